@@ -2,6 +2,10 @@
 # TFT Double Up crawler config (Windows absolute paths)
 
 REGIONAL_ROUTING = "europe"     # EUNE/EUW -> europe routing :contentReference[oaicite:1]{index=1}
+
+# None: real Riot API. Set to a local stand-in (src/riot_stub_server.py)
+# for offline benchmarks, e.g. "http://127.0.0.1:8089"
+API_BASE_URL = None
 PATCH_PREFIX = "16.3"           #  patch prefix
 
 # Double Up queueId-k (if kept_count is 0, later you can debug)
@@ -21,8 +25,78 @@ PROJECT_ROOT = r"C:\Users\Levi\Documents\tft_duo_project"
 STATE_PATH = PROJECT_ROOT + r"\data\state\crawler_state.json"
 RAW_DIR = PROJECT_ROOT + r"\data\raw\matches"
 
-# Safety Limit
-MAX_QUEUE_SIZE = 30000
+# Crawl frontier (src/frontier.py): the queue lives in append-only segment
+# files, so no discovered puuid is dropped and the state only points into them
+FRONTIER_DIR = PROJECT_ROOT + r"\data\state\frontier"
+FRONTIER_SEGMENT_SIZE = 5000   # puuids per segment file (memory: about 2 segments)
 
 # State saving frequency (kept games)
 SAVE_EVERY_N_KEPT = 75
+
+# Telemetry (latency histograms, 429/5xx, yield, frontier size)
+METRICS_DIR = PROJECT_ROOT + r"\data\reports\crawler"
+METRICS_EXPORT_EVERY_SECONDS = 30
+METRICS_FORMAT = "both"        # "json" | "prom" | "both"
+
+# Disk writes (raw matches + state checkpoints) on a background thread,
+# so the fetch loop doesn't wait for json.dumps + file I/O.
+# False (default): inline writes. Set True to opt in
+WRITER_ENABLED = False
+WRITER_QUEUE_SIZE = 256        # pending writes before the fetch loop blocks
+WRITER_BATCH_SIZE = 32
+WRITER_FSYNC = "state"         # "none" | "state" (checkpoints only) | "always"
+
+# Raw match files hold the API response body as received.
+# None: <match_id>.json, "gzip": <match_id>.json.gz (~5-8x smaller, every reader takes both)
+RAW_COMPRESS = None
+RAW_GZIP_LEVEL = 6
+
+# Sharded crawl (src/crawl_shard.py): workers share one SQLite work queue
+SHARD_DB_PATH = PROJECT_ROOT + r"\data\state\crawl_queue.sqlite"
+SHARD_WORKERS = 4
+SHARD_LEASE_SECONDS = 120      # a crashed worker's leases are reclaimed after this
+SHARD_LEASE_BATCH = 8          # match ids leased at once
+SHARD_MAX_ATTEMPTS = 5         # leases per item before it's marked failed
+SHARD_RATE_LIMITS = "20:1,100:120"   # app rate limit of the key, shared by all workers
+SHARD_RATE_SAFETY = 0.9        # use this share of it (other tools share the key)
+
+# Live synergy (src/live_synergy.py): kept matches are classified and
+# aggregated while crawling, CSVs + partner index published periodically
+LIVE_SYNERGY = False
+LIVE_SYNERGY_DIR = PROJECT_ROOT + r"\output\synergy_live"
+LIVE_PUBLISH_EVERY_SECONDS = 30
+LIVE_BUILDS_PATH = PROJECT_ROOT + r"\config\builds_set16_16.3_SA.json"
+LIVE_UNIT_LIST_PATH = PROJECT_ROOT + r"\data\unit_list\16.txt"
+
+# Matchlist cache (src/matchlist_cache.py): per-puuid last poll + newest
+# game_datetime, so recrawls only list new games (startTime) and skip
+# players polled within the TTL. None (default): no cache, always the
+# newest N ids. Opt in with e.g.
+#   MATCHLIST_CACHE_PATH = PROJECT_ROOT + r"\data\state\matchlist_cache.sqlite"
+MATCHLIST_CACHE_PATH = None
+MATCHLIST_TTL_SECONDS = 6 * 3600
+MATCHLIST_WATERMARK_SLACK_SECONDS = 300   # startTime = watermark - slack (re-listed ids are dropped anyway)
+MATCHLIST_MAX_PAGES = 10                  # pages of MATCHLIST_COUNT_PER_PLAYER after a watermark; more -> it doesn't move
+MATCHLIST_REFRESH_MIN_SLEEP = 60          # --loop: minimum pause between refresh rounds
+
+# Adaptive concurrency + per-host circuit breaker (src/crawl_control.py).
+# Match details of a matchlist are fetched in parallel; the in-flight limit
+# moves AIMD-style with latency, 429s and 5xx. A 429 pauses the host, a
+# run of 5xx / network errors opens its breaker (the whole crawl waits).
+# False (default): one request at a time, per-call backoff, SLEEP_SECONDS throttle
+CONTROL_ENABLED = False
+# Requests are paced to the key's app limits (sliding windows per host);
+# SLEEP_SECONDS is then skipped. "": no pacing, SLEEP_SECONDS still applies
+CONTROL_RATE_LIMITS = "20:1,100:120"
+CONTROL_RATE_SAFETY = 0.9
+CONTROL_INITIAL_CONCURRENCY = 2
+CONTROL_MIN_CONCURRENCY = 1
+CONTROL_MAX_CONCURRENCY = 8
+CONTROL_DECREASE_FACTOR = 0.5
+CONTROL_LATENCY_TOLERANCE = 2.0          # slow = latency EWMA above this x the best recent latency
+CONTROL_LATENCY_FLOOR_SECONDS = 0.05     # ... and at least this much above it
+BREAKER_WINDOW = 20                      # last N responses per host
+BREAKER_FAILURE_RATIO = 0.5              # open at this share of 5xx / network errors
+BREAKER_MIN_REQUESTS = 10
+BREAKER_OPEN_SECONDS = 15                # then one probe request (half-open)
+BREAKER_MAX_OPEN_SECONDS = 300           # a failed probe doubles the open time up to this
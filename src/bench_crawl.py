@@ -0,0 +1,148 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+# crawler.py refuses to import without a key; the stub only checks it's present
+os.environ.setdefault("RIOT_API_KEY", "RGAPI-stub")
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import config.crawl_config as cfg
+import crawler
+from crawl_metrics import CrawlMetrics
+from riot_stub_server import ReplaySource, RiotStubServer, StubConfig, SyntheticSource
+
+# =========================================================
+# 0) Crawler throughput benchmark against the local stub
+# =========================================================
+#
+# Starts riot_stub_server in-process, points crawl_config at it and a
+# fresh RAW_DIR / STATE_PATH, runs crawl() and reports throughput,
+# CPU per kept match, retries and the stub's view of the traffic.
+# --no-control runs the sequential crawler (per-call backoff) for comparison.
+
+WORK_DIR = cfg.PROJECT_ROOT + r"\data\bench\crawl"
+OUT_DIR = cfg.PROJECT_ROOT + r"\data\reports\bench"
+
+
+def run(source, stub_cfg: StubConfig, target: int, sleep_s: float, work_dir: str, seeds,
+        control: bool = True, max_concurrency: int = 0, rate_limits: str = "") -> dict:
+    """rate_limits: CONTROL_RATE_LIMITS for the run ("": the limiter doesn't pace)"""
+    if os.path.isdir(work_dir):
+        shutil.rmtree(work_dir)
+    os.makedirs(work_dir)
+
+    server = RiotStubServer(source, stub_cfg, port=0)
+    base_url = server.start()
+
+    cfg.API_BASE_URL = base_url
+    cfg.RAW_DIR = os.path.join(work_dir, "raw")
+    cfg.STATE_PATH = os.path.join(work_dir, "crawler_state.json")
+    cfg.FRONTIER_DIR = os.path.join(work_dir, "frontier")
+    if cfg.MATCHLIST_CACHE_PATH:
+        cfg.MATCHLIST_CACHE_PATH = os.path.join(work_dir, "matchlist_cache.sqlite")
+    cfg.TARGET_MATCHES = target
+    cfg.SLEEP_SECONDS = sleep_s
+    cfg.CONTROL_ENABLED = control
+    cfg.CONTROL_RATE_LIMITS = rate_limits
+    if max_concurrency:
+        cfg.CONTROL_MAX_CONCURRENCY = max_concurrency
+    crawler.METRICS = CrawlMetrics(os.path.join(work_dir, "metrics"), cfg.METRICS_EXPORT_EVERY_SECONDS, "json")
+
+    t0 = time.perf_counter()
+    c0 = time.process_time()
+    try:
+        crawler.crawl(seeds)
+    finally:
+        wall = time.perf_counter() - t0
+        cpu = time.process_time() - c0
+        server.stop()
+
+    snap = crawler.METRICS.snapshot()
+    kept = snap["yield"]["match_kept"]
+    return {
+        "stub": {
+            "base_url": base_url,
+            "latency_ms": stub_cfg.latency_ms,
+            "jitter_ms": stub_cfg.jitter_ms,
+            "error_rate_5xx": stub_cfg.error_rate_5xx,
+            "app_limits": stub_cfg.app_limits,
+            "capacity": stub_cfg.capacity,
+            "stats": dict(server.stats),
+        },
+        "target": target,
+        "sleep_seconds": sleep_s,
+        "control": {
+            "enabled": control,
+            "max_concurrency": cfg.CONTROL_MAX_CONCURRENCY if control else 1,
+            "rate_limits": rate_limits if control else None,
+            "events": {k: snap["counters"].get(k, 0) for k in
+                       ("concurrency_decrease", "breaker_open", "breaker_half_open", "breaker_close")},
+            "gauges": snap["gauges"],
+        },
+        "kept": kept,
+        "wall_seconds": round(wall, 3),
+        "cpu_seconds": round(cpu, 3),
+        "kept_per_second": round(kept / wall, 3) if wall > 0 else None,
+        "cpu_ms_per_kept": round(cpu / kept * 1000, 3) if kept else None,
+        "metrics": {k: snap[k] for k in ("time", "http", "yield", "raw_cache")},
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Crawler throughput against the local Riot API stub.")
+    src = ap.add_mutually_exclusive_group()
+    src.add_argument("--replay-dir")
+    src.add_argument("--synthetic", type=int, default=5000)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--target", type=int, default=500)
+    ap.add_argument("--sleep", type=float, default=0.0, help="crawler SLEEP_SECONDS")
+    ap.add_argument("--latency-ms", type=float, default=20.0)
+    ap.add_argument("--jitter-ms", type=float, default=5.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--burst-every", type=float, default=0.0)
+    ap.add_argument("--burst-length", type=float, default=0.0)
+    ap.add_argument("--app-limits", default="")
+    ap.add_argument("--capacity", type=int, default=0, help="stub: requests served at once (0 = unlimited)")
+    ap.add_argument("--no-control", action="store_true", help="sequential crawler, per-call backoff")
+    ap.add_argument("--max-concurrency", type=int, default=0, help="CONTROL_MAX_CONCURRENCY override")
+    ap.add_argument("--rate-limits", default=None,
+                    help="CONTROL_RATE_LIMITS for the crawler (default: the stub's --app-limits)")
+    ap.add_argument("--unit-list", default=None, help="--synthetic: unit list (default: synth_matches.UNIT_LIST_PATH)")
+    ap.add_argument("--builds", default=None, help="--synthetic: build templates (default: synth_matches.BUILDS_PATH)")
+    ap.add_argument("--work-dir", default=WORK_DIR)
+    ap.add_argument("--out", default=None, help="result JSON (default: OUT_DIR/bench_crawl_<time>.json)")
+    args = ap.parse_args()
+
+    source = (ReplaySource(args.replay_dir) if args.replay_dir
+              else SyntheticSource(args.synthetic, args.seed, args.builds, args.unit_list))
+    stub_cfg = StubConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.burst_every,
+                          args.burst_length, args.app_limits, True, args.seed, args.capacity)
+
+    result = run(source, stub_cfg, args.target, args.sleep, args.work_dir, ["Bench#STUB"],
+                 not args.no_control, args.max_concurrency,
+                 args.app_limits if args.rate_limits is None else args.rate_limits)
+
+    out = args.out or os.path.join(OUT_DIR, f"bench_crawl_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+
+    print("\n[BENCH CRAWL]")
+    print(f"  kept={result['kept']}  wall={result['wall_seconds']}s  cpu={result['cpu_seconds']}s")
+    print(f"  kept/s={result['kept_per_second']}  cpu ms/kept={result['cpu_ms_per_kept']}")
+    print(f"  429={result['metrics']['http']['429']}  5xx={result['metrics']['http']['5xx']}"
+          f"  peak in flight={result['stub']['stats'].get('peak_in_flight')}")
+    if not args.no_control:
+        print(f"  control: {result['control']['events']}")
+    print(f"  result: {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+
+import filter_patch_raw
+import make_pair_summaries
+import synergy_MVP
+from profiling import Profiler
+from synth_matches import SyntheticMatchGenerator
+from unit_vocab import UnitVocab, vocab_path_for
+
+# =========================================================
+# 0) End-to-end benchmark on synthetic corpora
+# =========================================================
+#
+# For every corpus size:
+#   filter_patch_raw      raw/ -> raw/16.3/
+#   make_pair_summaries   raw/16.3/ -> pair_summaries.jsonl
+#   identify_build        classifier alone, on the boards of the output
+#   synergy_MVP           load, marginals, synergies, CSV, plots
+#
+# Corpora are generated once per (size, seed) and reused (generation is
+# not timed). Results are a profiling report (wall / cpu / memory per
+# stage) in OUT_DIR, compare two runs with --compare.
+
+PROJECT_ROOT = r"C:\Users\Levi\Documents\tft_duo_project"
+WORK_DIR = PROJECT_ROOT + r"\data\bench"
+OUT_DIR = PROJECT_ROOT + r"\data\reports\bench"
+BUILDS_PATH = PROJECT_ROOT + r"\config\builds_set16_16.3_SA.json"
+UNIT_LIST_PATH = PROJECT_ROOT + r"\data\unit_list\16.txt"
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+# plotting cost doesn't grow with the corpus -> optional
+PLOTS = True
+
+
+def git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def quiet():
+    """the pipeline scripts print a lot -> keep the bench output readable"""
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def prepare_corpus(gen: SyntheticMatchGenerator, size: int, work: str) -> str:
+    raw_dir = os.path.join(work, "raw")
+    patch_dir = os.path.join(raw_dir, filter_patch_raw.PATCH_PREFIX)
+
+    # undo the previous filter run so the corpus is reusable
+    if os.path.isdir(patch_dir):
+        for fn in os.listdir(patch_dir):
+            os.replace(os.path.join(patch_dir, fn), os.path.join(raw_dir, fn))
+
+    written = gen.write_corpus(raw_dir, size)
+    if written:
+        print(f"[GEN] size={size}: {written} new matches in {raw_dir}")
+    return raw_dir
+
+
+def bench_size(prof: Profiler, gen: SyntheticMatchGenerator, size: int, work_root: str) -> None:
+    work = os.path.join(work_root, f"n{size}_seed{gen.seed}")
+    raw_dir = prepare_corpus(gen, size, work)
+    patch_dir = os.path.join(raw_dir, filter_patch_raw.PATCH_PREFIX)
+    processed = os.path.join(work, "processed")
+    out_jsonl = os.path.join(processed, "pair_summaries.jsonl")
+    syn_dir = os.path.join(work, "synergy")
+    tag = f"n={size}"
+
+    # --- filter_patch_raw ---
+    filter_patch_raw.RAW_DIR = raw_dir
+    filter_patch_raw.OUT_DIR = patch_dir
+    filter_patch_raw.JOURNAL_PATH = os.path.join(raw_dir, ".filter_journal.tsv")
+    filter_patch_raw.PARTITION_ALL_PATCHES = False
+    with quiet(), prof.stage(f"{tag} filter_patch_raw"):
+        filter_patch_raw.main()
+
+    # --- make_pair_summaries ---
+    make_pair_summaries.RAW_DIR = patch_dir
+    make_pair_summaries.BUILDS_PATH = BUILDS_PATH
+    make_pair_summaries.UNIT_LIST_PATH = UNIT_LIST_PATH
+    make_pair_summaries.PROCESSED_DIR = processed
+    make_pair_summaries.OUT_PATH = out_jsonl
+    with quiet(), prof.stage(f"{tag} make_pair_summaries"):
+        make_pair_summaries.main()
+
+    # --- identify_build alone (boards from the output, no parsing) ---
+    vocab = UnitVocab.load(vocab_path_for(out_jsonl))
+    boards = []
+    with open(out_jsonl, "r", encoding="utf-8") as f:
+        for line in f:
+            for mem in json.loads(line)["members"]:
+                boards.append(mem["board_mask"])
+    compiled = make_pair_summaries.compile_builds(make_pair_summaries.load_json(BUILDS_PATH), vocab)
+    with prof.stage(f"{tag} identify_build ({len(boards)} boards)"):
+        for b in boards:
+            make_pair_summaries.identify_build_mask(b, compiled)
+    del boards
+
+    # --- synergy_MVP ---
+    synergy_MVP.PAIR_FILE = out_jsonl
+    synergy_MVP.OUT_DIR = syn_dir
+    synergy_MVP.ensure_dir(syn_dir)
+    with prof.stage(f"{tag} synergy load"):
+        df_pairs = synergy_MVP.build_pair_dataframe(synergy_MVP.read_jsonl(out_jsonl))
+    with prof.stage(f"{tag} synergy marginals"):
+        df_marg = synergy_MVP.compute_build_marginals(df_pairs)
+    with prof.stage(f"{tag} synergy pair_synergies"):
+        df_syn = synergy_MVP.compute_pair_synergies(df_pairs, df_marg)
+    if PLOTS:
+        df_rank = df_syn[df_syn["games"] >= synergy_MVP.MIN_GAMES]
+        with prof.stage(f"{tag} synergy plots"):
+            synergy_MVP.plot_top_bar(df_rank, "synergy_score", "bench", os.path.join(syn_dir, "top_synergy_score.png"))
+            synergy_MVP.plot_scatter_count_vs_perf(df_syn, os.path.join(syn_dir, "scatter.png"))
+            synergy_MVP.plot_heatmap_top_builds(df_pairs, os.path.join(syn_dir, "heatmap.png"))
+
+    for st in prof.stages:
+        if st["name"].startswith(tag + " "):
+            print(f"  {st['name']:<48} wall={st['wall_seconds']:>9.3f}s  cpu={st['cpu_seconds']:>9.3f}s")
+
+
+def compare(old_path: str, new_path: str) -> None:
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = {s["name"]: s for s in json.load(f)["stages"]}
+    with open(new_path, "r", encoding="utf-8") as f:
+        new_report = json.load(f)
+    print(f"{'stage':<48} {'old s':>9} {'new s':>9} {'new/old':>8}")
+    for st in new_report["stages"]:
+        o = old.get(st["name"])
+        if o is None:
+            continue
+        ratio = st["wall_seconds"] / o["wall_seconds"] if o["wall_seconds"] > 0 else float("nan")
+        print(f"{st['name']:<48} {o['wall_seconds']:>9.3f} {st['wall_seconds']:>9.3f} {ratio:>8.2f}")
+
+
+# =========================================================
+# 1) MAIN
+# =========================================================
+
+def main():
+    global PLOTS, BUILDS_PATH, UNIT_LIST_PATH
+
+    ap = argparse.ArgumentParser(description="Benchmark the pipeline on synthetic corpora.")
+    ap.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--work-dir", default=WORK_DIR)
+    ap.add_argument("--out-dir", default=OUT_DIR)
+    ap.add_argument("--builds", default=BUILDS_PATH)
+    ap.add_argument("--unit-list", default=UNIT_LIST_PATH)
+    ap.add_argument("--memory", action="store_true", help="tracemalloc peak per stage (slower)")
+    ap.add_argument("--no-plots", action="store_true")
+    ap.add_argument("--compare", nargs=2, metavar=("OLD_JSON", "NEW_JSON"))
+    args = ap.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    PLOTS = not args.no_plots
+    BUILDS_PATH = args.builds
+    UNIT_LIST_PATH = args.unit_list
+    gen = SyntheticMatchGenerator(args.seed, UNIT_LIST_PATH, BUILDS_PATH)
+    prof = Profiler(enabled=True, memory=args.memory, report_dir=args.out_dir)
+    prof.start("bench_pipeline", commit=git_commit(), seed=args.seed, sizes=args.sizes, memory=args.memory)
+
+    for size in args.sizes:
+        print(f"[BENCH] n={size}")
+        bench_size(prof, gen, size, args.work_dir)
+
+    prof.finish()
+
+
+if __name__ == "__main__":
+    main()
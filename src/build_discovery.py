@@ -0,0 +1,388 @@
+import argparse
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from make_pair_summaries import BUILDS_PATH, KEY_UNITS_N
+from synergy_MVP import DOUBLE_UP_QUEUE_ID, EB_M, empirical_bayes, team_rank_to_points
+from unit_vocab import UnitVocab, vocab_path_for
+
+# =========================================================
+# 0) Build discovery (MinHash + LSH)
+# =========================================================
+#
+# Proposes new templates from the boards the current ones don't cover
+# (build_id == UNKNOWN in the pair summaries):
+#
+#   1) identical boards are merged first (board_mask -> count, placements)
+#   2) every distinct board gets a MinHash signature of its unit set:
+#      NUM_BANDS * ROWS_PER_BAND random permutations of the unit ids,
+#      signature[k] = min over the board's units of perm_k[unit]
+#   3) LSH banding: the signature is cut into NUM_BANDS bands, boards
+#      sharing any band bucket are candidates (Jaccard ~ JACCARD_THRESHOLD
+#      and up), no all-pairs comparison
+#   4) leader clustering, most frequent boards first: a board joins the
+#      candidate cluster center with the highest exact Jaccard (bitmask
+#      popcounts) if >= JACCARD_THRESHOLD, otherwise it becomes a center.
+#      Only centers are kept in the buckets, so a cluster can't drift
+#      through a chain of near neighbours.
+#   5) per cluster: units on >= UNIT_MIN_SHARE of its boards form the
+#      template. Key units first (same as the hand written templates, the
+#      first KEY_UNITS_N units are the key units of identify_build_mask):
+#      the most cluster-specific (lift vs all boards) of the units on
+#      >= KEY_UNIT_MIN_SHARE of the boards, the rest by share.
+#
+# Output: candidate templates in the builds_set16_*.json schema
+# (build_id / name / units / notes) and a CSV with the cluster stats.
+
+PAIR_FILE = r"C:\Users\Levi\Documents\tft_duo_project\data\processed\pair_summaries_SA.jsonl"
+OUT_DIR = r"C:\Users\Levi\Documents\tft_duo_project\output\build_discovery"
+
+# LSH: P(candidate) = 1 - (1 - J^ROWS_PER_BAND)^NUM_BANDS
+#   J=0.6 -> 0.99, J=0.4 -> 0.56, J=0.2 -> 0.05
+NUM_BANDS = 32
+ROWS_PER_BAND = 4
+SEED = 42
+
+JACCARD_THRESHOLD = 0.6
+
+# clusters with fewer boards are not proposed
+MIN_CLUSTER_BOARDS = 100
+
+# template units
+UNIT_MIN_SHARE = 0.5
+KEY_UNIT_MIN_SHARE = 0.75
+MAX_TEMPLATE_UNITS = 10
+
+# candidates this close (unit set Jaccard) to a higher ranked one are folded into it
+TEMPLATE_DEDUP_JACCARD = 0.8
+
+# boards per MinHash chunk (chunk * NUM_BANDS * ROWS_PER_BAND * units values)
+SIGNATURE_CHUNK = 50_000
+
+_N, _PLACE, _TOP2, _POINTS = range(4)
+
+
+# =========================================================
+# 1) Boards
+# =========================================================
+
+def load_boards(path: str, include_known: bool = False,
+                queue_id: Optional[int] = DOUBLE_UP_QUEUE_ID) -> Dict[int, List[int]]:
+    """board_mask -> [count, placement sum, top2 count, team points sum]"""
+    boards: Dict[int, List[int]] = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            r = json.loads(line)
+            if queue_id is not None and r.get("queue_id") != queue_id:
+                continue
+            team_rank = r.get("team_rank")
+            if team_rank is None:
+                continue
+            team_rank = int(team_rank)
+            for m in r.get("members") or []:
+                if not include_known and m.get("build_id", "UNKNOWN") != "UNKNOWN":
+                    continue
+                mask = int(m.get("board_mask") or 0)
+                if not mask:
+                    continue
+                st = boards.get(mask)
+                if st is None:
+                    st = boards[mask] = [0, 0, 0, 0]
+                st[_N] += 1
+                st[_PLACE] += int(m.get("placement") or 0)
+                st[_TOP2] += team_rank <= 2
+                st[_POINTS] += team_rank_to_points(team_rank)
+    return boards
+
+
+def masks_to_ids(masks: List[int], vocab: UnitVocab) -> Tuple[np.ndarray, np.ndarray]:
+    """CSR layout: unit ids of board i = indices[indptr[i]:indptr[i+1]]"""
+    indptr = np.zeros(len(masks) + 1, dtype=np.int64)
+    indices: List[int] = []
+    for i, m in enumerate(masks):
+        indices.extend(vocab.unit_ids(m))
+        indptr[i + 1] = len(indices)
+    return indptr, np.asarray(indices, dtype=np.int64)
+
+
+# =========================================================
+# 2) MinHash + LSH
+# =========================================================
+
+def minhash_signatures(indptr: np.ndarray, indices: np.ndarray, n_units: int,
+                       num_hashes: int, seed: int = SEED) -> np.ndarray:
+    """
+    (boards, num_hashes) uint16. The unit universe is small, so the hash
+    functions are explicit random permutations of the unit ids.
+    """
+    rng = np.random.default_rng(seed)
+    perms = np.stack([rng.permutation(n_units) for _ in range(num_hashes)]).astype(np.uint16)
+
+    n = len(indptr) - 1
+    sig = np.empty((n, num_hashes), dtype=np.uint16)
+    for lo in range(0, n, SIGNATURE_CHUNK):
+        hi = min(n, lo + SIGNATURE_CHUNK)
+        a, b = indptr[lo], indptr[hi]
+        vals = perms[:, indices[a:b]]  # (num_hashes, units in chunk)
+        sig[lo:hi] = np.minimum.reduceat(vals, indptr[lo:hi] - a, axis=1).T
+    return sig
+
+
+def band_keys(sig: np.ndarray, num_bands: int, rows: int) -> np.ndarray:
+    """(boards, num_bands) uint64, one bucket key per band"""
+    if rows > 4:
+        raise ValueError("ROWS_PER_BAND > 4 doesn't fit a 64 bit band key")
+    bands = sig.reshape(len(sig), num_bands, rows).astype(np.uint64)
+    keys = np.zeros((len(sig), num_bands), dtype=np.uint64)
+    for r in range(rows):
+        keys |= bands[:, :, r] << np.uint64(16 * r)
+    return keys
+
+
+def jaccard(a: int, b: int) -> float:
+    union = (a | b).bit_count()
+    return (a & b).bit_count() / union if union else 0.0
+
+
+def leader_clusters(masks: List[int], keys: np.ndarray, threshold: float = JACCARD_THRESHOLD) -> np.ndarray:
+    """
+    masks must be in processing order (most frequent first).
+    Returns the cluster id (= index of its center board) per board.
+    """
+    num_bands = keys.shape[1]
+    buckets: List[Dict[int, List[int]]] = [{} for _ in range(num_bands)]
+    cluster = np.empty(len(masks), dtype=np.int64)
+    sizes = [m.bit_count() for m in masks]
+
+    for i, row in enumerate(keys.tolist()):
+        mask = masks[i]
+        size = sizes[i]
+        best, best_j = -1, threshold
+        seen = set()
+        for band, key in enumerate(row):
+            for c in buckets[band].get(key, ()):
+                if c in seen:
+                    continue
+                seen.add(c)
+                # jaccard(), inlined (the hot loop)
+                inter = (mask & masks[c]).bit_count()
+                j = inter / (size + sizes[c] - inter)
+                if j >= best_j and (j > best_j or best < 0):
+                    best, best_j = c, j
+
+        if best >= 0:
+            cluster[i] = best
+            continue
+
+        cluster[i] = i
+        for band, key in enumerate(row):
+            buckets[band].setdefault(key, []).append(i)
+    return cluster
+
+
+# =========================================================
+# 3) Clusters -> candidate templates
+# =========================================================
+
+def cluster_unit_counts(cluster: np.ndarray, weights: np.ndarray, indptr: np.ndarray,
+                        indices: np.ndarray, n_units: int) -> Tuple[np.ndarray, np.ndarray]:
+    """-> cluster ids (centers), (clusters, units) weighted unit counts"""
+    centers, cidx = np.unique(cluster, return_inverse=True)
+    counts = np.zeros((len(centers), n_units), dtype=np.int64)
+    rows = np.repeat(cidx, np.diff(indptr))
+    np.add.at(counts, (rows, indices), np.repeat(weights, np.diff(indptr)))
+    return centers, counts
+
+
+def template_units(share: np.ndarray, lift: np.ndarray, vocab: UnitVocab) -> List[str]:
+    units = [u for u in np.argsort(-share, kind="stable") if share[u] >= UNIT_MIN_SHARE][:MAX_TEMPLATE_UNITS]
+    key = sorted((u for u in units if share[u] >= KEY_UNIT_MIN_SHARE), key=lambda u: (-lift[u], -share[u]))[:KEY_UNITS_N]
+    rest = [u for u in units if u not in key]
+    return [vocab.names[u] for u in key + rest]
+
+
+def discover(boards: Dict[int, List[int]], vocab: UnitVocab, min_boards: int = MIN_CLUSTER_BOARDS,
+             threshold: float = JACCARD_THRESHOLD, num_bands: int = NUM_BANDS,
+             rows: int = ROWS_PER_BAND, seed: int = SEED) -> List[Dict[str, Any]]:
+    """Clusters with >= min_boards boards, most frequent first."""
+    order = sorted(boards, key=lambda m: -boards[m][_N])
+    stats = np.asarray([boards[m] for m in order], dtype=np.int64).reshape(-1, 4)
+    if not order:
+        return []
+
+    indptr, indices = masks_to_ids(order, vocab)
+    sig = minhash_signatures(indptr, indices, len(vocab), num_bands * rows, seed)
+    cluster = leader_clusters(order, band_keys(sig, num_bands, rows), threshold)
+
+    weights = stats[:, _N]
+    centers, counts = cluster_unit_counts(cluster, weights, indptr, indices, len(vocab))
+    _, cidx = np.unique(cluster, return_inverse=True)
+    totals = np.zeros((len(centers), 4), dtype=np.int64)
+    np.add.at(totals, cidx, stats)
+    n_distinct = np.bincount(cidx, minlength=len(centers))
+
+    all_boards = max(int(weights.sum()), 1)
+    global_share = counts.sum(axis=0) / all_boards
+    global_mean = float(stats[:, _POINTS].sum()) / all_boards
+
+    out = []
+    for c in np.flatnonzero(totals[:, _N] >= min_boards):
+        n = int(totals[c, _N])
+        share = counts[c] / n
+        with np.errstate(divide="ignore", invalid="ignore"):
+            lift = np.where(global_share > 0, share / global_share, 0.0)
+        units = template_units(share, lift, vocab)
+        if not units:
+            continue
+        avg_points = totals[c, _POINTS] / n
+        out.append({
+            "units": units,
+            "boards": n,
+            "distinct_boards": int(n_distinct[c]),
+            "board_share": n / all_boards,
+            "avg_placement": totals[c, _PLACE] / n,
+            "top2": totals[c, _TOP2] / n,
+            "avg_team_points": avg_points,
+            "eb_points": empirical_bayes(avg_points, n, global_mean, EB_M),
+            "center": vocab.decode_board(order[centers[c]]),
+            "_totals": totals[c].copy(),
+        })
+    out.sort(key=lambda r: (-r["boards"], r["avg_placement"]))
+    return fold_duplicates(out, vocab, global_mean)
+
+
+def fold_duplicates(cands: List[Dict[str, Any]], vocab: UnitVocab, global_mean: float) -> List[Dict[str, Any]]:
+    """Near identical candidates (two centers, same template) -> the higher ranked one."""
+    kept: List[Dict[str, Any]] = []
+    kept_masks: List[int] = []
+    for c in cands:
+        mask = vocab.encode_board(c["units"])
+        dup = next((k for k, km in enumerate(kept_masks) if jaccard(mask, km) >= TEMPLATE_DEDUP_JACCARD), None)
+        if dup is None:
+            kept.append(c)
+            kept_masks.append(mask)
+            continue
+        k = kept[dup]
+        k["_totals"] += c["_totals"]
+        t = k["_totals"]
+        n = int(t[_N])
+        k["board_share"] *= n / k["boards"]
+        k["boards"] = n
+        k["distinct_boards"] += c["distinct_boards"]
+        k["avg_placement"] = t[_PLACE] / n
+        k["top2"] = t[_TOP2] / n
+        k["avg_team_points"] = t[_POINTS] / n
+        k["eb_points"] = empirical_bayes(k["avg_team_points"], n, global_mean, EB_M)
+    for k in kept:
+        del k["_totals"]
+    return kept
+
+
+def closest_known(units: List[str], builds: List[dict], vocab: UnitVocab) -> Tuple[Optional[str], float]:
+    mask = vocab.encode_board(units)
+    best, best_j = None, 0.0
+    for b in builds:
+        j = jaccard(mask, vocab.encode_board(b.get("units") or []))
+        if j > best_j:
+            best, best_j = b.get("build_id"), j
+    return best, best_j
+
+
+def to_templates(cands: List[Dict[str, Any]], id_prefix: str = "D") -> List[dict]:
+    out = []
+    for i, c in enumerate(cands, 1):
+        key = [u.split("_", 1)[-1] for u in c["units"][:2]]
+        out.append({
+            "build_id": f"{id_prefix}{i:02d}",
+            "name": "-".join(key),
+            "units": c["units"],
+            "notes": (f"discovered: {c['boards']} boards, avg placement {c['avg_placement']:.2f}, "
+                      f"top2 {c['top2']:.3f}"),
+        })
+    return out
+
+
+# =========================================================
+# 4) MAIN
+# =========================================================
+
+def main():
+    ap = argparse.ArgumentParser(description="Propose build templates from UNKNOWN boards (MinHash + LSH).")
+    ap.add_argument("--pairs", default=PAIR_FILE)
+    ap.add_argument("--out-dir", default=OUT_DIR)
+    ap.add_argument("--templates", default=BUILDS_PATH, help="current template set (for closest_known)")
+    ap.add_argument("--all-boards", action="store_true", help="cluster every board, not only UNKNOWN ones")
+    ap.add_argument("--min-boards", type=int, default=MIN_CLUSTER_BOARDS)
+    ap.add_argument("--threshold", type=float, default=JACCARD_THRESHOLD)
+    ap.add_argument("--bands", type=int, default=NUM_BANDS)
+    ap.add_argument("--rows", type=int, default=ROWS_PER_BAND)
+    ap.add_argument("--sort", choices=["boards", "eb_points"], default="boards",
+                    help="candidate order (build_id) in the template JSON")
+    args = ap.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    vocab = UnitVocab.load(vocab_path_for(args.pairs))
+
+    t0 = time.perf_counter()
+    boards = load_boards(args.pairs, include_known=args.all_boards)
+    n_boards = sum(st[_N] for st in boards.values())
+    t1 = time.perf_counter()
+    print(f"[LOAD] {n_boards} boards, {len(boards)} distinct ({t1 - t0:.2f}s)")
+    if not boards:
+        print("[ERROR] No boards to cluster.")
+        return
+
+    cands = discover(boards, vocab, args.min_boards, args.threshold, args.bands, args.rows)
+    t2 = time.perf_counter()
+    print(f"[LSH] {len(cands)} clusters with >= {args.min_boards} boards ({t2 - t1:.2f}s)")
+    if args.sort == "eb_points":
+        cands.sort(key=lambda r: -r["eb_points"])
+
+    known = []
+    if args.templates and os.path.exists(args.templates):
+        with open(args.templates, "r", encoding="utf-8") as f:
+            known = json.load(f)
+
+    templates = to_templates(cands)
+    rows = []
+    for t, c in zip(templates, cands):
+        closest, closest_j = closest_known(c["units"], known, vocab)
+        rows.append({
+            "build_id": t["build_id"],
+            "name": t["name"],
+            "boards": c["boards"],
+            "distinct_boards": c["distinct_boards"],
+            "board_share": c["board_share"],
+            "avg_placement": c["avg_placement"],
+            "top2": c["top2"],
+            "avg_team_points": c["avg_team_points"],
+            "eb_points": c["eb_points"],
+            "closest_known": closest,
+            "closest_known_jaccard": closest_j,
+            "units": " ".join(c["units"]),
+            "center_board": " ".join(c["center"]),
+        })
+
+    tpl_path = os.path.join(args.out_dir, "builds_candidates.json")
+    with open(tpl_path, "w", encoding="utf-8") as f:
+        json.dump(templates, f, ensure_ascii=False, indent=2)
+    pd.DataFrame(rows).to_csv(os.path.join(args.out_dir, "build_clusters.csv"), index=False, encoding="utf-8-sig")
+
+    covered = sum(c["boards"] for c in cands)
+    print(f"[DONE] {len(templates)} candidate templates -> {tpl_path}")
+    print(f"  boards covered: {covered}/{n_boards} ({(covered / n_boards if n_boards else 0):.2%})")
+    for r in rows[:10]:
+        print(f"  {r['build_id']} {r['name']:<24} boards={r['boards']:<6} place={r['avg_placement']:.2f} "
+              f"top2={r['top2']:.3f} known={r['closest_known']}({r['closest_known_jaccard']:.2f})")
+
+
+if __name__ == "__main__":
+    main()
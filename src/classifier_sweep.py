@@ -0,0 +1,386 @@
+import argparse
+import itertools
+import os
+import random
+import time
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+import make_pair_summaries as mps
+from filter_patch_raw import extract_patch
+from make_pair_summaries import BUILDS_PATH, PROCESSED_DIR, RAW_DIR, UNIT_LIST_PATH, compile_builds, \
+    identify_build_mask, iter_json_files, load_json, load_match
+from raw_reader import raw_match_id
+from unit_vocab import UnitVocab, vocab_path_for
+
+# =========================================================
+# 0) Classifier parameter sweep on cached boards
+# =========================================================
+#
+# KEY_UNITS_N, KEY_UNITS_MIN_HITS and min_required_hits
+# (max(MIN_HITS_FLOOR, ceil(size * MIN_HITS_RATIO))) decide the UNKNOWN
+# ratio and which template a board gets. Trying a value used to mean a full
+# make_pair_summaries rerun over the raw corpus.
+#
+#   cache  reads the raw matches once (same validity rules as
+#          make_pair_summaries: placements 1..8) and stores the encoded
+#          boards in an npz: distinct boards as uint64 words + one row per
+#          participant (match_id, placement, patch, queue_id, board index).
+#          The unit vocabulary goes next to it (board_cache.units.json).
+#          Rerunning it only reads the raw files that aren't cached yet.
+#
+#   sweep  classifies every distinct board for a grid of
+#          (key_units_n, key_min_hits, min_hits_ratio, min_hits_floor):
+#          matched / key hit counts are popcounts of (board & template) for
+#          all boards x templates at once, identify_build_mask's pick
+#          (key pool first, then key_hits, key_ratio, score, matched,
+#          smaller size, first template on ties) is one argmax over a packed
+#          int64 key. Per setting: UNKNOWN rate, per-build counts and churn
+#          against the baseline (the current make_pair_summaries constants).
+#
+# The baseline is checked against identify_build_mask on a sample of boards
+# before the sweep, so the two can't drift apart unnoticed.
+
+CACHE_PATH = os.path.join(PROCESSED_DIR, "board_cache.npz")
+OUT_DIR = r"C:\Users\Levi\Documents\tft_duo_project\output\classifier_sweep"
+
+GRID_KEY_UNITS_N = (2, 3, 4)
+GRID_KEY_MIN_HITS = (1, 2, 3)
+GRID_MIN_HITS_RATIO = (0.4, 0.5, 0.6)
+GRID_MIN_HITS_FLOOR = (2, 3)
+
+# distinct boards classified per block (bounds the boards x templates arrays)
+CHUNK_BOARDS = 100_000
+VERIFY_SAMPLE = 2000
+
+_MASK64 = (1 << 64) - 1
+
+
+# =========================================================
+# 1) BOARD CACHE
+# =========================================================
+
+def to_words(mask: int, n_words: int) -> List[int]:
+    return [(mask >> (64 * i)) & _MASK64 for i in range(n_words)]
+
+
+def from_words(words: Sequence[int]) -> int:
+    mask = 0
+    for i, w in enumerate(words):
+        mask |= int(w) << (64 * i)
+    return mask
+
+
+def load_cache(path: str = CACHE_PATH) -> Dict[str, Any]:
+    """-> boards (U, W) uint64, counts (U,), rows: board / match_id / placement / patch / queue_id, vocab"""
+    with np.load(path, allow_pickle=False) as z:
+        cache = {k: z[k] for k in z.files}
+    cache["vocab"] = UnitVocab.load(vocab_path_for(path))
+    return cache
+
+
+def build_cache(raw_dir: str = RAW_DIR, path: str = CACHE_PATH, unit_list_path: str = UNIT_LIST_PATH,
+                rebuild: bool = False) -> Dict[str, Any]:
+    old = None
+    if not rebuild and os.path.exists(path):
+        old = load_cache(path)
+        vocab = old["vocab"]
+        masks = [from_words(w) for w in old["boards"]]
+        rows = {k: list(old[k]) for k in ("board", "match_id", "placement", "patch", "queue_id")}
+    else:
+        vocab = UnitVocab.from_unit_list(unit_list_path)
+        masks = []
+        rows = {"board": [], "match_id": [], "placement": [], "patch": [], "queue_id": []}
+    board_ids = {m: i for i, m in enumerate(masks)}
+    cached = set(rows["match_id"])
+
+    new = skipped = 0
+    for path_ in iter_json_files(raw_dir):
+        if raw_match_id(os.path.basename(path_)) in cached:
+            continue
+        try:
+            match = load_match(path_)
+        except Exception as e:
+            print(f"[SKIP] {path_} -> {e}")
+            continue
+        info = match.get("info", {})
+        match_id = match.get("metadata", {}).get("match_id", raw_match_id(os.path.basename(path_)))
+        if match_id in cached:
+            continue
+
+        placement_map = {}
+        for p in info.get("participants", []):
+            try:
+                placement_map[int(p.get("placement"))] = p
+            except (TypeError, ValueError):
+                pass
+        if any(pl not in placement_map for pl in range(1, 9)):
+            skipped += 1
+            continue
+
+        patch = extract_patch(info.get("game_version")) or ""
+        queue_id = info.get("queue_id") or info.get("queueId") or 0
+        for pl in range(1, 9):
+            board = vocab.encode_board(u.get("character_id") for u in placement_map[pl].get("units", []))
+            bid = board_ids.get(board)
+            if bid is None:
+                bid = board_ids[board] = len(masks)
+                masks.append(board)
+            rows["board"].append(bid)
+            rows["match_id"].append(match_id)
+            rows["placement"].append(pl)
+            rows["patch"].append(patch)
+            rows["queue_id"].append(queue_id)
+        cached.add(match_id)
+        new += 1
+
+    n_words = max(1, (len(vocab) + 63) // 64)
+    boards = np.array([to_words(m, n_words) for m in masks], dtype=np.uint64).reshape(len(masks), n_words)
+    cache = {
+        "boards": boards,
+        "counts": np.bincount(np.asarray(rows["board"], dtype=np.int64), minlength=len(masks)),
+        "board": np.asarray(rows["board"], dtype=np.int32),
+        "match_id": np.asarray(rows["match_id"], dtype=str),
+        "placement": np.asarray(rows["placement"], dtype=np.int8),
+        "patch": np.asarray(rows["patch"], dtype=str),
+        "queue_id": np.asarray(rows["queue_id"], dtype=np.int32),
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, **cache)
+    os.replace(tmp, path)
+    vocab.save(vocab_path_for(path))
+    cache["vocab"] = vocab
+
+    print(f"[CACHE] +{new} matches ({skipped} skipped), {len(cache['board'])} boards, {len(masks)} distinct, "
+          f"{len(vocab)} units -> {path}")
+    return cache
+
+
+def select_rows(cache: Dict[str, Any], patch: str | None = None, queue_id: int | None = None) -> np.ndarray:
+    """distinct board weights of the rows that pass the filters"""
+    keep = np.ones(len(cache["board"]), dtype=bool)
+    if patch:
+        keep &= cache["patch"] == patch
+    if queue_id is not None:
+        keep &= cache["queue_id"] == queue_id
+    return np.bincount(cache["board"][keep], minlength=len(cache["boards"]))
+
+
+# =========================================================
+# 2) VECTORIZED CLASSIFICATION
+# =========================================================
+
+def template_arrays(compiled: List[Dict[str, Any]], n_words: int, key_ns: Sequence[int]) -> Dict[str, Any]:
+    sizes = np.array([b["size"] for b in compiled], dtype=np.int64)
+    if sizes.max(initial=0) > 127:
+        raise ValueError("template with more than 127 units")
+    max_size = int(sizes.max(initial=0))
+    # identify_build_mask's rounded score, x 10000 as int
+    score = np.zeros((len(compiled), max_size + 1), dtype=np.int64)
+    for t, b in enumerate(compiled):
+        score[t, :b["size"] + 1] = [int(round(s * 10000)) for s in b["score_by_matched"]]
+    key_masks = {}
+    for k in key_ns:
+        key_masks[k] = np.array([to_words(sum(b["bits"][:min(k, b["size"])]), n_words) for b in compiled],
+                                dtype=np.uint64).reshape(len(compiled), n_words)
+    return {
+        "masks": np.array([to_words(b["mask"], n_words) for b in compiled], dtype=np.uint64).reshape(len(compiled), n_words),
+        "sizes": sizes,
+        "score": score,
+        "key_masks": key_masks,
+    }
+
+
+def _popcount(boards: np.ndarray, masks: np.ndarray) -> np.ndarray:
+    """(B, W) x (T, W) -> (B, T) set bits of board & mask"""
+    return np.bitwise_count(boards[:, None, :] & masks[None, :, :]).sum(axis=2, dtype=np.int64)
+
+
+def classify(boards: np.ndarray, tpl: Dict[str, Any], settings: List[Tuple[int, int, float, int]]) -> np.ndarray:
+    """-> (settings, boards) template index, -1 = UNKNOWN"""
+    sizes = tpl["sizes"]
+    n_t = len(sizes)
+    out = np.full((len(settings), len(boards)), -1, dtype=np.int16)
+    if n_t == 0:
+        return out
+    max_k = max(s[0] for s in settings)
+    # key_ratio = round(key_hits / key_n, 4) x 10000
+    ratio = np.zeros((max_k + 1, max_k + 1), dtype=np.int64)
+    for kn in range(1, max_k + 1):
+        for kh in range(kn + 1):
+            ratio[kn, kh] = int(round(round(kh / kn, 4) * 10000))
+    t_idx = np.arange(n_t)
+
+    for lo in range(0, len(boards), CHUNK_BOARDS):
+        chunk = boards[lo:lo + CHUNK_BOARDS]
+        matched = _popcount(chunk, tpl["masks"])
+        score = tpl["score"][t_idx[None, :], matched]
+        # identify_build_mask's tie-break tuple packed into 46 bits, per key_units_n
+        key_hits, tuples = {}, {}
+        for k, m in tpl["key_masks"].items():
+            kh = key_hits[k] = _popcount(chunk, m)
+            key = kh.copy()
+            key = (key << 14) | ratio[np.minimum(k, sizes)[None, :], kh]
+            key = (key << 14) | score
+            key = (key << 7) | matched
+            tuples[k] = (key << 7) | (127 - sizes)
+        eligible = {}
+        for _, _, r, f in settings:
+            if (r, f) not in eligible:
+                eligible[(r, f)] = matched >= np.maximum(f, np.ceil(sizes * r).astype(np.int64))
+
+        for s, (k, h, r, f) in enumerate(settings):
+            # key pool above everything else
+            key = tuples[k] | ((key_hits[k] >= h).astype(np.int64) << 46)
+            key = np.where(eligible[(r, f)], key, -1)
+            best = key.argmax(axis=1)
+            hit = key[np.arange(len(chunk)), best] >= 0
+            out[s, lo:lo + len(chunk)] = np.where(hit, best, -1)
+    return out
+
+
+def verify_baseline(boards: np.ndarray, assign: np.ndarray, compiled: List[Dict[str, Any]], sample: int) -> Tuple[int, int]:
+    """vectorized baseline vs identify_build_mask on a sample of boards"""
+    idx = random.Random(0).sample(range(len(boards)), min(sample, len(boards)))
+    agree = 0
+    for i in idx:
+        best = identify_build_mask(from_words(boards[i]), compiled, with_names=False)
+        want = -1 if best is None else next(t for t, b in enumerate(compiled) if b["build_id"] == best["build_id"]
+                                            and b["build_name"] == best["build_name"])
+        agree += int(assign[i]) == want
+    return agree, len(idx)
+
+
+# =========================================================
+# 3) SWEEP
+# =========================================================
+
+def setting_label(k: int, h: int, r: float, f: int) -> str:
+    return f"k{k}_h{h}_r{r:g}_f{f}"
+
+
+def sweep(cache: Dict[str, Any], builds: List[Dict[str, Any]], weights: np.ndarray,
+          key_ns: Sequence[int], key_min_hits: Sequence[int], ratios: Sequence[float], floors: Sequence[int],
+          verify: int = VERIFY_SAMPLE) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    baseline = (mps.KEY_UNITS_N, mps.KEY_UNITS_MIN_HITS, mps.MIN_HITS_RATIO, mps.MIN_HITS_FLOOR)
+    settings = [baseline] + [s for s in itertools.product(key_ns, key_min_hits, ratios, floors) if s != baseline]
+
+    # template units the corpus never saw still get an id (and can't match)
+    vocab = cache["vocab"]
+    compiled = compile_builds(builds, vocab)
+    n_words = max(cache["boards"].shape[1], (len(vocab) + 63) // 64)
+    boards = cache["boards"]
+    if boards.shape[1] < n_words:
+        boards = np.pad(boards, ((0, 0), (0, n_words - boards.shape[1])))
+
+    # only boards that occur under the filters
+    used = np.flatnonzero(weights)
+    boards, w = boards[used], weights[used].astype(np.float64)
+
+    tpl = template_arrays(compiled, n_words, sorted({s[0] for s in settings}))
+    t0 = time.perf_counter()
+    assign = classify(boards, tpl, settings)
+    t1 = time.perf_counter()
+    print(f"[SWEEP] {len(settings)} settings x {len(boards)} distinct boards x {len(compiled)} templates "
+          f"({t1 - t0:.2f}s)")
+
+    if verify:
+        agree, n = verify_baseline(boards, assign[0], compiled, verify)
+        print(f"[CHECK] baseline vs identify_build_mask: {agree}/{n} boards agree")
+        if agree != n:
+            raise RuntimeError("vectorized classifier disagrees with identify_build_mask")
+
+    total = w.sum()
+    base = assign[0]
+    n_t = len(compiled)
+    counts = np.zeros((len(settings), n_t + 1))
+    rows = []
+    for s, (k, h, r, f) in enumerate(settings):
+        a = assign[s]
+        counts[s] = np.bincount(a + 1, weights=w, minlength=n_t + 1)
+        changed = a != base
+        rows.append({
+            "setting": setting_label(k, h, r, f),
+            "key_units_n": k,
+            "key_min_hits": h,
+            "min_hits_ratio": r,
+            "min_hits_floor": f,
+            "boards": int(total),
+            "unknown_rate": counts[s, 0] / total if total else np.nan,
+            "churn": w[changed].sum() / total if total else np.nan,
+            "unknown_to_known": w[changed & (base < 0)].sum() / total if total else np.nan,
+            "known_to_unknown": w[changed & (a < 0)].sum() / total if total else np.nan,
+            "known_switch": w[changed & (base >= 0) & (a >= 0)].sum() / total if total else np.nan,
+            "builds_used": int((counts[s, 1:] > 0).sum()),
+            "is_baseline": s == 0,
+        })
+    df = pd.DataFrame(rows)
+
+    df_counts = pd.DataFrame(counts.T.astype(np.int64), columns=df["setting"])
+    df_counts.insert(0, "build_name", ["UNKNOWN"] + [b["build_name"] for b in compiled])
+    df_counts.insert(0, "build_id", ["UNKNOWN"] + [b["build_id"] for b in compiled])
+    return df, df_counts
+
+
+# =========================================================
+# 4) MAIN
+# =========================================================
+
+def main():
+    ap = argparse.ArgumentParser(description="Sweep the build classifier parameters over cached board encodings.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    c = sub.add_parser("cache", help="encode the raw corpus boards once (incremental)")
+    c.add_argument("--raw-dir", default=RAW_DIR)
+    c.add_argument("--cache", default=CACHE_PATH)
+    c.add_argument("--unit-list", default=UNIT_LIST_PATH)
+    c.add_argument("--rebuild", action="store_true", help="ignore the existing cache")
+
+    s = sub.add_parser("sweep", help="classify the cached boards for a parameter grid")
+    s.add_argument("--cache", default=CACHE_PATH)
+    s.add_argument("--templates", default=BUILDS_PATH)
+    s.add_argument("--out-dir", default=OUT_DIR)
+    s.add_argument("--patch", default=None, help="only boards of this patch")
+    s.add_argument("--queue-id", type=int, default=None)
+    s.add_argument("--key-units-n", type=int, nargs="+", default=list(GRID_KEY_UNITS_N))
+    s.add_argument("--key-min-hits", type=int, nargs="+", default=list(GRID_KEY_MIN_HITS))
+    s.add_argument("--min-hits-ratio", type=float, nargs="+", default=list(GRID_MIN_HITS_RATIO))
+    s.add_argument("--min-hits-floor", type=int, nargs="+", default=list(GRID_MIN_HITS_FLOOR))
+    s.add_argument("--verify", type=int, default=VERIFY_SAMPLE, help="boards checked against identify_build_mask (0: off)")
+    args = ap.parse_args()
+
+    if args.cmd == "cache":
+        t0 = time.perf_counter()
+        build_cache(args.raw_dir, args.cache, args.unit_list, args.rebuild)
+        print(f"[DONE] {time.perf_counter() - t0:.2f}s")
+        return
+
+    t0 = time.perf_counter()
+    cache = load_cache(args.cache)
+    weights = select_rows(cache, args.patch, args.queue_id)
+    print(f"[LOAD] {int(weights.sum())} boards, {int((weights > 0).sum())} distinct ({time.perf_counter() - t0:.2f}s)")
+    if not weights.any():
+        print("[ERROR] No boards in the cache for these filters.")
+        return
+
+    df, df_counts = sweep(cache, load_json(args.templates), weights, args.key_units_n, args.key_min_hits,
+                          args.min_hits_ratio, args.min_hits_floor, args.verify)
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    df.to_csv(os.path.join(args.out_dir, "classifier_sweep.csv"), index=False, encoding="utf-8-sig")
+    df_counts.to_csv(os.path.join(args.out_dir, "build_counts.csv"), index=False, encoding="utf-8-sig")
+
+    print(f"[RESULT] {'setting':<18} unknown   churn  unk->known  known->unk  switch  builds")
+    for r in df.sort_values(["unknown_rate", "churn"], kind="stable").to_dict(orient="records"):
+        mark = "  <- baseline" if r["is_baseline"] else ""
+        print(f"  {r['setting']:<18} {r['unknown_rate']:7.2%} {r['churn']:7.2%} {r['unknown_to_known']:10.2%} "
+              f"{r['known_to_unknown']:10.2%} {r['known_switch']:7.2%} {r['builds_used']:6}{mark}")
+    print(f"[DONE] -> {args.out_dir} ({time.perf_counter() - t0:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
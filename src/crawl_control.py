@@ -0,0 +1,376 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+# =========================================================
+# 0) Adaptive concurrency + per-host circuit breaker
+# =========================================================
+#
+# riot_get used to back off per call: during a 5xx incident every match
+# burned its retries on its own while crawl() kept listing new ids. Now
+# every request passes one gate per host (HostControl):
+#
+#   limit    in-flight requests allowed (AIMD). +1 per window of clean
+#            completions, x DECREASE_FACTOR on a 429, a 5xx, a network
+#            error or a latency EWMA above LATENCY_TOLERANCE x the best
+#            recent latency. At most one decrease per window (a burst of
+#            errors from requests already in flight counts once)
+#   breaker  closed -> open when the failure share (5xx / network errors)
+#            of the last BREAKER_WINDOW responses reaches the ratio:
+#            nobody gets through until the open time is over -> half-open:
+#            a single probe request; success closes it (limit restarts at
+#            the minimum), failure reopens it with a doubled open time
+#   pause    a 429's Retry-After holds the whole host, not only the call
+#            that got it
+#   pacing   the concurrency limit only bounds requests in flight; with
+#            fast responses that's no rate at all. RateWindows keeps the
+#            starts of the last requests per app limit ("20:1,100:120"),
+#            a request goes out only when every window has room, so the
+#            key's budget holds before the first 429, not after it
+#
+# Waiting callers block in acquire(); the time goes to the metrics as
+# sleep ("breaker_open" / "rate_limit" / "pacing"), it doesn't use up retries.
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+STATE_CODE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+OK, THROTTLED, FAILED = "ok", "throttled", "failed"
+
+
+def outcome(status: Any) -> str:
+    """HTTP status (or a network exception name) -> ok / throttled / failed"""
+    if isinstance(status, int):
+        if status == 429:
+            return THROTTLED
+        if status >= 500:
+            return FAILED
+        return OK
+    return FAILED
+
+
+def host_of(url: str) -> str:
+    return urlparse(url).netloc
+
+
+def parse_limits(spec: str) -> List[Tuple[int, float]]:
+    """Riot format "requests:seconds,..." -> [(requests, seconds)]"""
+    out = []
+    for part in (spec or "").split(","):
+        part = part.strip()
+        if part:
+            n, sec = part.split(":")
+            out.append((int(n), float(sec)))
+    return out
+
+
+# =========================================================
+# 1) AIMD concurrency limit
+# =========================================================
+
+class AIMDLimit:
+    def __init__(self, initial: int = 2, min_limit: int = 1, max_limit: int = 8,
+                 decrease_factor: float = 0.5, latency_tolerance: float = 2.0,
+                 latency_floor: float = 0.05, latency_window: int = 200, ewma_alpha: float = 0.2):
+        """
+        latency_floor: seconds; slow only if the EWMA is also this much
+        above the best latency (a 2 ms -> 5 ms change is noise, not load)
+        """
+        self.min_limit = max(1, int(min_limit))
+        self.max_limit = max(self.min_limit, int(max_limit))
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.latency_floor = latency_floor
+        self.ewma_alpha = ewma_alpha
+        self.samples: deque = deque(maxlen=latency_window)
+        self.ewma: Optional[float] = None
+        self.cooldown = 0  # completions to wait before the next decrease
+        self.increases = 0
+        self.decreases = 0
+
+    @property
+    def allowed(self) -> int:
+        return int(self.limit)
+
+    def base_latency(self) -> Optional[float]:
+        return min(self.samples) if self.samples else None
+
+    def is_slow(self) -> bool:
+        base = self.base_latency()
+        if base is None or self.ewma is None or len(self.samples) < 10:
+            return False
+        return self.ewma > max(base * self.latency_tolerance, base + self.latency_floor)
+
+    def on_success(self, latency: float) -> bool:
+        """-> True if the limit was decreased (slow response)"""
+        self.samples.append(latency)
+        self.ewma = latency if self.ewma is None else self.ewma + self.ewma_alpha * (latency - self.ewma)
+        if self.cooldown > 0:
+            self.cooldown -= 1
+        if self.is_slow():
+            return self.decrease()
+        if self.limit < self.max_limit:
+            # +1 per window: 1/limit per completion
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self.increases += 1
+        return False
+
+    def on_failure(self) -> bool:
+        if self.cooldown > 0:
+            self.cooldown -= 1
+        return self.decrease()
+
+    def decrease(self) -> bool:
+        if self.cooldown > 0:
+            return False
+        self.limit = max(float(self.min_limit), self.limit * self.decrease_factor)
+        self.cooldown = max(1, self.allowed)
+        self.decreases += 1
+        return True
+
+    def reset(self) -> None:
+        """after a breaker trip: start again from the minimum"""
+        self.limit = float(self.min_limit)
+        self.ewma = None
+        self.cooldown = 0
+
+
+# =========================================================
+# 2) Circuit breaker
+# =========================================================
+
+class CircuitBreaker:
+    def __init__(self, window: int = 20, failure_ratio: float = 0.5, min_requests: int = 10,
+                 open_seconds: float = 15.0, max_open_seconds: float = 300.0):
+        self.window: deque = deque(maxlen=window)
+        self.failure_ratio = failure_ratio
+        self.min_requests = min_requests
+        self.base_open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.state = CLOSED
+        self.open_seconds = open_seconds
+        self.open_until = 0.0
+        self.probe_out = False
+        self.trips = 0
+
+    def failure_share(self) -> float:
+        return sum(self.window) / len(self.window) if self.window else 0.0
+
+    def should_trip(self) -> bool:
+        return len(self.window) >= self.min_requests and self.failure_share() >= self.failure_ratio
+
+    def trip(self, now: float, reopen: bool = False) -> None:
+        # a failed probe doubles the open time, a fresh trip starts from the base
+        self.open_seconds = min(self.max_open_seconds, self.open_seconds * 2) if reopen else self.base_open_seconds
+        self.state = OPEN
+        self.open_until = now + self.open_seconds
+        self.window.clear()
+        self.probe_out = False
+        self.trips += 1
+
+    def close(self) -> None:
+        self.state = CLOSED
+        self.open_seconds = self.base_open_seconds
+        self.window.clear()
+        self.probe_out = False
+
+
+# =========================================================
+# 3) Request pacing
+# =========================================================
+
+class RateWindows:
+    """
+    Sliding log per app limit: at most n x safety request starts in any
+    `sec` seconds (a token bucket that starts full would allow a burst of
+    n on top of the refill in the first window).
+    """
+
+    def __init__(self, limits: List[Tuple[int, float]], safety: float = 1.0):
+        self.windows = [(max(1, int(n * safety)), float(sec), deque()) for n, sec in limits]
+
+    def wait(self, now: float) -> float:
+        """seconds until every window has room (0.0: go now)"""
+        wait = 0.0
+        for cap, sec, starts in self.windows:
+            while starts and starts[0] <= now - sec:
+                starts.popleft()
+            if len(starts) >= cap:
+                wait = max(wait, starts[0] + sec - now)
+        return wait
+
+    def take(self, now: float) -> None:
+        for _, _, starts in self.windows:
+            starts.append(now)
+
+
+# =========================================================
+# 4) Per-host gate
+# =========================================================
+
+class HostControl:
+    def __init__(self, host: str, limit: AIMDLimit, breaker: CircuitBreaker, metrics=None,
+                 rate: Optional[RateWindows] = None):
+        self.host = host
+        self.limit = limit
+        self.breaker = breaker
+        self.rate = rate
+        self.metrics = metrics
+        self.cond = threading.Condition()
+        self.in_flight = 0
+        self.paused_until = 0.0
+
+    def _event(self, name: str, msg: Optional[str] = None) -> None:
+        if self.metrics is not None:
+            self.metrics.inc(name)
+        if msg:
+            print(f"[CONTROL] {self.host}: {msg}")
+
+    def _waited(self, seconds: float, reason: str) -> None:
+        if self.metrics is not None and seconds > 0:
+            self.metrics.add_sleep(seconds, reason)
+
+    def acquire(self) -> bool:
+        """Blocks until a request may go out. -> True if it's the half-open probe."""
+        with self.cond:
+            while True:
+                now = time.time()
+                b = self.breaker
+                if now < self.paused_until:
+                    wait, reason = self.paused_until - now, "rate_limit"
+                elif b.state == OPEN and now < b.open_until:
+                    wait, reason = b.open_until - now, "breaker_open"
+                elif b.state == OPEN:
+                    b.state = HALF_OPEN
+                    self._event("breaker_half_open", "half-open, sending a probe")
+                    continue
+                elif self.rate is not None and self.rate.wait(now) > 0:
+                    wait, reason = self.rate.wait(now), "pacing"
+                elif b.state == HALF_OPEN:
+                    if not b.probe_out and self.in_flight == 0:
+                        b.probe_out = True
+                        self._start(now)
+                        return True
+                    wait, reason = 1.0, "breaker_open"
+                elif self.in_flight < self.limit.allowed:
+                    self._start(now)
+                    return False
+                else:
+                    # a slot frees up on release() (notify); not counted as sleep
+                    wait, reason = 1.0, None
+                t0 = time.time()
+                self.cond.wait(wait)
+                if reason is not None:
+                    self._waited(time.time() - t0, reason)
+
+    def _start(self, now: float) -> None:
+        self.in_flight += 1
+        if self.rate is not None:
+            self.rate.take(now)
+
+    def release(self, probe: bool, latency: float, status: Any, retry_after: Optional[float] = None) -> None:
+        """Outcome of an acquired request (status: HTTP code or exception name)."""
+        res = outcome(status)
+        now = time.time()
+        with self.cond:
+            self.in_flight -= 1
+            b = self.breaker
+            if res == THROTTLED:
+                if retry_after:
+                    self.paused_until = max(self.paused_until, now + retry_after)
+                if self.limit.on_failure():
+                    self._event("concurrency_decrease")
+                if probe:
+                    # rate limited, not down: the next caller probes again
+                    b.probe_out = False
+            elif probe:
+                if res == OK:
+                    b.close()
+                    self.limit.reset()
+                    self._event("breaker_close", "closed")
+                else:
+                    b.trip(now, reopen=True)
+                    self._event("breaker_open", f"probe failed ({status}), open for {b.open_seconds:.0f}s")
+            elif b.state == CLOSED:
+                b.window.append(res == FAILED)
+                if res == OK:
+                    if self.limit.on_success(latency):
+                        self._event("concurrency_decrease")
+                elif self.limit.on_failure():
+                    self._event("concurrency_decrease")
+                if b.should_trip():
+                    share = b.failure_share()
+                    b.trip(now)
+                    self.limit.reset()
+                    self._event("breaker_open", f"{share:.0%} of the last {b.window.maxlen} failed, "
+                                                f"open for {b.open_seconds:.0f}s")
+            # responses that were in flight while the breaker opened are ignored
+            self.cond.notify_all()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.cond:
+            base = self.limit.base_latency()
+            return {
+                "limit": round(self.limit.limit, 2),
+                "in_flight": self.in_flight,
+                "breaker": self.breaker.state,
+                "breaker_trips": self.breaker.trips,
+                "failure_share": round(self.breaker.failure_share(), 3),
+                "latency_ewma_seconds": round(self.limit.ewma, 4) if self.limit.ewma is not None else None,
+                "latency_base_seconds": round(base, 4) if base is not None else None,
+                "paused_for_seconds": round(max(0.0, self.paused_until - time.time()), 2),
+            }
+
+
+class CrawlControl:
+    """One HostControl per host (routing values are different hosts)."""
+
+    def __init__(self, settings: Dict[str, Any], metrics=None):
+        self.settings = dict(settings)
+        self.metrics = metrics
+        self.hosts: Dict[str, HostControl] = {}
+        self.lock = threading.Lock()
+
+    def host(self, url: str) -> HostControl:
+        h = host_of(url)
+        with self.lock:
+            hc = self.hosts.get(h)
+            if hc is None:
+                s = self.settings
+                limit = AIMDLimit(s["initial"], s["min"], s["max"], s["decrease_factor"],
+                                  s["latency_tolerance"], s["latency_floor"])
+                breaker = CircuitBreaker(s["breaker_window"], s["breaker_failure_ratio"],
+                                         s["breaker_min_requests"], s["breaker_open_seconds"],
+                                         s["breaker_max_open_seconds"])
+                rate = RateWindows(s["rate_limits"], s["rate_safety"]) if self.paced else None
+                hc = self.hosts[h] = HostControl(h, limit, breaker, self.metrics, rate)
+            return hc
+
+    @property
+    def max_concurrency(self) -> int:
+        return int(self.settings["max"])
+
+    @property
+    def paced(self) -> bool:
+        """True if requests wait for the rate windows (otherwise only the in-flight limit holds)"""
+        return bool(self.settings.get("rate_limits"))
+
+    def export_gauges(self) -> None:
+        if self.metrics is None:
+            return
+        with self.lock:
+            hosts = list(self.hosts.values())
+        for hc in hosts:
+            snap = hc.snapshot()
+            self.metrics.set_gauge("concurrency_limit", snap["limit"], host=hc.host)
+            self.metrics.set_gauge("in_flight", snap["in_flight"], host=hc.host)
+            self.metrics.set_gauge("breaker_state", STATE_CODE[snap["breaker"]], host=hc.host)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self.lock:
+            hosts = dict(self.hosts)
+        return {h: hc.snapshot() for h, hc in hosts.items()}
@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+# =========================================================
+# 0) Crawler telemetry
+# =========================================================
+#
+# Counters, per-endpoint latency histograms, sleep vs network time and
+# frontier size samples. With concurrent requests the latencies add up to
+# more than the wall time: network_busy_seconds is the wall time with at
+# least one request in flight (request_started .. observe_request), the
+# latency sum stays as request_seconds_sum. Exported periodically as
+#   - JSON: latest snapshot (crawler_metrics.json) + history (.jsonl)
+#   - Prometheus text file (crawler_metrics.prom, node_exporter textfile format)
+
+# seconds, upper bounds (Prometheus style, +Inf is implicit)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# frontier (queue size) samples kept in memory
+FRONTIER_SAMPLES = 500
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last = +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v: float) -> None:
+        i = 0
+        for ub in self.buckets:
+            if v <= ub:
+                break
+            i += 1
+        self.counts[i] += 1
+        self.sum += v
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bucket bound containing the q-quantile (coarse, like Prometheus)."""
+        if self.count == 0:
+            return None
+        need = q * self.count
+        acc = 0
+        for i, c in enumerate(self.counts):
+            acc += c
+            if acc >= need:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum_seconds": round(self.sum, 4),
+            "mean_seconds": round(self.sum / self.count, 4) if self.count else None,
+            "p50_le": self.quantile(0.50),
+            "p90_le": self.quantile(0.90),
+            "p99_le": self.quantile(0.99),
+            "buckets": {str(ub): c for ub, c in zip(list(self.buckets) + ["+Inf"], self.counts)},
+        }
+
+
+class CrawlMetrics:
+    def __init__(self, out_dir: Optional[str] = None, every_seconds: float = 30.0, fmt: str = "both"):
+        self.out_dir = out_dir
+        self.every_seconds = every_seconds
+        self.fmt = fmt
+
+        self.started_at = time.time()
+        self._last_export = 0.0
+        self._lock = threading.Lock()
+
+        self.latency: Dict[str, Histogram] = {}
+        self.status: Dict[str, Dict[str, int]] = {}   # endpoint -> {status: count}
+        self.sleep_seconds: Dict[str, float] = {}     # reason -> seconds
+        self.counters: Dict[str, int] = {}
+        self.gauges: Dict[str, Dict[Tuple[Tuple[str, str], ...], float]] = {}   # name -> {labels: value}
+        self.frontier: deque = deque(maxlen=FRONTIER_SAMPLES)
+        self.in_flight = 0
+        self._busy_since = 0.0
+        self._busy_seconds = 0.0   # closed busy periods
+
+    # -----------------------------------------------------
+    # recording
+    # -----------------------------------------------------
+
+    def inc(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def request_started(self) -> None:
+        with self._lock:
+            if self.in_flight == 0:
+                self._busy_since = time.time()
+            self.in_flight += 1
+
+    def observe_request(self, endpoint: str, seconds: float, status: Any) -> None:
+        """status: HTTP status code or an exception name for network errors"""
+        with self._lock:
+            if self.in_flight > 0:
+                self.in_flight -= 1
+                if self.in_flight == 0:
+                    self._busy_seconds += time.time() - self._busy_since
+            h = self.latency.get(endpoint)
+            if h is None:
+                h = self.latency[endpoint] = Histogram()
+            h.observe(seconds)
+
+            st = self.status.setdefault(endpoint, {})
+            k = str(status)
+            st[k] = st.get(k, 0) + 1
+
+    def add_sleep(self, seconds: float, reason: str) -> None:
+        with self._lock:
+            self.sleep_seconds[reason] = self.sleep_seconds.get(reason, 0.0) + seconds
+
+    def set_gauge(self, name: str, value: float, **labels: str) -> None:
+        with self._lock:
+            self.gauges.setdefault(name, {})[tuple(sorted(labels.items()))] = value
+
+    def sample_frontier(self, size: int) -> None:
+        with self._lock:
+            self.frontier.append((round(time.time() - self.started_at, 2), size))
+
+    # -----------------------------------------------------
+    # snapshot / export
+    # -----------------------------------------------------
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            c = dict(self.counters)
+            now = time.time()
+            elapsed = now - self.started_at
+            request_sum = sum(h.sum for h in self.latency.values())
+            busy = self._busy_seconds + (now - self._busy_since if self.in_flight else 0.0)
+            sleeping = sum(self.sleep_seconds.values())
+
+            http_429 = sum(st.get("429", 0) for st in self.status.values())
+            http_5xx = sum(v for st in self.status.values() for k, v in st.items() if k.startswith("5"))
+
+            fetched = c.get("match_fetched", 0)
+            hits = c.get("raw_cache_hit", 0)
+            misses = c.get("raw_cache_miss", 0)
+
+            return {
+                "ts": round(now, 3),
+                "elapsed_seconds": round(elapsed, 3),
+                "time": {
+                    "network_busy_seconds": round(busy, 3),
+                    "request_seconds_sum": round(request_sum, 3),
+                    "sleep_seconds": round(sleeping, 3),
+                    "sleep_by_reason": {k: round(v, 3) for k, v in self.sleep_seconds.items()},
+                    "other_seconds": round(max(0.0, elapsed - busy - sleeping), 3),
+                },
+                "http": {
+                    "429": http_429,
+                    "5xx": http_5xx,
+                    "by_endpoint": {k: dict(v) for k, v in self.status.items()},
+                },
+                "latency": {k: h.to_dict() for k, h in self.latency.items()},
+                "yield": {
+                    "match_fetched": fetched,
+                    "match_kept": c.get("match_kept", 0),
+                    "kept_per_fetched": round(c.get("match_kept", 0) / fetched, 4) if fetched else None,
+                    "kept_per_minute": round(c.get("match_kept", 0) / (elapsed / 60.0), 3) if elapsed > 0 else None,
+                },
+                "raw_cache": {
+                    "hit": hits,
+                    "miss": misses,
+                    "hit_rate": round(hits / (hits + misses), 4) if (hits + misses) else None,
+                },
+                "frontier": {
+                    "current": self.frontier[-1][1] if self.frontier else None,
+                    "samples": list(self.frontier),
+                },
+                "counters": c,
+                "gauges": {name: {",".join(f"{k}={v}" for k, v in labels): val for labels, val in g.items()}
+                           for name, g in self.gauges.items()},
+            }
+
+    def to_prometheus(self) -> str:
+        snap = self.snapshot()
+        lines = []
+
+        def metric(name, help_, typ):
+            lines.append(f"# HELP {name} {help_}")
+            lines.append(f"# TYPE {name} {typ}")
+
+        with self._lock:
+            metric("tft_crawler_request_seconds", "Riot API request latency", "histogram")
+            for ep, h in self.latency.items():
+                acc = 0
+                for ub, cnt in zip(list(h.buckets) + ["+Inf"], h.counts):
+                    acc += cnt
+                    lines.append(f'tft_crawler_request_seconds_bucket{{endpoint="{ep}",le="{ub}"}} {acc}')
+                lines.append(f'tft_crawler_request_seconds_sum{{endpoint="{ep}"}} {h.sum:.6f}')
+                lines.append(f'tft_crawler_request_seconds_count{{endpoint="{ep}"}} {h.count}')
+
+            metric("tft_crawler_responses_total", "Responses by endpoint and status", "counter")
+            for ep, st in self.status.items():
+                for k, v in st.items():
+                    lines.append(f'tft_crawler_responses_total{{endpoint="{ep}",status="{k}"}} {v}')
+
+            metric("tft_crawler_network_busy_seconds_total", "Wall time with a request in flight", "counter")
+            lines.append(f"tft_crawler_network_busy_seconds_total {snap['time']['network_busy_seconds']:.6f}")
+
+            metric("tft_crawler_sleep_seconds_total", "Time spent sleeping", "counter")
+            for reason, v in self.sleep_seconds.items():
+                lines.append(f'tft_crawler_sleep_seconds_total{{reason="{reason}"}} {v:.6f}')
+
+            metric("tft_crawler_events_total", "Crawler event counters", "counter")
+            for k, v in self.counters.items():
+                lines.append(f'tft_crawler_events_total{{event="{k}"}} {v}')
+
+            for name, g in self.gauges.items():
+                metric(f"tft_crawler_{name}", name.replace("_", " "), "gauge")
+                for labels, val in g.items():
+                    lab = ",".join(f'{k}="{v}"' for k, v in labels)
+                    lines.append(f"tft_crawler_{name}{{{lab}}} {val}" if lab else f"tft_crawler_{name} {val}")
+
+        metric("tft_crawler_frontier_size", "PUUIDs waiting in the crawl queue", "gauge")
+        cur = snap["frontier"]["current"]
+        lines.append(f"tft_crawler_frontier_size {cur if cur is not None else 0}")
+
+        metric("tft_crawler_uptime_seconds", "Seconds since crawl start", "gauge")
+        lines.append(f"tft_crawler_uptime_seconds {snap['elapsed_seconds']}")
+
+        return "\n".join(lines) + "\n"
+
+    def export(self) -> None:
+        if not self.out_dir:
+            return
+        os.makedirs(self.out_dir, exist_ok=True)
+
+        if self.fmt in ("json", "both"):
+            snap = self.snapshot()
+            _atomic_write(os.path.join(self.out_dir, "crawler_metrics.json"), json.dumps(snap, indent=2))
+            hist = dict(snap)
+            hist["frontier"] = {"current": snap["frontier"]["current"]}  # samples only in the latest file
+            with open(os.path.join(self.out_dir, "crawler_metrics.jsonl"), "a", encoding="utf-8") as f:
+                f.write(json.dumps(hist) + "\n")
+
+        if self.fmt in ("prom", "both"):
+            _atomic_write(os.path.join(self.out_dir, "crawler_metrics.prom"), self.to_prometheus())
+
+        self._last_export = time.time()
+
+    def maybe_export(self) -> None:
+        if time.time() - self._last_export >= self.every_seconds:
+            self.export()
+
+
+def _atomic_write(path: str, text: str) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
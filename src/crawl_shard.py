@@ -0,0 +1,525 @@
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import random
+import socket
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# add project root to PYTHONPATH (so "import config..." always works)
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import config.crawl_config as cfg
+from crawl_control import parse_limits
+from frontier import state_puuids
+
+# =========================================================
+# 0) Sharded crawl (lease based work queue)
+# =========================================================
+#
+# crawler.crawl() keeps the frontier, the seen sets and the state JSON in
+# one process. Here the work lives in one SQLite database (WAL, every
+# worker process opens its own connection), no coordinator:
+#
+#   puuids   frontier: a puuid is leased, its match list fetched, the new
+#            match ids inserted (INSERT OR IGNORE = seen set), then done
+#   matches  a match id is leased, its detail fetched (or read from the
+#            raw cache), kept / skipped recorded, the snowball puuids
+#            inserted, then done
+#   budget   one token bucket per app rate limit ("20:1,100:120"), shared
+#            by all workers: every HTTP attempt (retries too) takes a
+#            token from each. Buckets hold one token and start empty, so
+#            no window of `seconds` ever sees more than the limit
+#   meta     kept counter, target
+#
+# Leases expire after SHARD_LEASE_SECONDS; a crashed worker's items go
+# back to the pool, until SHARD_MAX_ATTEMPTS leases (an item that keeps
+# crashing workers is marked failed, like one that keeps erroring). A match can only be completed once (state != done
+# guard), so a late finish after a re-lease doesn't count twice, and a
+# re-leased match whose raw file was already written is read from disk
+# instead of fetched again.
+#
+# Usage:
+#   python src/crawl_shard.py init "SomeName#EUNE"          # db + seeds
+#   python src/crawl_shard.py run --workers 4              # N processes
+#   python src/crawl_shard.py work --worker-id box2-1      # one worker (other machine / terminal)
+#   python src/crawl_shard.py status
+
+PENDING, LEASED, DONE, FAILED = 0, 1, 2, 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS puuids (
+    puuid TEXT PRIMARY KEY,
+    state INTEGER NOT NULL DEFAULT 0,
+    owner TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    added_at REAL
+);
+CREATE TABLE IF NOT EXISTS matches (
+    match_id TEXT PRIMARY KEY,
+    state INTEGER NOT NULL DEFAULT 0,
+    owner TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    kept INTEGER,
+    queue_id INTEGER,
+    game_version TEXT,
+    done_at REAL
+);
+CREATE INDEX IF NOT EXISTS puuids_state ON puuids(state, lease_until);
+CREATE INDEX IF NOT EXISTS matches_state ON matches(state, lease_until);
+CREATE TABLE IF NOT EXISTS budget (
+    name TEXT PRIMARY KEY,
+    capacity REAL NOT NULL,
+    per_second REAL NOT NULL,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+# =========================================================
+# 1) Work queue
+# =========================================================
+
+class WorkQueue:
+    def __init__(self, path: str, timeout: float = 60.0):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # isolation_level=None: transactions are explicit (BEGIN IMMEDIATE takes
+        # the write lock up front, so two workers can't lease the same row)
+        self.con = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.execute("PRAGMA synchronous=NORMAL")
+        self.con.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.con.close()
+
+    def _tx(self):
+        return _Tx(self.con)
+
+    # -----------------------------------------------------
+    # setup
+    # -----------------------------------------------------
+
+    def set_meta(self, key: str, value: Any) -> None:
+        self.con.execute("INSERT OR REPLACE INTO meta(key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    def get_meta(self, key: str, default: Any = None) -> Any:
+        row = self.con.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return default
+        # counters are updated in SQL and come back as plain integers
+        return json.loads(row[0]) if isinstance(row[0], str) else row[0]
+
+    def set_limits(self, limits: List[Tuple[int, float]], safety: float = 1.0) -> None:
+        """
+        (Re)define the shared rate budget. A bucket that starts full with
+        n tokens allows n at once plus n refilled in the first window (2x);
+        here it holds one token, starts empty and refills n - 1 per window:
+        any `sec` seconds see at most 1 + (n - 1) = n requests.
+        """
+        now = time.time()
+        with self._tx():
+            self.con.execute("DELETE FROM budget")
+            for n, sec in limits:
+                allowed = max(2.0, n * safety)
+                self.con.execute(
+                    "INSERT INTO budget(name, capacity, per_second, tokens, updated) VALUES (?, ?, ?, ?, ?)",
+                    (f"{n}:{int(sec)}", 1.0, (allowed - 1.0) / sec, 0.0, now),
+                )
+
+    def add_puuids(self, puuids: List[str]) -> int:
+        now = time.time()
+        with self._tx():
+            cur = self.con.executemany("INSERT OR IGNORE INTO puuids(puuid, added_at) VALUES (?, ?)",
+                                       [(p, now) for p in puuids])
+        return cur.rowcount
+
+    def add_done_matches(self, match_ids: List[str], kept: bool) -> None:
+        """Matches an earlier (single process) crawl already handled."""
+        now = time.time()
+        with self._tx():
+            self.con.executemany(
+                "INSERT OR IGNORE INTO matches(match_id, state, kept, done_at) VALUES (?, ?, ?, ?)",
+                [(m, DONE, int(kept), now) for m in match_ids],
+            )
+
+    # -----------------------------------------------------
+    # leases
+    # -----------------------------------------------------
+
+    def _lease(self, table: str, key: str, worker: str, n: int, ttl: float,
+               max_attempts: Optional[int] = None) -> List[str]:
+        """
+        Pending items, or leased ones whose lease ran out (the worker died
+        or hung). An expired item that already had max_attempts leases is
+        marked FAILED instead: it crashed its worker that often, and a crash
+        never gets to release().
+        """
+        now = time.time()
+        with self._tx():
+            if max_attempts is not None:
+                self.con.execute(
+                    f"UPDATE {table} SET state = ?, owner = NULL, lease_until = NULL "
+                    f"WHERE state = ? AND lease_until < ? AND attempts >= ?",
+                    (FAILED, LEASED, now, max_attempts),
+                )
+            rows = self.con.execute(
+                f"SELECT {key} FROM {table} WHERE state = ? OR (state = ? AND lease_until < ?) LIMIT ?",
+                (PENDING, LEASED, now, n),
+            ).fetchall()
+            ids = [r[0] for r in rows]
+            self.con.executemany(
+                f"UPDATE {table} SET state = ?, owner = ?, lease_until = ?, attempts = attempts + 1 WHERE {key} = ?",
+                [(LEASED, worker, now + ttl, i) for i in ids],
+            )
+        return ids
+
+    def lease_matches(self, worker: str, n: int, ttl: float, max_attempts: Optional[int] = None) -> List[str]:
+        return self._lease("matches", "match_id", worker, n, ttl, max_attempts)
+
+    def lease_puuids(self, worker: str, n: int, ttl: float, max_attempts: Optional[int] = None) -> List[str]:
+        return self._lease("puuids", "puuid", worker, n, ttl, max_attempts)
+
+    def renew(self, worker: str, match_ids: List[str], ttl: float) -> None:
+        until = time.time() + ttl
+        with self._tx():
+            self.con.executemany("UPDATE matches SET lease_until = ? WHERE match_id = ? AND owner = ? AND state = ?",
+                                 [(until, m, worker, LEASED) for m in match_ids])
+
+    def release(self, table: str, key: str, item: str, max_attempts: int) -> None:
+        """Failed item -> back to the pool, or FAILED after max_attempts leases."""
+        with self._tx():
+            self.con.execute(
+                f"UPDATE {table} SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END, owner = NULL, lease_until = NULL "
+                f"WHERE {key} = ? AND state = ?",
+                (max_attempts, FAILED, PENDING, item, LEASED),
+            )
+
+    # -----------------------------------------------------
+    # results (idempotent)
+    # -----------------------------------------------------
+
+    def finish_puuid(self, puuid: str, match_ids: List[str]) -> int:
+        """Store the match list, returns the number of new match ids."""
+        with self._tx():
+            cur = self.con.executemany("INSERT OR IGNORE INTO matches(match_id) VALUES (?)", [(m,) for m in match_ids])
+            new = cur.rowcount
+            self.con.execute("UPDATE puuids SET state = ?, owner = NULL, lease_until = NULL WHERE puuid = ?",
+                             (DONE, puuid))
+        return new
+
+    def finish_match(self, match_id: str, kept: bool, queue_id: Optional[int], game_version: str,
+                     snowball: List[str]) -> bool:
+        """
+        Returns False if the match was already done (another worker finished
+        it after our lease expired) -> nothing recorded twice.
+        """
+        now = time.time()
+        with self._tx():
+            cur = self.con.execute(
+                "UPDATE matches SET state = ?, owner = NULL, lease_until = NULL, kept = ?, queue_id = ?, "
+                "game_version = ?, done_at = ? WHERE match_id = ? AND state != ?",
+                (DONE, int(kept), queue_id, game_version, now, match_id, DONE),
+            )
+            if cur.rowcount == 0:
+                return False
+            if kept:
+                self.con.execute(
+                    "INSERT INTO meta(key, value) VALUES ('kept', '1') "
+                    "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+                )
+            if snowball:
+                self.con.executemany("INSERT OR IGNORE INTO puuids(puuid, added_at) VALUES (?, ?)",
+                                     [(p, now) for p in snowball])
+        return True
+
+    # -----------------------------------------------------
+    # shared rate budget
+    # -----------------------------------------------------
+
+    def take_token(self) -> float:
+        """
+        One request from every bucket. Returns 0.0 when granted, otherwise
+        the seconds until the emptiest bucket has a token again.
+        """
+        now = time.time()
+        with self._tx():
+            rows = self.con.execute("SELECT name, capacity, per_second, tokens, updated FROM budget").fetchall()
+            if not rows:
+                return 0.0
+            refilled = [(name, min(cap, tokens + (now - updated) * rate), rate) for name, cap, rate, tokens, updated in rows]
+            wait = max(((1.0 - t) / rate for _, t, rate in refilled if t < 1.0), default=0.0)
+            granted = wait <= 0.0
+            self.con.executemany(
+                "UPDATE budget SET tokens = ?, updated = ? WHERE name = ?",
+                [(t - 1.0 if granted else t, now, name) for name, t, _ in refilled],
+            )
+        return 0.0 if granted else wait
+
+    # -----------------------------------------------------
+    # status
+    # -----------------------------------------------------
+
+    def kept(self) -> int:
+        return int(self.get_meta("kept", 0) or 0)
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        names = {PENDING: "pending", LEASED: "leased", DONE: "done", FAILED: "failed"}
+        out = {}
+        for table in ("puuids", "matches"):
+            rows = self.con.execute(f"SELECT state, COUNT(*) FROM {table} GROUP BY state").fetchall()
+            out[table] = {names[s]: n for s, n in rows}
+        return out
+
+
+class _Tx:
+    def __init__(self, con: sqlite3.Connection):
+        self.con = con
+
+    def __enter__(self):
+        self.con.execute("BEGIN IMMEDIATE")
+        return self.con
+
+    def __exit__(self, exc_type, exc, tb):
+        self.con.execute("COMMIT" if exc_type is None else "ROLLBACK")
+
+
+# =========================================================
+# 2) Worker
+# =========================================================
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def run_worker(db_path: str, worker_id: Optional[str] = None, overrides: Optional[Dict[str, Any]] = None) -> Dict[str, int]:
+    """
+    Lease -> fetch -> record until the shared kept counter reaches the
+    target or no work is left. overrides: crawl_config values to set first
+    (the process may have been spawned with a fresh config module).
+    """
+    for k, v in (overrides or {}).items():
+        setattr(cfg, k, v)
+
+    import crawler  # needs RIOT_API_KEY, only imported in workers
+    from crawl_metrics import CrawlMetrics
+    from raw_reader import read_crawl_fields, read_raw_bytes
+
+    worker_id = worker_id or default_worker_id()
+    wq = WorkQueue(db_path)
+    target = int(wq.get_meta("target", cfg.TARGET_MATCHES))
+    ttl = cfg.SHARD_LEASE_SECONDS
+
+    if cfg.METRICS_DIR:
+        crawler.METRICS = CrawlMetrics(os.path.join(cfg.METRICS_DIR, f"worker_{worker_id}"),
+                                       cfg.METRICS_EXPORT_EVERY_SECONDS, cfg.METRICS_FORMAT)
+    metrics = crawler.METRICS
+    stats = {"matches": 0, "fetched": 0, "kept": 0, "puuids": 0, "late": 0, "failed": 0}
+
+    def budget() -> None:
+        while True:
+            wait = wq.take_token()
+            if wait <= 0.0:
+                return
+            crawler.sleep(min(wait, 1.0) + random.uniform(0, 0.01), "shared_budget")
+
+    def do_match(mid: str) -> None:
+        cached = crawler.lookup_raw(mid)
+        if cached is not None:
+            m = read_crawl_fields(read_raw_bytes(cached))
+        else:
+            body = crawler.match_detail_bytes(mid)
+            metrics.inc("match_fetched")
+            stats["fetched"] += 1
+            crawler.write_raw(mid, body)
+            m = read_crawl_fields(body)
+
+        kept = crawler.is_target_patch(m) and crawler.is_double_up(m)
+        snowball = crawler.extract_puuids(m) if kept else []
+        if not crawler.is_target_patch(m):
+            metrics.inc("skip_patch")
+        elif not kept:
+            metrics.inc("skip_queue")
+        if wq.finish_match(mid, kept, crawler.get_queue_id(m), crawler.get_game_version(m), snowball):
+            stats["matches"] += 1
+            if kept:
+                stats["kept"] += 1
+                metrics.inc("match_kept")
+        else:
+            stats["late"] += 1
+
+    def do_puuid(puuid: str) -> None:
+        mids = crawler.match_ids_by_puuid(puuid, cfg.MATCHLIST_COUNT_PER_PLAYER)
+        wq.finish_puuid(puuid, mids)
+        stats["puuids"] += 1
+
+    # every attempt inside riot_get, retries included, takes from the budget
+    crawler.BEFORE_REQUEST = budget
+    if cfg.WRITER_ENABLED:
+        crawler.WRITER = crawler.CrawlWriter(cfg.WRITER_QUEUE_SIZE, cfg.WRITER_BATCH_SIZE, cfg.WRITER_FSYNC, metrics,
+                                             gzip_level=cfg.RAW_GZIP_LEVEL)
+    print(f"[WORKER {worker_id}] start, kept={wq.kept()}/{target}")
+    try:
+        idle_since = None
+        while wq.kept() < target:
+            metrics.maybe_export()
+            # matches first: they move the kept counter, puuids only grow the pool
+            mids = wq.lease_matches(worker_id, cfg.SHARD_LEASE_BATCH, ttl, cfg.SHARD_MAX_ATTEMPTS)
+            if mids:
+                idle_since = None
+                for i, mid in enumerate(mids):
+                    if wq.kept() >= target:
+                        break
+                    try:
+                        do_match(mid)
+                    except Exception as e:
+                        print(f"[WARN] {worker_id} match {mid}: {e}")
+                        metrics.inc("match_detail_fail")
+                        stats["failed"] += 1
+                        wq.release("matches", "match_id", mid, cfg.SHARD_MAX_ATTEMPTS)
+                    # long batches (rate limited): keep the rest of the lease alive
+                    if i % 4 == 3:
+                        wq.renew(worker_id, mids[i + 1:], ttl)
+                continue
+
+            puuids = wq.lease_puuids(worker_id, 1, ttl, cfg.SHARD_MAX_ATTEMPTS)
+            if puuids:
+                idle_since = None
+                try:
+                    do_puuid(puuids[0])
+                except Exception as e:
+                    print(f"[WARN] {worker_id} matchlist {puuids[0][:8]}…: {e}")
+                    metrics.inc("matchlist_fail")
+                    wq.release("puuids", "puuid", puuids[0], cfg.SHARD_MAX_ATTEMPTS)
+                continue
+
+            # nothing free: other workers hold leases (they may add work) or we're done
+            c = wq.counts()
+            if not c["matches"].get("leased") and not c["puuids"].get("leased"):
+                break
+            idle_since = idle_since or time.time()
+            if time.time() - idle_since > ttl * 2:
+                break
+            crawler.sleep(0.2, "idle")
+    finally:
+        crawler.BEFORE_REQUEST = None
+        if crawler.WRITER is not None:
+            writer, crawler.WRITER = crawler.WRITER, None
+            writer.close()
+        metrics.export()
+        wq.close()
+
+    print(f"[WORKER {worker_id}] done {stats}")
+    return stats
+
+
+def _worker_main(db_path: str, worker_id: str, overrides: Dict[str, Any]) -> None:
+    run_worker(db_path, worker_id, overrides)
+
+
+# =========================================================
+# 3) MAIN
+# =========================================================
+
+def init(db_path: str, seeds: List[str], target: int, from_state: Optional[str] = None) -> None:
+    wq = WorkQueue(db_path)
+    wq.set_meta("target", target)
+    if wq.get_meta("kept") is None:
+        wq.set_meta("kept", 0)
+    wq.set_limits(parse_limits(cfg.SHARD_RATE_LIMITS), cfg.SHARD_RATE_SAFETY)
+
+    if from_state:
+        # continue a single process crawl: its frontier + handled matches
+        state = json.loads(Path(from_state).read_text(encoding="utf-8"))
+        kept = set(state.get("kept_match_ids", []))
+        wq.add_done_matches(sorted(kept), kept=True)
+        wq.add_done_matches([m for m in state.get("seen_match_ids", []) if m not in kept], kept=False)
+        wq.add_puuids(list(state_puuids(state)))
+        wq.set_meta("kept", max(wq.kept(), int(state.get("kept_count", len(kept)))))
+
+    if seeds:
+        import crawler
+        puuids = [crawler.account_by_riot_id(rid)["puuid"] for rid in seeds]
+        print(f"[INIT] {wq.add_puuids(puuids)} new seed puuids")
+    print(f"[INIT] {db_path}: target={target} kept={wq.kept()} {wq.counts()}")
+    wq.close()
+
+
+def run(db_path: str, workers: int, overrides: Dict[str, Any]) -> None:
+    t0 = time.perf_counter()
+    wq = WorkQueue(db_path)
+    kept0 = wq.kept()
+    wq.close()
+    ctx = mp.get_context("spawn")
+    host = socket.gethostname()
+    procs = [ctx.Process(target=_worker_main, args=(db_path, f"{host}-w{i}", overrides)) for i in range(workers)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    wq = WorkQueue(db_path)
+    wall = time.perf_counter() - t0
+    kept = wq.kept() - kept0
+    print(f"[RUN] {workers} workers: kept {kept} in {wall:.1f}s ({kept / wall if wall else 0:.2f}/s) {wq.counts()}")
+    wq.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Sharded crawl over a shared SQLite work queue.")
+    ap.add_argument("--db", default=cfg.SHARD_DB_PATH)
+    ap.add_argument("--api-base", default=None, help="override API_BASE_URL (stub server)")
+    ap.add_argument("--raw-dir", default=None, help="override RAW_DIR")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("init", help="create / extend the queue with seed Riot IDs")
+    p.add_argument("seeds", nargs="*")
+    p.add_argument("--target", type=int, default=cfg.TARGET_MATCHES)
+    p.add_argument("--from-state", default=None, help="import a crawler_state.json")
+
+    p = sub.add_parser("run", help="start N worker processes on this machine")
+    p.add_argument("--workers", type=int, default=cfg.SHARD_WORKERS)
+
+    p = sub.add_parser("work", help="run one worker in this process")
+    p.add_argument("--worker-id", default=None)
+
+    sub.add_parser("status")
+    args = ap.parse_args()
+
+    overrides = {}
+    if args.api_base:
+        overrides["API_BASE_URL"] = args.api_base
+    if args.raw_dir:
+        overrides["RAW_DIR"] = args.raw_dir
+    for k, v in overrides.items():
+        setattr(cfg, k, v)
+
+    if args.cmd == "init":
+        init(args.db, args.seeds, args.target, args.from_state)
+    elif args.cmd == "run":
+        run(args.db, args.workers, overrides)
+    elif args.cmd == "work":
+        run_worker(args.db, args.worker_id, overrides)
+    else:
+        wq = WorkQueue(args.db)
+        print(json.dumps({"target": wq.get_meta("target"), "kept": wq.kept(), **wq.counts()}, indent=2))
+        wq.close()
+
+
+if __name__ == "__main__":
+    main()
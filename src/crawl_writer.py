@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# =========================================================
+# 0) Background writer for the crawler
+# =========================================================
+#
+# crawl() used to json.dumps + write every kept match and every state
+# checkpoint inline, so the fetch loop stalled on disk. The writer takes
+# those jobs through a bounded queue and a single background thread:
+#
+#   - jobs are drained in batches of up to batch_size
+#   - within a batch only the newest state checkpoint is written (older
+#     ones are superseded anyway)
+#   - every file is written as <name>.tmp + os.replace, so a crash leaves
+#     either the old or the new file, never a truncated one
+#   - a full queue blocks the fetch loop (backpressure, counted as
+#     "writer_full" sleep in the metrics)
+#   - jobs are written in order: a checkpoint never lands before the raw
+#     files that were queued ahead of it
+#   - save_state(..., on_written) calls back on the writer thread once the
+#     checkpoint (or a newer one that superseded it) is on disk
+#
+# fsync policy (durability vs throughput):
+#   "none"    rename only: safe against a crashed process, not power loss
+#   "state"   fsync the state checkpoint (+ its directory), raw files are
+#             rewritten from the API if lost anyway
+#   "always"  fsync every file
+#
+# Raw paths ending in .gz are gzip compressed on the writer thread.
+
+FSYNC_POLICIES = ("none", "state", "always")
+
+_RAW, _STATE, _FLUSH, _STOP = range(4)
+
+
+def _fsync_dir(path: Path) -> None:
+    if os.name == "nt":
+        return  # directories can't be opened for fsync on Windows
+    fd = os.open(str(path), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path: Path, data: bytes, fsync: bool = False) -> None:
+    """temp file + rename: readers see the old or the new file, never half of one"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp, path)
+    if fsync:
+        _fsync_dir(path.parent)
+
+
+def encode_raw(payload: Any, gzip_level: Optional[int] = None) -> bytes:
+    """payload: response body bytes (written as is) or a decoded match dict"""
+    if isinstance(payload, (bytes, bytearray, memoryview)):
+        data = bytes(payload)
+    else:
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    if gzip_level is not None:
+        # mtime=0: same body -> same file
+        data = gzip.compress(data, compresslevel=gzip_level, mtime=0)
+    return data
+
+
+def encode_state(state: Dict[str, Any]) -> bytes:
+    return json.dumps(state, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+class CrawlWriter:
+    def __init__(self, queue_size: int = 256, batch_size: int = 32, fsync: str = "state", metrics=None,
+                 gzip_level: int = 6):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync policy must be one of {FSYNC_POLICIES}, got {fsync!r}")
+        self.batch_size = max(1, int(batch_size))
+        self.fsync = fsync
+        self.metrics = metrics
+        self.gzip_level = gzip_level
+
+        self._q: "queue.Queue[Tuple]" = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._error: Optional[BaseException] = None
+        self._closed = False
+
+        self.stats = {"raw_written": 0, "state_written": 0, "state_coalesced": 0, "batches": 0,
+                      "max_batch": 0, "blocked_puts": 0, "blocked_seconds": 0.0}
+
+        self._thread = threading.Thread(target=self._run, name="crawl-writer", daemon=True)
+        self._thread.start()
+
+    # -----------------------------------------------------
+    # fetch loop side
+    # -----------------------------------------------------
+
+    def write_raw(self, path: Path, payload: Any) -> None:
+        """payload: response body bytes or a match dict (serialized on the writer thread)"""
+        self._put((_RAW, Path(path), payload))
+
+    def save_state(self, path: Path, state: Dict[str, Any],
+                   on_written: Optional[Callable[[], None]] = None) -> None:
+        """state must not be mutated afterwards (pass fresh lists / dicts)"""
+        self._put((_STATE, Path(path), (state, on_written)))
+
+    def flush(self) -> None:
+        """Block until everything queued so far is on disk."""
+        done = threading.Event()
+        self._put((_FLUSH, None, done))
+        done.wait()
+        self._raise_if_failed()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread.is_alive():
+            self._q.put((_STOP, None, None))
+            self._thread.join()
+        self._raise_if_failed()
+
+    def __enter__(self) -> "CrawlWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        # still drain on errors in the fetch loop, those are the more interesting ones
+        if exc_type is None:
+            self.close()
+        else:
+            try:
+                self.close()
+            except Exception as e:
+                print(f"[WARN] writer: {e}")
+
+    def _put(self, job: Tuple) -> None:
+        self._raise_if_failed()
+        if self._closed:
+            raise RuntimeError("writer is closed")
+        try:
+            self._q.put_nowait(job)
+            return
+        except queue.Full:
+            pass
+        t0 = time.perf_counter()
+        while True:
+            try:
+                self._q.put(job, timeout=0.5)
+                break
+            except queue.Full:
+                # writer thread died -> don't wait forever
+                self._raise_if_failed()
+        waited = time.perf_counter() - t0
+        self.stats["blocked_puts"] += 1
+        self.stats["blocked_seconds"] += waited
+        if self.metrics is not None:
+            self.metrics.add_sleep(waited, "writer_full")
+
+    def _raise_if_failed(self) -> None:
+        if self._error is not None:
+            raise RuntimeError(f"crawl writer failed: {self._error!r}") from self._error
+
+    # -----------------------------------------------------
+    # writer thread
+    # -----------------------------------------------------
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            batch: List[Tuple] = [self._q.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._q.get_nowait())
+                except queue.Empty:
+                    break
+            stop = any(kind == _STOP for kind, _, _ in batch)
+            if self._error is None:
+                try:
+                    self._write_batch(batch)
+                except BaseException as e:
+                    self._error = e
+            # release flush() waiters even after a failure (they re-raise it)
+            for kind, _, obj in batch:
+                if kind == _FLUSH:
+                    obj.set()
+
+    def _write_batch(self, batch: List[Tuple]) -> None:
+        # newest checkpoint per path; its position is kept so raw files queued before it land first
+        last_state: Dict[Path, int] = {}
+        for i, (kind, path, _) in enumerate(batch):
+            if kind == _STATE:
+                if path in last_state:
+                    self.stats["state_coalesced"] += 1
+                last_state[path] = i
+
+        raws = states = 0
+        callbacks: List[Callable[[], None]] = []
+        for i, (kind, path, obj) in enumerate(batch):
+            if kind == _RAW:
+                level = self.gzip_level if path.name.endswith(".gz") else None
+                atomic_write(path, encode_raw(obj, level), fsync=self.fsync == "always")
+                raws += 1
+            elif kind == _STATE:
+                state, on_written = obj
+                if on_written is not None:
+                    callbacks.append(on_written)
+                if last_state.get(path) == i:
+                    atomic_write(path, encode_state(state), fsync=self.fsync in ("state", "always"))
+                    states += 1
+                    for cb in callbacks:
+                        try:
+                            cb()
+                        except Exception as e:
+                            print(f"[WARN] writer: state callback failed: {e}")
+                    callbacks = []
+
+        if raws or states:
+            self.stats["raw_written"] += raws
+            self.stats["state_written"] += states
+            self.stats["batches"] += 1
+            self.stats["max_batch"] = max(self.stats["max_batch"], raws + states)
+            if self.metrics is not None:
+                self.metrics.inc("writer_raw_written", raws)
+                self.metrics.inc("writer_state_written", states)
+                self.metrics.inc("writer_batches")
@@ -10,15 +10,25 @@ if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
 import os
+import functools
+import itertools
 import json
 import time
 from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Set
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
 import requests
 
 import config.crawl_config as cfg
+from crawl_control import CrawlControl, parse_limits
+from crawl_metrics import CrawlMetrics
+from crawl_writer import CrawlWriter, atomic_write, encode_raw, encode_state
+from frontier import DiskFrontier
+from matchlist_cache import MatchlistCache
+from profiling import PROF, profiled
+from raw_reader import read_crawl_fields, read_raw_bytes
 
 
 API_KEY = os.getenv("RIOT_API_KEY")
@@ -32,8 +42,63 @@ if not API_KEY:
 
 HEADERS = {"X-Riot-Token": API_KEY}
 
+METRICS = CrawlMetrics(cfg.METRICS_DIR, cfg.METRICS_EXPORT_EVERY_SECONDS, cfg.METRICS_FORMAT)
+
+# background disk writer, open while crawl() runs (None -> inline writes)
+WRITER: Optional[CrawlWriter] = None
+
+# called as hook(match_id, body) for every newly kept match (e.g. live_synergy)
+KEEP_HOOKS: List[Callable[[str, bytes], None]] = []
+
+# per-puuid matchlist watermarks, open while crawl() runs (None -> no cache)
+MATCHLIST: Optional[MatchlistCache] = None
+
+# adaptive concurrency + circuit breaker and the match detail fetch pool,
+# set while crawl() runs (None -> one request at a time, per-call backoff)
+CONTROL: Optional[CrawlControl] = None
+POOL: Optional[ThreadPoolExecutor] = None
+
+# called before every HTTP attempt, retries included (crawl_shard: shared rate budget)
+BEFORE_REQUEST: Optional[Callable[[], None]] = None
+
+
+def sleep(seconds: float, reason: str) -> None:
+    """time.sleep + bookkeeping (sleep vs network time in the metrics)"""
+    METRICS.add_sleep(seconds, reason)
+    time.sleep(seconds)
+
+
+def throttle() -> None:
+    """
+    SLEEP_SECONDS between matches. Skipped only when CONTROL paces every
+    request itself (CONTROL_RATE_LIMITS set): the in-flight limit alone
+    is no rate limit.
+    """
+    if CONTROL is None or not CONTROL.paced:
+        sleep(cfg.SLEEP_SECONDS, "throttle")
+
+
+def control_settings() -> Dict[str, Any]:
+    return {
+        "initial": cfg.CONTROL_INITIAL_CONCURRENCY,
+        "min": cfg.CONTROL_MIN_CONCURRENCY,
+        "max": cfg.CONTROL_MAX_CONCURRENCY,
+        "decrease_factor": cfg.CONTROL_DECREASE_FACTOR,
+        "latency_tolerance": cfg.CONTROL_LATENCY_TOLERANCE,
+        "latency_floor": cfg.CONTROL_LATENCY_FLOOR_SECONDS,
+        "breaker_window": cfg.BREAKER_WINDOW,
+        "breaker_failure_ratio": cfg.BREAKER_FAILURE_RATIO,
+        "breaker_min_requests": cfg.BREAKER_MIN_REQUESTS,
+        "breaker_open_seconds": cfg.BREAKER_OPEN_SECONDS,
+        "breaker_max_open_seconds": cfg.BREAKER_MAX_OPEN_SECONDS,
+        "rate_limits": parse_limits(cfg.CONTROL_RATE_LIMITS),
+        "rate_safety": cfg.CONTROL_RATE_SAFETY,
+    }
+
 
 def base(region: str) -> str:
+    if cfg.API_BASE_URL:
+        return cfg.API_BASE_URL.rstrip("/")
     return f"https://{region}.api.riotgames.com"
 
 
@@ -68,42 +133,74 @@ def base(region: str) -> str:
     raise RuntimeError(f"Max retries exceeded @ {url}")
 #server 500 error change
 
-def riot_get_json(url: str, params: Optional[Dict[str, Any]] = None, max_retries: int = 9) -> Any:
+def riot_get(url: str, params: Optional[Dict[str, Any]] = None, max_retries: int = 9,
+             endpoint: str = "other") -> requests.Response:
     """
+    GET with retries, returns the 200 response.
     To be Robust:
     - 429: Retry-After case
-    - 5xx: exponencial backoff + jitter + 'circuit breaker'
+    - 5xx: exponencial backoff + jitter
+    With CONTROL the waits are per host instead of per call (crawl_control):
+    429 pauses the host, 5xx / network errors feed its circuit breaker.
+    endpoint: label for the latency / status metrics
     """
+    gate = CONTROL.host(url) if CONTROL is not None else None
     last_status = None
     for attempt in range(max_retries):
+        if BEFORE_REQUEST is not None:
+            BEFORE_REQUEST()
+        probe = gate.acquire() if gate is not None else False
+        METRICS.request_started()
+        t0 = time.perf_counter()
         try:
             resp = requests.get(url, headers=HEADERS, params=params, timeout=35)
         except requests.RequestException as e:
+            dt = time.perf_counter() - t0
+            METRICS.observe_request(endpoint, dt, type(e).__name__)
+            if gate is not None:
+                gate.release(probe, dt, type(e).__name__)
+                print(f"[NET] {type(e).__name__} – retry")
+                sleep(random.uniform(0, 1.0), "net_backoff")
+                continue
             # Network error -> backoff
             wait = min(60.0, 2.0 * (2 ** attempt)) + random.uniform(0, 1.0)
             print(f"[NET] {type(e).__name__} – retry in {wait:.1f}s")
-            time.sleep(wait)
+            sleep(wait, "net_backoff")
             continue
 
+        dt = time.perf_counter() - t0
+        METRICS.observe_request(endpoint, dt, resp.status_code)
         last_status = resp.status_code
 
-        if resp.status_code == 200:
-            return resp.json()
-
+        wait = None
         if resp.status_code == 429:
             retry_after = resp.headers.get("Retry-After")
             # Riot sometimes doesnt give Retry-After-t -> be conservative
             base_wait = float(retry_after) if retry_after else (12 + attempt * 6)
             wait = min(120.0, base_wait) + random.uniform(0, 1.5)
+        if gate is not None:
+            gate.release(probe, dt, resp.status_code, wait)
+
+        if resp.status_code == 200:
+            return resp
+
+        if resp.status_code == 429:
             print(f"[RATE LIMIT] 429 – waiting {wait:.1f}s")
-            time.sleep(wait)
+            if gate is None:
+                sleep(wait, "rate_limit")
+            continue
+
+        if gate is not None and resp.status_code in (500, 502, 503, 504):
+            # the breaker pauses the whole host if the errors keep coming
+            print(f"[SERVER] {resp.status_code} – retry")
+            sleep(random.uniform(0, 1.0), "server_backoff")
             continue
 
         if resp.status_code in (500, 502, 503, 504):
             # Exponencial backoff + jitter, plafonnal
             wait = min(90.0, 2.0 * (2 ** attempt)) + random.uniform(0, 2.0)
             print(f"[SERVER] {resp.status_code} – retry in {wait:.1f}s")
-            time.sleep(wait)
+            sleep(wait, "server_backoff")
             continue
 
         if resp.status_code in (401, 403):
@@ -116,23 +213,70 @@ def riot_get_json(url: str, params: Optional[Dict[str, Any]] = None, max_retries
 
     raise RuntimeError(f"Max retries exceeded (last_status={last_status}) @ {url}")
 
+
+def riot_get_json(url: str, params: Optional[Dict[str, Any]] = None, max_retries: int = 9,
+                  endpoint: str = "other") -> Any:
+    return riot_get(url, params, max_retries, endpoint).json()
+
+
+def riot_get_bytes(url: str, params: Optional[Dict[str, Any]] = None, max_retries: int = 9,
+                   endpoint: str = "other") -> bytes:
+    """Response body as received (no decode)."""
+    return riot_get(url, params, max_retries, endpoint).content
+
+
 def account_by_riot_id(riot_id: str) -> Dict[str, Any]:
     # /riot/account/v1/accounts/by-riot-id/{gameName}/{tagLine} :contentReference[oaicite:2]{index=2}
     game, tag = riot_id.split("#", 1)
     url = f"{base(cfg.REGIONAL_ROUTING)}/riot/account/v1/accounts/by-riot-id/{game}/{tag}"
-    return riot_get_json(url)
+    return riot_get_json(url, endpoint="account")
 
 
-def match_ids_by_puuid(puuid: str, count: int) -> List[str]:
+def match_ids_by_puuid(puuid: str, count: int, start_time: Optional[int] = None, start: int = 0) -> List[str]:
     # /tft/match/v1/matches/by-puuid/{puuid}/ids :contentReference[oaicite:3]{index=3}
+    # start_time: epoch seconds, only games after it (matchlist watermark)
+    # start: offset into the list (newest first), for paging
     url = f"{base(cfg.REGIONAL_ROUTING)}/tft/match/v1/matches/by-puuid/{puuid}/ids"
-    return riot_get_json(url, params={"count": count})
+    params: Dict[str, Any] = {"count": count}
+    if start:
+        params["start"] = start
+    if start_time is not None:
+        params["startTime"] = start_time
+    return riot_get_json(url, params=params, endpoint="matchlist")
+
+
+def list_matches(puuid: str, start_time: Optional[int] = None) -> Tuple[List[str], bool]:
+    """
+    -> (ids newest first, whether they reach back to start_time).
+    No watermark: the newest MATCHLIST_COUNT_PER_PLAYER, as always. With
+    one, a full page means there may be more games after the watermark:
+    keep paging (start=) until a short page, at most MATCHLIST_MAX_PAGES.
+    Not reaching back -> the watermark must not move (gap below the list).
+    """
+    count = cfg.MATCHLIST_COUNT_PER_PLAYER
+    mids = match_ids_by_puuid(puuid, count, start_time)
+    if start_time is None:
+        return mids, True
+    page = mids
+    for _ in range(cfg.MATCHLIST_MAX_PAGES - 1):
+        if len(page) < count:
+            return mids, True
+        page = match_ids_by_puuid(puuid, count, start_time, start=len(mids))
+        METRICS.inc("matchlist_pages")
+        mids = mids + page
+    return mids, len(page) < count
 
 
 def match_detail(match_id: str) -> Dict[str, Any]:
     # /tft/match/v1/matches/{matchId} :contentReference[oaicite:4]{index=4}
     url = f"{base(cfg.REGIONAL_ROUTING)}/tft/match/v1/matches/{match_id}"
-    return riot_get_json(url)
+    return riot_get_json(url, endpoint="match_detail")
+
+
+def match_detail_bytes(match_id: str) -> bytes:
+    """match_detail without decoding: the body is stored as is, parsed partially"""
+    url = f"{base(cfg.REGIONAL_ROUTING)}/tft/match/v1/matches/{match_id}"
+    return riot_get_bytes(url, endpoint="match_detail")
 
 
 def load_state() -> Dict[str, Any]:
@@ -142,29 +286,54 @@ def load_state() -> Dict[str, Any]:
     return {
         "seen_match_ids": [],
         "seen_puuids": [],
-        "queue_puuids": [],
+        "frontier": None,
         "kept_match_ids": [],
         "kept_count": 0,
         "debug_queue_ids_seen": {}
     }
 
 
-def save_state(state: Dict[str, Any]) -> None:
-    Path(cfg.STATE_PATH).parent.mkdir(parents=True, exist_ok=True)
-    Path(cfg.STATE_PATH).write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
+@profiled("state_save")
+def save_state(state: Dict[str, Any], on_written: Optional[Callable[[], None]] = None) -> None:
+    # atomic either way: a crash never leaves a truncated crawler_state.json
+    if WRITER is not None:
+        WRITER.save_state(Path(cfg.STATE_PATH), state, on_written)
+    else:
+        atomic_write(Path(cfg.STATE_PATH), encode_state(state), fsync=cfg.WRITER_FSYNC != "none")
+        if on_written is not None:
+            on_written()
 
 
 def raw_path(match_id: str) -> Path:
-    return Path(cfg.RAW_DIR) / f"{match_id}.json"
+    suffix = ".json.gz" if cfg.RAW_COMPRESS == "gzip" else ".json"
+    return Path(cfg.RAW_DIR) / f"{match_id}{suffix}"
+
+
+def cached_raw(match_id: str) -> Optional[Path]:
+    """Existing raw file of the match, compressed or not (RAW_COMPRESS may have changed)."""
+    for suffix in (".json", ".json.gz"):
+        p = Path(cfg.RAW_DIR) / f"{match_id}{suffix}"
+        if p.exists():
+            return p
+    return None
 
 
-def has_raw(match_id: str) -> bool:
-    return raw_path(match_id).exists()
+def lookup_raw(match_id: str) -> Optional[Path]:
+    """cached_raw + the raw_cache hit / miss counters (once per match the crawl looks at)"""
+    p = cached_raw(match_id)
+    METRICS.inc("raw_cache_hit" if p is not None else "raw_cache_miss")
+    return p
 
 
-def write_raw(match_id: str, payload: Dict[str, Any]) -> None:
-    Path(cfg.RAW_DIR).mkdir(parents=True, exist_ok=True)
-    raw_path(match_id).write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+@profiled("raw_write")
+def write_raw(match_id: str, payload: bytes) -> None:
+    """payload: response body bytes (a match dict still works)"""
+    path = raw_path(match_id)
+    if WRITER is not None:
+        WRITER.write_raw(path, payload)
+    else:
+        level = cfg.RAW_GZIP_LEVEL if cfg.RAW_COMPRESS == "gzip" else None
+        atomic_write(path, encode_raw(payload, level), fsync=cfg.WRITER_FSYNC == "always")
 
 
 def get_game_version(m: Dict[str, Any]) -> str:
@@ -203,61 +372,193 @@ def extract_puuids(m: Dict[str, Any]) -> List[str]:
     return puuids
 
 
-def crawl(seed_riot_ids: List[str]) -> None:
-    state = load_state()
+def prefetch(mids: List[str], seen_match_ids: Set[str]) -> Dict[str, Future]:
+    """Start the detail fetches of the list's new, uncached ids on POOL (in-flight count is up to CONTROL)."""
+    if POOL is None:
+        return {}
+    return {mid: POOL.submit(match_detail_bytes, mid)
+            for mid in dict.fromkeys(mids) if mid not in seen_match_ids and cached_raw(mid) is None}
+
+
+def list_ahead(q: deque, listing: Dict[str, Future]) -> None:
+    """Request the matchlists of the next puuids in the queue on POOL (lookahead = max concurrency)."""
+    if POOL is None:
+        return
+    for pu in itertools.islice(q, CONTROL.max_concurrency):
+        if pu in listing:
+            continue
+        start_time = None
+        if MATCHLIST is not None:
+            if MATCHLIST.is_fresh(pu, cfg.MATCHLIST_TTL_SECONDS):
+                continue
+            start_time = MATCHLIST.start_time(pu, cfg.MATCHLIST_WATERMARK_SLACK_SECONDS)
+        listing[pu] = POOL.submit(list_matches, pu, start_time)
+
+
+def finish_matchlist(puuid: str, mids: List[str]) -> None:
+    """All of the puuid's listed ids were processed -> move its watermark."""
+    known = MATCHLIST.times(mids)
+    for mid in mids:
+        if mid in known:
+            continue
+        # seen in an earlier run, before the cache knew its time
+        p = cached_raw(mid)
+        if p is not None:
+            MATCHLIST.record_time(mid, read_crawl_fields(read_raw_bytes(p)).get("info", {}).get("game_datetime"))
+    MATCHLIST.advance(puuid, mids)
+
+
+def crawl(seed_riot_ids: List[str], refresh: bool = False, loop: bool = False) -> None:
+    """
+    refresh: instead of the frontier, re-poll the cached puuids whose
+    MATCHLIST_TTL_SECONDS ran out (new games only). loop: keep refreshing.
+    """
+    global WRITER, MATCHLIST, CONTROL, POOL
+    if (refresh or loop) and not cfg.MATCHLIST_CACHE_PATH:
+        raise SystemExit("--refresh needs MATCHLIST_CACHE_PATH in config/crawl_config.py")
+    if cfg.MATCHLIST_CACHE_PATH:
+        Path(cfg.MATCHLIST_CACHE_PATH).parent.mkdir(parents=True, exist_ok=True)
+        MATCHLIST = MatchlistCache(cfg.MATCHLIST_CACHE_PATH)
+    if cfg.CONTROL_ENABLED:
+        CONTROL = CrawlControl(control_settings(), METRICS)
+        POOL = ThreadPoolExecutor(CONTROL.max_concurrency, thread_name_prefix="fetch")
+    if cfg.WRITER_ENABLED:
+        WRITER = CrawlWriter(cfg.WRITER_QUEUE_SIZE, cfg.WRITER_BATCH_SIZE, cfg.WRITER_FSYNC, METRICS,
+                             gzip_level=cfg.RAW_GZIP_LEVEL)
+    live = None
+    if cfg.LIVE_SYNERGY:
+        from live_synergy import LiveSynergy
+        live = LiveSynergy(cfg.LIVE_BUILDS_PATH, cfg.LIVE_UNIT_LIST_PATH, cfg.LIVE_SYNERGY_DIR,
+                           cfg.LIVE_PUBLISH_EVERY_SECONDS)
+        KEEP_HOOKS.append(live.on_keep)
+    try:
+        _crawl(seed_riot_ids, refresh or loop)
+        while loop:
+            wait = MATCHLIST.next_due_in(cfg.MATCHLIST_TTL_SECONDS)
+            wait = cfg.MATCHLIST_TTL_SECONDS if wait is None else max(wait, cfg.MATCHLIST_REFRESH_MIN_SLEEP)
+            print(f"[REFRESH] next round in {wait:.0f}s")
+            sleep(wait, "refresh_idle")
+            _crawl([], True)
+    finally:
+        if live is not None:
+            KEEP_HOOKS.remove(live.on_keep)
+            live.publish()
+        if POOL is not None:
+            pool, POOL = POOL, None
+            pool.shutdown(wait=True, cancel_futures=True)
+        CONTROL = None
+        if WRITER is not None:
+            writer, WRITER = WRITER, None
+            writer.close()
+        if MATCHLIST is not None:
+            cache, MATCHLIST = MATCHLIST, None
+            cache.close()
+
+
+def _crawl(seed_riot_ids: List[str], refresh: bool = False) -> None:
+    PROF.start("crawler", patch=cfg.PATCH_PREFIX, target=cfg.TARGET_MATCHES, refresh=refresh)
+    with PROF.stage("load_state"):
+        state = load_state()
 
     seen_match_ids: Set[str] = set(state["seen_match_ids"])
     seen_puuids: Set[str] = set(state["seen_puuids"])
     kept_match_ids: Set[str] = set(state["kept_match_ids"])
     debug_queue_ids_seen: Dict[str, int] = dict(state.get("debug_queue_ids_seen", {}))
 
-    q = deque(state["queue_puuids"])
+    # the queue lives in segment files (FRONTIER_DIR), the state only points into them;
+    # a state from before the frontier had the whole queue in queue_puuids
+    frontier = DiskFrontier(cfg.FRONTIER_DIR, cfg.FRONTIER_SEGMENT_SIZE, state.get("frontier"),
+                            fsync=cfg.WRITER_FSYNC != "none", metrics=METRICS)
+    frontier.extend(state.get("queue_puuids", []))
     kept_count = int(state.get("kept_count", len(kept_match_ids)))
 
+    # refresh: poll the due puuids of the matchlist cache, no kept target;
+    # new players still go to the frontier (for a normal crawl later)
+    q = deque(MATCHLIST.due(cfg.MATCHLIST_TTL_SECONDS)) if refresh else frontier
+    target = float("inf") if refresh else cfg.TARGET_MATCHES
+
     # Seed RiotID -> PUUID -> queue
     for rid in seed_riot_ids:
         acc = account_by_riot_id(rid)
         puuid = acc["puuid"]
         if puuid not in seen_puuids:
             seen_puuids.add(puuid)
-            q.append(puuid)
+            frontier.append(puuid)
 
-    print(f"Start crawl. patch={cfg.PATCH_PREFIX} queueIds={sorted(cfg.DOUBLE_UP_QUEUE_IDS)}")
+    print(f"Start {'refresh' if refresh else 'crawl'}. patch={cfg.PATCH_PREFIX} queueIds={sorted(cfg.DOUBLE_UP_QUEUE_IDS)}")
     print(f"RAW_DIR={cfg.RAW_DIR}")
     print(f"STATE={cfg.STATE_PATH}")
     print(f"Queue={len(q)} kept={kept_count}/{cfg.TARGET_MATCHES}")
+    if MATCHLIST is not None:
+        print(f"Matchlist cache: {MATCHLIST.stats()}")
 
     last_saved_at_kept = kept_count
+    listing: Dict[str, Future] = {}   # matchlists requested ahead (POOL)
 
-    while q and kept_count < cfg.TARGET_MATCHES:
+    while q and kept_count < target:
         puuid = q.popleft()
+        METRICS.sample_frontier(len(frontier))
+        if CONTROL is not None:
+            CONTROL.export_gauges()
+        METRICS.maybe_export()
+
+        start_time = None
+        if MATCHLIST is not None:
+            if MATCHLIST.is_fresh(puuid, cfg.MATCHLIST_TTL_SECONDS):
+                METRICS.inc("matchlist_ttl_skip")
+                continue
+            start_time = MATCHLIST.start_time(puuid, cfg.MATCHLIST_WATERMARK_SLACK_SECONDS)
+        list_ahead(q, listing)
 
         try:
-            mids = match_ids_by_puuid(puuid, cfg.MATCHLIST_COUNT_PER_PLAYER)
+            fut = listing.pop(puuid, None)
+            mids, reaches_watermark = fut.result() if fut is not None else list_matches(puuid, start_time)
         except Exception as e:
             print(f"[WARN] matchlist fail {puuid[:8]}…: {e}")
-            time.sleep(cfg.SLEEP_SECONDS)
+            METRICS.inc("matchlist_fail")
+            throttle()
             continue
+        if MATCHLIST is not None:
+            MATCHLIST.record_poll(puuid, len(mids))
+            METRICS.inc("matchlist_incremental" if start_time is not None else "matchlist_full")
+            METRICS.inc("matchlist_ids", len(mids))
 
+        fetching = prefetch(mids, seen_match_ids)
+        complete = True
         for mid in mids:
-            if kept_count >= cfg.TARGET_MATCHES:
+            if kept_count >= target:
+                complete = False
+                # ids not sent yet are dropped; finished bodies aren't written
+                for fut in fetching.values():
+                    fut.cancel()
                 break
             if mid in seen_match_ids:
                 continue
 
-            seen_match_ids.add(mid)
-
-            # match detail (cache)
+            # match detail (cache). Only the fields used below are parsed,
+            # the body goes to disk as received
             try:
-                if has_raw(mid):
-                    m = json.loads(raw_path(mid).read_text(encoding="utf-8"))
+                cached = lookup_raw(mid)
+                if cached is not None:
+                    with PROF.section("raw_read"):
+                        body = read_raw_bytes(cached)
+                        m = read_crawl_fields(body)
                 else:
-                    m = match_detail(mid)
-                    write_raw(mid, m)
+                    fut = fetching.pop(mid, None)
+                    body = fut.result() if fut is not None else match_detail_bytes(mid)
+                    METRICS.inc("match_fetched")
+                    write_raw(mid, body)
+                    with PROF.section("crawl_parse"):
+                        m = read_crawl_fields(body)
             except Exception as e:
+                # not marked seen: the next list holding it tries again (the watermark waits for it)
                 print(f"[WARN] match detail fail {mid}: {e}")
-                time.sleep(cfg.SLEEP_SECONDS)
+                METRICS.inc("match_detail_fail")
+                throttle()
                 continue
+            seen_match_ids.add(mid)
+            if MATCHLIST is not None:
+                MATCHLIST.record_time(mid, m.get("info", {}).get("game_datetime"))
 
             # Debug: queueId distribution (helps to see Double Up queueId-t)
             qid = get_queue_id(m)
@@ -267,64 +568,104 @@ def crawl(seed_riot_ids: List[str]) -> None:
 
             # Filter: patch + Double Up
             if not is_target_patch(m):
+                METRICS.inc("skip_patch")
                 continue
             if not is_double_up(m):
+                METRICS.inc("skip_queue")
                 continue
 
             # Keep
             if mid not in kept_match_ids:
                 kept_match_ids.add(mid)
                 kept_count += 1
+                METRICS.inc("match_kept")
                 gv = get_game_version(m)
                 print(f"[OK] kept {kept_count}/{cfg.TARGET_MATCHES}  qid={qid}  gv={gv}  match={mid}")
+                for hook in KEEP_HOOKS:
+                    try:
+                        with PROF.section("keep_hooks"):
+                            hook(mid, body)
+                    except Exception as e:
+                        # a broken consumer mustn't stop the crawl
+                        print(f"[WARN] keep hook {getattr(hook, '__name__', hook)} failed on {mid}: {e}")
+                        METRICS.inc("keep_hook_fail")
 
             # Snowball
             for pu in extract_puuids(m):
-                if len(q) >= cfg.MAX_QUEUE_SIZE:
-                    break
                 if pu not in seen_puuids:
                     seen_puuids.add(pu)
-                    q.append(pu)
+                    frontier.append(pu)
 
-            time.sleep(cfg.SLEEP_SECONDS)
+            throttle()
 
             # Save state after some time
             if kept_count - last_saved_at_kept >= cfg.SAVE_EVERY_N_KEPT:
+                manifest = frontier.checkpoint()
                 state_out = {
                     "seen_match_ids": list(seen_match_ids),
                     "seen_puuids": list(seen_puuids),
-                    "queue_puuids": list(q),
+                    "frontier": manifest,
                     "kept_match_ids": list(kept_match_ids),
                     "kept_count": kept_count,
-                    "debug_queue_ids_seen": debug_queue_ids_seen,
+                    "debug_queue_ids_seen": dict(debug_queue_ids_seen),
                 }
-                save_state(state_out)
+                # read segments are deleted only once this state is on disk
+                save_state(state_out, functools.partial(frontier.committed, manifest))
                 last_saved_at_kept = kept_count
-                print(f"[SAVE] state saved. queue={len(q)} seen_matches={len(seen_match_ids)}")
+                print(f"[SAVE] state saved. queue={len(frontier)} seen_matches={len(seen_match_ids)}")
+
+        # a list that stops short of the watermark leaves a gap: keep the watermark where it is
+        if MATCHLIST is not None and complete and reaches_watermark:
+            finish_matchlist(puuid, mids)
+
+    # lookahead puuids are still in the queue (saved below)
+    for fut in listing.values():
+        fut.cancel()
 
     # Final save
+    manifest = frontier.checkpoint()
     state_out = {
         "seen_match_ids": list(seen_match_ids),
         "seen_puuids": list(seen_puuids),
-        "queue_puuids": list(q),
+        "frontier": manifest,
         "kept_match_ids": list(kept_match_ids),
         "kept_count": kept_count,
         "debug_queue_ids_seen": debug_queue_ids_seen,
     }
-    save_state(state_out)
+    save_state(state_out, functools.partial(frontier.committed, manifest))
+    if WRITER is not None:
+        with PROF.stage("writer_flush"):
+            WRITER.flush()
+    METRICS.sample_frontier(len(frontier))
+    if CONTROL is not None:
+        CONTROL.export_gauges()
+    METRICS.export()
+    PROF.finish(kept=kept_count, queue=len(frontier))
 
     print("Done.")
     print(f"Kept matches: {kept_count}")
-    print(f"Queue remaining: {len(q)}")
+    print(f"Queue remaining: {len(frontier)}  {frontier.stats()}")
+    if MATCHLIST is not None:
+        print(f"Matchlist cache: {MATCHLIST.stats()}")
+    if CONTROL is not None:
+        for host, snap in CONTROL.snapshot().items():
+            print(f"Control {host}: {snap}")
     print("QueueId debug counts (top 10):")
     top = sorted(debug_queue_ids_seen.items(), key=lambda x: x[1], reverse=True)[:10]
     for k, v in top:
         print(f"  queue_id={k}  count={v}")
+    if METRICS.out_dir:
+        print(f"Metrics: {METRICS.out_dir}")
 
 
 if __name__ == "__main__":
-    import sys
-    seeds = sys.argv[1:]
-    if not seeds:
-        raise SystemExit('Set seed Riot ID: python src/crawler.py "SomeName#EUNE" "AnotherName#EUW"')
-    crawl(seeds)
+    import argparse
+    ap = argparse.ArgumentParser(description="TFT Double Up crawler")
+    ap.add_argument("seeds", nargs="*", help='seed Riot IDs, e.g. "SomeName#EUNE"')
+    ap.add_argument("--refresh", action="store_true", help="re-poll cached players whose matchlist TTL ran out")
+    ap.add_argument("--loop", action="store_true", help="keep refreshing (keeps the patch dataset fresh)")
+    args = ap.parse_args()
+    if not args.seeds and not (args.refresh or args.loop):
+        raise SystemExit('Set seed Riot ID: python src/crawler.py "SomeName#EUNE" "AnotherName#EUW"\n'
+                         'or refresh known players: python src/crawler.py --refresh [--loop]')
+    crawl(args.seeds, args.refresh, args.loop)
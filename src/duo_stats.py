@@ -0,0 +1,439 @@
+import argparse
+import heapq
+import json
+import os
+import shutil
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from synergy_MVP import DOUBLE_UP_QUEUE_ID, empirical_bayes, safe_get_build_name, team_rank_to_points
+
+# =========================================================
+# 0) Duo (PUUID pair) analytics
+# =========================================================
+#
+# One pass over pair_summaries JSONL:
+#   puuid -> compact int id, duo key = (low id << 32) | high id
+#   hash aggregation per duo: games, team_rank distribution, first / last
+#   game, build-pair usage
+#
+# Memory is bounded by MAX_GROUPS_IN_MEMORY: when the table is full, the
+# partial aggregates are spilled into PARTITIONS files by key hash and the
+# table starts over. At the end every partition is merged on its own (a
+# partition holds ~1/PARTITIONS of the duos), written as the final
+# partition and fed to the leaderboards (bounded heaps).
+#
+# Output folder:
+#   players.tsv        id, puuid, last riot id
+#   builds.tsv         id, build label
+#   part_XXX.tsv       final aggregates, partitioned by duo key
+#   leaderboards.json  most played / best performing duos
+#   meta.json
+#
+# Lookup of one duo reads one partition file.
+
+PAIR_FILE = r"C:\Users\Levi\Documents\tft_duo_project\data\processed\pair_summaries_SA.jsonl"
+OUT_DIR = r"C:\Users\Levi\Documents\tft_duo_project\data\processed\duo_stats"
+
+# groups (duos) kept in memory before spilling, ~1-2 KB each with build pairs
+MAX_GROUPS_IN_MEMORY = 500_000
+
+PARTITIONS = 64
+
+# leaderboards
+LEADERBOARD_SIZE = 100
+MIN_DUO_GAMES = 10
+# EB shrink for duo avg points (duos have far fewer games than build pairs)
+DUO_EB_M = 20
+
+# build pairs kept per duo in the final output
+TOP_BUILD_PAIRS = 10
+
+# in-memory group layout
+_GAMES, _R1, _R2, _R3, _R4, _FIRST, _LAST, _BP = range(8)
+
+
+def duo_key(id_a: int, id_b: int) -> int:
+    lo, hi = (id_a, id_b) if id_a <= id_b else (id_b, id_a)
+    return (lo << 32) | hi
+
+
+def split_key(key: int) -> Tuple[int, int]:
+    return key >> 32, key & 0xFFFFFFFF
+
+
+def partition_of(key: int, partitions: int = PARTITIONS) -> int:
+    # ids are dense, mix the bits so partitions stay even
+    return (((key * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> 32) % partitions
+
+
+def _new_group() -> list:
+    return [0, 0, 0, 0, 0, None, None, Counter()]
+
+
+def _merge(dst: list, src: list) -> None:
+    for i in range(_GAMES, _R4 + 1):
+        dst[i] += src[i]
+    if src[_FIRST] is not None and (dst[_FIRST] is None or src[_FIRST] < dst[_FIRST]):
+        dst[_FIRST] = src[_FIRST]
+    if src[_LAST] is not None and (dst[_LAST] is None or src[_LAST] > dst[_LAST]):
+        dst[_LAST] = src[_LAST]
+    dst[_BP].update(src[_BP])
+
+
+def _encode(key: int, g: list) -> str:
+    bp = ";".join(f"{k}:{n}" for k, n in g[_BP].items())
+    first = "" if g[_FIRST] is None else g[_FIRST]
+    last = "" if g[_LAST] is None else g[_LAST]
+    return f"{key}\t{g[_GAMES]}\t{g[_R1]}\t{g[_R2]}\t{g[_R3]}\t{g[_R4]}\t{first}\t{last}\t{bp}\n"
+
+
+def _decode(line: str) -> Tuple[int, list]:
+    f = line.rstrip("\n").split("\t")
+    bp = Counter()
+    if f[8]:
+        for item in f[8].split(";"):
+            k, n = item.split(":")
+            bp[int(k)] = int(n)
+    g = [int(f[1]), int(f[2]), int(f[3]), int(f[4]), int(f[5]),
+         int(f[6]) if f[6] else None, int(f[7]) if f[7] else None, bp]
+    return int(f[0]), g
+
+
+def _avg_points(g: list) -> float:
+    return (4 * g[_R1] + 3 * g[_R2] + 2 * g[_R3] + 1 * g[_R4]) / g[_GAMES]
+
+
+# =========================================================
+# 1) Aggregation
+# =========================================================
+
+class DuoAggregator:
+    def __init__(self, out_dir: str = OUT_DIR, max_groups: int = MAX_GROUPS_IN_MEMORY,
+                 queue_id: Optional[int] = DOUBLE_UP_QUEUE_ID):
+        self.out_dir = out_dir
+        self.max_groups = max_groups
+        self.queue_id = queue_id
+
+        self.player_ids: Dict[str, int] = {}
+        self.player_names: List[Optional[str]] = []
+        self.build_ids: Dict[str, int] = {}
+        self.table: Dict[int, list] = {}
+
+        self.spill_dir = os.path.join(out_dir, "_spill")
+        self.spills = 0
+        self.teams = 0
+        self.skipped = 0
+        self.global_points = 0
+
+    def _player(self, m: Dict[str, Any]) -> Optional[int]:
+        puuid = m.get("puuid")
+        if not puuid:
+            return None
+        pid = self.player_ids.get(puuid)
+        if pid is None:
+            pid = self.player_ids[puuid] = len(self.player_ids)
+            self.player_names.append(None)
+        name = m.get("riotIdGameName")
+        if name:
+            self.player_names[pid] = f"{name}#{m.get('riotIdTagline') or ''}"
+        return pid
+
+    def _build(self, m: Dict[str, Any]) -> int:
+        label = safe_get_build_name(m)
+        bid = self.build_ids.get(label)
+        if bid is None:
+            bid = self.build_ids[label] = len(self.build_ids)
+        return bid
+
+    def add(self, row: Dict[str, Any]) -> None:
+        """One pair_summaries row (duo in a match)."""
+        if self.queue_id is not None and row.get("queue_id") != self.queue_id:
+            self.skipped += 1
+            return
+        members = row.get("members") or []
+        team_rank = row.get("team_rank")
+        if len(members) != 2 or team_rank is None:
+            self.skipped += 1
+            return
+        pa = self._player(members[0])
+        pb = self._player(members[1])
+        if pa is None or pb is None or pa == pb:
+            self.skipped += 1
+            return
+
+        key = duo_key(pa, pb)
+        g = self.table.get(key)
+        if g is None:
+            if len(self.table) >= self.max_groups:
+                self.spill()
+            g = self.table[key] = _new_group()
+
+        team_rank = int(team_rank)
+        g[_GAMES] += 1
+        g[_R1 + team_rank - 1] += 1
+        dt = row.get("game_datetime")
+        if dt is not None:
+            if g[_FIRST] is None or dt < g[_FIRST]:
+                g[_FIRST] = dt
+            if g[_LAST] is None or dt > g[_LAST]:
+                g[_LAST] = dt
+
+        # build pair in the duo's player order (low id first)
+        ba, bb = self._build(members[0]), self._build(members[1])
+        if pa > pb:
+            ba, bb = bb, ba
+        g[_BP][(ba << 16) | bb] += 1
+
+        self.teams += 1
+        self.global_points += team_rank_to_points(team_rank)
+
+    def add_jsonl(self, path: str) -> None:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    self.add(json.loads(line))
+
+    def spill(self) -> None:
+        """Partial aggregates -> partition files (appended), empty the table."""
+        if self.spills == 0:
+            # leftovers of an interrupted run would be merged in (counted twice)
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+        os.makedirs(self.spill_dir, exist_ok=True)
+        buckets: Dict[int, List[str]] = {}
+        for key, g in self.table.items():
+            buckets.setdefault(partition_of(key), []).append(_encode(key, g))
+        for p, lines in buckets.items():
+            with open(os.path.join(self.spill_dir, f"spill_{p:03d}.tsv"), "a", encoding="utf-8") as f:
+                f.writelines(lines)
+        self.table = {}
+        self.spills += 1
+
+    # -----------------------------------------------------
+    # finish
+    # -----------------------------------------------------
+
+    def finish(self) -> Dict[str, Any]:
+        os.makedirs(self.out_dir, exist_ok=True)
+        for fn in os.listdir(self.out_dir):
+            if fn.startswith("part_") and fn.endswith(".tsv"):
+                os.remove(os.path.join(self.out_dir, fn))
+
+        global_mean = self.global_points / self.teams if self.teams else 0.0
+        most_played: List[Tuple] = []
+        best: List[Tuple] = []
+        duos = 0
+
+        def feed(key: int, g: list):
+            nonlocal duos
+            duos += 1
+            item = (g[_GAMES], key)
+            if len(most_played) < LEADERBOARD_SIZE:
+                heapq.heappush(most_played, item)
+            elif item > most_played[0]:
+                heapq.heapreplace(most_played, item)
+            if g[_GAMES] >= MIN_DUO_GAMES:
+                eb = empirical_bayes(_avg_points(g), g[_GAMES], global_mean, DUO_EB_M)
+                item = (eb, g[_GAMES], key)
+                if len(best) < LEADERBOARD_SIZE:
+                    heapq.heappush(best, item)
+                elif item > best[0]:
+                    heapq.heapreplace(best, item)
+
+        if self.spills == 0:
+            # everything fit in memory: partition the table directly
+            parts: Dict[int, List[Tuple[int, list]]] = {}
+            for key, g in self.table.items():
+                parts.setdefault(partition_of(key), []).append((key, g))
+            for p, items in parts.items():
+                self._write_partition(p, items, feed)
+        else:
+            if self.table:
+                self.spill()
+            for p in range(PARTITIONS):
+                path = os.path.join(self.spill_dir, f"spill_{p:03d}.tsv")
+                if not os.path.exists(path):
+                    continue
+                merged: Dict[int, list] = {}
+                with open(path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        key, g = _decode(line)
+                        cur = merged.get(key)
+                        if cur is None:
+                            merged[key] = g
+                        else:
+                            _merge(cur, g)
+                self._write_partition(p, merged.items(), feed)
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+        self.table = {}
+
+        with open(os.path.join(self.out_dir, "players.tsv"), "w", encoding="utf-8") as f:
+            for puuid, pid in self.player_ids.items():
+                f.write(f"{pid}\t{puuid}\t{self.player_names[pid] or ''}\n")
+        with open(os.path.join(self.out_dir, "builds.tsv"), "w", encoding="utf-8") as f:
+            for label, bid in self.build_ids.items():
+                f.write(f"{bid}\t{label}\n")
+
+        names = {v: k for k, v in self.build_ids.items()}
+        puuids = {v: k for k, v in self.player_ids.items()}
+
+        def entry(key, **extra):
+            a, b = split_key(key)
+            return {"puuid_a": puuids[a], "name_a": self.player_names[a],
+                    "puuid_b": puuids[b], "name_b": self.player_names[b], **extra}
+
+        leaderboards = {
+            "most_played": [entry(k, games=n) for n, k in sorted(most_played, reverse=True)],
+            "best_performing": [entry(k, eb_points=round(eb, 4), games=n) for eb, n, k in sorted(best, reverse=True)],
+        }
+        with open(os.path.join(self.out_dir, "leaderboards.json"), "w", encoding="utf-8") as f:
+            json.dump(leaderboards, f, ensure_ascii=False, indent=2)
+
+        meta = {
+            "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "queue_id": self.queue_id,
+            "teams": self.teams,
+            "skipped_rows": self.skipped,
+            "players": len(self.player_ids),
+            "duos": duos,
+            "spills": self.spills,
+            "partitions": PARTITIONS,
+            "global_mean_points": global_mean,
+            "duo_eb_m": DUO_EB_M,
+            "min_duo_games": MIN_DUO_GAMES,
+            "builds": len(self.build_ids),
+        }
+        with open(os.path.join(self.out_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        return meta
+
+    def _write_partition(self, p: int, items: Iterable[Tuple[int, list]], feed) -> None:
+        with open(os.path.join(self.out_dir, f"part_{p:03d}.tsv"), "w", encoding="utf-8") as f:
+            for key, g in items:
+                if len(g[_BP]) > TOP_BUILD_PAIRS:
+                    g[_BP] = Counter(dict(g[_BP].most_common(TOP_BUILD_PAIRS)))
+                f.write(_encode(key, g))
+                feed(key, g)
+
+
+# =========================================================
+# 2) Lookup
+# =========================================================
+
+class DuoStats:
+    """Read side of OUT_DIR: one duo's record, leaderboards."""
+
+    def __init__(self, out_dir: str = OUT_DIR):
+        self.out_dir = out_dir
+        with open(os.path.join(out_dir, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.player_ids: Dict[str, int] = {}
+        self.puuids: Dict[int, str] = {}
+        self.names: Dict[int, str] = {}
+        self.by_name: Dict[str, int] = {}
+        with open(os.path.join(out_dir, "players.tsv"), "r", encoding="utf-8") as f:
+            for line in f:
+                pid, puuid, name = line.rstrip("\n").split("\t")
+                pid = int(pid)
+                self.player_ids[puuid] = pid
+                self.puuids[pid] = puuid
+                if name:
+                    self.names[pid] = name
+                    self.by_name[name.lower()] = pid
+        self.builds: Dict[int, str] = {}
+        with open(os.path.join(out_dir, "builds.tsv"), "r", encoding="utf-8") as f:
+            for line in f:
+                bid, label = line.rstrip("\n").split("\t", 1)
+                self.builds[int(bid)] = label
+
+    def resolve(self, player: str) -> Optional[int]:
+        """puuid or "Name#TAG" -> id"""
+        pid = self.player_ids.get(player)
+        if pid is None:
+            pid = self.by_name.get(player.lower())
+        return pid
+
+    def lookup(self, player_a: str, player_b: str) -> Optional[Dict[str, Any]]:
+        a, b = self.resolve(player_a), self.resolve(player_b)
+        if a is None or b is None:
+            return None
+        key = duo_key(a, b)
+        path = os.path.join(self.out_dir, f"part_{partition_of(key, self.meta['partitions']):03d}.tsv")
+        if not os.path.exists(path):
+            return None
+        prefix = f"{key}\t"
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith(prefix):
+                    return self._record(*_decode(line))
+        return None
+
+    def _record(self, key: int, g: list) -> Dict[str, Any]:
+        a, b = split_key(key)
+        n = g[_GAMES]
+        avg_points = _avg_points(g)
+        return {
+            "puuid_a": self.puuids[a], "name_a": self.names.get(a),
+            "puuid_b": self.puuids[b], "name_b": self.names.get(b),
+            "games": n,
+            "team_rank_counts": {"1": g[_R1], "2": g[_R2], "3": g[_R3], "4": g[_R4]},
+            "avg_team_points": avg_points,
+            "eb_points": empirical_bayes(avg_points, n, self.meta["global_mean_points"], self.meta["duo_eb_m"]),
+            "top1": g[_R1] / n,
+            "top2": (g[_R1] + g[_R2]) / n,
+            "first_game_datetime": g[_FIRST],
+            "last_game_datetime": g[_LAST],
+            # builds in (name_a, name_b) order
+            "build_pairs": [
+                {"build_a": self.builds[k >> 16], "build_b": self.builds[k & 0xFFFF], "games": c}
+                for k, c in g[_BP].most_common()
+            ],
+        }
+
+    def leaderboards(self) -> Dict[str, List[Dict[str, Any]]]:
+        with open(os.path.join(self.out_dir, "leaderboards.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+
+# =========================================================
+# 3) MAIN
+# =========================================================
+
+def main():
+    ap = argparse.ArgumentParser(description="Duo (PUUID pair) analytics from pair summaries.")
+    ap.add_argument("--pairs", nargs="+", default=None, help=f"pair_summaries JSONL file(s) (default: {PAIR_FILE})")
+    ap.add_argument("--out-dir", default=OUT_DIR)
+    ap.add_argument("--max-groups", type=int, default=MAX_GROUPS_IN_MEMORY)
+    ap.add_argument("--lookup", nargs=2, metavar=("PLAYER_A", "PLAYER_B"), help="puuid or Name#TAG")
+    ap.add_argument("--top", type=int, default=0, help="print the top N of both leaderboards")
+    args = ap.parse_args()
+
+    # --lookup / --top alone read an earlier run; with --pairs aggregate first
+    if args.pairs is not None or not (args.lookup or args.top):
+        t0 = time.perf_counter()
+        agg = DuoAggregator(args.out_dir, args.max_groups)
+        for path in args.pairs or [PAIR_FILE]:
+            print(f"[LOAD] {path}")
+            agg.add_jsonl(path)
+        meta = agg.finish()
+        print(f"[DONE] {meta['teams']} teams, {meta['duos']} duos, {meta['players']} players, "
+              f"{meta['spills']} spills in {time.perf_counter() - t0:.1f}s -> {args.out_dir}")
+
+    if args.lookup or args.top:
+        stats = DuoStats(args.out_dir)
+        if args.lookup:
+            rec = stats.lookup(*args.lookup)
+            print(json.dumps(rec, ensure_ascii=False, indent=2) if rec else "[DUO] not found")
+        if args.top:
+            lb = stats.leaderboards()
+            for name, rows in lb.items():
+                print(f"\n[{name.upper()}]")
+                for r in rows[:args.top]:
+                    extra = f"eb={r['eb_points']:.3f} " if "eb_points" in r else ""
+                    print(f"  {r['name_a'] or r['puuid_a'][:12]} + {r['name_b'] or r['puuid_b'][:12]}: {extra}games={r['games']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,9 @@
 import os
-import json
-import shutil
 import re
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from raw_reader import is_raw_file, peek_match
 
 # =========================================================
 # 0) Setup
@@ -13,6 +15,25 @@ PATCH_PREFIX = "16.3"
 
 OUT_DIR = rf"C:\Users\Levi\Documents\tft_duo_project\data\raw\matches\16.3"
 
+# False: move only PATCH_PREFIX into OUT_DIR (old behaviour)
+# True:  split RAW_DIR into RAW_DIR/<patch>/ for every patch found
+PARTITION_ALL_PATCHES = False
+
+# True: one more level per queue -> RAW_DIR/<patch>/<queue_id>/
+# (make_pair_summaries expects the flat <patch>/ folder, so default off)
+PARTITION_BY_QUEUE = False
+
+# reads + renames are I/O bound -> threads
+WORKERS = 16
+
+# files classified + moved per batch (journal is flushed per batch)
+BATCH_SIZE = 500
+
+# resumable progress: "file \t patch \t queue_id" per classified file
+JOURNAL_PATH = os.path.join(RAW_DIR, ".filter_journal.tsv")
+
+UNKNOWN_PATCH = "unknown"
+
 
 # =========================================================
 # 1) Helpers
@@ -37,48 +58,157 @@ def extract_patch(game_version: str) -> str | None:
     return None
 
 
+def partition_dir(patch: str, queue_id) -> str:
+    if not PARTITION_ALL_PATCHES:
+        return OUT_DIR
+    d = os.path.join(RAW_DIR, patch or UNKNOWN_PATCH)
+    if PARTITION_BY_QUEUE:
+        d = os.path.join(d, str(queue_id) if queue_id is not None else "unknown")
+    return d
+
+
+def classify_file(fn: str):
+    """
+    -> (fn, patch, queue_id, error)
+    Only reads until game_version is found (+ the tail for queue_id).
+    """
+    full_path = os.path.join(RAW_DIR, fn)
+    tail_keys = ("queue_id",) if PARTITION_BY_QUEUE else ()
+    try:
+        fields = peek_match(full_path, head_keys=("game_version",), tail_keys=tail_keys)
+    except Exception as e:
+        return fn, None, None, str(e)
+
+    return fn, extract_patch(str(fields.get("game_version", ""))), fields.get("queue_id"), None
+
+
+def load_journal(path: str) -> dict:
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) != 3:
+                continue  # half written line from an interrupted run
+            fn, patch, qid = parts
+            done[fn] = (patch or None, int(qid) if qid.lstrip("-").isdigit() else None)
+    return done
+
+
+def compact_journal(path: str, journal: dict) -> None:
+    """Keep only entries whose file is still in RAW_DIR (e.g. other patches)."""
+    left = {fn: v for fn, v in journal.items() if os.path.exists(os.path.join(RAW_DIR, fn))}
+    if not left:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        for fn, (patch, qid) in left.items():
+            f.write(f"{fn}\t{patch or ''}\t{'' if qid is None else qid}\n")
+    os.replace(tmp, path)
+
+
+def move_batch(ex: ThreadPoolExecutor, moves: list) -> int:
+    """moves: [(fn, target_dir)] -> renames in parallel, one mkdir per dir"""
+    by_dir = defaultdict(list)
+    for fn, target_dir in moves:
+        by_dir[target_dir].append(fn)
+
+    def _move(args):
+        fn, target_dir = args
+        src = os.path.join(RAW_DIR, fn)
+        if not os.path.exists(src):
+            return 0  # moved in an earlier (interrupted) run
+        os.replace(src, os.path.join(target_dir, fn))
+        return 1
+
+    for target_dir in by_dir:
+        ensure_dir(target_dir)
+
+    return sum(ex.map(_move, moves))
+
+
+def wanted(patch: str | None) -> bool:
+    if PARTITION_ALL_PATCHES:
+        return True
+    return patch == PATCH_PREFIX
+
+
 # =========================================================
 # 2) MAIN
 # =========================================================
 
 def main():
 
-    ensure_dir(OUT_DIR)
+    if not PARTITION_ALL_PATCHES:
+        ensure_dir(OUT_DIR)
+
+    journal = load_journal(JOURNAL_PATH)
+
+    files = [fn for fn in os.listdir(RAW_DIR) if is_raw_file(fn)]
 
-    total = 0
+    def known(fn):
+        # queue partitions need the queue_id, older entries may lack it
+        return fn in journal and not (PARTITION_BY_QUEUE and journal[fn][1] is None)
+
+    todo = [fn for fn in files if not known(fn)]
+    resumed = [fn for fn in files if known(fn)]
+
+    total = len(files)
     moved = 0
     skipped = 0
+    per_partition = Counter()
+
+    if resumed:
+        print(f"[RESUME] {len(resumed)} files already classified in {JOURNAL_PATH}")
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as ex:
+        # files classified by an earlier run: no re-read, just move
+        moves = []
+        for fn in resumed:
+            patch, qid = journal[fn]
+            if wanted(patch):
+                moves.append((fn, partition_dir(patch, qid)))
+                per_partition[(patch or UNKNOWN_PATCH, qid)] += 1
+        moved += move_batch(ex, moves)
+
+        with open(JOURNAL_PATH, "a", encoding="utf-8") as jf:
+            for start in range(0, len(todo), BATCH_SIZE):
+                batch = todo[start:start + BATCH_SIZE]
 
-    for fn in os.listdir(RAW_DIR):
-        if not fn.lower().endswith(".json"):
-            continue
+                moves = []
+                for fn, patch, qid, err in ex.map(classify_file, batch):
+                    if err is not None:
+                        print(f"[SKIP] I could not read: {fn} -> {err}")
+                        skipped += 1
+                        continue
 
-        total += 1
-        full_path = os.path.join(RAW_DIR, fn)
+                    journal[fn] = (patch, qid)
+                    jf.write(f"{fn}\t{patch or ''}\t{'' if qid is None else qid}\n")
 
-        try:
-            with open(full_path, "r", encoding="utf-8") as f:
-                match = json.load(f)
-        except Exception as e:
-            print(f"[SKIP] I could not read: {fn} -> {e}")
-            skipped += 1
-            continue
+                    if wanted(patch):
+                        moves.append((fn, partition_dir(patch, qid)))
+                        per_partition[(patch or UNKNOWN_PATCH, qid)] += 1
 
-        game_version = match.get("info", {}).get("game_version", "")
-        patch = extract_patch(game_version)
+                jf.flush()
+                moved += move_batch(ex, moves)
+                print(f"[PROGRESS] {min(start + BATCH_SIZE, len(todo))}/{len(todo)} scanned, moved={moved}")
 
-        if patch == PATCH_PREFIX:
-            target_path = os.path.join(OUT_DIR, fn)
-            shutil.move(full_path, target_path)
-            moved += 1
-        else:
-            continue
+    compact_journal(JOURNAL_PATH, journal)
 
     print("\n[DONE]")
     print(f"Total files scanned: {total}")
-    print(f"Moved to patch {PATCH_PREFIX}: {moved}")
+    if PARTITION_ALL_PATCHES:
+        print(f"Moved into partitions: {moved}")
+        for (patch, qid), cnt in sorted(per_partition.items(), key=lambda x: (x[0][0], str(x[0][1]))):
+            label = f"{patch}/{qid}" if PARTITION_BY_QUEUE else patch
+            print(f"  {label}: {cnt}")
+    else:
+        print(f"Moved to patch {PATCH_PREFIX}: {moved}")
+        print(f"Output dir: {OUT_DIR}")
     print(f"Skipped (read error): {skipped}")
-    print(f"Output dir: {OUT_DIR}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import re
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from crawl_writer import atomic_write
+
+# =========================================================
+# 0) Disk-backed crawl frontier (FIFO of puuids)
+# =========================================================
+#
+# crawl() kept the frontier in one deque and stopped enqueuing at
+# MAX_QUEUE_SIZE: the dropped puuids were already marked seen, so they
+# were lost for good, and every checkpoint rewrote the whole queue into
+# crawler_state.json. Here every queued puuid lives in a segment file:
+#
+#   tail      newest puuids, not written yet; flushed into a new segment
+#             when it's full (or at a checkpoint)
+#   segments  seg_<id>.txt in the frontier folder, one puuid per line,
+#             written once (append-only), read back in id order
+#   head      the segment being read + the read offset into it
+#
+# When the head segment is used up, the next one is loaded; no segment
+# left -> the tail is flushed and read like any other. push / pop are
+# O(1) amortized, memory is at most 2 x segment_size puuids.
+#
+# checkpoint() flushes the tail and returns a manifest of segment ids +
+# the read offset only, so a state save doesn't grow with the queue.
+# Segments that were read completely are deleted by committed(manifest),
+# once the state that holds that manifest is on disk (the state before it
+# may still point at them). On load, files outside the manifest's range
+# (read before it, or written after it) are removed.
+
+SEGMENT_RE = re.compile(r"^seg_(\d{8})\.txt$")
+
+
+def segment_path(directory: Path, seg_id: int) -> Path:
+    return directory / f"seg_{seg_id:08d}.txt"
+
+
+def read_segment(path: Path) -> List[str]:
+    return [ln for ln in path.read_text(encoding="utf-8").splitlines() if ln]
+
+
+class DiskFrontier:
+    def __init__(self, directory: str, segment_size: int = 5000,
+                 manifest: Optional[Dict[str, Any]] = None, fsync: bool = False, metrics=None):
+        """manifest: checkpoint() of an earlier run (None -> empty, old segments removed)"""
+        self.dir = Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.segment_size = max(1, int(segment_size))
+        self.fsync = fsync
+        self.metrics = metrics
+
+        m = manifest or {}
+        self.tail: List[str] = []
+        self.head: Optional[List[str]] = None   # contents of read_seg, loaded on the first pop
+        self.read_seg = int(m.get("read_segment", 0))
+        self.pos = int(m.get("read_offset", 0))
+        self.next_seg = int(m.get("next_segment", self.read_seg))
+        self.n = int(m.get("size", 0))
+        self._drop_stale()
+        # committed() runs on the writer thread
+        self._delete_lock = threading.Lock()
+        self.deleted_upto = self.read_seg
+
+    def _drop_stale(self) -> None:
+        for p in self.dir.iterdir():
+            mt = SEGMENT_RE.match(p.name)
+            if mt and not (self.read_seg <= int(mt.group(1)) < self.next_seg):
+                p.unlink()
+
+    def live_segments(self) -> range:
+        return range(self.read_seg, self.next_seg)
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __iter__(self) -> Iterator[str]:
+        """Front to back, segments read lazily (islice(frontier, k) only touches the head)."""
+        for i in self.live_segments():
+            if i == self.read_seg:
+                yield from (self.head if self.head is not None else read_segment(segment_path(self.dir, i)))[self.pos:]
+            else:
+                yield from read_segment(segment_path(self.dir, i))
+        yield from self.tail
+
+    # -----------------------------------------------------
+    # push / pop
+    # -----------------------------------------------------
+
+    def append(self, puuid: str) -> None:
+        self.tail.append(puuid)
+        if len(self.tail) >= self.segment_size:
+            self._spill()
+        self.n += 1
+
+    def extend(self, puuids: Iterable[str]) -> None:
+        for pu in puuids:
+            self.append(pu)
+
+    def popleft(self) -> str:
+        while True:
+            if self.head is not None:
+                if self.pos < len(self.head):
+                    self.pos += 1
+                    self.n -= 1
+                    return self.head[self.pos - 1]
+                # head segment used up (its file goes on the next committed())
+                self.read_seg += 1
+                self.head, self.pos = None, 0
+            if self.read_seg < self.next_seg:
+                self._load_segment()
+            elif self.tail:
+                self._spill()
+            else:
+                raise IndexError("pop from an empty frontier")
+
+    def _spill(self) -> None:
+        data = ("\n".join(self.tail) + "\n").encode("utf-8")
+        atomic_write(segment_path(self.dir, self.next_seg), data, fsync=self.fsync)
+        self.next_seg += 1
+        if self.metrics is not None:
+            self.metrics.inc("frontier_spilled", len(self.tail))
+        self.tail = []
+
+    def _load_segment(self) -> None:
+        self.head = read_segment(segment_path(self.dir, self.read_seg))
+        if self.metrics is not None:
+            self.metrics.inc("frontier_segments_loaded")
+
+    # -----------------------------------------------------
+    # persistence
+    # -----------------------------------------------------
+
+    def checkpoint(self) -> Dict[str, Any]:
+        """Manifest for the state JSON (ids + offsets, no puuids). Flushes the tail into a segment."""
+        if self.tail:
+            self._spill()
+        return {
+            "dir": str(self.dir),
+            "read_segment": self.read_seg,
+            "read_offset": self.pos,
+            "next_segment": self.next_seg,
+            "size": self.n,
+        }
+
+    def committed(self, manifest: Dict[str, Any]) -> None:
+        """The state holding `manifest` is on disk: the segments read before it can go."""
+        upto = int(manifest["read_segment"])
+        with self._delete_lock:
+            for i in range(self.deleted_upto, upto):
+                p = segment_path(self.dir, i)
+                if p.exists():
+                    p.unlink()
+            self.deleted_upto = max(self.deleted_upto, upto)
+
+    def stats(self) -> Dict[str, int]:
+        head = len(self.head) - self.pos if self.head is not None else 0
+        return {"size": self.n, "in_memory": head + len(self.tail),
+                "segments": self.next_seg - self.read_seg}
+
+
+def state_puuids(state: Dict[str, Any]) -> Iterator[str]:
+    """Queued puuids of a crawler state (frontier manifest or the old queue_puuids list), front to back."""
+    yield from state.get("queue_puuids", [])
+    m = state.get("frontier")
+    if m:
+        first = int(m["read_segment"])
+        for i in range(first, int(m["next_segment"])):
+            ids = read_segment(segment_path(Path(m["dir"]), i))
+            yield from (ids[int(m.get("read_offset", 0)):] if i == first else ids)
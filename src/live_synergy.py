@@ -0,0 +1,145 @@
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from make_pair_summaries import BUILDS_PATH, UNIT_LIST_PATH, UNKNOWN_BUILD, compile_builds, identify_build_mask, \
+    load_json
+from partner_index import PartnerIndex, index_path
+from raw_reader import read_match_bytes
+from synergy_MVP import DOUBLE_UP_QUEUE_ID, MIN_GAMES, safe_get_build_name, write_csv
+from unit_vocab import UnitVocab
+
+# =========================================================
+# 0) Live synergy while crawling
+# =========================================================
+#
+# crawler.crawl() calls the keep hooks with every newly kept match. This
+# aggregator classifies the 8 boards (same compiled templates and
+# identify_build_mask as make_pair_summaries), forms the 4 duos
+# (placements 1-2, 3-4, 5-6, 7-8) and adds them to a PartnerIndex
+# without rescoring: per match that is a handful of counter updates,
+# independent of how many pairs are known.
+#
+# Every PUBLISH_EVERY_SECONDS the index is rescored once and written as
+#   pair_synergies_all.csv, build_marginals.csv   (synergy_MVP columns,
+#       so synergy_query can serve the folder and hot-swaps it)
+#   partner_index.json
+#   live_status.json                              (matches, publish time)
+#
+# Only the matches kept in this crawl session are counted, with the
+# synergy_MVP queue filter (DOUBLE_UP_QUEUE_ID).
+
+OUT_DIR = r"C:\Users\Levi\Documents\tft_duo_project\output\synergy_live"
+
+PUBLISH_EVERY_SECONDS = 30
+
+# 4 duos: (placement a, placement b, team_rank)
+PAIR_DEFS = ((1, 2, 1), (3, 4, 2), (5, 6, 3), (7, 8, 4))
+
+
+class LiveSynergy:
+    def __init__(self, builds_path: str = BUILDS_PATH, unit_list_path: str = UNIT_LIST_PATH, out_dir: str = OUT_DIR,
+                 publish_every_seconds: float = PUBLISH_EVERY_SECONDS, min_games: int = MIN_GAMES):
+        self.vocab = UnitVocab.from_unit_list(unit_list_path)
+        self.compiled = compile_builds(load_json(builds_path), self.vocab)
+        self.builds_path = builds_path
+        self.out_dir = out_dir
+        self.publish_every_seconds = publish_every_seconds
+        self.min_games = min_games
+
+        self.index = PartnerIndex()
+        self.matches = 0
+        self.skipped = 0
+        self.unknown = 0
+        self.boards = 0
+        self._last_publish = time.time()
+        self.published = 0
+
+    # -----------------------------------------------------
+    # updates
+    # -----------------------------------------------------
+
+    def add_match(self, match: Dict[str, Any]) -> bool:
+        """match: full or raw_reader-slim match dict. False if it's skipped."""
+        info = match.get("info", {}) or {}
+        # same queue filter as synergy_MVP
+        if (info.get("queue_id") or info.get("queueId")) != DOUBLE_UP_QUEUE_ID:
+            self.skipped += 1
+            return False
+
+        placement_map = {}
+        for p in info.get("participants", []) or []:
+            try:
+                placement_map[int(p.get("placement"))] = p
+            except (TypeError, ValueError):
+                pass
+        if any(pl not in placement_map for pl in range(1, 9)):
+            self.skipped += 1
+            return False
+
+        labels = {}
+        for pl, p in placement_map.items():
+            board = self.vocab.encode_board(u.get("character_id") for u in p.get("units", []) or [])
+            best = identify_build_mask(board, self.compiled, with_names=False) or UNKNOWN_BUILD
+            labels[pl] = safe_get_build_name(best)
+            self.boards += 1
+            self.unknown += best["build_id"] == "UNKNOWN"
+
+        self.index.add_games(((labels[a], labels[b], team_rank) for a, b, team_rank in PAIR_DEFS), rescore=False)
+        self.matches += 1
+        return True
+
+    def on_keep(self, match_id: str, body: bytes) -> None:
+        """crawler keep hook: (match id, response body)"""
+        self.add_match(read_match_bytes(body))
+        self.maybe_publish()
+
+    # -----------------------------------------------------
+    # publishing
+    # -----------------------------------------------------
+
+    def maybe_publish(self) -> Optional[str]:
+        if time.time() - self._last_publish < self.publish_every_seconds:
+            return None
+        return self.publish()
+
+    def publish(self) -> str:
+        t0 = time.perf_counter()
+        self._last_publish = time.time()
+        os.makedirs(self.out_dir, exist_ok=True)
+
+        self.index.rescore_all()
+        df_syn, df_marg = self.index.to_frames()
+        write_csv(df_marg.sort_values("games", ascending=False), os.path.join(self.out_dir, "build_marginals.csv"))
+        write_csv(df_syn.sort_values("synergy_score", ascending=False),
+                  os.path.join(self.out_dir, "pair_synergies_all.csv"))
+        self.index.save(index_path(self.out_dir))
+
+        self.published += 1
+        status = self.status()
+        status["publish_seconds"] = round(time.perf_counter() - t0, 4)
+        with open(os.path.join(self.out_dir, "live_status.json"), "w", encoding="utf-8") as f:
+            json.dump(status, f, indent=2)
+
+        top = self.top(3)
+        best = ", ".join(f"{r['build_a']} + {r['build_b']} ({r['eb_points']:.2f}, n={r['games']})" for r in top)
+        print(f"[LIVE] {self.matches} matches, {len(self.index.pairs)} pairs -> {self.out_dir}"
+              + (f" | top: {best}" if best else ""))
+        return self.out_dir
+
+    def top(self, k: int = 10, metric: str = "eb_points") -> List[Dict[str, Any]]:
+        return self.index.top_pairs(metric, k, self.min_games)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "published_at": round(self._last_publish, 3),
+            "publishes": self.published,
+            "matches": self.matches,
+            "skipped_matches": self.skipped,
+            "pairs": len(self.index.pairs),
+            "builds": len(self.index.builds),
+            "unknown_ratio": round(self.unknown / self.boards, 4) if self.boards else None,
+            "global_mean_points": self.index.global_mean,
+            "builds_path": self.builds_path,
+        }
@@ -1,8 +1,14 @@
 import os
+import re
 import json
 import math
 from collections import Counter
 
+from filter_patch_raw import extract_patch
+from profiling import PROF, profiled
+from raw_reader import is_raw_file, read_match, read_raw_bytes
+from unit_vocab import UnitVocab, norm_unit, vocab_path_for
+
 # =================================================
 # FILE PATHS
 # =================================================
@@ -12,6 +18,35 @@ BUILDS_PATH = r"C:\Users\Levi\Documents\tft_duo_project\config\builds_set16_16.3
 PROCESSED_DIR = r"C:\Users\Levi\Documents\tft_duo_project\data\processed"
 OUT_PATH = os.path.join(PROCESSED_DIR, "pair_summaries_SA.jsonl")
 
+# seeds the unit vocabulary (unit name <-> small int id)
+UNIT_LIST_PATH = r"C:\Users\Levi\Documents\tft_duo_project\data\unit_list\16.txt"
+
+# True: mmap + partial scan (only the fields used below), False: full json.load
+PARTIAL_PARSE = True
+
+# One pass, many template sets: every TEMPLATE_DIR/builds_set<set>_<patch>_<variant>.json
+# is applied to the matches whose tft_set_number / patch it fits, with one
+# output per template file (MULTI_OUT_PATTERN in PROCESSED_DIR).
+# Patch "16." (no minor, e.g. builds_set16_16._all.json) fits every 16.x patch.
+# False: only BUILDS_PATH -> OUT_PATH (old behaviour)
+MULTI_TEMPLATE = False
+TEMPLATE_DIR = r"C:\Users\Levi\Documents\tft_duo_project\config"
+TEMPLATE_RE = re.compile(r"^builds_set(\d+)_(\d+\.\d*)_(\w+)\.json$")
+MULTI_OUT_PATTERN = "pair_summaries_set{set}_{patch}_{variant}.jsonl"
+
+# Also load the rows into the embedded pair store (see pair_store.py),
+# one template set = the template file name without .json. None: off
+STORE_PATH = None  # e.g. os.path.join(PROCESSED_DIR, "pair_store.sqlite")
+
+# set of BUILDS_PATH if its file name doesn't follow TEMPLATE_RE
+DEFAULT_TFT_SET = 16
+
+# Boards are written as unit bitmasks ("board_mask", "matched_mask"),
+# decoded with the vocabulary saved next to OUT_PATH (*.units.json).
+# True (default): also write the "matched_units" name lists, as before.
+# False: bitmasks only (smaller files; readers decode with the vocabulary)
+WRITE_UNIT_NAMES = True
+
 
 # =================================================
 # HELPER
@@ -23,13 +58,19 @@ def ensure_dirs():
 
 
 def load_json(path: str):
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return json.loads(read_raw_bytes(path))
+
+
+@profiled("json_load")
+def load_match(path: str):
+    if PARTIAL_PARSE:
+        return read_match(path)
+    return load_json(path)
 
 
 def iter_json_files(folder: str):
     for fn in os.listdir(folder):
-        if fn.lower().endswith(".json"):
+        if is_raw_file(fn):  # .json or .json.gz
             yield os.path.join(folder, fn)
 
 
@@ -53,6 +94,9 @@ def placement_to_team_rank(placement: int) -> int:
 # =================================================
 KEY_UNITS_N = 3        #  First 3 unit is the "key"
 KEY_UNITS_MIN_HITS = 3 # Minimum matches from the "key" units
+MIN_HITS_RATIO = 0.5   # min_required_hits: share of the template units
+MIN_HITS_FLOOR = 2     # ... but at least this many
+# (classifier_sweep.py evaluates other values on the cached boards)
 
 
 
@@ -68,7 +112,7 @@ def min_required_hits(size: int) -> int:
 
     # általános: nagy core listánál több találat kell S tier setuő
     # 8 -> 5, 9 -> 6
-    return max(2, math.ceil(size * 0.5))
+    return max(MIN_HITS_FLOOR, math.ceil(size * MIN_HITS_RATIO))
 
 
 # Régi azonositás, jobbra def identify_build(board_units: list[str], builds: list[dict]):
@@ -116,7 +160,60 @@ def min_required_hits(size: int) -> int:
 
     return best
 
-def identify_build(board_units: list[str], builds: list[dict]):
+
+def compile_builds(builds: list[dict], vocab: UnitVocab) -> list[dict]:
+    """
+    Templates -> unit bitmasks (once per run, not once per board).
+    Units are deduplicated on the normalized name, key units are the
+    first KEY_UNITS_N of them.
+    """
+    compiled = []
+    for b in builds:
+        units = []
+        seen = set()
+        for u in b.get("units", []):
+            if not u or norm_unit(u) in seen:
+                continue
+            seen.add(norm_unit(u))
+            units.append(u)
+
+        size = len(units)
+        if size == 0:
+            continue
+
+        bits = [1 << vocab.intern(u) for u in units]
+        key_n = min(KEY_UNITS_N, size)
+
+        mask = 0
+        for bit in bits:
+            mask |= bit
+        key_mask = 0
+        for bit in bits[:key_n]:
+            key_mask |= bit
+
+        compiled.append({
+            "build_id": b.get("build_id", "UNKNOWN"),
+            "build_name": b.get("name", "UNKNOWN"),
+            "units": units,
+            "bits": bits,
+            "mask": mask,
+            "key_mask": key_mask,
+            "key_n": key_n,
+            "size": size,
+            "min_hits": min_required_hits(size),
+            # score only depends on (matched, size) -> precompute
+            "score_by_matched": [round((k / size) / math.sqrt(size), 4) for k in range(size + 1)],
+        })
+    return compiled
+
+
+def matched_unit_names(build: dict, matched_mask: int) -> list[str]:
+    """Template order, like the old matched_units list."""
+    return [u for u, bit in zip(build["units"], build["bits"]) if matched_mask & bit]
+
+
+@profiled("identify_build")
+def identify_build_mask(board: int, compiled: list[dict], with_names: bool | None = None):
     """
     2 lépcsős build azonosítás (kulcs unitokkal):
     1) kulcs 4 alapján előszűrés
@@ -128,52 +225,33 @@ def identify_build(board_units: list[str], builds: list[dict]):
     - score
     - matched
     - kisebb size
-    """
-
-    board = set(u.strip().lower() for u in board_units if u)
 
+    board: unit bitmask (UnitVocab.encode_board), compiled: compile_builds()
+    with_names: also return matched_units names (default WRITE_UNIT_NAMES)
+    """
     best = None
+    best_build = None
     best_from_key_pool = False
 
-    for b in builds:
-        units = b.get("units", [])
-        if not units:
-            continue
-
-        clean = list(dict.fromkeys(units))
-        clean_norm = [u.strip().lower() for u in clean if u]
-
-        size = len(clean_norm)
-        if size == 0:
+    for b in compiled:
+        hit = board & b["mask"]
+        matched = hit.bit_count()
+        if matched < b["min_hits"]:
             continue
 
-        key_n = min(KEY_UNITS_N, size)
-        key_units_norm = clean_norm[:key_n]
-
-        key_hits = 0
-        for u in key_units_norm:
-            if u in board:
-                key_hits += 1
-
+        size = b["size"]
+        key_n = b["key_n"]
+        key_hits = (board & b["key_mask"]).bit_count()
         key_ratio = key_hits / key_n if key_n > 0 else 0.0
         is_key_ok = (key_hits >= KEY_UNITS_MIN_HITS)
 
-        matched_units = [clean[i] for i, u in enumerate(clean_norm) if u in board]
-        matched = len(matched_units)
-
-        if matched < min_required_hits(size):
-            continue
-
-        raw_score = matched / size
-        adjusted_score = raw_score / math.sqrt(size)
-
         cand = {
-            "build_id": b.get("build_id", "UNKNOWN"),
-            "build_name": b.get("name", "UNKNOWN"),
-            "matched_units": matched_units,
+            "build_id": b["build_id"],
+            "build_name": b["build_name"],
+            "matched_mask": hit,
             "matched": matched,
             "size": size,
-            "score": round(adjusted_score, 4),
+            "score": b["score_by_matched"][matched],
             "key_hits": key_hits,
             "key_n": key_n,
             "key_ratio": round(key_ratio, 4),
@@ -181,6 +259,7 @@ def identify_build(board_units: list[str], builds: list[dict]):
 
         if best is None:
             best = cand
+            best_build = b
             best_from_key_pool = is_key_ok
             continue
 
@@ -189,6 +268,7 @@ def identify_build(board_units: list[str], builds: list[dict]):
 
         if (not best_from_key_pool) and is_key_ok:
             best = cand
+            best_build = b
             best_from_key_pool = True
             continue
 
@@ -197,9 +277,101 @@ def identify_build(board_units: list[str], builds: list[dict]):
 
         if cand_tuple > best_tuple:
             best = cand
+            best_build = b
+
+    if with_names is None:
+        with_names = WRITE_UNIT_NAMES
+    if best is not None and with_names:
+        best["matched_units"] = matched_unit_names(best_build, best["matched_mask"])
 
     return best
 
+
+def identify_build(board_units: list[str], builds: list[dict], vocab: UnitVocab | None = None):
+    """
+    Name-list wrapper around identify_build_mask (ad hoc checks).
+    In loops compile the builds once and call identify_build_mask.
+    """
+    vocab = vocab if vocab is not None else UnitVocab()
+    compiled = compile_builds(builds, vocab)
+    return identify_build_mask(vocab.encode_board(board_units), compiled, with_names=True)
+
+# =================================================
+# TEMPLATE SETS
+# =================================================
+
+def parse_template_name(path: str) -> dict | None:
+    """builds_set16_16.3_SA.json -> {"set": 16, "patch": "16.3", "variant": "SA"}"""
+    m = TEMPLATE_RE.match(os.path.basename(path))
+    if not m:
+        return None
+    return {"set": int(m.group(1)), "patch": m.group(2), "variant": m.group(3)}
+
+
+def template_fits(template: dict, tft_set, patch: str | None) -> bool:
+    if tft_set != template["set"]:
+        return False
+    want = template["patch"]
+    if want is None:
+        return True
+    if want.endswith("."):
+        return patch is not None and patch.startswith(want)
+    return patch == want
+
+
+def discover_templates(template_dir: str) -> list[dict]:
+    templates = []
+    for fn in sorted(os.listdir(template_dir)):
+        meta = parse_template_name(fn)
+        if meta is None:
+            continue
+        meta["path"] = os.path.join(template_dir, fn)
+        meta["out_path"] = os.path.join(PROCESSED_DIR, MULTI_OUT_PATTERN.format(
+            set=meta["set"], patch=meta["patch"].rstrip("."), variant=meta["variant"]))
+        templates.append(meta)
+    return templates
+
+
+def single_template() -> dict:
+    """BUILDS_PATH -> OUT_PATH; the set comes from the file name, every patch is accepted"""
+    meta = parse_template_name(BUILDS_PATH) or {"set": DEFAULT_TFT_SET, "variant": None}
+    meta["patch"] = None
+    meta["path"] = BUILDS_PATH
+    meta["out_path"] = OUT_PATH
+    return meta
+
+
+def open_runs(templates: list[dict], vocab: UnitVocab) -> list[dict]:
+    """compile every template set with the shared vocabulary, open its output"""
+    runs = []
+    for t in templates:
+        builds = load_json(t["path"])
+        print(f"[DEBUG] template {os.path.basename(t['path'])}: {len(builds)} builds -> {t['out_path']}")
+        runs.append({
+            "template": t,
+            "compiled": compile_builds(builds, vocab),
+            "out_f": open(t["out_path"], "w", encoding="utf-8"),
+            "build_counter": Counter(),
+            "known": 0,
+            "unknown": 0,
+            "matches": 0,
+            "pairs": 0,
+        })
+    return runs
+
+
+UNKNOWN_BUILD = {
+    "build_id": "UNKNOWN",
+    "build_name": "UNKNOWN",
+    "matched_mask": 0,
+    "matched_units": [],
+    "matched": 0,
+    "size": 0,
+    "score": 0.0,
+}
+
+
+@profiled("jsonl_write")
 def write_jsonl_line(f, obj: dict):
     f.write(json.dumps(obj, ensure_ascii=False) + "\n")
 
@@ -209,28 +381,44 @@ def write_jsonl_line(f, obj: dict):
 # -------------------------------------------------
 def main():
     ensure_dirs()
-
-    # build list + debug
-    builds = load_json(BUILDS_PATH)
-    print("[DEBUG] BUILDS_PATH =", BUILDS_PATH)
-    print("[DEBUG] builds count =", len(builds))
-    print("[DEBUG] first build =", builds[0] if builds else None)
+    PROF.start("make_pair_summaries", builds_path=BUILDS_PATH, raw_dir=RAW_DIR, multi_template=MULTI_TEMPLATE)
+
+    # template sets + debug
+    with PROF.stage("load_builds"):
+        templates = discover_templates(TEMPLATE_DIR) if MULTI_TEMPLATE else [single_template()]
+    print("[DEBUG] BUILDS_PATH =", BUILDS_PATH if not MULTI_TEMPLATE else TEMPLATE_DIR)
+    print("[DEBUG] template sets =", len(templates))
+    if not templates:
+        print("[ERROR] No template set found.")
+        PROF.finish(matches=0, pairs=0)
+        return
+
+    with PROF.stage("compile_builds"):
+        vocab = UnitVocab.from_unit_list(UNIT_LIST_PATH)
+        runs = open_runs(templates, vocab)
+
+    store = None
+    if STORE_PATH:
+        from pair_store import PairStore
+        store = PairStore(STORE_PATH)
+        for run in runs:
+            run["store_template"] = os.path.splitext(os.path.basename(run["template"]["path"]))[0]
+            store.begin_template(run["store_template"])
 
     total_matches = 0
     skipped_wrong_set = 0
     skipped_bad_match = 0
+    no_template = Counter()
 
     total_players_seen = 0
-    total_pairs_written = 0
 
-    build_counter = Counter()
-    unknown_count = 0
-    known_count = 0
+    # (set, patch) -> runs whose template fits
+    runs_for = {}
 
-    with open(OUT_PATH, "w", encoding="utf-8") as out_f:
+    with PROF.stage("process_matches"):
         for match_path in iter_json_files(RAW_DIR):
             try:
-                match = load_json(match_path)
+                match = load_match(match_path)
             except Exception as e:
                 print(f"[SKIP] Nem tudtam olvasni: {match_path} -> {e}")
                 continue
@@ -239,9 +427,15 @@ def main():
             meta = match.get("metadata", {})
             match_id = meta.get("match_id", os.path.splitext(os.path.basename(match_path))[0])
 
-            # --- Set16 filter ---
-            if info.get("tft_set_number") != 16:
+            # --- set / patch -> template sets ---
+            tft_set = info.get("tft_set_number")
+            patch = extract_patch(info.get("game_version"))
+            active = runs_for.get((tft_set, patch))
+            if active is None:
+                active = runs_for[(tft_set, patch)] = [r for r in runs if template_fits(r["template"], tft_set, patch)]
+            if not active:
                 skipped_wrong_set += 1
+                no_template[(tft_set, patch)] += 1
                 continue
 
             participants = info.get("participants", [])
@@ -285,84 +479,104 @@ def main():
                 (7, 8, 4),
             ]
 
-            for a_pl, b_pl, team_rank in pair_defs:
-                a = placement_map[a_pl]
-                b = placement_map[b_pl]
-
-                members = []
-                for p in (a, b):
-                    riot_name = p.get("riotIdGameName")
-                    tagline = p.get("riotIdTagline")
-                    puuid = p.get("puuid")
-                    placement = int(p.get("placement"))
-
-                    units = p.get("units", [])
-                    board_units = [u.get("character_id") for u in units if u.get("character_id")]
-
-                    best = identify_build(board_units, builds)
-                    if best is None:
-                        best = {
-                            "build_id": "UNKNOWN",
-                            "build_name": "UNKNOWN",
-                            "matched_units": [],
-                            "matched": 0,
-                            "size": 0,
-                            "score": 0.0,
+            # boards are encoded once, classified once per template set
+            boards = {}
+            for pl, p in placement_map.items():
+                boards[pl] = vocab.encode_board(u.get("character_id") for u in p.get("units", []))
+
+            for run in active:
+                run["matches"] += 1
+                for a_pl, b_pl, team_rank in pair_defs:
+                    members = []
+                    for pl in (a_pl, b_pl):
+                        p = placement_map[pl]
+                        board = boards[pl]
+
+                        best = identify_build_mask(board, run["compiled"]) or UNKNOWN_BUILD
+
+                        # build stat
+                        bid = best["build_id"]
+                        run["build_counter"][bid] += 1
+                        if bid == "UNKNOWN":
+                            run["unknown"] += 1
+                        else:
+                            run["known"] += 1
+
+                        member = {
+                            "riotIdGameName": p.get("riotIdGameName"),
+                            "riotIdTagline": p.get("riotIdTagline"),
+                            "puuid": p.get("puuid"),
+                            "placement": pl,                  # 1..8 (egyéni)
+                            "team_rank": team_rank,           # 1..4 (csapat)
+                            "build_id": best["build_id"],
+                            "build_name": best["build_name"],
+                            "score": best["score"],
+                            "matched": best["matched"],
+                            "size": best["size"],
+                            "board_mask": board,              # unit bitmask, see *.units.json
+                            "matched_mask": best["matched_mask"],
                         }
-
-                    # build stat
-                    bid = best["build_id"]
-                    build_counter[bid] += 1
-                    if bid == "UNKNOWN":
-                        unknown_count += 1
-                    else:
-                        known_count += 1
-
-                    members.append({
-                        "riotIdGameName": riot_name,
-                        "riotIdTagline": tagline,
-                        "puuid": puuid,
-                        "placement": placement,           # 1..8 (egyéni)
-                        "team_rank": team_rank,           # 1..4 (csapat)
-                        "build_id": best["build_id"],
-                        "build_name": best["build_name"],
-                        "score": best["score"],
-                        "matched": best["matched"],
-                        "size": best["size"],
-                        "matched_units": best["matched_units"],
-                    })
-
-                out_obj = {
-                    "match_id": match_id,
-                    "game_datetime": game_dt,
-                    "queue_id": queue_id,
-                    "team_rank": team_rank,        # 1..4  (“final placement”)
-                    "team_bucket": team_rank,      # our bucket = team_rank
-                    "pair_key": f"{a_pl}-{b_pl}",  # debug: placement pairs
-                    "members": members
-                }
-
-                write_jsonl_line(out_f, out_obj)
-                total_pairs_written += 1
+                        if WRITE_UNIT_NAMES:
+                            member["matched_units"] = best["matched_units"]
+                        members.append(member)
+
+                    out_obj = {
+                        "match_id": match_id,
+                        "game_datetime": game_dt,
+                        "queue_id": queue_id,
+                        "patch": patch,
+                        "team_rank": team_rank,        # 1..4  (“final placement”)
+                        "team_bucket": team_rank,      # our bucket = team_rank
+                        "pair_key": f"{a_pl}-{b_pl}",  # debug: placement pairs
+                        "members": members
+                    }
+
+                    write_jsonl_line(run["out_f"], out_obj)
+                    if store is not None:
+                        store.add(out_obj, run["store_template"])
+                    run["pairs"] += 1
+
+    for run in runs:
+        run["out_f"].close()
+        # ids are only meaningful together with the vocabulary of this run
+        vocab.save(vocab_path_for(run["template"]["out_path"]))
+
+    if store is not None:
+        with PROF.stage("store_index"):
+            store.close()
 
     print("\n[DONE] Done.")
-    print(f"  Set16 matches processed: {total_matches}")
-    print(f"  SKIP (not Set16): {skipped_wrong_set}")
+    print(f"  Matches processed: {total_matches}")
+    print(f"  SKIP (no template set for set/patch): {skipped_wrong_set}")
+    for (tft_set, patch), cnt in no_template.most_common(5):
+        print(f"    set={tft_set} patch={patch}: {cnt}")
     print(f"  SKIP (faulty placement/missing 1..8): {skipped_bad_match}")
     print(f"  Players seen (all participant list lenght added together): {total_players_seen}")
-    print(f"  Pair rows written (match*4 expected): {total_pairs_written}")
-    print(f"  Output: {OUT_PATH}")
-
-    print("\n[BUILD STATS] (player level, 2 player/pair)")
-    print(f"  Known build (not UNKNOWN): {known_count}")
-    print(f"  UNKNOWN: {unknown_count}")
-    total_classified = known_count + unknown_count
-    if total_classified > 0:
-        print(f"  UNKNOWN ratio: {unknown_count / total_classified:.2%}")
-
-    print("\n[TOP 15 BUILD_ID]")
-    for bid, cnt in build_counter.most_common(15):
-        print(f"  {bid}: {cnt}")
+    print(f"  Unit vocabulary: {len(vocab)} units")
+    if store is not None:
+        print(f"  Pair store: {STORE_PATH}")
+
+    for run in runs:
+        t = run["template"]
+        print(f"\n[TEMPLATE] {os.path.basename(t['path'])}")
+        print(f"  Matches: {run['matches']}")
+        print(f"  Pair rows written (match*4 expected): {run['pairs']}")
+        print(f"  Output: {t['out_path']}")
+
+        print("  [BUILD STATS] (player level, 2 player/pair)")
+        print(f"    Known build (not UNKNOWN): {run['known']}")
+        print(f"    UNKNOWN: {run['unknown']}")
+        total_classified = run["known"] + run["unknown"]
+        if total_classified > 0:
+            print(f"    UNKNOWN ratio: {run['unknown'] / total_classified:.2%}")
+
+        print("  [TOP 15 BUILD_ID]")
+        for bid, cnt in run["build_counter"].most_common(15):
+            print(f"    {bid}: {cnt}")
+
+    PROF.finish(matches=total_matches, templates=len(runs),
+                pairs=sum(r["pairs"] for r in runs),
+                unknown=sum(r["unknown"] for r in runs), known=sum(r["known"] for r in runs))
 
 
 if __name__ == "__main__":
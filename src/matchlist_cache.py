@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Optional
+
+# =========================================================
+# 0) Persistent matchlist cache (per-PUUID watermarks)
+# =========================================================
+#
+# crawler.crawl() used to ask for the newest MATCHLIST_COUNT_PER_PLAYER
+# ids of every dequeued puuid, with no memory of what that player's list
+# looked like last time. This SQLite file remembers per puuid:
+#
+#   polled_at     last matchlist call -> puuids polled within the TTL are
+#                 skipped
+#   watermark_ms  newest game_datetime of a listed match whose time is
+#                 known -> the next call asks only for newer games
+#                 (startTime = watermark - slack, seconds)
+#
+# The watermark only moves over a contiguous run of known matches, oldest
+# first: if a listed match failed to load (or the list wasn't fully
+# processed) it stays below that match, so nothing is skipped. The crawler
+# marks an id seen only once its body is stored, so the next listing
+# fetches the failed match again and the watermark moves on; ids that did
+# load are re-listed cheaply, the seen set drops them.
+#
+# match_times holds game_datetime per match id (filled from every match
+# the crawler reads, fetched or cached).
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    puuid TEXT PRIMARY KEY,
+    polled_at REAL,
+    watermark_ms INTEGER,
+    polls INTEGER NOT NULL DEFAULT 0,
+    listed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS players_polled ON players(polled_at);
+CREATE TABLE IF NOT EXISTS match_times (
+    match_id TEXT PRIMARY KEY,
+    game_datetime INTEGER NOT NULL
+);
+"""
+
+
+class MatchlistCache:
+    def __init__(self, path: str):
+        self.path = path
+        self.con = sqlite3.connect(path)
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.execute("PRAGMA synchronous=NORMAL")
+        self.con.executescript(SCHEMA)
+        self.con.commit()
+
+    def close(self) -> None:
+        self.con.commit()
+        self.con.close()
+
+    # -----------------------------------------------------
+    # before the call
+    # -----------------------------------------------------
+
+    def is_fresh(self, puuid: str, ttl_seconds: float, now: Optional[float] = None) -> bool:
+        """polled within the TTL"""
+        row = self.con.execute("SELECT polled_at FROM players WHERE puuid = ?", (puuid,)).fetchone()
+        if row is None or row[0] is None:
+            return False
+        return (now if now is not None else time.time()) - row[0] < ttl_seconds
+
+    def start_time(self, puuid: str, slack_seconds: int = 0) -> Optional[int]:
+        """startTime (epoch seconds) for the matchlist call, None = never listed"""
+        row = self.con.execute("SELECT watermark_ms FROM players WHERE puuid = ?", (puuid,)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return max(0, int(row[0]) // 1000 - int(slack_seconds))
+
+    def due(self, ttl_seconds: float, limit: Optional[int] = None, now: Optional[float] = None) -> List[str]:
+        """polled puuids whose TTL ran out, longest waiting first"""
+        cutoff = (now if now is not None else time.time()) - ttl_seconds
+        sql = "SELECT puuid FROM players WHERE polled_at IS NOT NULL AND polled_at <= ? ORDER BY polled_at"
+        params: tuple = (cutoff,)
+        if limit is not None:
+            sql += " LIMIT ?"
+            params += (int(limit),)
+        return [r[0] for r in self.con.execute(sql, params)]
+
+    def next_due_in(self, ttl_seconds: float, now: Optional[float] = None) -> Optional[float]:
+        """seconds until the next puuid is due (0 if one already is, None if nothing was polled)"""
+        row = self.con.execute("SELECT MIN(polled_at) FROM players").fetchone()
+        if row is None or row[0] is None:
+            return None
+        return max(0.0, row[0] + ttl_seconds - (now if now is not None else time.time()))
+
+    # -----------------------------------------------------
+    # after the call
+    # -----------------------------------------------------
+
+    def record_poll(self, puuid: str, n_ids: int, now: Optional[float] = None) -> None:
+        self.con.execute(
+            "INSERT INTO players (puuid, polled_at, polls, listed) VALUES (?, ?, 1, ?) "
+            "ON CONFLICT(puuid) DO UPDATE SET polled_at = excluded.polled_at, polls = polls + 1, "
+            "listed = listed + excluded.listed",
+            (puuid, now if now is not None else time.time(), int(n_ids)))
+        self.con.commit()
+
+    def record_time(self, match_id: str, game_datetime) -> None:
+        if game_datetime is None:
+            return
+        try:
+            gdt = int(game_datetime)
+        except (TypeError, ValueError):
+            return
+        self.con.execute("INSERT OR IGNORE INTO match_times (match_id, game_datetime) VALUES (?, ?)", (match_id, gdt))
+
+    def times(self, match_ids: Iterable[str]) -> Dict[str, int]:
+        ids = list(match_ids)
+        if not ids:
+            return {}
+        marks = ",".join("?" * len(ids))
+        return dict(self.con.execute(f"SELECT match_id, game_datetime FROM match_times WHERE match_id IN ({marks})", ids))
+
+    def advance(self, puuid: str, match_ids: List[str]) -> Optional[int]:
+        """
+        match_ids: the list as returned (newest first), fully processed.
+        Moves the watermark up to the newest match of the known run
+        starting at the oldest id. Returns the watermark.
+        """
+        known = self.times(match_ids)
+        mark = None
+        for mid in reversed(match_ids):
+            gdt = known.get(mid)
+            if gdt is None:
+                break
+            mark = gdt if mark is None else max(mark, gdt)
+        if mark is not None:
+            self.con.execute(
+                "UPDATE players SET watermark_ms = MAX(COALESCE(watermark_ms, 0), ?) WHERE puuid = ?", (mark, puuid))
+        self.con.commit()
+        row = self.con.execute("SELECT watermark_ms FROM players WHERE puuid = ?", (puuid,)).fetchone()
+        return row[0] if row else None
+
+    def stats(self) -> Dict[str, int]:
+        players, polled, marked, listed = self.con.execute(
+            "SELECT COUNT(*), COUNT(polled_at), COUNT(watermark_ms), COALESCE(SUM(listed), 0) FROM players").fetchone()
+        (times,) = self.con.execute("SELECT COUNT(*) FROM match_times").fetchone()
+        return {"players": players, "polled": polled, "with_watermark": marked, "ids_listed": listed,
+                "match_times": times}
@@ -0,0 +1,590 @@
+import argparse
+import json
+import os
+import time
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from synergy_MVP import DOUBLE_UP_QUEUE_ID, MIN_GAMES, canonical_pair, safe_get_build_name
+from unit_vocab import UnitVocab, vocab_path_for
+
+# =========================================================
+# 0) Sparse placement model (logistic, mini-batch SGD)
+# =========================================================
+#
+# EB points and lifts score every build pair on its own games. Here one
+# regularized logistic model of P(top2) (or top1) shares strength across
+# pairs. Features per team (partner order doesn't matter):
+#
+#   unit:<u>        units on the two boards (0 / 1 / 2)
+#   build:<b>       build of each partner (0 / 1 / 2)
+#   pair:<a>|<b>    build pair, only pairs with >= PAIR_MIN_GAMES games
+#   units:<u>|<v>   u on one board and v on the other, the UNIT_PAIRS most
+#                   frequent cross-board unit pairs (>= UNIT_PAIR_MIN_GAMES)
+#
+# 1) scan: the pair summaries are read once into a compact cache next to
+#    them (label, time, build ids, unit ids per board; .model_cache.npy)
+#    plus the counts that pick the interactions
+# 2) fit: EPOCHS passes over the cache in CHUNK_TEAMS slices (memmap, each
+#    slice shuffled), AdaGrad steps on BATCH_TEAMS teams, L2 penalty.
+#    Memory = one slice + the weights, whatever the corpus size
+# 3) holdout (newest HOLDOUT_SHARE or a match_id hash, like param_sweep):
+#    log loss and AUC vs the base rate
+# 4) exports: per-feature effects, the model, and P(top2) for every build
+#    pair seen at least once -- pairs below MIN_GAMES (not in the ranked
+#    CSV) are scored from their builds' average boards + the fitted parts
+#
+# Score a pair later without refitting:
+#   python src/pair_model.py score "Build A" "Build B"
+
+PAIR_FILE = r"C:\Users\Levi\Documents\tft_duo_project\data\processed\pair_summaries_SA.jsonl"
+OUT_DIR = r"C:\Users\Levi\Documents\tft_duo_project\output\pair_model"
+
+TARGET = "top2"             # "top2" | "top1"
+PAIR_MIN_GAMES = 30
+UNIT_PAIRS = 400
+UNIT_PAIR_MIN_GAMES = 200
+EPOCHS = 3
+BATCH_TEAMS = 2048
+CHUNK_TEAMS = 131072
+LEARNING_RATE = 0.1
+L2 = 1e-5
+HOLDOUT_SHARE = 0.1
+
+MAX_UNITS = 16              # units stored per board (more are cut, counted)
+NO_UNIT = np.iinfo(np.uint16).max
+
+CACHE_DTYPE = np.dtype([
+    ("rank", np.int8),
+    ("gdt", np.int64),
+    ("mhash", np.uint16),   # crc32(match_id) % 1000, for the hash holdout
+    ("build_a", np.int32),
+    ("build_b", np.int32),
+    ("units_a", np.uint16, (MAX_UNITS,)),
+    ("units_b", np.uint16, (MAX_UNITS,)),
+])
+
+
+def cache_paths(pairs_path: str) -> Tuple[str, str]:
+    base = os.path.splitext(pairs_path)[0]
+    return base + ".model_cache.npy", base + ".model_cache.json"
+
+
+# =========================================================
+# 1) Scan: pair summaries -> cache + counts
+# =========================================================
+
+def _board(mask: int, vocab: UnitVocab) -> Tuple[np.ndarray, int]:
+    ids = vocab.unit_ids(mask)
+    out = np.full(MAX_UNITS, NO_UNIT, dtype=np.uint16)
+    n = min(len(ids), MAX_UNITS)
+    out[:n] = ids[:n]
+    return out, len(ids) - n
+
+
+def scan(pairs_path: str, vocab: UnitVocab, queue_id: Optional[int] = DOUBLE_UP_QUEUE_ID,
+         flush_every: int = 8192) -> Dict[str, Any]:
+    """One pass over the JSONL: writes the cache, returns the meta (builds + counts)."""
+    cache_path, meta_path = cache_paths(pairs_path)
+    V = len(vocab)
+    builds: Dict[str, int] = {}
+    pair_games: Dict[Tuple[int, int], List[int]] = {}   # (a, b) a <= b -> [games, top1, top2]
+    unit_pair_games = np.zeros((V, V), dtype=np.int64)  # cross-board, upper triangle
+    unit_sum: List[np.ndarray] = []                     # build -> unit counts over its boards
+    build_games: List[int] = []
+    cut = 0
+    n = 0
+    rows: List[tuple] = []
+
+    def flush(f) -> None:
+        nonlocal rows
+        if not rows:
+            return
+        arr = np.array(rows, dtype=CACHE_DTYPE)
+        arr.tofile(f)
+        ua = arr["units_a"].astype(np.int64)
+        ub = arr["units_b"].astype(np.int64)
+        i = np.repeat(ua, MAX_UNITS, axis=1)
+        j = np.tile(ub, (1, MAX_UNITS))
+        ok = (i != NO_UNIT) & (j != NO_UNIT)
+        lo, hi = np.minimum(i[ok], j[ok]), np.maximum(i[ok], j[ok])
+        np.add.at(unit_pair_games, (lo, hi), 1)
+        rows = []
+
+    with open(pairs_path, "r", encoding="utf-8") as src, open(cache_path + ".tmp", "wb") as f:
+        for line in src:
+            line = line.strip()
+            if not line:
+                continue
+            r = json.loads(line)
+            if queue_id is not None and r.get("queue_id") != queue_id:
+                continue
+            members = r.get("members") or []
+            if len(members) != 2 or r.get("team_rank") is None:
+                continue
+            ids = []
+            boards = []
+            for mem in members:
+                name = safe_get_build_name(mem)
+                b = builds.get(name)
+                if b is None:
+                    b = builds[name] = len(builds)
+                    unit_sum.append(np.zeros(V, dtype=np.int64))
+                    build_games.append(0)
+                board, lost = _board(int(mem.get("board_mask") or 0), vocab)
+                cut += lost
+                ids.append(b)
+                boards.append(board)
+                build_games[b] += 1
+                valid = board[board != NO_UNIT]
+                unit_sum[b][valid] += 1
+            rank = int(r["team_rank"])
+            key = (min(ids), max(ids))
+            c = pair_games.setdefault(key, [0, 0, 0])
+            c[0] += 1
+            c[1] += rank == 1
+            c[2] += rank <= 2
+            mhash = zlib.crc32(str(r.get("match_id")).encode("utf-8")) % 1000
+            rows.append((rank, int(r.get("game_datetime") or 0), mhash, ids[0], ids[1], boards[0], boards[1]))
+            n += 1
+            if len(rows) >= flush_every:
+                flush(f)
+        flush(f)
+
+    # plain .npy header in front of the records, so np.load(mmap_mode="r") opens it
+    with open(cache_path, "wb") as out:
+        np.lib.format.write_array_header_1_0(out, {"descr": np.lib.format.dtype_to_descr(CACHE_DTYPE),
+                                                   "fortran_order": False, "shape": (n,)})
+        with open(cache_path + ".tmp", "rb") as f:
+            while True:
+                block = f.read(1 << 24)
+                if not block:
+                    break
+                out.write(block)
+    os.remove(cache_path + ".tmp")
+
+    st = os.stat(pairs_path)
+    meta = {
+        "source": os.path.abspath(pairs_path),
+        "source_size": st.st_size,
+        "source_mtime": st.st_mtime,
+        "queue_id": queue_id,
+        "teams": n,
+        "units_cut": cut,
+        "builds": sorted(builds, key=builds.get),
+        "build_games": build_games,
+        "build_unit_sum": [s.tolist() for s in unit_sum],
+        "pairs": [[a, b, g, t1, t2] for (a, b), (g, t1, t2) in sorted(pair_games.items())],
+        "unit_pair_games": [[int(i), int(j), int(unit_pair_games[i, j])] for i, j in zip(*np.nonzero(unit_pair_games))],
+    }
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    return meta
+
+
+def load_or_scan(pairs_path: str, vocab: UnitVocab, rebuild: bool = False) -> Tuple[np.ndarray, Dict[str, Any]]:
+    cache_path, meta_path = cache_paths(pairs_path)
+    meta = None
+    if not rebuild and os.path.exists(cache_path) and os.path.exists(meta_path):
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        st = os.stat(pairs_path)
+        if meta.get("source_size") != st.st_size or meta.get("source_mtime") != st.st_mtime:
+            meta = None
+    if meta is None:
+        t0 = time.perf_counter()
+        meta = scan(pairs_path, vocab)
+        print(f"[SCAN] {meta['teams']} teams, {len(meta['builds'])} builds -> {cache_path} "
+              f"({time.perf_counter() - t0:.1f}s)")
+    else:
+        print(f"[CACHE] {meta['teams']} teams from {cache_path}")
+    return np.load(cache_path, mmap_mode="r"), meta
+
+
+# =========================================================
+# 2) Features
+# =========================================================
+
+class FeatureSpace:
+    """column layout: units | builds | build pairs | unit pairs (intercept kept apart)"""
+
+    def __init__(self, units: List[str], builds: List[str], pair_list: List[Tuple[int, int]],
+                 unit_pair_list: List[Tuple[int, int]]):
+        self.units = units
+        self.builds = builds
+        self.pair_list = pair_list
+        self.unit_pair_list = unit_pair_list
+        V, B = len(units), len(builds)
+        self.unit_off = 0
+        self.build_off = V
+        self.pair_off = V + B
+        self.unit_pair_off = self.pair_off + len(pair_list)
+        self.n = self.unit_pair_off + len(unit_pair_list)
+
+        # symmetric lookups, -1 = not a feature
+        self.pair_col = np.full((B, B), -1, dtype=np.int64)
+        for k, (a, b) in enumerate(pair_list):
+            self.pair_col[a, b] = self.pair_col[b, a] = self.pair_off + k
+        self.unit_pair_col = np.full((V + 1, V + 1), -1, dtype=np.int64)   # last row/col: padding
+        for k, (i, j) in enumerate(unit_pair_list):
+            self.unit_pair_col[i, j] = self.unit_pair_col[j, i] = self.unit_pair_off + k
+
+    @classmethod
+    def select(cls, meta: Dict[str, Any], units: List[str], pair_min_games: int, unit_pairs: int,
+               unit_pair_min_games: int) -> "FeatureSpace":
+        pairs = [(a, b) for a, b, g, _, _ in meta["pairs"] if g >= pair_min_games]
+        up = sorted(((g, i, j) for i, j, g in meta["unit_pair_games"] if g >= unit_pair_min_games), reverse=True)
+        return cls(units, meta["builds"], pairs, sorted((i, j) for _, i, j in up[:unit_pairs]))
+
+    def names(self) -> List[Tuple[str, str, str]]:
+        """(kind, a, b) per column"""
+        out = [("unit", u, "") for u in self.units]
+        out += [("build", b, "") for b in self.builds]
+        out += [("pair", self.builds[a], self.builds[b]) for a, b in self.pair_list]
+        out += [("units", self.units[i], self.units[j]) for i, j in self.unit_pair_list]
+        return out
+
+    def matrix(self, recs: np.ndarray) -> sp.csr_matrix:
+        n = len(recs)
+        V = len(self.units)
+        ua = recs["units_a"].astype(np.int64)
+        ub = recs["units_b"].astype(np.int64)
+        ua[ua == NO_UNIT] = V
+        ub[ub == NO_UNIT] = V
+        ba = recs["build_a"].astype(np.int64)
+        bb = recs["build_b"].astype(np.int64)
+
+        team = np.arange(n)
+        per_unit = np.repeat(team, MAX_UNITS)
+        va, vb = ua.ravel() < V, ub.ravel() < V        # padding units drop out
+        rows = [per_unit[va], per_unit[vb], team, team, team]
+        cols = [ua.ravel()[va], ub.ravel()[vb], self.build_off + ba, self.build_off + bb, self.pair_col[ba, bb]]
+        if self.unit_pair_list:
+            rows.append(np.repeat(team, MAX_UNITS * MAX_UNITS))
+            cols.append(self.unit_pair_col[ua[:, :, None], ub[:, None, :]].ravel())
+
+        r = np.concatenate(rows)
+        c = np.concatenate(cols)
+        keep = c >= 0                                   # unselected pairs
+        r, c = r[keep], c[keep]
+        X = sp.csr_matrix((np.ones(len(r)), (r, c)), shape=(n, self.n))
+        X.sum_duplicates()
+        return X
+
+
+def labels(recs: np.ndarray, target: str) -> np.ndarray:
+    return (recs["rank"] <= (1 if target == "top1" else 2)).astype(np.float64)
+
+
+def holdout_mask(cache: np.ndarray, share: float, how: str) -> np.ndarray:
+    if share <= 0:
+        return np.zeros(len(cache), dtype=bool)
+    if how == "time":
+        cutoff = np.quantile(cache["gdt"], 1.0 - share)
+        return cache["gdt"] > cutoff
+    return cache["mhash"] < int(share * 1000)
+
+
+# =========================================================
+# 3) Fit (AdaGrad mini-batch SGD, L2)
+# =========================================================
+
+def sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -30, 30)))
+
+
+def chunks(n: int, size: int) -> Iterator[slice]:
+    for s in range(0, n, size):
+        yield slice(s, min(n, s + size))
+
+
+class LogisticSGD:
+    def __init__(self, n_features: int, lr: float = LEARNING_RATE, l2: float = L2, bias: float = 0.0):
+        self.w = np.zeros(n_features)
+        self.b = bias
+        self.lr = lr
+        self.l2 = l2
+        self.gw = np.full(n_features, 1e-8)   # AdaGrad accumulators
+        self.gb = 1e-8
+
+    def logit(self, X: sp.csr_matrix) -> np.ndarray:
+        return X @ self.w + self.b
+
+    def step(self, X: sp.csr_matrix, y: np.ndarray) -> float:
+        p = sigmoid(self.logit(X))
+        err = p - y
+        n = len(y)
+        g = X.T @ err / n + self.l2 * self.w
+        gb = float(err.mean())
+        self.gw += g * g
+        self.gb += gb * gb
+        self.w -= self.lr * g / np.sqrt(self.gw)
+        self.b -= self.lr * gb / np.sqrt(self.gb)
+        return log_loss(y, p)
+
+
+def log_loss(y: np.ndarray, p: np.ndarray) -> float:
+    p = np.clip(p, 1e-12, 1 - 1e-12)
+    return float(-np.mean(y * np.log(p) + (1 - y) * np.log(1 - p)))
+
+
+def auc(y: np.ndarray, p: np.ndarray) -> Optional[float]:
+    """Mann-Whitney, ties get average ranks"""
+    pos = y > 0.5
+    n_pos, n_neg = int(pos.sum()), int((~pos).sum())
+    if not n_pos or not n_neg:
+        return None
+    from scipy.stats import rankdata
+    r = rankdata(p)
+    return float((r[pos].sum() - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg))
+
+
+def fit(cache: np.ndarray, fs: FeatureSpace, test: np.ndarray, target: str, epochs: int, batch: int,
+        chunk: int, lr: float, l2: float, seed: int = 7) -> Tuple[LogisticSGD, List[Dict[str, Any]]]:
+    rng = np.random.default_rng(seed)
+    train_idx = np.flatnonzero(~test)
+    test_idx = np.flatnonzero(test)
+    base = float(labels(cache[train_idx], target).mean()) if len(train_idx) else 0.5
+    model = LogisticSGD(fs.n, lr, l2, bias=float(np.log(base / (1 - base))) if 0 < base < 1 else 0.0)
+
+    history = []
+    for ep in range(1, epochs + 1):
+        t0 = time.perf_counter()
+        losses = []
+        # slices in random order, shuffled inside: one slice in memory at a time
+        starts = rng.permutation(np.arange(0, len(train_idx), chunk))
+        for s in starts:
+            idx = train_idx[s:s + chunk]
+            recs = cache[np.sort(idx)]
+            recs = recs[rng.permutation(len(recs))]
+            for sl in chunks(len(recs), batch):
+                part = recs[sl]
+                losses.append(model.step(fs.matrix(part), labels(part, target)))
+        ev = evaluate(model, cache, fs, test_idx, target, base, batch)
+        ev.update({"epoch": ep, "train_loss": round(float(np.mean(losses)), 5) if losses else None,
+                   "seconds": round(time.perf_counter() - t0, 2)})
+        history.append(ev)
+        print(f"[EPOCH {ep}] train loss={ev['train_loss']} holdout loss={ev['holdout_loss']} "
+              f"(base {ev['holdout_base_loss']}) auc={ev['holdout_auc']} ({ev['seconds']}s)")
+    return model, history
+
+
+def evaluate(model: LogisticSGD, cache: np.ndarray, fs: FeatureSpace, test_idx: np.ndarray, target: str,
+             base: float, batch: int) -> Dict[str, Any]:
+    if not len(test_idx):
+        return {"holdout_teams": 0, "holdout_loss": None, "holdout_base_loss": None, "holdout_auc": None}
+    ys, ps = [], []
+    for sl in chunks(len(test_idx), batch):
+        recs = cache[test_idx[sl]]
+        ys.append(labels(recs, target))
+        ps.append(sigmoid(model.logit(fs.matrix(recs))))
+    y, p = np.concatenate(ys), np.concatenate(ps)
+    a = auc(y, p)
+    return {
+        "holdout_teams": int(len(y)),
+        "holdout_loss": round(log_loss(y, p), 5),
+        "holdout_base_loss": round(log_loss(y, np.full(len(y), base)), 5),
+        "holdout_auc": round(a, 4) if a is not None else None,
+    }
+
+
+# =========================================================
+# 4) Effects + pair scoring
+# =========================================================
+
+def build_boards(meta: Dict[str, Any]) -> np.ndarray:
+    """average unit counts per board of each build (B, V)"""
+    s = np.asarray(meta["build_unit_sum"], dtype=np.float64)
+    g = np.asarray(meta["build_games"], dtype=np.float64)
+    return s / np.maximum(g, 1)[:, None]
+
+
+def unit_pair_weights(model_w: np.ndarray, fs: FeatureSpace) -> np.ndarray:
+    """(V, V) symmetric, so board_a @ W @ board_b = the unit-pair part of the logit"""
+    V = len(fs.units)
+    W = np.zeros((V, V))
+    for k, (i, j) in enumerate(fs.unit_pair_list):
+        W[i, j] = W[j, i] = model_w[fs.unit_pair_off + k]
+    return W
+
+
+def pair_logits(w: np.ndarray, b: float, fs: FeatureSpace, boards: np.ndarray, a: np.ndarray,
+                c: np.ndarray) -> np.ndarray:
+    """logit of build pairs (a[k], c[k]) with their builds' average boards"""
+    V = len(fs.units)
+    wu = w[:V]
+    W = unit_pair_weights(w, fs)
+    pc = fs.pair_col[a, c]
+    z = (b + w[fs.build_off + a] + w[fs.build_off + c]
+         + boards[a] @ wu + boards[c] @ wu
+         + np.einsum("kv,vu,ku->k", boards[a], W, boards[c])
+         + np.where(pc >= 0, w[np.maximum(pc, 0)], 0.0))
+    return z
+
+
+def feature_effects(model: LogisticSGD, fs: FeatureSpace, meta: Dict[str, Any]) -> pd.DataFrame:
+    names = fs.names()
+    games = np.zeros(fs.n, dtype=np.int64)
+    games[fs.build_off:fs.build_off + len(fs.builds)] = meta["build_games"]
+    pair_g = {(a, b): g for a, b, g, _, _ in meta["pairs"]}
+    for k, p in enumerate(fs.pair_list):
+        games[fs.pair_off + k] = pair_g.get(p, 0)
+    up_g = {(i, j): g for i, j, g in meta["unit_pair_games"]}
+    for k, p in enumerate(fs.unit_pair_list):
+        games[fs.unit_pair_off + k] = up_g.get(p, 0)
+    unit_boards = np.asarray(meta["build_unit_sum"], dtype=np.int64).sum(axis=0) if meta["build_unit_sum"] else 0
+    games[:len(fs.units)] = unit_boards
+    df = pd.DataFrame({
+        "kind": [n[0] for n in names],
+        "feature_a": [n[1] for n in names],
+        "feature_b": [n[2] for n in names],
+        "weight": model.w,
+        "odds_ratio": np.exp(model.w),
+        "games": games,
+    })
+    intercept = pd.DataFrame([{"kind": "intercept", "feature_a": "", "feature_b": "", "weight": model.b,
+                               "odds_ratio": np.exp(model.b), "games": meta["teams"]}])
+    return pd.concat([intercept, df], ignore_index=True)
+
+
+def pair_predictions(model: LogisticSGD, fs: FeatureSpace, meta: Dict[str, Any], target: str,
+                     min_games: int = MIN_GAMES) -> pd.DataFrame:
+    """every build pair seen at least once: model P(target) vs observed"""
+    arr = np.asarray(meta["pairs"], dtype=np.int64).reshape(-1, 5)
+    a, c, g, t1, t2 = arr.T
+    z = pair_logits(model.w, model.b, fs, build_boards(meta), a, c)
+    obs = (t1 if target == "top1" else t2) / np.maximum(g, 1)
+    names = np.asarray(fs.builds, dtype=object)
+    ba, bb = zip(*(canonical_pair(x, y) for x, y in zip(names[a], names[c]))) if len(a) else ((), ())
+    return pd.DataFrame({
+        "build_a": ba,
+        "build_b": bb,
+        "games": g,
+        f"p_{target}_model": np.round(sigmoid(z), 5),
+        f"p_{target}_observed": np.round(obs, 5),
+        "pair_fitted": fs.pair_col[a, c] >= 0,
+        "in_ranked": g >= min_games,
+    }).sort_values(f"p_{target}_model", ascending=False)
+
+
+def save_model(out_dir: str, model: LogisticSGD, fs: FeatureSpace, meta: Dict[str, Any],
+               info: Dict[str, Any]) -> str:
+    path = os.path.join(out_dir, "pair_model.npz")
+    np.savez_compressed(
+        path, w=model.w, b=np.array([model.b]),
+        pair_list=np.asarray(fs.pair_list, dtype=np.int64).reshape(-1, 2),
+        unit_pair_list=np.asarray(fs.unit_pair_list, dtype=np.int64).reshape(-1, 2),
+        boards=build_boards(meta), build_games=np.asarray(meta["build_games"], dtype=np.int64))
+    with open(os.path.join(out_dir, "pair_model.json"), "w", encoding="utf-8") as f:
+        json.dump({"units": fs.units, "builds": fs.builds, **info}, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def load_model(out_dir: str) -> Tuple[np.ndarray, float, FeatureSpace, np.ndarray, Dict[str, Any]]:
+    with open(os.path.join(out_dir, "pair_model.json"), "r", encoding="utf-8") as f:
+        info = json.load(f)
+    z = np.load(os.path.join(out_dir, "pair_model.npz"))
+    fs = FeatureSpace(info["units"], info["builds"], [tuple(p) for p in z["pair_list"].tolist()],
+                      [tuple(p) for p in z["unit_pair_list"].tolist()])
+    return z["w"], float(z["b"][0]), fs, z["boards"], info
+
+
+# =========================================================
+# 5) MAIN
+# =========================================================
+
+def cmd_fit(args) -> None:
+    os.makedirs(args.out_dir, exist_ok=True)
+    vocab = UnitVocab.load(vocab_path_for(args.pairs))
+    t0 = time.perf_counter()
+    cache, meta = load_or_scan(args.pairs, vocab, args.rebuild)
+    if not meta["teams"]:
+        print("[ERROR] No Double Up teams in the input.")
+        return
+    if meta["units_cut"]:
+        print(f"[WARN] {meta['units_cut']} units beyond MAX_UNITS={MAX_UNITS} per board were left out")
+
+    fs = FeatureSpace.select(meta, vocab.names, args.pair_min_games, args.unit_pairs, args.unit_pair_min_games)
+    print(f"[FEATURES] {fs.n}: {len(fs.units)} units, {len(fs.builds)} builds, {len(fs.pair_list)} build pairs, "
+          f"{len(fs.unit_pair_list)} unit pairs")
+    test = holdout_mask(cache, args.holdout, args.split)
+    print(f"[SPLIT] train={int((~test).sum())} holdout={int(test.sum())} ({args.split})")
+
+    model, history = fit(cache, fs, test, args.target, args.epochs, args.batch, args.chunk, args.lr, args.l2)
+
+    eff = feature_effects(model, fs, meta)
+    eff.reindex(eff["weight"].abs().sort_values(ascending=False).index).to_csv(
+        os.path.join(args.out_dir, "feature_effects.csv"), index=False, encoding="utf-8-sig")
+    preds = pair_predictions(model, fs, meta, args.target)
+    preds.to_csv(os.path.join(args.out_dir, "pair_predictions.csv"), index=False, encoding="utf-8-sig")
+    info = {
+        "target": args.target,
+        "teams": meta["teams"],
+        "source": meta["source"],
+        "settings": {k: getattr(args, k) for k in ("pair_min_games", "unit_pairs", "unit_pair_min_games", "epochs",
+                                                  "batch", "chunk", "lr", "l2", "holdout", "split")},
+        "history": history,
+        "seconds": round(time.perf_counter() - t0, 2),
+    }
+    save_model(args.out_dir, model, fs, meta, info)
+
+    print(f"[DONE] {args.out_dir} ({info['seconds']}s total)")
+    hypo = preds[~preds["in_ranked"]]
+    if hypo.empty:
+        print(f"Every build pair seen has >= MIN_GAMES={MIN_GAMES} games.")
+        return
+    print(f"Top pairs below MIN_GAMES={MIN_GAMES} (not in the ranked CSV), by model p_{args.target}:")
+    for _, r in hypo.head(10).iterrows():
+        print(f"  {r['build_a']:<28} + {r['build_b']:<28} p={r[f'p_{args.target}_model']:.3f} games={r['games']}")
+
+
+def cmd_score(args) -> None:
+    w, b, fs, boards, info = load_model(args.out_dir)
+    ids = {name: i for i, name in enumerate(fs.builds)}
+    missing = [x for x in (args.build_a, args.build_b) if x not in ids]
+    if missing:
+        raise SystemExit(f"Unknown build(s): {missing}. Known: {', '.join(fs.builds)}")
+    a, c = np.array([ids[args.build_a]]), np.array([ids[args.build_b]])
+    z = float(pair_logits(w, b, fs, boards, a, c)[0])
+    fitted = fs.pair_col[a[0], c[0]] >= 0
+    print(f"{args.build_a} + {args.build_b}: p_{info['target']}={sigmoid(np.array(z)):.4f} "
+          f"(logit {z:+.3f}, pair term {'fitted' if fitted else 'not fitted: builds + boards only'})")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Sparse logistic model of team placement (mini-batch SGD).")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    f = sub.add_parser("fit", help="scan (cached) + fit + export effects / pair predictions")
+    f.add_argument("--pairs", default=PAIR_FILE)
+    f.add_argument("--out-dir", default=OUT_DIR)
+    f.add_argument("--target", choices=("top2", "top1"), default=TARGET)
+    f.add_argument("--pair-min-games", type=int, default=PAIR_MIN_GAMES)
+    f.add_argument("--unit-pairs", type=int, default=UNIT_PAIRS)
+    f.add_argument("--unit-pair-min-games", type=int, default=UNIT_PAIR_MIN_GAMES)
+    f.add_argument("--epochs", type=int, default=EPOCHS)
+    f.add_argument("--batch", type=int, default=BATCH_TEAMS)
+    f.add_argument("--chunk", type=int, default=CHUNK_TEAMS)
+    f.add_argument("--lr", type=float, default=LEARNING_RATE)
+    f.add_argument("--l2", type=float, default=L2)
+    f.add_argument("--holdout", type=float, default=HOLDOUT_SHARE)
+    f.add_argument("--split", choices=("time", "hash"), default="time")
+    f.add_argument("--rebuild", action="store_true", help="rescan the pair summaries")
+    f.set_defaults(func=cmd_fit)
+
+    s = sub.add_parser("score", help="P(target) of a build pair from a fitted model")
+    s.add_argument("build_a")
+    s.add_argument("build_b")
+    s.add_argument("--out-dir", default=OUT_DIR)
+    s.set_defaults(func=cmd_score)
+
+    args = ap.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
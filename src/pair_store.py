@@ -0,0 +1,381 @@
+import argparse
+import json
+import os
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+# =========================================================
+# 0) Embedded store for pair summaries (SQLite, DuckDB optional)
+# =========================================================
+#
+# Star schema:
+#   teams     fact, 1 row = 1 duo in 1 match for 1 template set
+#             (team_rank, points, canonical build pair, + match filters)
+#   members   2 rows per team (player, build, placement, board masks)
+#   matches   match_id, game_datetime, queue_id, patch
+#   builds    (template, build_id) -> name + label used by synergy_MVP
+#   players   puuid -> riot id
+#
+# queue_id / patch / game_datetime are also on the fact table so the
+# usual filters hit one indexed table without a join.
+#
+# Loading: make_pair_summaries with STORE_PATH set, or
+#   python src/pair_store.py import data/processed/pair_summaries_SA.jsonl --template builds_set16_16.3_SA
+# Reading: pair_aggregates / build_marginals / global_mean_points give the
+# same frames synergy_MVP computes with pandas, as SQL GROUP BYs.
+
+STORE_PATH = r"C:\Users\Levi\Documents\tft_duo_project\data\processed\pair_store.sqlite"
+
+# "sqlite" (stdlib) or "duckdb" (if installed)
+BACKEND = "sqlite"
+
+# rows buffered before an executemany
+BATCH_ROWS = 5000
+
+DOUBLE_UP_QUEUE_ID = 1160
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS matches (
+        match_id TEXT PRIMARY KEY,
+        game_datetime BIGINT,
+        queue_id INTEGER,
+        patch TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS builds (
+        build_key INTEGER PRIMARY KEY,
+        template TEXT NOT NULL,
+        build_id TEXT NOT NULL,
+        build_name TEXT,
+        label TEXT NOT NULL,
+        UNIQUE (template, build_id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS players (
+        player_key INTEGER PRIMARY KEY,
+        puuid TEXT UNIQUE,
+        riot_id_game_name TEXT,
+        riot_id_tagline TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS teams (
+        template TEXT NOT NULL,
+        match_id TEXT NOT NULL,
+        team_rank INTEGER NOT NULL,
+        team_points INTEGER NOT NULL,
+        pair_key TEXT,
+        queue_id INTEGER,
+        patch TEXT,
+        game_datetime BIGINT,
+        build_a_key INTEGER NOT NULL,
+        build_b_key INTEGER NOT NULL,
+        PRIMARY KEY (template, match_id, team_rank)
+    )""",
+    """CREATE TABLE IF NOT EXISTS members (
+        template TEXT NOT NULL,
+        match_id TEXT NOT NULL,
+        team_rank INTEGER NOT NULL,
+        slot INTEGER NOT NULL,
+        player_key INTEGER,
+        build_key INTEGER NOT NULL,
+        placement INTEGER,
+        score DOUBLE,
+        matched INTEGER,
+        size INTEGER,
+        board_mask TEXT,
+        matched_mask TEXT,
+        PRIMARY KEY (template, match_id, team_rank, slot)
+    )""",
+]
+
+# created after the bulk load of a run (cheaper than maintaining them per row)
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_teams_filter ON teams (template, queue_id, patch)",
+    "CREATE INDEX IF NOT EXISTS ix_teams_datetime ON teams (game_datetime)",
+    "CREATE INDEX IF NOT EXISTS ix_teams_build_a ON teams (build_a_key)",
+    "CREATE INDEX IF NOT EXISTS ix_teams_build_b ON teams (build_b_key)",
+    "CREATE INDEX IF NOT EXISTS ix_members_build ON members (build_key)",
+    "CREATE INDEX IF NOT EXISTS ix_members_player ON members (player_key)",
+    "CREATE INDEX IF NOT EXISTS ix_builds_build_id ON builds (build_id)",
+    "CREATE INDEX IF NOT EXISTS ix_matches_patch ON matches (patch)",
+    "CREATE INDEX IF NOT EXISTS ix_matches_queue ON matches (queue_id)",
+    "CREATE INDEX IF NOT EXISTS ix_matches_datetime ON matches (game_datetime)",
+]
+
+
+def build_label(build_id, build_name) -> str:
+    """same naming as synergy_MVP.safe_get_build_name"""
+    if build_name is None or build_name == "" or str(build_name).upper() == "UNKNOWN":
+        return f"UNKNOWN({build_id if build_id is not None else 'UNKNOWN'})"
+    return str(build_name)
+
+
+def team_rank_to_points(team_rank: int) -> int:
+    return 5 - int(team_rank)
+
+
+def _mask(v) -> Optional[str]:
+    # unit bitmasks can be wider than 64 bits -> hex text
+    return None if v is None else format(int(v), "x")
+
+
+def connect(path: str, backend: str = BACKEND):
+    if backend == "duckdb":
+        try:
+            import duckdb
+        except ImportError:
+            raise RuntimeError("BACKEND = 'duckdb' but duckdb is not installed (pip install duckdb)")
+        return duckdb.connect(path)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class PairStore:
+    def __init__(self, path: str = STORE_PATH, backend: str = BACKEND):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.backend = backend
+        self.conn = connect(path, backend)
+        for stmt in SCHEMA:
+            self.conn.execute(stmt)
+
+        # dimension keys are assigned here (same inserts work on both backends)
+        self._build_keys: Dict[Tuple[str, str], int] = {
+            (t, b): k for k, t, b in self.conn.execute("SELECT build_key, template, build_id FROM builds").fetchall()
+        }
+        self._player_keys: Dict[str, int] = {
+            p: k for k, p in self.conn.execute("SELECT player_key, puuid FROM players").fetchall()
+        }
+        self._labels: Dict[int, str] = {
+            k: l for k, l in self.conn.execute("SELECT build_key, label FROM builds").fetchall()
+        }
+
+        self._loaded = False
+        self._matches: List[tuple] = []
+        self._builds: List[tuple] = []
+        self._players: List[tuple] = []
+        self._teams: List[tuple] = []
+        self._members: List[tuple] = []
+
+    # -----------------------------------------------------
+    # load
+    # -----------------------------------------------------
+
+    def begin_template(self, template: str) -> None:
+        """A run rewrites its template set completely (like the JSONL output)."""
+        self.flush()
+        self._loaded = True
+        self.conn.execute("DELETE FROM members WHERE template = ?", (template,))
+        self.conn.execute("DELETE FROM teams WHERE template = ?", (template,))
+        self.conn.commit()
+
+    def _build_key(self, template: str, build_id, build_name) -> int:
+        build_id = str(build_id if build_id is not None else "UNKNOWN")
+        key = self._build_keys.get((template, build_id))
+        if key is None:
+            key = len(self._build_keys) + 1
+            label = build_label(build_id, build_name)
+            self._build_keys[(template, build_id)] = key
+            self._labels[key] = label
+            self._builds.append((key, template, build_id, build_name, label))
+        return key
+
+    def _player_key(self, m: Dict[str, Any]) -> Optional[int]:
+        puuid = m.get("puuid")
+        if puuid is None:
+            return None
+        key = self._player_keys.get(puuid)
+        if key is None:
+            key = self._player_keys[puuid] = len(self._player_keys) + 1
+            self._players.append((key, puuid, m.get("riotIdGameName"), m.get("riotIdTagline")))
+        return key
+
+    def add(self, row: Dict[str, Any], template: str) -> None:
+        """One make_pair_summaries output row (a duo in a match)."""
+        members = row.get("members") or []
+        if len(members) != 2 or row.get("team_rank") is None:
+            return
+        match_id = row.get("match_id")
+        team_rank = int(row["team_rank"])
+
+        self._matches.append((match_id, row.get("game_datetime"), row.get("queue_id"), row.get("patch")))
+
+        keys = [self._build_key(template, m.get("build_id"), m.get("build_name")) for m in members]
+        # canonical pair on the label, like synergy_MVP.canonical_pair
+        ka, kb = keys if self._labels[keys[0]] <= self._labels[keys[1]] else keys[::-1]
+
+        self._teams.append((template, match_id, team_rank, team_rank_to_points(team_rank), row.get("pair_key"),
+                            row.get("queue_id"), row.get("patch"), row.get("game_datetime"), ka, kb))
+        for slot, (m, bk) in enumerate(zip(members, keys)):
+            self._members.append((template, match_id, team_rank, slot, self._player_key(m), bk,
+                                  m.get("placement"), m.get("score"), m.get("matched"), m.get("size"),
+                                  _mask(m.get("board_mask")), _mask(m.get("matched_mask"))))
+
+        if len(self._teams) >= BATCH_ROWS:
+            self.flush()
+
+    def flush(self) -> None:
+        c = self.conn
+        if self._builds:
+            c.executemany("INSERT OR IGNORE INTO builds VALUES (?, ?, ?, ?, ?)", self._builds)
+        if self._players:
+            c.executemany("INSERT OR IGNORE INTO players VALUES (?, ?, ?, ?)", self._players)
+        if self._matches:
+            c.executemany("INSERT OR REPLACE INTO matches VALUES (?, ?, ?, ?)", self._matches)
+        if self._teams:
+            c.executemany("INSERT OR REPLACE INTO teams VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", self._teams)
+        if self._members:
+            c.executemany("INSERT OR REPLACE INTO members VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", self._members)
+        c.commit()
+        self._matches, self._builds, self._players, self._teams, self._members = [], [], [], [], []
+
+    def finish(self) -> None:
+        self.flush()
+        for stmt in INDEXES:
+            self.conn.execute(stmt)
+        if self.backend == "sqlite":
+            self.conn.execute("ANALYZE")
+        self.conn.commit()
+
+    def close(self) -> None:
+        if self._loaded:
+            self.finish()
+        self.conn.close()
+
+    def import_jsonl(self, path: str, template: str) -> int:
+        self.begin_template(template)
+        n = 0
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    self.add(json.loads(line), template)
+                    n += 1
+        self.finish()
+        self._loaded = False
+        return n
+
+    # -----------------------------------------------------
+    # queries (synergy_MVP pushdown)
+    # -----------------------------------------------------
+
+    def _where(self, template: str, patch: Optional[str], queue_id: Optional[int],
+               since: Optional[int], until: Optional[int]) -> Tuple[str, list]:
+        cond = ["t.template = ?"]
+        args: list = [template]
+        if queue_id is not None:
+            cond.append("t.queue_id = ?")
+            args.append(queue_id)
+        if patch is not None:
+            cond.append("t.patch = ?")
+            args.append(patch)
+        if since is not None:
+            cond.append("t.game_datetime >= ?")
+            args.append(since)
+        if until is not None:
+            cond.append("t.game_datetime < ?")
+            args.append(until)
+        return " AND ".join(cond), args
+
+    def _frame(self, sql: str, args: list) -> pd.DataFrame:
+        cur = self.conn.execute(sql, args)
+        cols = [d[0] for d in cur.description]
+        return pd.DataFrame(cur.fetchall(), columns=cols)
+
+    def pair_aggregates(self, template: str, patch: Optional[str] = None, queue_id: Optional[int] = DOUBLE_UP_QUEUE_ID,
+                        since: Optional[int] = None, until: Optional[int] = None) -> pd.DataFrame:
+        """= synergy_MVP.aggregate_pairs(build_pair_dataframe(rows))"""
+        where, args = self._where(template, patch, queue_id, since, until)
+        df = self._frame(f"""
+            SELECT ba.label AS build_a, bb.label AS build_b,
+                   COUNT(*) AS games,
+                   AVG(t.team_rank * 1.0) AS avg_team_rank,
+                   AVG(t.team_points * 1.0) AS avg_team_points,
+                   AVG(CASE WHEN t.team_rank = 1 THEN 1.0 ELSE 0.0 END) AS top1,
+                   AVG(CASE WHEN t.team_rank <= 2 THEN 1.0 ELSE 0.0 END) AS top2,
+                   AVG(CASE WHEN t.team_rank <= 3 THEN 1.0 ELSE 0.0 END) AS top3
+            FROM teams t
+            JOIN builds ba ON ba.build_key = t.build_a_key
+            JOIN builds bb ON bb.build_key = t.build_b_key
+            WHERE {where}
+            GROUP BY ba.label, bb.label
+            ORDER BY ba.label, bb.label""", args)
+        df["games"] = df["games"].astype("int64")
+        return df
+
+    def build_marginals(self, template: str, patch: Optional[str] = None, queue_id: Optional[int] = DOUBLE_UP_QUEUE_ID,
+                        since: Optional[int] = None, until: Optional[int] = None) -> pd.DataFrame:
+        """= synergy_MVP.compute_build_marginals(df_pairs), a team counts for both of its builds"""
+        where, args = self._where(template, patch, queue_id, since, until)
+        df = self._frame(f"""
+            SELECT b.label AS build,
+                   COUNT(*) AS games,
+                   AVG(x.team_rank * 1.0) AS avg_team_rank,
+                   AVG(x.team_points * 1.0) AS avg_team_points,
+                   AVG(CASE WHEN x.team_rank = 1 THEN 1.0 ELSE 0.0 END) AS top1,
+                   AVG(CASE WHEN x.team_rank <= 2 THEN 1.0 ELSE 0.0 END) AS top2,
+                   AVG(CASE WHEN x.team_rank <= 3 THEN 1.0 ELSE 0.0 END) AS top3
+            FROM (
+                SELECT t.build_a_key AS build_key, t.team_rank, t.team_points FROM teams t WHERE {where}
+                UNION ALL
+                SELECT t.build_b_key AS build_key, t.team_rank, t.team_points FROM teams t WHERE {where}
+            ) x
+            JOIN builds b ON b.build_key = x.build_key
+            GROUP BY b.label
+            ORDER BY b.label""", args + args)
+        df["games"] = df["games"].astype("int64")
+        return df
+
+    def global_mean_points(self, template: str, patch: Optional[str] = None, queue_id: Optional[int] = DOUBLE_UP_QUEUE_ID,
+                           since: Optional[int] = None, until: Optional[int] = None) -> Optional[float]:
+        where, args = self._where(template, patch, queue_id, since, until)
+        row = self.conn.execute(f"SELECT AVG(t.team_points * 1.0), COUNT(*) FROM teams t WHERE {where}", args).fetchone()
+        return float(row[0]) if row and row[1] else None
+
+    def templates(self) -> List[Tuple[str, int]]:
+        return [tuple(r) for r in self.conn.execute(
+            "SELECT template, COUNT(*) FROM teams GROUP BY template ORDER BY template").fetchall()]
+
+    def query(self, sql: str, args: Iterable = ()) -> pd.DataFrame:
+        """ad hoc SQL -> DataFrame"""
+        return self._frame(sql, list(args))
+
+
+# =========================================================
+# 1) MAIN
+# =========================================================
+
+def main():
+    ap = argparse.ArgumentParser(description="Pair summary store (SQLite / DuckDB).")
+    ap.add_argument("--store", default=STORE_PATH)
+    ap.add_argument("--backend", default=BACKEND, choices=["sqlite", "duckdb"])
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    imp = sub.add_parser("import", help="load a pair_summaries JSONL")
+    imp.add_argument("jsonl")
+    imp.add_argument("--template", help="template set name (default: file name)")
+
+    sub.add_parser("info", help="rows per template set")
+
+    q = sub.add_parser("sql", help="run a query, print the result")
+    q.add_argument("query")
+
+    args = ap.parse_args()
+    store = PairStore(args.store, args.backend)
+
+    if args.cmd == "import":
+        template = args.template or os.path.splitext(os.path.basename(args.jsonl))[0]
+        n = store.import_jsonl(args.jsonl, template)
+        print(f"[STORE] {n} rows from {args.jsonl} -> {args.store} (template {template})")
+    elif args.cmd == "info":
+        for template, n in store.templates():
+            print(f"  {template:<40} {n} teams")
+    elif args.cmd == "sql":
+        with pd.option_context("display.max_rows", 200, "display.width", 200):
+            print(store.query(args.query))
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+import argparse
+import itertools
+import json
+import os
+import time
+import zlib
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.stats import kendalltau
+
+from synergy_MVP import EB_M, MIN_GAMES, PAIR_FILE, W_TOP1, W_TOP2, aggregate_pairs, build_pair_dataframe, \
+    compute_build_marginals, read_jsonl
+
+# =========================================================
+# 0) Scoring parameter sweep
+# =========================================================
+#
+# EB_M, MIN_GAMES and the log-lift weights (W_TOP2 / W_TOP1) of
+# synergy_score are plain constants in synergy_MVP. This script scores the
+# whole grid of (eb_m, min_games, w_top2, w_top1) settings at once:
+#
+#   1) the matches are split into train / holdout (newest HOLDOUT_SHARE by
+#      game_datetime, or a match_id hash)
+#   2) train: per pair games, mean points, log-lifts vs the marginals; the
+#      log-lifts don't depend on any parameter, so score_pair over the grid
+#      is one broadcast: (eb_m, w_top2, w_top1, pair)
+#   3) holdout accuracy: for every two teams of a holdout match, does the
+#      higher train synergy_score belong to the better placed team? (ties
+#      count half, both pairs need >= min_games train games). One matrix
+#      product for every setting.
+#   4) stability: Kendall tau of the pair ranking against the neighbouring
+#      setting on the eb_m / w_top2 / w_top1 axes, top-K overlap against
+#      every neighbour (a min_games step only drops pairs, the order of the
+#      rest can't change)
+#   5) topk_holdout_points: holdout team points of the train top-K pairs
+#
+# Output: sweep_results.csv (one row per setting, best holdout_acc first)
+# and sweep_summary.json (best + current setting).
+
+OUT_DIR = r"C:\Users\Levi\Documents\tft_duo_project\output\param_sweep"
+
+GRID_EB_M = (25, 50, 100, 200, 400, 800)
+GRID_MIN_GAMES = (10, 20, 30, 50, 100)
+GRID_W_TOP2 = (0.0, 0.15, 0.30, 0.45, 0.60)
+GRID_W_TOP1 = (0.0, 0.075, 0.15, 0.30)
+
+HOLDOUT_SHARE = 0.2
+TOP_K = 20
+
+
+# =========================================================
+# 1) SPLIT + ARRAYS
+# =========================================================
+
+def split_holdout(df_pairs: pd.DataFrame, share: float = HOLDOUT_SHARE, how: str = "time") -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """whole matches go to one side"""
+    matches = df_pairs.drop_duplicates("match_id")[["match_id", "game_datetime"]]
+    if how == "time":
+        matches = matches.sort_values(["game_datetime", "match_id"])
+        test_ids = set(matches["match_id"].iloc[len(matches) - int(round(len(matches) * share)):])
+    else:
+        cut = int(share * 1000)
+        test_ids = {m for m in matches["match_id"] if zlib.crc32(str(m).encode("utf-8")) % 1000 < cut}
+    is_test = df_pairs["match_id"].isin(test_ids)
+    return df_pairs[~is_test], df_pairs[is_test]
+
+
+def _log_lift(obs: np.ndarray, pa: np.ndarray, pb: np.ndarray) -> np.ndarray:
+    """score_pair's log-lift, NaN (no expectation / zero lift) -> 0 as in synergy_score"""
+    exp = np.clip(pa, 0.0, 1.0) * np.clip(pb, 0.0, 1.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        lift = np.where(exp > 1e-9, np.clip(obs, 0.0, 1.0) / exp, np.nan)
+        llt = np.where(lift > 1e-12, np.log(lift), np.nan)
+    return np.nan_to_num(llt, nan=0.0)
+
+
+def train_arrays(df_train: pd.DataFrame) -> Dict[str, Any]:
+    """per pair inputs of score_pair, from synergy_MVP's aggregate_pairs + compute_build_marginals"""
+    g = aggregate_pairs(df_train)
+    marg = compute_build_marginals(df_train).set_index("build")
+    ma = marg.reindex(g["build_a"])
+    mb = marg.reindex(g["build_b"])
+    return {
+        "pairs": g,
+        "n": g["games"].to_numpy(np.float64),
+        "mean": g["avg_team_points"].to_numpy(np.float64),
+        "l2": _log_lift(g["top2"].to_numpy(), ma["top2"].to_numpy(), mb["top2"].to_numpy()),
+        "l1": _log_lift(g["top1"].to_numpy(), ma["top1"].to_numpy(), mb["top1"].to_numpy()),
+        "global_mean": float(df_train["team_points"].mean()),
+    }
+
+
+def score_grid(tr: Dict[str, Any], eb_ms: Sequence[float], w_top2s: Sequence[float], w_top1s: Sequence[float]) -> np.ndarray:
+    """synergy_score of every pair for every setting -> (eb_m, w_top2, w_top1, pair)"""
+    n, mean, gm = tr["n"], tr["mean"], tr["global_mean"]
+    m = np.asarray(eb_ms, dtype=np.float64)[:, None]
+    eb = (n * mean + m * gm) / (n + m)
+    sample_factor = np.sqrt(n) / np.sqrt(n + m)
+    w2 = np.asarray(w_top2s, dtype=np.float64)[None, :, None, None]
+    w1 = np.asarray(w_top1s, dtype=np.float64)[None, None, :, None]
+    return (eb[:, None, None, :] + w2 * tr["l2"] + w1 * tr["l1"]) * sample_factor[:, None, None, :]
+
+
+def holdout_comparisons(df_test: pd.DataFrame, pair_ids: Dict[Tuple[str, str], int]) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    -> (better team's pair, worse team's pair, all team comparisons)
+    for every two teams of a holdout match whose pairs were seen in train.
+    """
+    t = pd.DataFrame({
+        "match_id": df_test["match_id"].to_numpy(),
+        "pair": [pair_ids.get(k, -1) for k in zip(df_test["build_a"], df_test["build_b"])],
+        "team_rank": df_test["team_rank"].to_numpy(),
+    })
+    c = t.merge(t, on="match_id")
+    c = c[c["team_rank_x"] < c["team_rank_y"]]
+    total = len(c)
+    # unseen pairs have no score, the same pair on both teams can't be told apart
+    c = c[(c["pair_x"] >= 0) & (c["pair_y"] >= 0) & (c["pair_x"] != c["pair_y"])]
+    return c["pair_x"].to_numpy(), c["pair_y"].to_numpy(), total
+
+
+# =========================================================
+# 2) SWEEP
+# =========================================================
+
+def sweep(df_train: pd.DataFrame, df_test: pd.DataFrame, eb_ms: Sequence[float], min_games: Sequence[int],
+          w_top2s: Sequence[float], w_top1s: Sequence[float], top_k: int = TOP_K) -> pd.DataFrame:
+    eb_ms, min_games = sorted(eb_ms), sorted(min_games)
+    w_top2s, w_top1s = sorted(w_top2s), sorted(w_top1s)
+
+    tr = train_arrays(df_train)
+    g = tr["pairs"]
+    n_pairs = len(g)
+    pair_ids = {k: i for i, k in enumerate(zip(g["build_a"], g["build_b"]))}
+
+    shape = (len(eb_ms), len(w_top2s), len(w_top1s))
+    S = score_grid(tr, eb_ms, w_top2s, w_top1s).reshape(-1, n_pairs)  # (settings, pairs)
+
+    # holdout accuracy for every (score setting, min_games) in one product
+    better, worse, total_cmp = holdout_comparisons(df_test, pair_ids)
+    elig = tr["n"][None, :] >= np.asarray(min_games, dtype=np.float64)[:, None]  # (min_games, pairs)
+    valid = (elig[:, better] & elig[:, worse]).astype(np.float64)               # (min_games, comparisons)
+    d = S[:, better] - S[:, worse]
+    right = (d > 0) + 0.5 * (d == 0)                                             # (settings, comparisons)
+    n_valid = valid.sum(axis=1)
+    with np.errstate(invalid="ignore"):
+        acc = (right @ valid.T) / n_valid                                        # (settings, min_games)
+
+    # holdout points per pair
+    test_pair = np.array([pair_ids.get(k, -1) for k in zip(df_test["build_a"], df_test["build_b"])], dtype=np.int64)
+    seen = test_pair >= 0
+    test_n = np.bincount(test_pair[seen], minlength=n_pairs)
+    test_pts = np.bincount(test_pair[seen], weights=df_test["team_points"].to_numpy()[seen], minlength=n_pairs)
+
+    # rankings: one argsort per score setting, min_games only filters it
+    order = np.argsort(-S, axis=1, kind="stable")
+    ranked = {}
+    for c in range(S.shape[0]):
+        for j in range(len(min_games)):
+            o = order[c, elig[j][order[c]]]
+            ranked[(c, j)] = o
+
+    def topk(c: int, j: int) -> np.ndarray:
+        return ranked[(c, j)][:top_k]
+
+    # neighbours: one step up on each axis -> (tau, overlap) per edge
+    taus: Dict[Tuple[int, int], List[float]] = {}
+    overlaps: Dict[Tuple[int, int], List[float]] = {}
+    idx = np.arange(S.shape[0]).reshape(shape)
+    for e, w2, w1 in itertools.product(*(range(s) for s in shape)):
+        c = int(idx[e, w2, w1])
+        for j in range(len(min_games)):
+            # score axes: same pairs, the order can move
+            for nb in ((e + 1, w2, w1), (e, w2 + 1, w1), (e, w2, w1 + 1)):
+                if any(x >= s for x, s in zip(nb, shape)):
+                    continue
+                c2 = int(idx[nb])
+                mask = elig[j]
+                tau = kendalltau(S[c, mask], S[c2, mask])[0] if mask.sum() > 1 else np.nan
+                ov = len(np.intersect1d(topk(c, j), topk(c2, j))) / max(1, min(top_k, int(mask.sum())))
+                for key in ((c, j), (c2, j)):
+                    taus.setdefault(key, []).append(tau)
+                    overlaps.setdefault(key, []).append(ov)
+            # min_games axis: the same order, fewer pairs
+            if j + 1 < len(min_games):
+                kk = max(1, min(top_k, int(elig[j + 1].sum())))
+                ov = len(np.intersect1d(topk(c, j), topk(c, j + 1))) / kk
+                for key in ((c, j), (c, j + 1)):
+                    overlaps.setdefault(key, []).append(ov)
+
+    rows = []
+    for (e, w2, w1), j in itertools.product(itertools.product(*(range(s) for s in shape)), range(len(min_games))):
+        c = int(idx[e, w2, w1])
+        top = topk(c, j)
+        top = top[test_n[top] > 0]
+        rows.append({
+            "eb_m": eb_ms[e],
+            "min_games": min_games[j],
+            "w_top2": w_top2s[w2],
+            "w_top1": w_top1s[w1],
+            "pairs_ranked": int(elig[j].sum()),
+            "holdout_acc": float(acc[c, j]),
+            "holdout_comparisons": int(n_valid[j]),
+            "holdout_coverage": n_valid[j] / total_cmp if total_cmp else np.nan,
+            "topk_holdout_points": float(test_pts[top].sum() / test_n[top].sum()) if len(top) else np.nan,
+            "tau_neighbors": float(np.nanmean(taus[(c, j)])) if taus.get((c, j)) else np.nan,
+            "topk_overlap": float(np.mean(overlaps[(c, j)])) if overlaps.get((c, j)) else np.nan,
+        })
+    df = pd.DataFrame(rows)
+    df["is_current"] = ((df["eb_m"] == EB_M) & (df["min_games"] == MIN_GAMES)
+                        & np.isclose(df["w_top2"], W_TOP2) & np.isclose(df["w_top1"], W_TOP1))
+    return df.sort_values(["holdout_acc", "tau_neighbors"], ascending=False).reset_index(drop=True)
+
+
+# =========================================================
+# 3) MAIN
+# =========================================================
+
+def _plain(r: Dict[str, Any]) -> Dict[str, Any]:
+    # numpy scalars -> json, NaN -> null
+    out = {k: (v.item() if hasattr(v, "item") else v) for k, v in r.items()}
+    return {k: (None if isinstance(v, float) and v != v else v) for k, v in out.items()}
+
+
+def _fmt(r: Dict[str, Any], top_k: int) -> str:
+    return (f"eb_m={r['eb_m']:<5g} min_games={r['min_games']:<4} w_top2={r['w_top2']:<5g} w_top1={r['w_top1']:<6g} "
+            f"acc={r['holdout_acc']:.4f} cov={r['holdout_coverage']:.2f} tau={r['tau_neighbors']:.3f} "
+            f"overlap={r['topk_overlap']:.2f} top{top_k}_pts={r['topk_holdout_points']:.3f}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Sweep EB_M / MIN_GAMES / synergy_score weights against a holdout split.")
+    ap.add_argument("--pairs", default=PAIR_FILE)
+    ap.add_argument("--out-dir", default=OUT_DIR)
+    ap.add_argument("--eb-m", type=float, nargs="+", default=list(GRID_EB_M))
+    ap.add_argument("--min-games", type=int, nargs="+", default=list(GRID_MIN_GAMES))
+    ap.add_argument("--w-top2", type=float, nargs="+", default=list(GRID_W_TOP2))
+    ap.add_argument("--w-top1", type=float, nargs="+", default=list(GRID_W_TOP1))
+    ap.add_argument("--holdout", type=float, default=HOLDOUT_SHARE, help="share of matches held out")
+    ap.add_argument("--split", choices=["time", "hash"], default="time",
+                    help="time: newest matches held out, hash: match_id hash")
+    ap.add_argument("--top-k", type=int, default=TOP_K)
+    args = ap.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    t0 = time.perf_counter()
+    df_pairs = build_pair_dataframe(read_jsonl(args.pairs))
+    if df_pairs.empty:
+        print("[ERROR] Empty df_pairs – something is not right.")
+        return
+    df_train, df_test = split_holdout(df_pairs, args.holdout, args.split)
+    t1 = time.perf_counter()
+    print(f"[LOAD] {len(df_pairs)} teams, train={len(df_train)} holdout={len(df_test)} ({t1 - t0:.2f}s)")
+
+    df = sweep(df_train, df_test, args.eb_m, args.min_games, args.w_top2, args.w_top1, args.top_k)
+    t2 = time.perf_counter()
+    print(f"[SWEEP] {len(df)} settings ({t2 - t1:.2f}s)")
+
+    df.to_csv(os.path.join(args.out_dir, "sweep_results.csv"), index=False, encoding="utf-8-sig")
+    best = df.iloc[0].to_dict()
+    cur = df[df["is_current"]]
+    summary = {
+        "pairs": args.pairs,
+        "split": args.split,
+        "holdout_share": args.holdout,
+        "train_teams": len(df_train),
+        "holdout_teams": len(df_test),
+        "settings": len(df),
+        "sweep_seconds": round(t2 - t1, 3),
+        "best": _plain(best),
+        "current": _plain(cur.iloc[0].to_dict()) if len(cur) else None,
+    }
+    with open(os.path.join(args.out_dir, "sweep_summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+
+    print("[TOP]")
+    for r in df.head(10).to_dict(orient="records"):
+        print("  " + _fmt(r, args.top_k))
+    if len(cur):
+        print(f"[CURRENT] rank {int(cur.index[0]) + 1}/{len(df)}")
+        print("  " + _fmt(cur.iloc[0].to_dict(), args.top_k))
+    print(f"[DONE] -> {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
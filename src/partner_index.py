@@ -0,0 +1,371 @@
+import bisect
+import json
+import math
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from synergy_MVP import EB_M, score_pair, team_rank_to_points
+
+# =========================================================
+# 0) Per-build partner index (incremental)
+# =========================================================
+#
+# For every build and metric a sorted array of its partners, so "top
+# partners of X" is a slice instead of a sort of the whole pair table.
+#
+# The index keeps the sufficient statistics behind compute_pair_synergies
+# (per pair: games, rank sum, point sum, top1/2/3 counts; per build: the
+# same for the marginals; global point sum), so new games can be added
+# without going back to the pair summaries:
+#   - the pair's own row and every pair touching build a or b is rescored
+#     (their lift uses a's / b's marginals) and moved in the sorted arrays
+#   - eb_points of the other pairs depend on the global mean only, they are
+#     rescored when it drifted more than GLOBAL_MEAN_TOLERANCE since the
+#     last full rescore
+#
+# Saved as partner_index.json next to the synergy CSVs.
+
+INDEX_FILE = "partner_index.json"
+INDEX_VERSION = 1
+
+METRICS = ("synergy_score", "eb_points", "lift_top2", "top2")
+
+# metrics ranked ascending (every other one: higher is better)
+LOWER_IS_BETTER = {"avg_team_rank"}
+
+# global mean shift (in team points) that triggers a full rescore
+GLOBAL_MEAN_TOLERANCE = 1e-3
+
+
+def _stats() -> Dict[str, float]:
+    return {"games": 0, "sum_rank": 0, "sum_points": 0, "top1": 0, "top2": 0, "top3": 0}
+
+
+def _add(st: Dict[str, float], team_rank: int, k: int = 1) -> None:
+    st["games"] += k
+    st["sum_rank"] += k * team_rank
+    st["sum_points"] += k * team_rank_to_points(team_rank)
+    st["top1"] += k * (team_rank == 1)
+    st["top2"] += k * (team_rank <= 2)
+    st["top3"] += k * (team_rank <= 3)
+
+
+def _rates(st: Dict[str, float]) -> Dict[str, float]:
+    n = st["games"]
+    return {
+        "games": n,
+        "avg_team_rank": st["sum_rank"] / n,
+        "avg_team_points": st["sum_points"] / n,
+        "top1": st["top1"] / n,
+        "top2": st["top2"] / n,
+        "top3": st["top3"] / n,
+    }
+
+
+def _from_rates(row: Dict[str, Any]) -> Dict[str, float]:
+    """compute_pair_synergies / compute_build_marginals row -> counts"""
+    n = int(row["games"])
+    return {
+        "games": n,
+        "sum_rank": int(round(float(row["avg_team_rank"]) * n)),
+        "sum_points": int(round(float(row["avg_team_points"]) * n)),
+        "top1": int(round(float(row["top1"]) * n)),
+        "top2": int(round(float(row["top2"]) * n)),
+        "top3": int(round(float(row["top3"]) * n)),
+    }
+
+
+def _sort_key(value: Optional[float], tie, higher: bool = True) -> Tuple:
+    # best first, missing (NaN) last, ties by partner name (pairs: by (a, b))
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return (1, 0.0, tie)
+    return (0, -value if higher else value, tie)
+
+
+class PartnerIndex:
+    def __init__(self, metrics: Iterable[str] = METRICS):
+        self.metrics = tuple(metrics)
+        self.pairs: Dict[Tuple[str, str], Dict[str, float]] = {}
+        self.builds: Dict[str, Dict[str, float]] = {}
+        self.total_games = 0
+        self.total_points = 0
+
+        # (a, b) -> metric values of the pair
+        self.values: Dict[Tuple[str, str], Dict[str, float]] = {}
+        # build -> metric -> sorted [(key, partner)]
+        self.sorted: Dict[str, Dict[str, List[Tuple]]] = {}
+        # build -> partners
+        self.partners_of: Dict[str, set] = {}
+        # metric -> all pairs sorted [(key, (a, b))], built on the first top_pairs() after a change
+        self._top: Dict[str, List[Tuple]] = {}
+
+        self._scored_mean: Optional[float] = None
+
+    # -----------------------------------------------------
+    # build
+    # -----------------------------------------------------
+
+    @classmethod
+    def from_synergy(cls, df_syn: pd.DataFrame, df_marg: pd.DataFrame, metrics: Iterable[str] = METRICS) -> "PartnerIndex":
+        """From the outputs of compute_pair_synergies + compute_build_marginals."""
+        idx = cls(metrics)
+        for r in df_marg.to_dict(orient="records"):
+            st = _from_rates(r)
+            idx.builds[str(r["build"])] = st
+            idx.total_games += st["games"]
+            idx.total_points += st["sum_points"]
+        # marginals count every pair twice (once per build)
+        idx.total_games //= 2
+        idx.total_points //= 2
+
+        for r in df_syn.to_dict(orient="records"):
+            key = (str(r["build_a"]), str(r["build_b"]))
+            idx.pairs[key] = _from_rates(r)
+            idx._link(*key)
+        idx.rescore_all()
+        return idx
+
+    @classmethod
+    def from_pairs(cls, df_pairs: pd.DataFrame, metrics: Iterable[str] = METRICS) -> "PartnerIndex":
+        """From build_pair_dataframe output (one row per team)."""
+        idx = cls(metrics)
+        idx.add_games(zip(df_pairs["build_a"], df_pairs["build_b"], df_pairs["team_rank"]), rescore=False)
+        idx.rescore_all()
+        return idx
+
+    def _link(self, a: str, b: str) -> None:
+        self.partners_of.setdefault(a, set()).add(b)
+        self.partners_of.setdefault(b, set()).add(a)
+
+    # -----------------------------------------------------
+    # scoring
+    # -----------------------------------------------------
+
+    @property
+    def global_mean(self) -> float:
+        return self.total_points / self.total_games if self.total_games else 0.0
+
+    def _score(self, key: Tuple[str, str]) -> Dict[str, float]:
+        a, b = key
+        st = self.pairs[key]
+        rates = _rates(st)
+        ma = _rates(self.builds[a])
+        mb = _rates(self.builds[b])
+        vals = score_pair(st["games"], rates["avg_team_points"], rates["top1"], rates["top2"], ma, mb, self.global_mean)
+        vals.update(rates)
+        return vals
+
+    def _place(self, key: Tuple[str, str], vals: Dict[str, float]) -> None:
+        """(re)insert the pair into both builds' sorted arrays"""
+        old = self.values.get(key)
+        a, b = key
+        for build, partner in ((a, b), (b, a)) if a != b else ((a, b),):
+            per_metric = self.sorted.setdefault(build, {m: [] for m in self.metrics})
+            for m in self.metrics:
+                arr = per_metric[m]
+                higher = m not in LOWER_IS_BETTER
+                if old is not None:
+                    item = (_sort_key(old.get(m), partner, higher), partner)
+                    i = bisect.bisect_left(arr, item)
+                    if i < len(arr) and arr[i] == item:
+                        del arr[i]
+                bisect.insort(arr, (_sort_key(vals.get(m), partner, higher), partner))
+        self.values[key] = vals
+        self._top.clear()
+
+    def rescore(self, keys: Iterable[Tuple[str, str]]) -> None:
+        for key in keys:
+            self._place(key, self._score(key))
+
+    def rescore_all(self) -> None:
+        self.sorted = {}
+        self.values = {}
+        self._top = {}
+        for key in self.pairs:
+            self._place(key, self._score(key))
+        self._scored_mean = self.global_mean
+
+    # -----------------------------------------------------
+    # incremental updates
+    # -----------------------------------------------------
+
+    def add_games(self, games: Iterable[Tuple[str, str, int]], rescore: bool = True) -> int:
+        """
+        games: (build_a, build_b, team_rank) per team, same as build_pair_dataframe rows.
+        Returns the number of pairs rescored.
+        """
+        touched = set()
+        n = 0
+        for a, b, team_rank in games:
+            a, b = (a, b) if a <= b else (b, a)
+            team_rank = int(team_rank)
+            key = (a, b)
+            st = self.pairs.get(key)
+            if st is None:
+                st = self.pairs[key] = _stats()
+                self._link(a, b)
+            _add(st, team_rank)
+            for build in (a, b):
+                bst = self.builds.get(build)
+                if bst is None:
+                    bst = self.builds[build] = _stats()
+                _add(bst, team_rank)
+            self.total_games += 1
+            self.total_points += team_rank_to_points(team_rank)
+            touched.add(a)
+            touched.add(b)
+            n += 1
+
+        if not rescore or not n:
+            return 0
+
+        if self._scored_mean is None or abs(self.global_mean - self._scored_mean) > GLOBAL_MEAN_TOLERANCE:
+            self.rescore_all()
+            return len(self.pairs)
+
+        keys = set()
+        for build in touched:
+            for partner in self.partners_of.get(build, ()):
+                keys.add((build, partner) if build <= partner else (partner, build))
+        self.rescore(keys)
+        return len(keys)
+
+    # -----------------------------------------------------
+    # queries
+    # -----------------------------------------------------
+
+    def top(self, build: str, metric: str = "synergy_score", k: int = 10, min_games: int = 0) -> List[Dict[str, Any]]:
+        """Best partners of `build` by `metric`, each the pair's values + "partner"."""
+        out = []
+        for _, partner in self.sorted.get(build, {}).get(metric, ()):
+            key = (build, partner) if build <= partner else (partner, build)
+            vals = self.values[key]
+            if vals["games"] < min_games:
+                continue
+            row = {"build_a": key[0], "build_b": key[1], "partner": partner}
+            row.update(vals)
+            out.append(row)
+            if len(out) >= k:
+                break
+        return out
+
+    def top_pairs(self, metric: str = "synergy_score", k: int = 10, min_games: int = 0) -> List[Dict[str, Any]]:
+        """Best pairs overall by `metric` (same order as the per-build arrays), each build_a, build_b + values."""
+        arr = self._top.get(metric)
+        if arr is None:
+            higher = metric not in LOWER_IS_BETTER
+            arr = self._top[metric] = sorted((_sort_key(v.get(metric), key, higher), key)
+                                             for key, v in self.values.items())
+        out = []
+        for _, key in arr:
+            vals = self.values[key]
+            if vals["games"] < min_games:
+                continue
+            row = {"build_a": key[0], "build_b": key[1]}
+            row.update(vals)
+            out.append(row)
+            if len(out) >= k:
+                break
+        return out
+
+    def pair(self, a: str, b: str) -> Optional[Dict[str, Any]]:
+        key = (a, b) if a <= b else (b, a)
+        vals = self.values.get(key)
+        if vals is None:
+            return None
+        row = {"build_a": key[0], "build_b": key[1]}
+        row.update(vals)
+        return row
+
+    def to_frames(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        -> (pair synergies, build marginals) with the columns of
+        compute_pair_synergies / compute_build_marginals.
+        """
+        pair_cols = ["build_a", "build_b", "games", "avg_team_rank", "avg_team_points", "top1", "top2", "top3",
+                     "eb_points", "lift_top2", "lift_top1", "log_lift_top2", "log_lift_top1", "synergy_score"]
+        rows = []
+        for (a, b), vals in self.values.items():
+            row = {"build_a": a, "build_b": b}
+            row.update(vals)
+            rows.append(row)
+        df_syn = pd.DataFrame(rows, columns=pair_cols)
+
+        marg_cols = ["build", "games", "avg_team_rank", "avg_team_points", "top1", "top2", "top3"]
+        df_marg = pd.DataFrame([dict(build=b, **_rates(st)) for b, st in self.builds.items() if st["games"]],
+                               columns=marg_cols)
+        return df_syn, df_marg
+
+    # -----------------------------------------------------
+    # save / load
+    # -----------------------------------------------------
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": INDEX_VERSION,
+            "eb_m": EB_M,
+            "metrics": list(self.metrics),
+            "total_games": self.total_games,
+            "total_points": self.total_points,
+            "builds": self.builds,
+            "pairs": [[a, b, st] for (a, b), st in self.pairs.items()],
+            # presorted partner lists -> loading needs no sorting or scoring
+            "sorted": {
+                build: {m: [[partner, self.values[(build, partner) if build <= partner else (partner, build)].get(m)]
+                            for _, partner in arr]
+                        for m, arr in per_metric.items()}
+                for build, per_metric in self.sorted.items()
+            },
+            "values": [[a, b, v] for (a, b), v in self.values.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "PartnerIndex":
+        if d.get("version") != INDEX_VERSION:
+            raise ValueError(f"partner index version {d.get('version')} != {INDEX_VERSION}")
+        idx = cls(d["metrics"])
+        idx.total_games = d["total_games"]
+        idx.total_points = d["total_points"]
+        idx.builds = d["builds"]
+        for a, b, st in d["pairs"]:
+            idx.pairs[(a, b)] = st
+            idx._link(a, b)
+        for a, b, v in d["values"]:
+            idx.values[(a, b)] = {k: (math.nan if x is None else x) for k, x in v.items()}
+        idx.sorted = {
+            build: {m: [(_sort_key(val, partner, m not in LOWER_IS_BETTER), partner) for partner, val in lst]
+                    for m, lst in per_metric.items()}
+            for build, per_metric in d["sorted"].items()
+        }
+        idx._scored_mean = idx.global_mean
+        if d.get("eb_m") != EB_M:
+            # scored with another shrink parameter
+            idx.rescore_all()
+        return idx
+
+    def save(self, path: str) -> None:
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(_nan_to_none(self.to_dict()), f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "PartnerIndex":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+def _nan_to_none(obj):
+    if isinstance(obj, float):
+        return None if math.isnan(obj) else obj
+    if isinstance(obj, dict):
+        return {k: _nan_to_none(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_nan_to_none(v) for v in obj]
+    return obj
+
+
+def index_path(out_dir: str) -> str:
+    return os.path.join(out_dir, INDEX_FILE)
@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+import cProfile
+import functools
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+try:
+    import resource  # not on Windows
+except ImportError:
+    resource = None
+
+# =========================================================
+# 0) Opt-in profiling (off by default, zero cost when off)
+# =========================================================
+#
+# Environment switches:
+#   TFT_PROFILE=1               stage + section timers, report JSON per run
+#   TFT_PROFILE_MEMORY=1        tracemalloc peak per stage (slows the run down)
+#   TFT_PROFILE_CPROFILE=1      cProfile dump (.prof) next to the report
+#   TFT_PROFILE_PYINSTRUMENT=1  pyinstrument HTML next to the report (if installed)
+#   TFT_PROFILE_DIR=...         report folder (default below)
+#
+# Usage in a script:
+#   PROF.start("make_pair_summaries")
+#   with PROF.stage("load"): ...           # coarse steps, wall/cpu/peak memory
+#   with PROF.section("json_load"): ...    # hot spots inside loops, accumulated
+#   @profiled("identify_build")            # per-function accumulated timers
+#   PROF.finish()                          # writes the report
+
+REPORT_DIR = r"C:\Users\Levi\Documents\tft_duo_project\data\reports\profile"
+
+
+def _env_flag(name: str) -> bool:
+    return os.getenv(name, "").strip().lower() not in ("", "0", "false", "no")
+
+
+def _max_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux: KiB, macOS: bytes
+    return round(rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024, 2)
+
+
+class _Acc:
+    __slots__ = ("calls", "wall", "cpu")
+
+    def __init__(self):
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "wall_seconds": round(self.wall, 6),
+            "cpu_seconds": round(self.cpu, 6),
+            "wall_per_call_us": round(self.wall / self.calls * 1e6, 3) if self.calls else None,
+        }
+
+
+class Profiler:
+    def __init__(self, enabled: bool = False, memory: bool = False, cprofile: bool = False,
+                 pyinstrument: bool = False, report_dir: str = REPORT_DIR):
+        self.enabled = enabled
+        self.memory = memory and enabled
+        self.cprofile = cprofile and enabled
+        self.pyinstrument = pyinstrument and enabled
+        self.report_dir = report_dir
+
+        self.run_name: Optional[str] = None
+        self.meta: Dict[str, Any] = {}
+        self.stages: List[Dict[str, Any]] = []
+        self.sections: Dict[str, _Acc] = {}
+
+        self._t0 = 0.0
+        self._c0 = 0.0
+        self._started_at = None
+        self._cprof = None
+        self._pyinst = None
+
+    @classmethod
+    def from_env(cls) -> "Profiler":
+        return cls(
+            enabled=_env_flag("TFT_PROFILE"),
+            memory=_env_flag("TFT_PROFILE_MEMORY"),
+            cprofile=_env_flag("TFT_PROFILE_CPROFILE"),
+            pyinstrument=_env_flag("TFT_PROFILE_PYINSTRUMENT"),
+            report_dir=os.getenv("TFT_PROFILE_DIR") or REPORT_DIR,
+        )
+
+    # -----------------------------------------------------
+    # run
+    # -----------------------------------------------------
+
+    def start(self, run_name: str, **meta) -> None:
+        if not self.enabled:
+            return
+        self.run_name = run_name
+        self.meta = dict(meta)
+        self.stages = []
+        self.sections = {}
+        self._started_at = datetime.now()
+        self._t0 = time.perf_counter()
+        self._c0 = time.process_time()
+
+        if self.memory:
+            tracemalloc.start()
+        if self.cprofile:
+            self._cprof = cProfile.Profile()
+            self._cprof.enable()
+        if self.pyinstrument:
+            try:
+                from pyinstrument import Profiler as _PyInst
+                self._pyinst = _PyInst()
+                self._pyinst.start()
+            except ImportError:
+                print("[PROFILE] pyinstrument not installed, skipping")
+                self._pyinst = None
+
+    def finish(self, **meta) -> Optional[str]:
+        """Write the report, return its path."""
+        if not self.enabled or self.run_name is None:
+            return None
+        self.meta.update(meta)
+
+        wall = time.perf_counter() - self._t0
+        cpu = time.process_time() - self._c0
+
+        stamp = self._started_at.strftime("%Y%m%d_%H%M%S")
+        base_name = f"profile_{self.run_name}_{stamp}"
+        os.makedirs(self.report_dir, exist_ok=True)
+
+        files = {}
+        if self._cprof is not None:
+            self._cprof.disable()
+            p = os.path.join(self.report_dir, base_name + ".prof")
+            self._cprof.dump_stats(p)
+            files["cprofile"] = p
+            self._cprof = None
+        if self._pyinst is not None:
+            self._pyinst.stop()
+            p = os.path.join(self.report_dir, base_name + ".html")
+            with open(p, "w", encoding="utf-8") as f:
+                f.write(self._pyinst.output_html())
+            files["pyinstrument"] = p
+            self._pyinst = None
+
+        peak_mb = None
+        if self.memory:
+            peak_mb = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 3)
+            tracemalloc.stop()
+
+        report = {
+            "run": self.run_name,
+            "started_at": self._started_at.isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "argv": sys.argv,
+            "meta": self.meta,
+            "total": {
+                "wall_seconds": round(wall, 6),
+                "cpu_seconds": round(cpu, 6),
+                "peak_traced_mb": peak_mb,
+                "max_rss_mb": _max_rss_mb(),
+            },
+            "stages": self.stages,
+            "sections": {k: v.to_dict() for k, v in sorted(self.sections.items(), key=lambda x: -x[1].wall)},
+            "files": files,
+        }
+
+        path = os.path.join(self.report_dir, base_name + ".json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+        print(f"[PROFILE] report: {path}")
+        for st in self.stages:
+            print(f"  {st['name']:<28} wall={st['wall_seconds']:>9.3f}s  cpu={st['cpu_seconds']:>9.3f}s")
+        self.run_name = None
+        return path
+
+    # -----------------------------------------------------
+    # timers
+    # -----------------------------------------------------
+
+    @contextmanager
+    def _stage(self, name: str):
+        if self.memory:
+            tracemalloc.reset_peak()
+            mem0 = tracemalloc.get_traced_memory()[0]
+        t0 = time.perf_counter()
+        c0 = time.process_time()
+        try:
+            yield
+        finally:
+            rec = {
+                "name": name,
+                "wall_seconds": round(time.perf_counter() - t0, 6),
+                "cpu_seconds": round(time.process_time() - c0, 6),
+                "max_rss_mb": _max_rss_mb(),
+            }
+            if self.memory:
+                cur, peak = tracemalloc.get_traced_memory()
+                rec["peak_traced_mb"] = round(peak / (1024 * 1024), 3)
+                rec["delta_traced_mb"] = round((cur - mem0) / (1024 * 1024), 3)
+            self.stages.append(rec)
+
+    def stage(self, name: str):
+        """Coarse step of a run (wall, cpu, peak memory)."""
+        if not self.enabled:
+            return nullcontext()
+        return self._stage(name)
+
+    @contextmanager
+    def _section(self, name: str):
+        acc = self.sections.get(name)
+        if acc is None:
+            acc = self.sections[name] = _Acc()
+        t0 = time.perf_counter()
+        c0 = time.process_time()
+        try:
+            yield
+        finally:
+            acc.calls += 1
+            acc.wall += time.perf_counter() - t0
+            acc.cpu += time.process_time() - c0
+
+    def section(self, name: str):
+        """Accumulated timer for code inside loops."""
+        if not self.enabled:
+            return nullcontext()
+        return self._section(name)
+
+
+PROF = Profiler.from_env()
+
+
+def profiled(name: Optional[str] = None, prof: Optional[Profiler] = None):
+    """
+    Decorator: accumulated wall/cpu per function in prof.sections.
+    Applied at import time -> when profiling is off the function is returned as is.
+    """
+    prof = prof or PROF
+
+    def deco(fn):
+        if not prof.enabled:
+            return fn
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            acc = prof.sections.get(label)
+            if acc is None:
+                acc = prof.sections[label] = _Acc()
+            t0 = time.perf_counter()
+            c0 = time.process_time()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                acc.calls += 1
+                acc.wall += time.perf_counter() - t0
+                acc.cpu += time.process_time() - c0
+
+        return wrapper
+
+    return deco
@@ -0,0 +1,318 @@
+import gzip
+import json
+import mmap
+import re
+
+# =========================================================
+# 0) Partial reader for raw Riot match JSON
+# =========================================================
+#
+# make_pair_summaries only needs a handful of fields per match
+# (placement, puuid, names, unit character_ids + a few info fields).
+# json.load builds the whole tree (traits, items, companion, ...) for
+# every file. Here the file is memory-mapped and a few literal-prefixed
+# regex scans pick out only the wanted "key": value tokens, so no object
+# tree is built for the parts we throw away anyway.
+#
+# The result has the same shape as the full match dict, only slimmer,
+# so callers can keep using match["info"]["participants"] etc.
+#
+# Participant fields are grouped by key repetition: every participant
+# object has the same key order, so a key we already have for the
+# current participant means the next participant started. If the
+# result doesn't look like a full match we fall back to json.loads.
+#
+# Raw files are <match_id>.json or, when the crawler compresses them,
+# <match_id>.json.gz (the API response bytes either way); every reader
+# here takes both.
+
+
+METADATA_KEYS = ("match_id",)
+INFO_KEYS = ("game_datetime", "game_version", "queue_id", "queueId", "tft_set_number")
+PARTICIPANT_KEYS = ("placement", "puuid", "riotIdGameName", "riotIdTagline", "units")
+
+# (numbers need a delimiter after them, so a chunk cut mid-number doesn't match)
+_VALUE = rb'\s*:\s*(?:"((?:[^"\\]|\\.)*)"|(-?\d[\d.eE+\-]*)(?=[\s,}\]])|(true|false|null)|(\[))'
+
+# keys are located with bytes.find, the regex only decodes the value there
+# (a single alternation over all keys would test every '"' in the file)
+_KEY_BYTES = {k: b'"' + k.encode() + b'"' for k in METADATA_KEYS + INFO_KEYS + PARTICIPANT_KEYS}
+_KEY_RES = {k: re.compile(re.escape(kb) + _VALUE) for k, kb in _KEY_BYTES.items()}
+
+# Riot writes these info keys after the participants list
+_TAIL_INFO_KEYS = {"queue_id", "queueId", "tft_set_number"}
+
+_CHARACTER_ID_RE = re.compile(rb'"character_id"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+
+# =========================================================
+# 1) Helpers
+# =========================================================
+
+def _decode_str(raw: bytes) -> str:
+    if b"\\" in raw:
+        return json.loads(b'"' + raw + b'"')
+    return raw.decode("utf-8")
+
+
+def _decode_num(raw: bytes):
+    if b"." in raw or b"e" in raw or b"E" in raw:
+        return float(raw)
+    return int(raw)
+
+
+_LITERALS = {b"true": True, b"false": False, b"null": None}
+
+
+def _slim_from_full(match: dict) -> dict:
+    """Same slim shape, built from a fully decoded match (fallback path)."""
+    info = match.get("info", {}) or {}
+    meta = match.get("metadata", {}) or {}
+
+    out_info = {k: info[k] for k in INFO_KEYS if k in info}
+    parts = []
+    for p in info.get("participants", []) or []:
+        q = {k: p[k] for k in PARTICIPANT_KEYS if k in p and k != "units"}
+        q["units"] = [{"character_id": u.get("character_id")} for u in p.get("units", []) or []]
+        parts.append(q)
+    out_info["participants"] = parts
+
+    out_meta = {k: meta[k] for k in METADATA_KEYS if k in meta}
+    return {"metadata": out_meta, "info": out_info}
+
+
+# =========================================================
+# 2) Public API
+# =========================================================
+
+def _find_key(buf, k: str, from_end: bool = False):
+    kb = _KEY_BYTES[k]
+    pos = buf.rfind(kb) if from_end else buf.find(kb)
+    while pos >= 0:
+        m = _KEY_RES[k].match(buf, pos)
+        if m is not None:
+            return m
+        pos = buf.rfind(kb, 0, pos) if from_end else buf.find(kb, pos + 1)
+    return None
+
+
+def _iter_key(buf, k: str):
+    # bytes.find is a lot faster than letting the regex engine walk the file
+    kb = _KEY_BYTES[k]
+    rx = _KEY_RES[k]
+    pos = buf.find(kb)
+    while pos >= 0:
+        m = rx.match(buf, pos)
+        if m is not None:
+            yield m
+        pos = buf.find(kb, pos + 1)
+
+
+def _value(m):
+    s, num, lit, arr = m.group(1), m.group(2), m.group(3), m.group(4)
+    if s is not None:
+        return _decode_str(s)
+    if num is not None:
+        return _decode_num(num)
+    if lit is not None:
+        return _LITERALS[lit]
+    return arr  # "[" marker (units)
+
+
+def parse_match_bytes(buf) -> dict:
+    """
+    Partial parse of a match from a buffer with find / rfind
+    (bytes, bytearray, mmap; not memoryview).
+    """
+    metadata = {}
+    info = {}
+
+    # metadata comes first and info scalars sit around the participants
+    # list, so a plain find / rfind stops early for most of them
+    for k in METADATA_KEYS:
+        m = _find_key(buf, k)
+        if m is not None:
+            metadata[k] = _value(m)
+
+    for k in INFO_KEYS:
+        m = _find_key(buf, k, from_end=k in _TAIL_INFO_KEYS)
+        if m is not None:
+            info[k] = _value(m)
+
+    # participant level keys in file order
+    anchors = []
+    for k in PARTICIPANT_KEYS:
+        for m in _iter_key(buf, k):
+            anchors.append((m.start(), k, m))
+    anchors.sort(key=lambda x: x[0])
+
+    participants = []
+    cur = None
+    for idx, (pos, k, m) in enumerate(anchors):
+        if cur is None or k in cur:
+            cur = {}
+            participants.append(cur)
+
+        if k != "units":
+            cur[k] = _value(m)
+            continue
+
+        if m.group(4) is None:
+            raise ValueError("units is not a list")
+        # the units list ends before the next participant key (or EOF)
+        end = anchors[idx + 1][0] if idx + 1 < len(anchors) else len(buf)
+        cur["units"] = [
+            {"character_id": cid.decode("utf-8") if b"\\" not in cid else _decode_str(cid)}
+            for cid in _CHARACTER_ID_RE.findall(buf, m.end(), end)
+        ]
+
+    for p in participants:
+        if "placement" not in p:
+            raise ValueError("participant without placement")
+        p.setdefault("units", [])
+
+    info["participants"] = participants
+    return {"metadata": metadata, "info": info}
+
+
+def read_match_bytes(buf) -> dict:
+    try:
+        return parse_match_bytes(buf)
+    except (ValueError, UnicodeDecodeError):
+        # unusual layout -> pay for the full decode once
+        return _slim_from_full(json.loads(bytes(buf)))
+
+
+def read_match(path: str) -> dict:
+    """Memory-map a raw match file and extract only the fields we use."""
+    if is_gzip(path):
+        return read_match_bytes(read_raw_bytes(path))
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return read_match_bytes(mm)
+
+
+# =========================================================
+# 3) Peek (a few scalars, stop reading early)
+# =========================================================
+
+PEEK_CHUNK = 8192
+
+
+def peek_match(path: str, head_keys=("game_version",), tail_keys=()) -> dict:
+    """
+    Read only as much of the file as needed:
+    - head_keys (metadata / info before participants, e.g. game_version)
+      are searched in growing chunks from the start
+    - tail_keys (info after participants, e.g. queue_id) from the last chunk
+    Missing keys are simply absent from the result.
+    """
+    if is_gzip(path):
+        # no seeking in a gzip stream, the file is small once decompressed
+        return peek_match_bytes(read_raw_bytes(path), head_keys, tail_keys)
+    out = {}
+    with open(path, "rb") as f:
+        buf = b""
+        todo = list(head_keys)
+        while todo:
+            chunk = f.read(PEEK_CHUNK)
+            buf += chunk
+            for k in list(todo):
+                m = _find_key(buf, k)
+                if m is not None:
+                    out[k] = _value(m)
+                    todo.remove(k)
+            if not chunk:
+                break
+
+        if tail_keys:
+            size = f.seek(0, 2)
+            f.seek(max(0, size - PEEK_CHUNK))
+            tail = f.read()
+            for k in tail_keys:
+                m = _find_key(tail, k, from_end=True)
+                if m is None and size > PEEK_CHUNK:
+                    f.seek(0)
+                    tail = f.read()
+                    m = _find_key(tail, k, from_end=True)
+                if m is not None:
+                    out[k] = _value(m)
+    return out
+
+
+def peek_match_bytes(buf, head_keys=("game_version",), tail_keys=()) -> dict:
+    out = {}
+    for k in head_keys:
+        m = _find_key(buf, k)
+        if m is not None:
+            out[k] = _value(m)
+    for k in tail_keys:
+        m = _find_key(buf, k, from_end=True)
+        if m is not None:
+            out[k] = _value(m)
+    return out
+
+
+# =========================================================
+# 4) Raw files (.json / .json.gz)
+# =========================================================
+
+RAW_SUFFIXES = (".json", ".json.gz")
+
+
+def is_raw_file(fn: str) -> bool:
+    return fn.lower().endswith(RAW_SUFFIXES)
+
+
+def is_gzip(path) -> bool:
+    return str(path).lower().endswith(".gz")
+
+
+def raw_match_id(fn: str) -> str:
+    """EUN1_123.json / EUN1_123.json.gz -> EUN1_123"""
+    name = fn[:-3] if is_gzip(fn) else fn
+    return name[:-5] if name.lower().endswith(".json") else name
+
+
+def read_raw_bytes(path) -> bytes:
+    """The response body as the API sent it."""
+    with open(path, "rb") as f:
+        data = f.read()
+    return gzip.decompress(data) if is_gzip(path) else data
+
+
+# =========================================================
+# 5) Crawler fields
+# =========================================================
+
+def read_crawl_fields(buf) -> dict:
+    """
+    What the crawler needs from a match (patch / queue filter + snowball,
+    matchlist watermark): game_version, queue_id, game_datetime and the
+    participant puuids, in the match shape (info.game_version,
+    info.queue_id, info.game_datetime, info.participants[].puuid).
+    """
+    info = {}
+    m = _find_key(buf, "game_version")
+    if m is not None:
+        info["game_version"] = _value(m)
+    m = _find_key(buf, "game_datetime")
+    if m is not None:
+        info["game_datetime"] = _value(m)
+    m = _find_key(buf, "queue_id", from_end=True)
+    if m is not None:
+        info["queue_id"] = _value(m)
+
+    # metadata.participants is a plain list of strings, only the
+    # info.participants objects have a "puuid" key
+    puuids = []
+    for m in _iter_key(buf, "puuid"):
+        pu = _value(m)
+        if isinstance(pu, str) and pu not in puuids:
+            puuids.append(pu)
+
+    if "game_version" not in info or not puuids:
+        # error body / unusual layout -> full decode
+        return json.loads(bytes(buf))
+    info["participants"] = [{"puuid": pu} for pu in puuids]
+    return {"metadata": {}, "info": info}
@@ -0,0 +1,374 @@
+import abc
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+from crawl_control import parse_limits
+from raw_reader import is_raw_file, raw_match_id, read_match_bytes, read_raw_bytes
+
+# =========================================================
+# 0) Local Riot API stand-in (offline crawler benchmarks)
+# =========================================================
+#
+# Serves the three endpoints the crawler uses:
+#   /riot/account/v1/accounts/by-riot-id/{gameName}/{tagLine}
+#   /tft/match/v1/matches/by-puuid/{puuid}/ids   (count, start, startTime, endTime)
+#   /tft/match/v1/matches/{matchId}
+#
+# Data: replayed raw match files (the crawler's RAW_DIR is a recording)
+# or the synthetic generator. Faults: Riot-style rate limit headers and
+# 429 + Retry-After, random 5xx, periodic 5xx bursts, latency + jitter,
+# limited capacity (requests beyond it queue, latency grows with load).
+#
+# Point the crawler at it with API_BASE_URL in config/crawl_config.py.
+
+HOST = "127.0.0.1"
+PORT = 8089
+
+
+class StubConfig:
+    def __init__(self,
+                 latency_ms: float = 0.0,
+                 jitter_ms: float = 0.0,
+                 error_rate_5xx: float = 0.0,
+                 burst_every_s: float = 0.0,
+                 burst_length_s: float = 0.0,
+                 app_limits: str = "",
+                 retry_after_header: bool = True,
+                 seed: int = 7,
+                 capacity: int = 0):
+        """
+        app_limits: Riot format "requests:seconds,...", e.g. "20:1,100:120" (dev key).
+        burst_every_s / burst_length_s: every N seconds, return 503 for M seconds.
+        capacity: requests served at once (0 = unlimited), the rest wait for a slot.
+        """
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate_5xx = error_rate_5xx
+        self.burst_every_s = burst_every_s
+        self.burst_length_s = burst_length_s
+        self.app_limits = parse_limits(app_limits)
+        self.retry_after_header = retry_after_header
+        self.seed = seed
+        self.capacity = capacity
+
+
+# =========================================================
+# 1) Data sources
+# =========================================================
+
+class MatchSource(abc.ABC):
+    """match_id -> bytes, puuid -> [(game_datetime, match_id)]"""
+
+    def __init__(self):
+        self.by_puuid: Dict[str, List[Tuple[int, str]]] = defaultdict(list)
+        self.match_ids: List[str] = []
+
+    def _index(self, match_id: str, game_datetime: int, puuids: List[str]) -> None:
+        self.match_ids.append(match_id)
+        for pu in puuids:
+            self.by_puuid[pu].append((game_datetime, match_id))
+
+    def finish_index(self) -> None:
+        for lst in self.by_puuid.values():
+            lst.sort(reverse=True)  # newest first, like Riot
+
+    @abc.abstractmethod
+    def get(self, match_id: str) -> Optional[bytes]:
+        """raw match body, None if the source doesn't have it (-> 404)"""
+
+    def puuids(self) -> List[str]:
+        return sorted(self.by_puuid)
+
+
+class ReplaySource(MatchSource):
+    """Raw match files recorded by the crawler (<match_id>.json / .json.gz)."""
+
+    def __init__(self, raw_dir: str):
+        super().__init__()
+        self.paths: Dict[str, str] = {}
+        for root, _, files in os.walk(raw_dir):
+            for fn in files:
+                if not is_raw_file(fn):
+                    continue
+                path = os.path.join(root, fn)
+                m = read_match_bytes(read_raw_bytes(path))
+                mid = m["metadata"].get("match_id") or raw_match_id(fn)
+                puuids = [p.get("puuid") for p in m["info"]["participants"] if p.get("puuid")]
+                self.paths[mid] = path
+                self._index(mid, int(m["info"].get("game_datetime") or 0), puuids)
+        self.finish_index()
+
+    def get(self, match_id: str) -> Optional[bytes]:
+        path = self.paths.get(match_id)
+        if path is None:
+            return None
+        return read_raw_bytes(path)
+
+
+class SyntheticSource(MatchSource):
+    """Matches from synth_matches, regenerated on request (only the index is kept)."""
+
+    def __init__(self, n: int, seed: int = 42, builds_path: Optional[str] = None,
+                 unit_list_path: Optional[str] = None):
+        super().__init__()
+        from synth_matches import BUILDS_PATH, UNIT_LIST_PATH, SyntheticMatchGenerator
+
+        self.gen = SyntheticMatchGenerator(seed, unit_list_path or UNIT_LIST_PATH, builds_path or BUILDS_PATH)
+        self.index_of: Dict[str, int] = {}
+        for i in range(n):
+            m = self.gen.match(i)
+            mid = m["metadata"]["match_id"]
+            self.index_of[mid] = i
+            self._index(mid, m["info"]["game_datetime"], m["metadata"]["participants"])
+        self.finish_index()
+
+    def get(self, match_id: str) -> Optional[bytes]:
+        i = self.index_of.get(match_id)
+        if i is None:
+            return None
+        return self.gen.match_bytes(i)
+
+
+# =========================================================
+# 2) Faults: rate limits, 5xx, latency
+# =========================================================
+
+class FaultInjector:
+    def __init__(self, cfg: StubConfig):
+        self.cfg = cfg
+        self.rng = random.Random(cfg.seed)
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.windows = [deque() for _ in cfg.app_limits]
+        self.slots = threading.BoundedSemaphore(cfg.capacity) if cfg.capacity > 0 else None
+
+    def latency(self) -> float:
+        with self.lock:
+            j = self.rng.uniform(-self.cfg.jitter_ms, self.cfg.jitter_ms) if self.cfg.jitter_ms else 0.0
+        return max(0.0, self.cfg.latency_ms + j) / 1000.0
+
+    def rate_limit(self) -> Tuple[Optional[float], Dict[str, str]]:
+        """-> (retry_after seconds or None, rate limit headers)"""
+        if not self.cfg.app_limits:
+            return None, {}
+        now = time.time()
+        with self.lock:
+            retry = None
+            for (limit, sec), win in zip(self.cfg.app_limits, self.windows):
+                while win and win[0] <= now - sec:
+                    win.popleft()
+                if len(win) >= limit:
+                    wait = win[0] + sec - now
+                    retry = max(retry or 0.0, wait)
+            if retry is None:
+                for win in self.windows:
+                    win.append(now)
+            counts = ",".join(f"{len(w)}:{int(s)}" for (_, s), w in zip(self.cfg.app_limits, self.windows))
+        headers = {
+            "X-App-Rate-Limit": ",".join(f"{n}:{int(s)}" for n, s in self.cfg.app_limits),
+            "X-App-Rate-Limit-Count": counts,
+        }
+        return retry, headers
+
+    def server_error(self) -> Optional[int]:
+        if self.cfg.burst_every_s > 0 and self.cfg.burst_length_s > 0:
+            phase = (time.time() - self.started) % self.cfg.burst_every_s
+            if phase >= self.cfg.burst_every_s - self.cfg.burst_length_s:
+                return 503
+        if self.cfg.error_rate_5xx > 0:
+            with self.lock:
+                if self.rng.random() < self.cfg.error_rate_5xx:
+                    return self.rng.choice([500, 502, 503, 504])
+        return None
+
+
+# =========================================================
+# 3) Server
+# =========================================================
+
+class RiotStubServer:
+    def __init__(self, source: MatchSource, cfg: Optional[StubConfig] = None,
+                 host: str = HOST, port: int = PORT):
+        self.source = source
+        self.cfg = cfg or StubConfig()
+        self.faults = FaultInjector(self.cfg)
+        self.stats = defaultdict(int)
+        self.stats_lock = threading.Lock()
+        self.in_flight = 0
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, fmt, *args):
+                pass
+
+            def do_GET(self):
+                stub._handle(self)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, key: str) -> None:
+        with self.stats_lock:
+            self.stats[key] += 1
+
+    # -----------------------------------------------------
+
+    def _send(self, h: BaseHTTPRequestHandler, status: int, body: bytes, headers: Optional[Dict[str, str]] = None):
+        h.send_response(status)
+        h.send_header("Content-Type", "application/json;charset=utf-8")
+        h.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            h.send_header(k, v)
+        h.end_headers()
+        h.wfile.write(body)
+        self.count(f"status_{status}")
+
+    def _json(self, h, status: int, obj, headers=None):
+        self._send(h, status, json.dumps(obj).encode("utf-8"), headers)
+
+    def _handle(self, h: BaseHTTPRequestHandler) -> None:
+        url = urlparse(h.path)
+        parts = [unquote(p) for p in url.path.strip("/").split("/")]
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        if url.path == "/_stub/stats":
+            with self.stats_lock:
+                return self._json(h, 200, dict(self.stats))
+
+        self.count("requests")
+        with self.stats_lock:
+            self.in_flight += 1
+            self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self.in_flight)
+        try:
+            self._serve(h, url, parts, query)
+        finally:
+            with self.stats_lock:
+                self.in_flight -= 1
+
+    def _serve(self, h: BaseHTTPRequestHandler, url, parts: List[str], query: Dict[str, str]) -> None:
+        delay = self.faults.latency()
+        if self.faults.slots is not None:
+            # over capacity: wait for a slot, then the usual latency
+            with self.faults.slots:
+                time.sleep(delay)
+        elif delay:
+            time.sleep(delay)
+
+        if not h.headers.get("X-Riot-Token"):
+            return self._json(h, 401, {"status": {"message": "Unauthorized", "status_code": 401}})
+
+        retry, rl_headers = self.faults.rate_limit()
+        if retry is not None:
+            headers = dict(rl_headers)
+            headers["X-Rate-Limit-Type"] = "application"
+            if self.cfg.retry_after_header:
+                headers["Retry-After"] = str(max(1, int(retry + 0.999)))
+            return self._json(h, 429, {"status": {"message": "Rate limit exceeded", "status_code": 429}}, headers)
+
+        err = self.faults.server_error()
+        if err is not None:
+            return self._json(h, err, {"status": {"message": "Service unavailable", "status_code": err}}, rl_headers)
+
+        # /riot/account/v1/accounts/by-riot-id/{game}/{tag}
+        if parts[:5] == ["riot", "account", "v1", "accounts", "by-riot-id"] and len(parts) == 7:
+            puuids = self.source.puuids()
+            if not puuids:
+                return self._json(h, 404, {"status": {"message": "Data not found", "status_code": 404}}, rl_headers)
+            k = int(hashlib.md5(f"{parts[5]}#{parts[6]}".encode("utf-8")).hexdigest(), 16) % len(puuids)
+            return self._json(h, 200, {"puuid": puuids[k], "gameName": parts[5], "tagLine": parts[6]}, rl_headers)
+
+        # /tft/match/v1/matches/by-puuid/{puuid}/ids
+        if parts[:5] == ["tft", "match", "v1", "matches", "by-puuid"] and len(parts) == 7 and parts[6] == "ids":
+            lst = self.source.by_puuid.get(parts[5], [])
+            start_time = query.get("startTime")
+            end_time = query.get("endTime")
+            if start_time is not None:
+                lst = [x for x in lst if x[0] // 1000 >= int(start_time)]
+            if end_time is not None:
+                lst = [x for x in lst if x[0] // 1000 <= int(end_time)]
+            start = int(query.get("start", 0))
+            count = int(query.get("count", 20))
+            return self._json(h, 200, [mid for _, mid in lst[start:start + count]], rl_headers)
+
+        # /tft/match/v1/matches/{matchId}
+        if parts[:4] == ["tft", "match", "v1", "matches"] and len(parts) == 5:
+            body = self.source.get(parts[4])
+            if body is None:
+                return self._json(h, 404, {"status": {"message": "Data not found", "status_code": 404}}, rl_headers)
+            self.count("match_bytes")
+            return self._send(h, 200, body, rl_headers)
+
+        return self._json(h, 404, {"status": {"message": "Unknown endpoint", "status_code": 404}})
+
+    # -----------------------------------------------------
+
+    def start(self) -> str:
+        """Serve in a background thread, returns the base URL."""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+# =========================================================
+# 4) MAIN
+# =========================================================
+
+def main():
+    ap = argparse.ArgumentParser(description="Local Riot API stand-in for crawler tests.")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--replay-dir", help="raw match folder to replay")
+    src.add_argument("--synthetic", type=int, metavar="N", help="serve N synthetic matches")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--host", default=HOST)
+    ap.add_argument("--port", type=int, default=PORT)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--error-rate", type=float, default=0.0, help="share of random 5xx responses")
+    ap.add_argument("--burst-every", type=float, default=0.0, help="seconds between 5xx bursts")
+    ap.add_argument("--burst-length", type=float, default=0.0, help="seconds a 5xx burst lasts")
+    ap.add_argument("--app-limits", default="", help='Riot format, e.g. "20:1,100:120"')
+    ap.add_argument("--no-retry-after", action="store_true")
+    ap.add_argument("--capacity", type=int, default=0, help="requests served at once (0 = unlimited)")
+    ap.add_argument("--unit-list", default=None, help="--synthetic: unit list (default: synth_matches.UNIT_LIST_PATH)")
+    ap.add_argument("--builds", default=None, help="--synthetic: build templates (default: synth_matches.BUILDS_PATH)")
+    args = ap.parse_args()
+
+    source = (ReplaySource(args.replay_dir) if args.replay_dir
+              else SyntheticSource(args.synthetic, args.seed, args.builds, args.unit_list))
+    cfg = StubConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.burst_every, args.burst_length,
+                     args.app_limits, not args.no_retry_after, args.seed, args.capacity)
+    server = RiotStubServer(source, cfg, args.host, args.port)
+    print(f"[STUB] {len(source.match_ids)} matches, {len(source.by_puuid)} puuids")
+    print(f"[STUB] serving on {server.base_url}  (set API_BASE_URL in config/crawl_config.py)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
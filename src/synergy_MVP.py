@@ -7,6 +7,8 @@ import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
+from profiling import PROF
+
 
 # =========================================================
 # 0) SETTINGS
@@ -15,6 +17,14 @@ import matplotlib.pyplot as plt
 PAIR_FILE = r"C:\Users\Levi\Documents\tft_duo_project\data\processed\pair_summaries_S.jsonl"
 OUT_DIR = r"C:\Users\Levi\Documents\tft_duo_project\output\synergy"
 
+# "jsonl": PAIR_FILE through pandas, "store": SQL aggregates from the pair store
+# (pair_store.py, filled by make_pair_summaries with STORE_PATH set)
+SOURCE = "jsonl"
+STORE_PATH = r"C:\Users\Levi\Documents\tft_duo_project\data\processed\pair_store.sqlite"
+STORE_TEMPLATE = "builds_set16_16.3_SA"
+# None: every patch in the store
+STORE_PATCH = "16.3"
+
 # Double Up queue_id: 1160
 DOUBLE_UP_QUEUE_ID = 1160
 
@@ -24,6 +34,10 @@ MIN_GAMES = 30
 # Empirical Bayes shrink “m” parameter
 EB_M = 200
 
+# log-lift weights in synergy_score (tune with param_sweep.py)
+W_TOP2 = 0.30
+W_TOP1 = 0.15
+
 # Top N for plot
 TOPN = 10
 
@@ -129,24 +143,20 @@ def compute_build_marginals(df_pairs: pd.DataFrame) -> pd.DataFrame:
       - top1/top2 ratio (team_rank)
       - average team_points / team_rank
     """
-    # separate pairs “long”: 1 row = (match, build)
-    long_rows = []
-    for _, row in df_pairs.iterrows():
-        for b in (row["build_a"], row["build_b"]):
-            long_rows.append({
-                "build": b,
-                "team_rank": row["team_rank"],
-                "team_points": row["team_points"],
-            })
-    df_long = pd.DataFrame(long_rows)
+    # separate pairs “long”: 1 row = (match, build), a == b counts twice
+    cols = ["team_rank", "team_points"]
+    df_long = pd.concat([df_pairs[["build_a"] + cols].rename(columns={"build_a": "build"}),
+                         df_pairs[["build_b"] + cols].rename(columns={"build_b": "build"})])
+    df_long = df_long.assign(t1=df_long["team_rank"] == 1, t2=df_long["team_rank"] <= 2,
+                             t3=df_long["team_rank"] <= 3)
 
     g = df_long.groupby("build", as_index=False).agg(
-        games=("build", "count"),
+        games=("build", "size"),
         avg_team_rank=("team_rank", "mean"),
         avg_team_points=("team_points", "mean"),
-        top1=("team_rank", lambda s: float((s == 1).mean())),
-        top2=("team_rank", lambda s: float((s <= 2).mean())),
-        top3=("team_rank", lambda s: float((s <= 3).mean())),
+        top1=("t1", "mean"),
+        top2=("t2", "mean"),
+        top3=("t3", "mean"),
     )
     return g
 
@@ -155,35 +165,74 @@ def compute_build_marginals(df_pairs: pd.DataFrame) -> pd.DataFrame:
 # 4) PAIR SYNERGY METRICS
 # =========================================================
 
-def compute_pair_synergies(df_pairs: pd.DataFrame, df_marg: pd.DataFrame) -> pd.DataFrame:
+def score_pair(n: int, avg_team_points: float, top1: float, top2: float,
+               marg_a: Dict[str, float], marg_b: Dict[str, float], global_mean_points: float,
+               eb_m: float = EB_M, w_top2: float = W_TOP2, w_top1: float = W_TOP1) -> Dict[str, float]:
     """
-    Pair level stats:
-      - games
-      - avg_team_rank, avg_team_points
-      - top1/top2/top3 arány
-      - EB_shrunk_points (Empirical Bayes)
-      - Lift_top2: observed_top2 / (pA_top2 * pB_top2)
-      - Lift_top1: observed_top1 / (pA_top1 * pB_top1)
-      - log_lift_top2, log_lift_top1
-      - synergy_score (combined)
+    Metrics of one pair from its own counts + the two builds' marginals.
+    Shared by compute_pair_synergies and the incremental partner index
+    (param_sweep.py has the vectorized twin over a parameter grid).
     """
-    # Marginal lookup
-    marg = df_marg.set_index("build").to_dict(orient="index")
-
-    def get_marg(build: str) -> Dict[str, float]:
-        return marg.get(build, {"top1": 0.0, "top2": 0.0, "top3": 0.0, "avg_team_points": df_pairs["team_points"].mean(), "games": 0})
-
-    # Pair aggregations
-    g = df_pairs.groupby(["build_a", "build_b"], as_index=False).agg(
+    # Empirical Bayes shrinkelt point
+    eb = empirical_bayes(avg_team_points, n, global_mean_points, eb_m)
+
+    # expected baseline (independence condition)
+    exp_top2 = clip01(float(marg_a["top2"])) * clip01(float(marg_b["top2"]))
+    exp_top1 = clip01(float(marg_a["top1"])) * clip01(float(marg_b["top1"]))
+
+    obs_top2 = clip01(top2)
+    obs_top1 = clip01(top1)
+
+    # Lift: if >1 then “better together, then expected”
+    lt2 = (obs_top2 / exp_top2) if exp_top2 > 1e-9 else np.nan
+    lt1 = (obs_top1 / exp_top1) if exp_top1 > 1e-9 else np.nan
+
+    # Log-lift for stable ranking
+    llt2 = math.log(lt2) if (not np.isnan(lt2) and lt2 > 1e-12) else np.nan
+    llt1 = math.log(lt1) if (not np.isnan(lt1) and lt1 > 1e-12) else np.nan
+
+    # Combined synergy score:
+    # - EB point (stabil performance)
+    # - + log-lift (if “together extra”)
+    # - and a “sample number factor” (don't have a 3-game miracle)
+    sample_factor = math.sqrt(n) / math.sqrt(n + eb_m)
+    score = (eb * 1.0) + (w_top2 * (llt2 if not np.isnan(llt2) else 0.0)) + (w_top1 * (llt1 if not np.isnan(llt1) else 0.0))
+    score *= sample_factor
+
+    return {
+        "eb_points": eb,
+        "lift_top2": lt2,
+        "lift_top1": lt1,
+        "log_lift_top2": llt2,
+        "log_lift_top1": llt1,
+        "synergy_score": score,
+    }
+
+
+def aggregate_pairs(df_pairs: pd.DataFrame) -> pd.DataFrame:
+    """Pair aggregations (games, averages, top1/2/3 ratio) per (build_a, build_b)."""
+    d = df_pairs.assign(t1=df_pairs["team_rank"] == 1, t2=df_pairs["team_rank"] <= 2, t3=df_pairs["team_rank"] <= 3)
+    return d.groupby(["build_a", "build_b"], as_index=False).agg(
         games=("team_rank", "count"),
         avg_team_rank=("team_rank", "mean"),
         avg_team_points=("team_points", "mean"),
-        top1=("team_rank", lambda s: float((s == 1).mean())),
-        top2=("team_rank", lambda s: float((s <= 2).mean())),
-        top3=("team_rank", lambda s: float((s <= 3).mean())),
+        top1=("t1", "mean"),
+        top2=("t2", "mean"),
+        top3=("t3", "mean"),
     )
 
-    global_mean_points = float(df_pairs["team_points"].mean())
+
+def score_pairs(g: pd.DataFrame, df_marg: pd.DataFrame, global_mean_points: float,
+                eb_m: float = EB_M, w_top2: float = W_TOP2, w_top1: float = W_TOP1) -> pd.DataFrame:
+    """
+    EB + lift metrics on top of aggregate_pairs() output (or the same
+    columns from the pair store's SQL aggregates).
+    """
+    # Marginal lookup
+    marg = df_marg.set_index("build").to_dict(orient="index")
+
+    def get_marg(build: str) -> Dict[str, float]:
+        return marg.get(build, {"top1": 0.0, "top2": 0.0, "top3": 0.0, "avg_team_points": global_mean_points, "games": 0})
 
     # EB + lift calculation
     eb_points = []
@@ -194,46 +243,14 @@ def compute_pair_synergies(df_pairs: pd.DataFrame, df_marg: pd.DataFrame) -> pd.
     synergy_score = []
 
     for _, row in g.iterrows():
-        a = row["build_a"]
-        b = row["build_b"]
-        n = int(row["games"])
-
-        # Empirical Bayes shrinkelt point
-        eb = empirical_bayes(float(row["avg_team_points"]), n, global_mean_points, EB_M)
-        eb_points.append(eb)
-
-        ma = get_marg(a)
-        mb = get_marg(b)
-
-        # expected baseline (independence condition)
-        exp_top2 = clip01(float(ma["top2"])) * clip01(float(mb["top2"]))
-        exp_top1 = clip01(float(ma["top1"])) * clip01(float(mb["top1"]))
-
-        obs_top2 = clip01(float(row["top2"]))
-        obs_top1 = clip01(float(row["top1"]))
-
-        # Lift: if >1 then “better together, then expected”
-        lt2 = (obs_top2 / exp_top2) if exp_top2 > 1e-9 else np.nan
-        lt1 = (obs_top1 / exp_top1) if exp_top1 > 1e-9 else np.nan
-
-        lift_top2.append(lt2)
-        lift_top1.append(lt1)
-
-        # Log-lift for stable ranking
-        llt2 = math.log(lt2) if (lt2 is not np.nan and lt2 is not None and not (isinstance(lt2, float) and np.isnan(lt2)) and lt2 > 1e-12) else np.nan
-        llt1 = math.log(lt1) if (lt1 is not np.nan and lt1 is not None and not (isinstance(lt1, float) and np.isnan(lt1)) and lt1 > 1e-12) else np.nan
-
-        log_lift_top2.append(llt2)
-        log_lift_top1.append(llt1)
-
-        # Combined synergy score:
-        # - EB point (stabil performance)
-        # - + log-lift (if “together extra”)
-        # - and a “sample number factor” (don't have a 3-game miracle)
-        sample_factor = math.sqrt(n) / math.sqrt(n + EB_M)
-        score = (eb * 1.0) + (0.30 * (llt2 if not np.isnan(llt2) else 0.0)) + (0.15 * (llt1 if not np.isnan(llt1) else 0.0))
-        score *= sample_factor
-        synergy_score.append(score)
+        s = score_pair(int(row["games"]), float(row["avg_team_points"]), float(row["top1"]), float(row["top2"]),
+                       get_marg(row["build_a"]), get_marg(row["build_b"]), global_mean_points, eb_m, w_top2, w_top1)
+        eb_points.append(s["eb_points"])
+        lift_top2.append(s["lift_top2"])
+        lift_top1.append(s["lift_top1"])
+        log_lift_top2.append(s["log_lift_top2"])
+        log_lift_top1.append(s["log_lift_top1"])
+        synergy_score.append(s["synergy_score"])
 
     g["eb_points"] = eb_points
     g["lift_top2"] = lift_top2
@@ -245,6 +262,22 @@ def compute_pair_synergies(df_pairs: pd.DataFrame, df_marg: pd.DataFrame) -> pd.
     return g
 
 
+def compute_pair_synergies(df_pairs: pd.DataFrame, df_marg: pd.DataFrame) -> pd.DataFrame:
+    """
+    Pair level stats:
+      - games
+      - avg_team_rank, avg_team_points
+      - top1/top2/top3 arány
+      - EB_shrunk_points (Empirical Bayes)
+      - Lift_top2: observed_top2 / (pA_top2 * pB_top2)
+      - Lift_top1: observed_top1 / (pA_top1 * pB_top1)
+      - log_lift_top2, log_lift_top1
+      - synergy_score (combined)
+    """
+    global_mean_points = float(df_pairs["team_points"].mean())
+    return score_pairs(aggregate_pairs(df_pairs), df_marg, global_mean_points)
+
+
 # =========================================================
 # 5) FIGURES
 # =========================================================
@@ -289,6 +322,18 @@ def plot_heatmap_top_builds(df_pairs: pd.DataFrame, out_path: str, top_builds: i
     # pivot: mean points
     piv = df.pivot_table(index="build_a", columns="build_b", values="team_points", aggfunc="mean")
 
+    draw_heatmap(piv, top, top_builds, out_path)
+
+
+def plot_heatmap_from_aggregates(df_syn: pd.DataFrame, df_marg: pd.DataFrame, out_path: str, top_builds: int = 18) -> None:
+    """Same heatmap from pair / build aggregates (pair store source, no per-team rows)."""
+    top = list(df_marg.sort_values("games", ascending=False)["build"].head(top_builds))
+    df = df_syn[(df_syn["build_a"].isin(top)) & (df_syn["build_b"].isin(top))]
+    piv = df.pivot_table(index="build_a", columns="build_b", values="avg_team_points", aggfunc="mean")
+    draw_heatmap(piv, top, top_builds, out_path)
+
+
+def draw_heatmap(piv: pd.DataFrame, top: List[str], top_builds: int, out_path: str) -> None:
     # fill the missings
     piv = piv.reindex(index=top, columns=top)
     mat = piv.values
@@ -309,36 +354,110 @@ def plot_heatmap_top_builds(df_pairs: pd.DataFrame, out_path: str, top_builds: i
 # =========================================================
 
 def main():
+    if SOURCE == "store":
+        return main_store()
+
     ensure_dir(OUT_DIR)
+    PROF.start("synergy_MVP", pair_file=PAIR_FILE, eb_m=EB_M, min_games=MIN_GAMES)
 
     print(f"[LOAD] {PAIR_FILE}")
-    rows = read_jsonl(PAIR_FILE)
+    with PROF.stage("read_jsonl"):
+        rows = read_jsonl(PAIR_FILE)
     print(f"[LOAD] rows: {len(rows)}")
 
-    df_pairs = build_pair_dataframe(rows)
+    with PROF.stage("build_pair_dataframe"):
+        df_pairs = build_pair_dataframe(rows)
     print(f"[PAIRS] filtered rows (Double Up queue): {len(df_pairs)}")
 
     if df_pairs.empty:
         print("[ERROR] Empty df_pairs – something is not right.")
+        PROF.finish(rows=len(rows), pairs=0)
         return
 
     # marginals
-    df_marg = compute_build_marginals(df_pairs)
+    with PROF.stage("marginals"):
+        df_marg = compute_build_marginals(df_pairs)
 
     # synergies
-    df_syn = compute_pair_synergies(df_pairs, df_marg)
+    with PROF.stage("pair_synergies"):
+        df_syn = compute_pair_synergies(df_pairs, df_marg)
+
+    df_rank = save_outputs(df_syn, df_marg, df_pairs)
+
+    with PROF.stage("plots"):
+        plot_outputs(df_syn, df_rank)
+        plot_heatmap_top_builds(df_pairs, os.path.join(OUT_DIR, "heatmap_top_builds.png"))
+
+    PROF.finish(rows=len(rows), pairs=len(df_pairs), build_pairs=len(df_syn), ranked=len(df_rank))
+    print("[DONE] Ready! Look at the output/synergy folder.")
+
+
+def main_store():
+    """Same outputs from the pair store: the groupbys run as SQL, no per-team rows in pandas."""
+    from pair_store import PairStore
+
+    ensure_dir(OUT_DIR)
+    PROF.start("synergy_MVP", source="store", store=STORE_PATH, template=STORE_TEMPLATE, patch=STORE_PATCH,
+               eb_m=EB_M, min_games=MIN_GAMES)
+
+    print(f"[LOAD] {STORE_PATH} template={STORE_TEMPLATE} patch={STORE_PATCH}")
+    store = PairStore(STORE_PATH)
+    with PROF.stage("sql_aggregates"):
+        g = store.pair_aggregates(STORE_TEMPLATE, STORE_PATCH, DOUBLE_UP_QUEUE_ID)
+        df_marg = store.build_marginals(STORE_TEMPLATE, STORE_PATCH, DOUBLE_UP_QUEUE_ID)
+        global_mean = store.global_mean_points(STORE_TEMPLATE, STORE_PATCH, DOUBLE_UP_QUEUE_ID)
+    store.close()
+    print(f"[PAIRS] teams (Double Up queue): {int(g['games'].sum()) if len(g) else 0}")
+
+    if g.empty:
+        print("[ERROR] No rows in the store for this template / patch.")
+        PROF.finish(build_pairs=0)
+        return
+
+    with PROF.stage("pair_synergies"):
+        df_syn = score_pairs(g, df_marg, global_mean)
+
+    df_rank = save_outputs(df_syn, df_marg)
 
+    with PROF.stage("plots"):
+        plot_outputs(df_syn, df_rank)
+        plot_heatmap_from_aggregates(df_syn, df_marg, os.path.join(OUT_DIR, "heatmap_top_builds.png"))
+
+    PROF.finish(build_pairs=len(df_syn), ranked=len(df_rank))
+    print("[DONE] Ready! Look at the output/synergy folder.")
+
+
+def write_csv(df: pd.DataFrame, path: str) -> None:
+    # temp file + rename: readers (synergy_query's watcher) never see half a file
+    tmp = path + ".tmp"
+    df.to_csv(tmp, index=False, encoding="utf-8-sig")
+    os.replace(tmp, path)
+
+
+def save_outputs(df_syn: pd.DataFrame, df_marg: pd.DataFrame, df_pairs: pd.DataFrame | None = None) -> pd.DataFrame:
     # alap szűrés ranglistához
     df_rank = df_syn[df_syn["games"] >= MIN_GAMES].copy()
 
-    # mentsük ki táblákba
-    df_pairs.to_csv(os.path.join(OUT_DIR, "pairs_raw.csv"), index=False, encoding="utf-8-sig")
-    df_marg.sort_values("games", ascending=False).to_csv(os.path.join(OUT_DIR, "build_marginals.csv"), index=False, encoding="utf-8-sig")
-    df_syn.sort_values("synergy_score", ascending=False).to_csv(os.path.join(OUT_DIR, "pair_synergies_all.csv"), index=False, encoding="utf-8-sig")
-    df_rank.sort_values("synergy_score", ascending=False).to_csv(os.path.join(OUT_DIR, "pair_synergies_ranked_min_games.csv"), index=False, encoding="utf-8-sig")
+    # mentsük ki táblákba (marginals before pairs: synergy_query reloads on the pairs file)
+    with PROF.stage("save_csv"):
+        if df_pairs is not None:
+            write_csv(df_pairs, os.path.join(OUT_DIR, "pairs_raw.csv"))
+        write_csv(df_marg.sort_values("games", ascending=False), os.path.join(OUT_DIR, "build_marginals.csv"))
+        write_csv(df_syn.sort_values("synergy_score", ascending=False), os.path.join(OUT_DIR, "pair_synergies_all.csv"))
+        write_csv(df_rank.sort_values("synergy_score", ascending=False), os.path.join(OUT_DIR, "pair_synergies_ranked_min_games.csv"))
 
     print(f"[SAVE] CSVs saved to: {OUT_DIR}")
 
+    # per-build partner index next to the CSVs (partner_index imports this module)
+    from partner_index import PartnerIndex, index_path
+    with PROF.stage("partner_index"):
+        PartnerIndex.from_synergy(df_syn, df_marg).save(index_path(OUT_DIR))
+    print(f"[SAVE] partner index: {index_path(OUT_DIR)}")
+
+    return df_rank
+
+
+def plot_outputs(df_syn: pd.DataFrame, df_rank: pd.DataFrame) -> None:
     # ábrák
     plot_top_bar(df_rank, "synergy_score", f"TOP pairs synergy_score (min {MIN_GAMES} game)", os.path.join(OUT_DIR, "top_synergy_score.png"))
     plot_top_bar(df_rank, "eb_points", f"TOP pairs EB-shrunken performance (min {MIN_GAMES} game)", os.path.join(OUT_DIR, "top_eb_points.png"))
@@ -347,9 +466,6 @@ def main():
     plot_top_bar(df_rank, "lift_top1", f"TOP pairs Lift Top1 (min {MIN_GAMES} game)", os.path.join(OUT_DIR, "top_lift_top1.png"))
 
     plot_scatter_count_vs_perf(df_syn, os.path.join(OUT_DIR, "scatter_games_vs_eb_points.png"))
-    plot_heatmap_top_builds(df_pairs, os.path.join(OUT_DIR, "heatmap_top_builds.png"))
-
-    print("[DONE] Ready! Look at the output/synergy folder.")
 
 
 if __name__ == "__main__":
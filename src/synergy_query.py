@@ -0,0 +1,469 @@
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, quote, unquote, urlparse
+
+import pandas as pd
+
+from partner_index import PartnerIndex
+
+# =========================================================
+# 0) In-memory synergy query service
+# =========================================================
+#
+# Loads the synergy_MVP output (pair_synergies_all.csv + build_marginals.csv)
+# once per patch into a partner_index.PartnerIndex and answers from its
+# sorted arrays (the same ranking live_synergy and synergy_MVP publish):
+#   partners(build)     best partners of one build by a metric
+#   top_pairs()         best pairs overall by a metric
+#   pair(a, b)          one pair's row
+# all with optional patch / min_games filters.
+#
+# The producers (synergy_MVP.save_outputs, live_synergy.publish) write
+# every CSV to a temp file and os.replace it into place, marginals first.
+# A watcher thread polls pair_synergies_all.csv and reloads as soon as it
+# was replaced (other inode / mtime / size): a renamed file is always
+# complete, no settle time. The swap is a single dict assignment, readers
+# always see either the old or the new snapshot, never a half-loaded one.
+#
+# Programmatic: svc = SynergyService({"16.3": OUT_DIR}); svc.partners("Dive Duo")
+# HTTP:         python src/synergy_query.py --serve
+# Load test:    python src/synergy_query.py --loadtest 100000
+
+SNAPSHOTS = {
+    "16.3": r"C:\Users\Levi\Documents\tft_duo_project\output\synergy",
+}
+
+PAIRS_CSV = "pair_synergies_all.csv"
+MARGINALS_CSV = "build_marginals.csv"
+
+# same default as synergy_MVP
+MIN_GAMES = 30
+
+HOST = "127.0.0.1"
+PORT = 8090
+
+# stat polling of PAIRS_CSV
+WATCH_EVERY_SECONDS = 2.0
+
+# rankable columns (direction: partner_index.LOWER_IS_BETTER)
+METRICS = (
+    "synergy_score",
+    "eb_points",
+    "lift_top2",
+    "lift_top1",
+    "log_lift_top2",
+    "log_lift_top1",
+    "top1",
+    "top2",
+    "top3",
+    "avg_team_points",
+    "avg_team_rank",
+    "games",
+)
+
+
+def _clean(v):
+    """numpy / NaN -> plain JSON-able python values"""
+    if v is None:
+        return None
+    if isinstance(v, float) and math.isnan(v):
+        return None
+    if hasattr(v, "item"):
+        v = v.item()
+        if isinstance(v, float) and math.isnan(v):
+            return None
+    return v
+
+
+def _row(r: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: _clean(v) for k, v in r.items()}
+
+
+def file_stamp(path: str) -> Tuple[int, int, int]:
+    """changes when the file is replaced (os.replace -> new inode) or rewritten"""
+    st = os.stat(path)
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+# =========================================================
+# 1) Snapshot (immutable once built)
+# =========================================================
+
+class Snapshot:
+    def __init__(self, patch: str, index: PartnerIndex, marginals: Dict[str, Dict[str, Any]],
+                 source: Optional[str] = None, stamp: Optional[Tuple[int, int, int]] = None):
+        self.patch = patch
+        self.index = index
+        self.marginals = marginals
+        self.source = source
+        self.stamp = stamp
+        self.loaded_at = time.time()
+        # sort the overall rankings here, not on the first query
+        for metric in METRICS:
+            index.top_pairs(metric, k=1)
+
+    @classmethod
+    def load(cls, patch: str, out_dir: str) -> "Snapshot":
+        pairs_path = os.path.join(out_dir, PAIRS_CSV)
+        marg_path = os.path.join(out_dir, MARGINALS_CSV)
+
+        # stamp first: if the file is replaced while reading, the watcher sees it again
+        stamp = file_stamp(pairs_path)
+        df_syn = pd.read_csv(pairs_path, encoding="utf-8-sig")
+        df_marg = pd.read_csv(marg_path, encoding="utf-8-sig")
+        index = PartnerIndex.from_synergy(df_syn, df_marg, METRICS)
+        marginals = {str(r["build"]): _row(r) for r in df_marg.to_dict(orient="records")}
+        return cls(patch, index, marginals, out_dir, stamp)
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "patch": self.patch,
+            "source": self.source,
+            "pairs": len(self.index.values),
+            "builds": len(self.index.sorted),
+            "csv_mtime": self.stamp[1] / 1e9 if self.stamp else None,
+            "loaded_at": self.loaded_at,
+        }
+
+
+# =========================================================
+# 2) Service (queries + hot swap)
+# =========================================================
+
+class SynergyService:
+    def __init__(self, snapshot_dirs: Optional[Dict[str, str]] = None, watch: bool = False,
+                 watch_every_seconds: float = WATCH_EVERY_SECONDS):
+        self.snapshot_dirs = dict(snapshot_dirs or SNAPSHOTS)
+        self.snapshots: Dict[str, Snapshot] = {}
+        self.swaps = 0
+        self.watch_every_seconds = watch_every_seconds
+        self._stop = threading.Event()
+        self._watcher = None
+
+        for patch, out_dir in self.snapshot_dirs.items():
+            self.reload(patch)
+
+        if watch:
+            self.start_watcher()
+
+    @property
+    def default_patch(self) -> Optional[str]:
+        # newest patch by version number
+        if not self.snapshots:
+            return None
+        return max(self.snapshots, key=lambda p: tuple(int(x) for x in p.split(".") if x.isdigit()))
+
+    def _snapshot(self, patch: Optional[str]) -> Snapshot:
+        snap = self.snapshots.get(patch or self.default_patch)
+        if snap is None:
+            raise KeyError(f"no snapshot for patch {patch!r} (have: {sorted(self.snapshots)})")
+        return snap
+
+    @staticmethod
+    def _metric(metric: str) -> str:
+        if metric not in METRICS:
+            raise ValueError(f"unknown metric {metric!r} (one of: {', '.join(METRICS)})")
+        return metric
+
+    # -----------------------------------------------------
+    # queries
+    # -----------------------------------------------------
+
+    def partners(self, build: str, metric: str = "synergy_score", k: int = 10,
+                 min_games: int = MIN_GAMES, patch: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Best partners of `build`, each row + "partner"."""
+        snap = self._snapshot(patch)
+        return [_row(r) for r in snap.index.top(build, self._metric(metric), k, min_games)]
+
+    def top_pairs(self, metric: str = "synergy_score", k: int = 10, min_games: int = MIN_GAMES,
+                  patch: Optional[str] = None) -> List[Dict[str, Any]]:
+        snap = self._snapshot(patch)
+        return [_row(r) for r in snap.index.top_pairs(self._metric(metric), k, min_games)]
+
+    def pair(self, a: str, b: str, patch: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        row = self._snapshot(patch).index.pair(a, b)
+        return _row(row) if row is not None else None
+
+    def build(self, name: str, patch: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        return self._snapshot(patch).marginals.get(name)
+
+    def builds(self, patch: Optional[str] = None) -> List[str]:
+        return sorted(self._snapshot(patch).index.sorted)
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "default_patch": self.default_patch,
+            "swaps": self.swaps,
+            "snapshots": {p: s.info() for p, s in self.snapshots.items()},
+        }
+
+    # -----------------------------------------------------
+    # hot swap
+    # -----------------------------------------------------
+
+    def reload(self, patch: str) -> bool:
+        """Load the patch's CSVs into a new snapshot and swap it in. Old one stays on error."""
+        out_dir = self.snapshot_dirs[patch]
+        try:
+            snap = Snapshot.load(patch, out_dir)
+        except (OSError, ValueError, KeyError, pd.errors.ParserError) as e:
+            print(f"[QUERY] reload failed for {patch} ({out_dir}): {e}")
+            return False
+        self.snapshots[patch] = snap
+        self.swaps += 1
+        print(f"[QUERY] patch {patch}: {len(snap.index.values)} pairs, {len(snap.index.sorted)} builds loaded")
+        return True
+
+    def _changed(self, patch: str) -> bool:
+        try:
+            stamp = file_stamp(os.path.join(self.snapshot_dirs[patch], PAIRS_CSV))
+        except OSError:
+            return False
+        snap = self.snapshots.get(patch)
+        return snap is None or snap.stamp != stamp
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.watch_every_seconds):
+            for patch in list(self.snapshot_dirs):
+                if self._changed(patch):
+                    self.reload(patch)
+
+    def start_watcher(self) -> None:
+        if self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, daemon=True)
+            self._watcher.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+# =========================================================
+# 3) HTTP (optional)
+# =========================================================
+#
+#   /partners?build=Dive%20Duo&metric=synergy_score&k=10&min_games=30&patch=16.3
+#   /top?metric=eb_points&k=20
+#   /pair?a=...&b=...
+#   /build?name=...
+#   /builds, /info
+
+class SynergyHTTPServer:
+    def __init__(self, service: SynergyService, host: str = HOST, port: int = PORT):
+        self.service = service
+        srv = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # headers and body are separate writes, with Nagle on every
+            # keep-alive response waits for the client's delayed ACK
+            disable_nagle_algorithm = True
+
+            def log_message(self, fmt, *args):
+                pass
+
+            def do_GET(self):
+                srv._handle(self)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _json(self, h: BaseHTTPRequestHandler, status: int, obj) -> None:
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        h.send_response(status)
+        h.send_header("Content-Type", "application/json;charset=utf-8")
+        h.send_header("Content-Length", str(len(body)))
+        h.end_headers()
+        h.wfile.write(body)
+
+    def _handle(self, h: BaseHTTPRequestHandler) -> None:
+        url = urlparse(h.path)
+        q = {k: unquote(v[-1]) for k, v in parse_qs(url.query).items()}
+        svc = self.service
+        try:
+            k = int(q.get("k", 10))
+            min_games = int(q.get("min_games", MIN_GAMES))
+            patch = q.get("patch")
+            metric = q.get("metric", "synergy_score")
+
+            if url.path == "/partners":
+                return self._json(h, 200, svc.partners(q["build"], metric, k, min_games, patch))
+            if url.path == "/top":
+                return self._json(h, 200, svc.top_pairs(metric, k, min_games, patch))
+            if url.path == "/pair":
+                row = svc.pair(q["a"], q["b"], patch)
+                return self._json(h, 200 if row else 404, row or {"error": "pair not found"})
+            if url.path == "/build":
+                row = svc.build(q["name"], patch)
+                return self._json(h, 200 if row else 404, row or {"error": "build not found"})
+            if url.path == "/builds":
+                return self._json(h, 200, svc.builds(patch))
+            if url.path == "/info":
+                return self._json(h, 200, svc.info())
+        except KeyError as e:
+            return self._json(h, 400 if e.args and e.args[0] in ("build", "a", "b", "name") else 404,
+                              {"error": f"missing or unknown: {e}"})
+        except ValueError as e:
+            return self._json(h, 400, {"error": str(e)})
+        return self._json(h, 404, {"error": "unknown endpoint"})
+
+    def start(self) -> str:
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+# =========================================================
+# 4) Load test
+# =========================================================
+
+def _percentile(sorted_vals: List[float], q: float) -> float:
+    if not sorted_vals:
+        return float("nan")
+    i = min(len(sorted_vals) - 1, max(0, int(math.ceil(q * len(sorted_vals))) - 1))
+    return sorted_vals[i]
+
+
+def load_test(service: SynergyService, n: int = 100_000, seed: int = 0,
+              base_url: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Random query mix (70% partners, 20% top pairs, 10% single pair) against
+    the service in-process, or over HTTP when base_url is given (one keep-alive
+    connection). Latency per query in microseconds.
+    """
+    rng = random.Random(seed)
+    builds = service.builds()
+    metrics = ["synergy_score", "eb_points", "lift_top2", "top2"]
+    if not builds:
+        raise ValueError("no builds loaded")
+
+    queries = []
+    for _ in range(n):
+        r = rng.random()
+        m = rng.choice(metrics)
+        if r < 0.7:
+            queries.append(("partners", {"build": rng.choice(builds), "metric": m, "k": 10, "min_games": rng.choice([0, MIN_GAMES])}))
+        elif r < 0.9:
+            queries.append(("top", {"metric": m, "k": rng.choice([10, 50]), "min_games": MIN_GAMES}))
+        else:
+            queries.append(("pair", {"a": rng.choice(builds), "b": rng.choice(builds)}))
+
+    lat = {"partners": [], "top": [], "pair": []}
+    conn = None
+    if base_url:
+        u = urlparse(base_url)
+        conn = http.client.HTTPConnection(u.hostname, u.port)
+
+    t_all = time.perf_counter()
+    for kind, p in queries:
+        t0 = time.perf_counter_ns()
+        if conn is not None:
+            qs = "&".join(f"{k}={quote(str(v))}" for k, v in p.items())
+            conn.request("GET", f"/{kind}?{qs}")
+            conn.getresponse().read()
+        elif kind == "partners":
+            service.partners(p["build"], p["metric"], p["k"], p["min_games"])
+        elif kind == "top":
+            service.top_pairs(p["metric"], p["k"], p["min_games"])
+        else:
+            service.pair(p["a"], p["b"])
+        lat[kind].append((time.perf_counter_ns() - t0) / 1000.0)
+    wall = time.perf_counter() - t_all
+    if conn is not None:
+        conn.close()
+
+    def summary(vals):
+        vals = sorted(vals)
+        return {
+            "n": len(vals),
+            "p50_us": round(_percentile(vals, 0.50), 2),
+            "p90_us": round(_percentile(vals, 0.90), 2),
+            "p99_us": round(_percentile(vals, 0.99), 2),
+            "max_us": round(vals[-1], 2) if vals else None,
+        }
+
+    return {
+        "mode": "http" if base_url else "in-process",
+        "queries": n,
+        "qps": round(n / wall, 1) if wall > 0 else None,
+        "all": summary(lat["partners"] + lat["top"] + lat["pair"]),
+        **{k: summary(v) for k, v in lat.items()},
+    }
+
+
+# =========================================================
+# 5) MAIN
+# =========================================================
+
+def main():
+    ap = argparse.ArgumentParser(description="In-memory synergy query service.")
+    ap.add_argument("--snapshot", action="append", metavar="PATCH=DIR",
+                    help="synergy_MVP output folder per patch (default: SNAPSHOTS)")
+    ap.add_argument("--serve", action="store_true", help="HTTP server with hot swap")
+    ap.add_argument("--host", default=HOST)
+    ap.add_argument("--port", type=int, default=PORT)
+    ap.add_argument("--loadtest", type=int, metavar="N", help="run N random queries, print p50/p99")
+    ap.add_argument("--http", action="store_true", help="load test over HTTP instead of in-process")
+    ap.add_argument("--partners", metavar="BUILD", help="print best partners of BUILD and exit")
+    ap.add_argument("--metric", default="synergy_score")
+    ap.add_argument("-k", type=int, default=10)
+    ap.add_argument("--min-games", type=int, default=MIN_GAMES)
+    ap.add_argument("--patch")
+    args = ap.parse_args()
+
+    dirs = dict(s.split("=", 1) for s in args.snapshot) if args.snapshot else SNAPSHOTS
+    svc = SynergyService(dirs, watch=args.serve)
+
+    if args.partners:
+        for r in svc.partners(args.partners, args.metric, args.k, args.min_games, args.patch):
+            print(f"  {r['partner']:<40} {args.metric}={r.get(args.metric)}  games={r['games']}")
+        return
+
+    if args.loadtest:
+        server = None
+        base_url = None
+        if args.http:
+            server = SynergyHTTPServer(svc, args.host, 0)
+            base_url = server.start()
+        try:
+            res = load_test(svc, args.loadtest, base_url=base_url)
+        finally:
+            if server is not None:
+                server.stop()
+        print(json.dumps(res, indent=2))
+        return
+
+    if args.serve:
+        server = SynergyHTTPServer(svc, args.host, args.port)
+        print(f"[QUERY] serving on {server.base_url}")
+        try:
+            server.httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            svc.stop()
+            server.httpd.server_close()
+        return
+
+    print(json.dumps(svc.info(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+import argparse
+import json
+import os
+import random
+from typing import Dict, List, Optional
+
+from unit_vocab import UnitVocab
+
+# =========================================================
+# 0) Synthetic Double Up matches (Riot match-v1 schema)
+# =========================================================
+#
+# Deterministic: match i only depends on (seed, i), so any slice of a
+# corpus can be regenerated or generated in parallel.
+#
+# Boards are drawn from the build templates (core units + fillers) or
+# are random "UNKNOWN" boards, units come from the real Set 16 list.
+# Placements come from a latent team strength = build strengths
+# + a hidden pair synergy term + noise, so the synergy pipeline has
+# something real to find.
+
+UNIT_LIST_PATH = r"C:\Users\Levi\Documents\tft_duo_project\data\unit_list\16.txt"
+BUILDS_PATH = r"C:\Users\Levi\Documents\tft_duo_project\config\builds_set16_16.3_SA.json"
+
+# patch -> share of matches
+PATCH_MIX = {"16.3": 0.85, "16.2": 0.15}
+
+# queue_id -> share of matches (1160 = Double Up, 1100 = ranked solo)
+QUEUE_MIX = {1160: 0.80, 1150: 0.05, 1100: 0.15}
+
+# share of boards built from a template (the rest is a random board)
+TEMPLATE_BOARD_RATE = 0.75
+
+PLATFORM = "EUN1"
+BASE_DATETIME_MS = 1767225600000  # 2026-01-01
+
+TRAITS = [
+    "TFT16_Bilgewater", "TFT16_Demacia", "TFT16_Freljord", "TFT16_Ionia", "TFT16_Ixtal",
+    "TFT16_Noxus", "TFT16_Piltover", "TFT16_ShadowIsles", "TFT16_Shurima", "TFT16_Targon",
+    "TFT16_Void", "TFT16_Yordle", "TFT16_Zaun", "TFT16_Bruiser", "TFT16_Defender",
+    "TFT16_Gunslinger", "TFT16_Invoker", "TFT16_Juggernaut", "TFT16_Longshot", "TFT16_Magus",
+    "TFT16_Slayer", "TFT16_Sorcerer", "TFT16_Vanquisher", "TFT16_Warden",
+]
+
+ITEMS = [
+    "TFT_Item_GuinsoosRageblade", "TFT_Item_InfinityEdge", "TFT_Item_Deathblade",
+    "TFT_Item_JeweledGauntlet", "TFT_Item_WarmogsArmor", "TFT_Item_BrambleVest",
+    "TFT_Item_DragonsClaw", "TFT_Item_GargoyleStoneplate", "TFT_Item_SpearOfShojin",
+    "TFT_Item_Bloodthirster", "TFT_Item_TitansResolve", "TFT_Item_HextechGunblade",
+    "TFT_Item_RabadonsDeathcap", "TFT_Item_ArchangelsStaff", "TFT_Item_SteraksGage",
+]
+
+AUGMENTS = [f"TFT16_Augment_{i:02d}" for i in range(60)]
+
+
+class SyntheticMatchGenerator:
+    def __init__(self, seed: int = 42, unit_list_path: str = UNIT_LIST_PATH,
+                 builds_path: str = BUILDS_PATH, patch_mix: Optional[Dict[str, float]] = None,
+                 queue_mix: Optional[Dict[int, float]] = None):
+        self.seed = seed
+        self.vocab = UnitVocab.from_unit_list(unit_list_path)
+        self.units = list(self.vocab.names)
+
+        with open(builds_path, "r", encoding="utf-8") as f:
+            self.builds = [b for b in json.load(f) if b.get("units")]
+
+        self.patch_mix = patch_mix or PATCH_MIX
+        self.queue_mix = queue_mix or QUEUE_MIX
+
+        # hidden "truth" the pipeline should recover, fixed by the seed
+        rng = random.Random(seed)
+        self.build_strength = [rng.gauss(0.0, 0.6) for _ in self.builds]
+        self.build_weight = [rng.uniform(0.3, 1.5) for _ in self.builds]
+        self.pair_synergy = {}
+        n = len(self.builds)
+        for i in range(n):
+            for j in range(i, n):
+                if rng.random() < 0.15:
+                    self.pair_synergy[(i, j)] = rng.gauss(0.0, 0.8)
+
+    # -----------------------------------------------------
+    # pieces
+    # -----------------------------------------------------
+
+    def _pick(self, rng: random.Random, mix: dict):
+        r = rng.random()
+        acc = 0.0
+        for k, w in mix.items():
+            acc += w
+            if r < acc:
+                return k
+        return k
+
+    def _board(self, rng: random.Random, level: int):
+        """-> (build index or None, unit names)"""
+        if rng.random() < TEMPLATE_BOARD_RATE:
+            bi = rng.choices(range(len(self.builds)), weights=self.build_weight)[0]
+            core = list(dict.fromkeys(self.builds[bi]["units"]))
+            # key units almost always, the rest of the core often
+            keep = [u for k, u in enumerate(core) if rng.random() < (0.95 if k < 3 else 0.7)]
+            fill = [u for u in rng.sample(self.units, level + 4) if u not in keep]
+            return bi, (keep + fill)[:level]
+        return None, rng.sample(self.units, level)
+
+    def _participant(self, rng: random.Random, puuid: str, placement: int, group: int, units: List[str]) -> dict:
+        return {
+            "augments": rng.sample(AUGMENTS, 3),
+            "companion": {
+                "content_ID": f"{rng.getrandbits(128):032x}",
+                "item_ID": rng.randint(1, 99999),
+                "skin_ID": rng.randint(1, 60),
+                "species": rng.choice(["PetChibiJinx", "PetTFTAvatar", "PetGloop", "PetSprite"]),
+            },
+            "gold_left": rng.randint(0, 60),
+            "last_round": rng.randint(20, 40),
+            "level": len(units),
+            "missions": {"PlayerScore2": rng.randint(0, 200)},
+            "partner_group_id": group,
+            "placement": placement,
+            "players_eliminated": rng.randint(0, 2),
+            "puuid": puuid,
+            "riotIdGameName": f"Player{rng.randint(0, 99999)}",
+            "riotIdTagline": rng.choice(["EUNE", "EUW", "HUN", "0001"]),
+            "time_eliminated": round(rng.uniform(900.0, 2400.0), 3),
+            "total_damage_to_players": rng.randint(0, 200),
+            "traits": [
+                {
+                    "name": t,
+                    "num_units": rng.randint(1, 6),
+                    "style": rng.randint(0, 4),
+                    "tier_current": rng.randint(0, 3),
+                    "tier_total": rng.randint(1, 4),
+                }
+                for t in rng.sample(TRAITS, rng.randint(6, 12))
+            ],
+            "units": [
+                {
+                    "character_id": u,
+                    "itemNames": rng.sample(ITEMS, rng.randint(0, 3)),
+                    "name": "",
+                    "rarity": max(0, self.vocab.costs[self.vocab.get(u)] - 1) if self.vocab.get(u) is not None else 0,
+                    "tier": rng.choice([1, 2, 2, 2, 3]),
+                }
+                for u in units
+            ],
+            "win": placement <= 4,
+        }
+
+    def _puuid(self, rng: random.Random) -> str:
+        # real puuids are 78 chars; small pool so duos / players repeat
+        pid = rng.randint(0, 20000)
+        return f"synthetic-{self.seed}-{pid:06d}".ljust(78, "x")
+
+    # -----------------------------------------------------
+    # match
+    # -----------------------------------------------------
+
+    def match(self, i: int) -> dict:
+        rng = random.Random(self.seed * 1_000_003 + i)
+
+        patch = self._pick(rng, self.patch_mix)
+        queue_id = self._pick(rng, self.queue_mix)
+        match_id = f"{PLATFORM}_{4000000000 + i}"
+
+        # 4 teams of 2, latent team strength -> team rank
+        teams = []
+        for group in range(1, 5):
+            level_a = rng.choice([7, 8, 8, 9, 9, 10])
+            level_b = rng.choice([7, 8, 8, 9, 9, 10])
+            ba, ua = self._board(rng, level_a)
+            bb, ub = self._board(rng, level_b)
+
+            strength = rng.gauss(0.0, 1.0)
+            for b in (ba, bb):
+                if b is not None:
+                    strength += self.build_strength[b]
+            if ba is not None and bb is not None:
+                strength += self.pair_synergy.get((min(ba, bb), max(ba, bb)), 0.0)
+
+            teams.append((strength, group, ua, ub))
+
+        teams.sort(key=lambda t: -t[0])
+
+        participants = []
+        for team_rank, (_, group, ua, ub) in enumerate(teams, start=1):
+            first = rng.random() < 0.5
+            pl_a = 2 * team_rank - 1 if first else 2 * team_rank
+            pl_b = 2 * team_rank if first else 2 * team_rank - 1
+            participants.append(self._participant(rng, self._puuid(rng), pl_a, group, ua))
+            participants.append(self._participant(rng, self._puuid(rng), pl_b, group, ub))
+        rng.shuffle(participants)
+
+        game_datetime = BASE_DATETIME_MS + i * 37_000 + rng.randint(0, 30_000)
+        return {
+            "metadata": {
+                "data_version": "6",
+                "match_id": match_id,
+                "participants": [p["puuid"] for p in participants],
+            },
+            "info": {
+                "endOfGameResult": "GameComplete",
+                "gameCreation": game_datetime - 2_100_000,
+                "gameId": 4000000000 + i,
+                "game_datetime": game_datetime,
+                "game_length": round(rng.uniform(1800.0, 2500.0), 6),
+                "game_version": f"Linux Version {patch}.{rng.randint(600, 699)}.1234 (Jan 20 2026/12:00:00) [PUBLIC] <Releases/{patch}>",
+                "mapId": 22,
+                "participants": participants,
+                "queueId": queue_id,
+                "queue_id": queue_id,
+                "tft_game_type": "pairs" if queue_id in (1150, 1160) else "standard",
+                "tft_set_core_name": "TFTSet16",
+                "tft_set_number": 16,
+            },
+        }
+
+    def match_bytes(self, i: int) -> bytes:
+        return json.dumps(self.match(i), ensure_ascii=False).encode("utf-8")
+
+    # -----------------------------------------------------
+    # corpus
+    # -----------------------------------------------------
+
+    def write_corpus(self, out_dir: str, n: int, start: int = 0, skip_existing: bool = True) -> int:
+        """Write matches start..start+n-1 as <match_id>.json, returns files written."""
+        os.makedirs(out_dir, exist_ok=True)
+        written = 0
+        for i in range(start, start + n):
+            path = os.path.join(out_dir, f"{PLATFORM}_{4000000000 + i}.json")
+            if skip_existing and os.path.exists(path):
+                continue
+            with open(path, "wb") as f:
+                f.write(self.match_bytes(i))
+            written += 1
+        return written
+
+
+# =========================================================
+# 1) MAIN
+# =========================================================
+
+def main():
+    ap = argparse.ArgumentParser(description="Generate synthetic Double Up matches (Riot schema).")
+    ap.add_argument("out_dir")
+    ap.add_argument("n", type=int)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--start", type=int, default=0)
+    ap.add_argument("--unit-list", default=UNIT_LIST_PATH)
+    ap.add_argument("--builds", default=BUILDS_PATH)
+    args = ap.parse_args()
+
+    gen = SyntheticMatchGenerator(args.seed, args.unit_list, args.builds)
+    written = gen.write_corpus(args.out_dir, args.n, start=args.start)
+    print(f"[DONE] {written} matches written to {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
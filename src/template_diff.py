@@ -0,0 +1,274 @@
+import argparse
+import json
+import os
+import time
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+import make_pair_summaries as mps
+from classifier_sweep import CACHE_PATH, classify, load_cache, template_arrays
+from make_pair_summaries import compile_builds, load_json
+from synergy_MVP import DOUBLE_UP_QUEUE_ID, MIN_GAMES, aggregate_pairs, compute_build_marginals, \
+    safe_get_build_name, score_pairs, team_rank_to_points
+
+# =========================================================
+# 0) Template diff (reclassification impact of a template edit)
+# =========================================================
+#
+# Editing builds_set16_16.3_SA.json used to mean rerunning
+# make_pair_summaries + synergy_MVP to see what changed. This reads the
+# board cache of classifier_sweep.py (encoded once from the raw corpus,
+# no JSON parsing here), classifies every board under both template files
+# with the current classifier constants and reports:
+#
+#   board_moves.csv    old build -> new build, boards moved (+ the most
+#                      common board of the move, decoded)
+#   build_counts.csv   boards per build, old / new / delta (UNKNOWN first)
+#   pair_changes.csv   synergy_MVP's ranked pairs (games >= MIN_GAMES,
+#                      synergy_score order) under both: rank / score
+#                      before and after, entered / dropped / moved
+#   summary.json
+#
+# The duos are formed from the cached rows like make_pair_summaries does
+# (placements 1-2, 3-4, 5-6, 7-8), with synergy_MVP's queue filter.
+#
+# --match MATCH_ID prints the 8 boards of one match under both files
+# (what test_single_match.py does for one template file).
+
+OUT_DIR = r"C:\Users\Levi\Documents\tft_duo_project\output\template_diff"
+
+# ranked pairs listed in the console summary
+TOP_N = 20
+
+# 4 duos per match: placement columns (0-based) + team_rank
+PAIR_DEFS = ((0, 1, 1), (2, 3, 2), (4, 5, 3), (6, 7, 4))
+
+
+# =========================================================
+# 1) CLASSIFY
+# =========================================================
+
+def classify_both(cache: Dict[str, Any], old_builds: List[dict], new_builds: List[dict]) -> Tuple[np.ndarray, np.ndarray, List[str], List[str]]:
+    """-> per distinct board: old / new label index (0 = UNKNOWN), label names"""
+    vocab = cache["vocab"]
+    compiled = [compile_builds(old_builds, vocab), compile_builds(new_builds, vocab)]
+    n_words = max(cache["boards"].shape[1], (len(vocab) + 63) // 64)
+    boards = cache["boards"]
+    if boards.shape[1] < n_words:
+        boards = np.pad(boards, ((0, 0), (0, n_words - boards.shape[1])))
+
+    setting = [(mps.KEY_UNITS_N, mps.KEY_UNITS_MIN_HITS, mps.MIN_HITS_RATIO, mps.MIN_HITS_FLOOR)]
+    out = []
+    for comp in compiled:
+        tpl = template_arrays(comp, n_words, [mps.KEY_UNITS_N])
+        labels = classify(boards, tpl, setting)[0].astype(np.int32) + 1
+        # same names as the synergy output
+        names = [safe_get_build_name(mps.UNKNOWN_BUILD)] + [safe_get_build_name(b) for b in comp]
+        out.append((labels, names))
+    return out[0][0], out[1][0], out[0][1], out[1][1]
+
+
+# =========================================================
+# 2) SYNERGY UNDER ONE TEMPLATE FILE
+# =========================================================
+
+def match_grid(cache: Dict[str, Any], patch: str | None, queue_id: int | None) -> np.ndarray:
+    """-> (matches, 8) distinct board index per placement"""
+    keep = np.ones(len(cache["board"]), dtype=bool)
+    if patch:
+        keep &= cache["patch"] == patch
+    if queue_id is not None:
+        keep &= cache["queue_id"] == queue_id
+    # the cache stores every match as 8 consecutive rows, placements 1..8
+    board = cache["board"][keep].reshape(-1, 8)
+    placement = cache["placement"][keep].reshape(-1, 8)
+    if not (placement == np.arange(1, 9)).all():
+        raise ValueError("board cache rows are not 8 placements per match, rebuild it")
+    return board
+
+
+def pair_synergies(grid: np.ndarray, labels: np.ndarray, names: List[str]) -> pd.DataFrame:
+    """compute_pair_synergies on the duos of `grid` labelled with `labels`"""
+    name_arr = np.asarray(names, dtype=object)
+    lab = labels[grid]
+    parts = []
+    for a, b, team_rank in PAIR_DEFS:
+        na, nb = name_arr[lab[:, a]], name_arr[lab[:, b]]
+        swap = na > nb
+        parts.append(pd.DataFrame({
+            "build_a": np.where(swap, nb, na),
+            "build_b": np.where(swap, na, nb),
+            "team_rank": team_rank,
+            "team_points": team_rank_to_points(team_rank),
+        }))
+    df_pairs = pd.concat(parts, ignore_index=True)
+    global_mean = float(df_pairs["team_points"].mean())
+    return score_pairs(aggregate_pairs(df_pairs), compute_build_marginals(df_pairs), global_mean)
+
+
+def ranked(df_syn: pd.DataFrame, min_games: int) -> pd.DataFrame:
+    r = df_syn[df_syn["games"] >= min_games].sort_values("synergy_score", ascending=False).reset_index(drop=True)
+    r["rank"] = np.arange(1, len(r) + 1)
+    return r[["build_a", "build_b", "games", "eb_points", "synergy_score", "rank"]]
+
+
+def pair_changes(old: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    df = old.merge(new, on=["build_a", "build_b"], how="outer", suffixes=("_old", "_new"))
+    df["rank_delta"] = df["rank_old"] - df["rank_new"]  # > 0: moved up
+    df["score_delta"] = df["synergy_score_new"] - df["synergy_score_old"]
+    df["status"] = np.select(
+        [df["rank_old"].isna(), df["rank_new"].isna(), df["rank_delta"] != 0, df["games_old"] != df["games_new"]],
+        ["entered", "dropped", "moved", "same_rank"], default="unchanged")
+    cols = ["build_a", "build_b", "status", "rank_old", "rank_new", "rank_delta", "games_old", "games_new",
+            "synergy_score_old", "synergy_score_new", "score_delta", "eb_points_old", "eb_points_new"]
+    return df[cols].sort_values(["rank_new", "rank_old"], na_position="last").reset_index(drop=True)
+
+
+# =========================================================
+# 3) REPORT
+# =========================================================
+
+def board_moves(cache: Dict[str, Any], weights: np.ndarray, old_lab: np.ndarray, new_lab: np.ndarray,
+                old_names: List[str], new_names: List[str]) -> pd.DataFrame:
+    moved = np.flatnonzero((weights > 0) & (np.asarray(old_names, dtype=object)[old_lab]
+                                            != np.asarray(new_names, dtype=object)[new_lab]))
+    if not len(moved):
+        return pd.DataFrame(columns=["old_build", "new_build", "boards", "distinct_boards", "example_board"])
+    d = pd.DataFrame({"old": old_lab[moved], "new": new_lab[moved], "w": weights[moved], "board": moved})
+    rows = []
+    for (o, n), g in d.groupby(["old", "new"]):
+        top = int(g.loc[g["w"].idxmax(), "board"])
+        rows.append({
+            "old_build": old_names[o],
+            "new_build": new_names[n],
+            "boards": int(g["w"].sum()),
+            "distinct_boards": len(g),
+            "example_board": " ".join(cache["vocab"].decode_board(_board_int(cache, top))),
+        })
+    return pd.DataFrame(rows).sort_values("boards", ascending=False).reset_index(drop=True)
+
+
+def build_counts(weights: np.ndarray, old_lab: np.ndarray, new_lab: np.ndarray,
+                 old_names: List[str], new_names: List[str]) -> pd.DataFrame:
+    old = pd.Series(np.bincount(old_lab, weights=weights, minlength=len(old_names)), index=old_names).groupby(level=0).sum()
+    new = pd.Series(np.bincount(new_lab, weights=weights, minlength=len(new_names)), index=new_names).groupby(level=0).sum()
+    df = pd.DataFrame({"boards_old": old, "boards_new": new}).fillna(0).astype(np.int64)
+    df["delta"] = df["boards_new"] - df["boards_old"]
+    df = df.rename_axis("build").reset_index()
+    unknown = old_names[0]
+    df["_u"] = df["build"] != unknown
+    return df.sort_values(["_u", "boards_new"], ascending=[True, False]).drop(columns="_u").reset_index(drop=True)
+
+
+def _board_int(cache: Dict[str, Any], i: int) -> int:
+    mask = 0
+    for k, w in enumerate(cache["boards"][i]):
+        mask |= int(w) << (64 * k)
+    return mask
+
+
+def show_match(cache: Dict[str, Any], match_id: str, old_lab: np.ndarray, new_lab: np.ndarray,
+               old_names: List[str], new_names: List[str]) -> None:
+    rows = np.flatnonzero(cache["match_id"] == match_id)
+    if not len(rows):
+        print(f"[MATCH] {match_id} is not in the board cache")
+        return
+    print(f"[MATCH] {match_id} patch={cache['patch'][rows[0]]} queue_id={cache['queue_id'][rows[0]]}")
+    for r in rows:
+        b = int(cache["board"][r])
+        old, new = old_names[old_lab[b]], new_names[new_lab[b]]
+        mark = "  *" if old != new else ""
+        print(f"  {int(cache['placement'][r])}. {old}  ->  {new}{mark}")
+        print(f"     {' '.join(cache['vocab'].decode_board(_board_int(cache, b)))}")
+
+
+# =========================================================
+# 4) MAIN
+# =========================================================
+
+def main():
+    ap = argparse.ArgumentParser(description="Reclassification impact of a template file edit (board cache based).")
+    ap.add_argument("old", help="current template file (e.g. BUILDS_PATH)")
+    ap.add_argument("new", help="edited template file")
+    ap.add_argument("--cache", default=CACHE_PATH, help="board cache (classifier_sweep.py cache)")
+    ap.add_argument("--out-dir", default=OUT_DIR)
+    ap.add_argument("--patch", default=None, help="only matches of this patch")
+    ap.add_argument("--queue-id", type=int, default=DOUBLE_UP_QUEUE_ID, help="synergy_MVP's queue filter")
+    ap.add_argument("--min-games", type=int, default=MIN_GAMES)
+    ap.add_argument("--match", default=None, help="also print one match's boards under both files")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    cache = load_cache(args.cache)
+    old_builds, new_builds = load_json(args.old), load_json(args.new)
+    t1 = time.perf_counter()
+
+    old_lab, new_lab, old_names, new_names = classify_both(cache, old_builds, new_builds)
+    t2 = time.perf_counter()
+
+    grid = match_grid(cache, args.patch, args.queue_id)
+    weights = np.bincount(grid.ravel(), minlength=len(cache["boards"])).astype(np.float64)
+    total = weights.sum()
+    if not total:
+        print("[ERROR] No matches in the board cache for these filters.")
+        return
+    print(f"[LOAD] {len(grid)} matches, {int(total)} boards ({t1 - t0:.2f}s), classified twice ({t2 - t1:.2f}s)")
+
+    df_moves = board_moves(cache, weights, old_lab, new_lab, old_names, new_names)
+    df_counts = build_counts(weights, old_lab, new_lab, old_names, new_names)
+
+    old_rank = ranked(pair_synergies(grid, old_lab, old_names), args.min_games)
+    new_rank = ranked(pair_synergies(grid, new_lab, new_names), args.min_games)
+    df_pairs = pair_changes(old_rank, new_rank)
+    t3 = time.perf_counter()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    df_moves.to_csv(os.path.join(args.out_dir, "board_moves.csv"), index=False, encoding="utf-8-sig")
+    df_counts.to_csv(os.path.join(args.out_dir, "build_counts.csv"), index=False, encoding="utf-8-sig")
+    df_pairs.to_csv(os.path.join(args.out_dir, "pair_changes.csv"), index=False, encoding="utf-8-sig")
+
+    unk_old = float(weights[old_lab == 0].sum() / total)
+    unk_new = float(weights[new_lab == 0].sum() / total)
+    moved = int(df_moves["boards"].sum()) if len(df_moves) else 0
+    status = df_pairs["status"].value_counts().to_dict()
+    summary = {
+        "old": args.old,
+        "new": args.new,
+        "matches": len(grid),
+        "boards": int(total),
+        "unknown_rate_old": round(unk_old, 6),
+        "unknown_rate_new": round(unk_new, 6),
+        "boards_moved": moved,
+        "boards_moved_share": round(moved / total, 6),
+        "ranked_pairs_old": len(old_rank),
+        "ranked_pairs_new": len(new_rank),
+        "pair_status": {k: int(v) for k, v in status.items()},
+        "seconds": round(t3 - t0, 3),
+    }
+    with open(os.path.join(args.out_dir, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"[UNKNOWN] {unk_old:.2%} -> {unk_new:.2%}")
+    print(f"[MOVED] {moved} boards ({moved / total:.2%})")
+    for r in df_moves.head(10).to_dict(orient="records"):
+        print(f"  {r['boards']:>7}  {r['old_build']}  ->  {r['new_build']}")
+    print(f"[PAIRS] ranked (games >= {args.min_games}): {len(old_rank)} -> {len(new_rank)}  "
+          + ", ".join(f"{k}={v}" for k, v in sorted(status.items())))
+    top = df_pairs[df_pairs["rank_new"] <= TOP_N]
+    for r in top.to_dict(orient="records"):
+        was = "new" if r["rank_old"] != r["rank_old"] else f"{int(r['rank_old'])}"
+        print(f"  {int(r['rank_new']):>3} (was {was:>4})  {r['build_a']} + {r['build_b']}  "
+              f"score={r['synergy_score_new']:.3f}  n={int(r['games_new'])}")
+    gone = df_pairs[(df_pairs["status"] == "dropped") & (df_pairs["rank_old"] <= TOP_N)]
+    for r in gone.to_dict(orient="records"):
+        print(f"  --- (was {int(r['rank_old']):>4})  {r['build_a']} + {r['build_b']}  dropped")
+
+    if args.match:
+        show_match(cache, args.match, old_lab, new_lab, old_names, new_names)
+    print(f"[DONE] -> {args.out_dir} ({t3 - t0:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import argparse
+import json
+import os
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from synergy_MVP import DOUBLE_UP_QUEUE_ID, EB_M, team_rank_to_points
+from unit_vocab import UnitVocab, vocab_path_for
+
+# =========================================================
+# 0) Unit-level synergy (no build templates)
+# =========================================================
+#
+# Every team = two sparse rows over the unit vocabulary:
+#   A[t, i] = 1  unit i on partner A's board
+#   B[t, j] = 1  unit j on partner B's board
+# (partner order doesn't matter: a team counts for (i, j) if i is on one
+# board and j on the other, either way round)
+#
+# One matrix product per statistic over the whole corpus:
+#   games(i, j)   ~ A^T B
+#   points(i, j)  ~ A^T diag(team_points) B
+#   top2(i, j)    ~ A^T diag(team_rank <= 2) B
+# plus the same per unit for the marginals. Boards come from board_mask,
+# the ids from the vocabulary saved next to the pair summaries
+# (seeded from data/unit_list/16.txt).
+#
+# Metrics follow synergy_MVP: EB-shrunk avg points, top2 ratio and
+# lift_top2 = top2(i, j) / (top2(i) * top2(j)).
+
+PAIR_FILE = r"C:\Users\Levi\Documents\tft_duo_project\data\processed\pair_summaries_SA.jsonl"
+OUT_DIR = r"C:\Users\Levi\Documents\tft_duo_project\output\unit_synergy"
+
+MIN_GAMES = 50
+TOPN = 200
+
+# team_rank -> team_points of synergy_MVP as a lookup array (index 0 unused)
+RANK_POINTS = np.array([0] + [team_rank_to_points(r) for r in range(1, 5)], dtype=np.float64)
+
+
+def load_teams(path: str, queue_id: int | None = DOUBLE_UP_QUEUE_ID) -> Tuple[List[int], List[int], np.ndarray]:
+    """-> board masks of partner A, partner B, team_rank per team"""
+    masks_a, masks_b, ranks = [], [], []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            r = json.loads(line)
+            if queue_id is not None and r.get("queue_id") != queue_id:
+                continue
+            members = r.get("members") or []
+            if len(members) != 2 or r.get("team_rank") is None:
+                continue
+            masks_a.append(int(members[0].get("board_mask") or 0))
+            masks_b.append(int(members[1].get("board_mask") or 0))
+            ranks.append(int(r["team_rank"]))
+    return masks_a, masks_b, np.asarray(ranks, dtype=np.int8)
+
+
+def boards_to_csr(masks: List[int], vocab: UnitVocab) -> sp.csr_matrix:
+    indptr = [0]
+    indices: List[int] = []
+    for m in masks:
+        indices.extend(vocab.unit_ids(m))
+        indptr.append(len(indices))
+    data = np.ones(len(indices), dtype=np.float64)
+    return sp.csr_matrix((data, np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int64)),
+                         shape=(len(masks), len(vocab)))
+
+
+def _either_way(A: sp.csr_matrix, B: sp.csr_matrix, w: np.ndarray) -> sp.csr_matrix:
+    """
+    sum of w over teams with (i on A and j on B) or (j on A and i on B):
+    A^T W B + its transpose - the teams counted twice, i.e. with both units
+    on both boards (C = A * B elementwise). The diagonal comes out right too.
+    """
+    W = sp.diags(w)
+    m = (A.T @ W @ B).tocsr()
+    C = A.multiply(B).tocsr()
+    return (m + m.T - C.T @ W @ C).tocsr()
+
+
+def cooccurrence(A: sp.csr_matrix, B: sp.csr_matrix, ranks: np.ndarray) -> Dict[str, sp.csr_matrix]:
+    points = RANK_POINTS[ranks]
+    top2 = (ranks <= 2).astype(np.float64)
+    return {
+        "games": _either_way(A, B, np.ones(len(ranks))),
+        "points": _either_way(A, B, points),
+        "top2": _either_way(A, B, top2),
+    }
+
+
+def unit_marginals(A: sp.csr_matrix, B: sp.csr_matrix, ranks: np.ndarray) -> Dict[str, np.ndarray]:
+    """per unit over teams that have it on either board"""
+    P = ((A + B) > 0).astype(np.float64)
+    points = RANK_POINTS[ranks]
+    top2 = (ranks <= 2).astype(np.float64)
+    games = np.asarray(P.sum(axis=0)).ravel()
+    return {
+        "games": games,
+        "points": P.T @ points,
+        "top2": P.T @ top2,
+    }
+
+
+def unit_pair_table(co: Dict[str, sp.csr_matrix], marg: Dict[str, np.ndarray], vocab: UnitVocab,
+                    global_mean: float, min_games: int = MIN_GAMES, eb_m: float = EB_M) -> pd.DataFrame:
+    games = sp.triu(co["games"]).tocoo()
+    keep = games.data >= min_games
+    i = games.row[keep]
+    j = games.col[keep]
+    n = games.data[keep]
+
+    pts = np.asarray(co["points"][i, j]).ravel()
+    t2 = np.asarray(co["top2"][i, j]).ravel()
+
+    avg_points = pts / n
+    eb_points = (n * avg_points + eb_m * global_mean) / (n + eb_m)
+    top2 = t2 / n
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p_top2 = marg["top2"] / marg["games"]
+        exp_top2 = p_top2[i] * p_top2[j]
+        lift_top2 = np.where(exp_top2 > 1e-9, top2 / exp_top2, np.nan)
+        log_lift_top2 = np.where(lift_top2 > 1e-12, np.log(lift_top2), np.nan)
+        avg_i = marg["points"][i] / marg["games"][i]
+        avg_j = marg["points"][j] / marg["games"][j]
+
+    names = np.asarray(vocab.names, dtype=object)
+    costs = np.asarray(vocab.costs)
+    return pd.DataFrame({
+        "unit_a": names[i],
+        "unit_b": names[j],
+        "cost_a": costs[i],
+        "cost_b": costs[j],
+        "games": n.astype(np.int64),
+        "avg_team_points": avg_points,
+        "eb_points": eb_points,
+        "top2": top2,
+        "lift_top2": lift_top2,
+        "log_lift_top2": log_lift_top2,
+        # pair vs the average of the two units' own marginals
+        "delta_points": avg_points - (avg_i + avg_j) / 2,
+    })
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Unit-level co-occurrence synergy (sparse matrices).")
+    ap.add_argument("--pairs", default=PAIR_FILE)
+    ap.add_argument("--out-dir", default=OUT_DIR)
+    ap.add_argument("--min-games", type=int, default=MIN_GAMES)
+    ap.add_argument("--topn", type=int, default=TOPN)
+    ap.add_argument("--save-matrices", action="store_true", help="also write the co-occurrence matrices (.npz)")
+    args = ap.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    vocab = UnitVocab.load(vocab_path_for(args.pairs))
+
+    t0 = time.perf_counter()
+    masks_a, masks_b, ranks = load_teams(args.pairs)
+    t1 = time.perf_counter()
+    print(f"[LOAD] {len(ranks)} teams, {len(vocab)} units ({t1 - t0:.2f}s)")
+    if not len(ranks):
+        print("[ERROR] No Double Up teams in the input.")
+        return
+
+    A = boards_to_csr(masks_a, vocab)
+    B = boards_to_csr(masks_b, vocab)
+    del masks_a, masks_b
+    co = cooccurrence(A, B, ranks)
+    marg = unit_marginals(A, B, ranks)
+    global_mean = float(RANK_POINTS[ranks].mean())
+    t2 = time.perf_counter()
+    print(f"[SPARSE] co-occurrence: {co['games'].nnz} unit pairs ({t2 - t1:.2f}s)")
+
+    df = unit_pair_table(co, marg, vocab, global_mean, args.min_games)
+    df.sort_values("eb_points", ascending=False).to_csv(
+        os.path.join(args.out_dir, "unit_pairs_all.csv"), index=False, encoding="utf-8-sig")
+    df.sort_values("eb_points", ascending=False).head(args.topn).to_csv(
+        os.path.join(args.out_dir, "unit_pairs_top_eb_points.csv"), index=False, encoding="utf-8-sig")
+    df.sort_values("lift_top2", ascending=False).head(args.topn).to_csv(
+        os.path.join(args.out_dir, "unit_pairs_top_lift_top2.csv"), index=False, encoding="utf-8-sig")
+
+    units = pd.DataFrame({
+        "unit": vocab.names,
+        "cost": vocab.costs,
+        "games": marg["games"].astype(np.int64),
+        "avg_team_points": np.divide(marg["points"], marg["games"], out=np.full(len(vocab), np.nan), where=marg["games"] > 0),
+        "top2": np.divide(marg["top2"], marg["games"], out=np.full(len(vocab), np.nan), where=marg["games"] > 0),
+    })
+    units.sort_values("games", ascending=False).to_csv(
+        os.path.join(args.out_dir, "unit_marginals.csv"), index=False, encoding="utf-8-sig")
+
+    if args.save_matrices:
+        for k, m in co.items():
+            sp.save_npz(os.path.join(args.out_dir, f"unit_cooc_{k}.npz"), m)
+
+    print(f"[DONE] {len(df)} unit pairs with >= {args.min_games} games -> {args.out_dir} "
+          f"({time.perf_counter() - t0:.2f}s total)")
+    for _, r in df.sort_values("eb_points", ascending=False).head(10).iterrows():
+        print(f"  {r['unit_a']:<22} + {r['unit_b']:<22} eb={r['eb_points']:.3f} lift_top2={r['lift_top2']:.2f} games={r['games']}")
+
+
+if __name__ == "__main__":
+    main()
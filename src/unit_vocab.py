@@ -0,0 +1,132 @@
+import json
+import os
+from typing import Dict, Iterable, List, Optional
+
+# =========================================================
+# 0) Unit vocabulary
+# =========================================================
+#
+# Every stage used to carry unit names around as strings
+# ("TFT16_JarvanIV" in every raw file, board list and output row).
+# The vocabulary maps each unit to a small int id, seeded from
+# data/unit_list/<set>.txt (grouped by cost) and extended on the fly
+# for units the list doesn't know yet.
+#
+# A board is a python int used as a bitmask: bit i set <=> unit id i
+# on board. Set16 has ~100 units, so a board fits in 2 machine words
+# and build matching becomes `(board & template).bit_count()`.
+
+UNIT_LIST_PATH = r"C:\Users\Levi\Documents\tft_duo_project\data\unit_list\16.txt"
+
+UNKNOWN_COST = 0
+
+
+def norm_unit(name: str) -> str:
+    return name.strip().lower()
+
+
+class UnitVocab:
+    def __init__(self):
+        self.names: List[str] = []        # id -> name (first spelling seen)
+        self.costs: List[int] = []        # id -> cost (0 = not in unit list)
+        self.ids: Dict[str, int] = {}     # normalized name -> id
+        self._raw_ids: Dict[str, int] = {}  # exact spelling -> id (skips lower())
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    # -----------------------------------------------------
+    # building
+    # -----------------------------------------------------
+
+    @classmethod
+    def from_unit_list(cls, path: str = UNIT_LIST_PATH) -> "UnitVocab":
+        """
+        Unit list format: a cost number on its own line, then the units
+        of that cost, one per line (blank lines ignored).
+        """
+        v = cls()
+        cost = UNKNOWN_COST
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                s = line.strip()
+                if not s:
+                    continue
+                if s.isdigit():
+                    cost = int(s)
+                    continue
+                v.intern(s, cost)
+        return v
+
+    def intern(self, name: str, cost: int = UNKNOWN_COST) -> int:
+        uid = self._raw_ids.get(name)
+        if uid is not None:
+            return uid
+
+        key = norm_unit(name)
+        uid = self.ids.get(key)
+        if uid is None:
+            uid = len(self.names)
+            self.ids[key] = uid
+            self.names.append(name.strip())
+            self.costs.append(cost)
+
+        self._raw_ids[name] = uid
+        return uid
+
+    def get(self, name: str) -> Optional[int]:
+        uid = self._raw_ids.get(name)
+        if uid is None:
+            uid = self.ids.get(norm_unit(name))
+        return uid
+
+    # -----------------------------------------------------
+    # boards
+    # -----------------------------------------------------
+
+    def encode_board(self, units: Iterable[str]) -> int:
+        mask = 0
+        for u in units:
+            if u:
+                mask |= 1 << self.intern(u)
+        return mask
+
+    def unit_ids(self, mask: int) -> List[int]:
+        out = []
+        while mask:
+            low = mask & -mask
+            out.append(low.bit_length() - 1)
+            mask ^= low
+        return out
+
+    def decode_board(self, mask: int) -> List[str]:
+        return [self.names[i] for i in self.unit_ids(mask)]
+
+    # -----------------------------------------------------
+    # persistence (written next to every output that holds masks)
+    # -----------------------------------------------------
+
+    def to_dict(self) -> dict:
+        return {"names": self.names, "costs": self.costs}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "UnitVocab":
+        v = cls()
+        for name, cost in zip(d.get("names", []), d.get("costs", [])):
+            v.intern(name, int(cost))
+        return v
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> "UnitVocab":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+def vocab_path_for(data_path: str) -> str:
+    """pair_summaries_SA.jsonl -> pair_summaries_SA.units.json"""
+    return os.path.splitext(data_path)[0] + ".units.json"
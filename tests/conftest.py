@@ -0,0 +1,83 @@
+import os
+import random
+import sys
+
+import pytest
+
+# src/ scripts import each other by module name and config.* from the project root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for p in (ROOT, os.path.join(ROOT, "src")):
+    if p not in sys.path:
+        sys.path.insert(0, p)
+
+UNIT_LIST_PATH = os.path.join(ROOT, "data", "unit_list", "16.txt")
+BUILDS_PATH = os.path.join(ROOT, "config", "builds_set16_16.3_SA.json")
+
+
+@pytest.fixture(scope="session")
+def synth():
+    from synth_matches import SyntheticMatchGenerator
+    return SyntheticMatchGenerator(seed=7, unit_list_path=UNIT_LIST_PATH, builds_path=BUILDS_PATH)
+
+
+def pair_rows(n_matches, seed=0, n_builds=12, n_players=200):
+    """
+    make_pair_summaries-shaped rows (4 duos per match) over a few builds,
+    some UNKNOWN, other queues and patches mixed in.
+    """
+    rng = random.Random(seed)
+    builds = [(f"b{i:02d}", f"Build {i:02d}") for i in range(n_builds)] + [("UNKNOWN", "UNKNOWN")]
+    rows = []
+    for i in range(n_matches):
+        match_id = f"EUN1_{4000000000 + i}"
+        queue_id = rng.choice((1160, 1160, 1160, 1100))
+        patch = rng.choice(("16.3", "16.3", "16.2"))
+        dt = 1767225600000 + i * 60000
+        for team_rank in range(1, 5):
+            members = []
+            for slot in range(2):
+                bid, name = rng.choice(builds)
+                members.append({"puuid": f"p{rng.randrange(n_players)}", "placement": 2 * team_rank - 1 + slot,
+                                "team_rank": team_rank, "build_id": bid, "build_name": name,
+                                "score": 0.25, "matched": 4, "size": 8,
+                                "board_mask": rng.getrandbits(100), "matched_mask": rng.getrandbits(8)})
+            rows.append({"match_id": match_id, "game_datetime": dt, "queue_id": queue_id, "patch": patch,
+                         "team_rank": team_rank, "team_bucket": team_rank,
+                         "pair_key": f"{2 * team_rank - 1}-{2 * team_rank}", "members": members})
+    return rows
+
+
+def boards(builds, units, n, seed):
+    """Template cores with units dropped / swapped / re-cased, plus random boards."""
+    rng = random.Random(seed)
+    for _ in range(n):
+        if rng.random() < 0.7:
+            core = [u for u in rng.choice(builds)["units"] if rng.random() < 0.8]
+            extra = rng.sample(units, rng.randint(0, 5))
+            board = [u.upper() if rng.random() < 0.1 else u for u in core + extra]
+        else:
+            board = rng.sample(units, rng.randint(0, 10))
+        rng.shuffle(board)
+        yield board + ([""] if rng.random() < 0.05 else [])
+
+
+@pytest.fixture()
+def crawler(monkeypatch, tmp_path):
+    """crawler module with every path in tmp_path, no sleeps, metrics kept in memory"""
+    monkeypatch.setenv("RIOT_API_KEY", "RGAPI-test")
+    import crawler
+    import config.crawl_config as cfg
+    from crawl_metrics import CrawlMetrics
+
+    for k, v in {"STATE_PATH": str(tmp_path / "state" / "crawler_state.json"),
+                 "RAW_DIR": str(tmp_path / "raw"),
+                 "FRONTIER_DIR": str(tmp_path / "state" / "frontier"),
+                 "METRICS_DIR": None,
+                 "SLEEP_SECONDS": 0.0,
+                 "CONTROL_ENABLED": False,
+                 "WRITER_ENABLED": False,
+                 "LIVE_SYNERGY": False,
+                 "MATCHLIST_CACHE_PATH": None}.items():
+        monkeypatch.setattr(cfg, k, v)
+    monkeypatch.setattr(crawler, "METRICS", CrawlMetrics(None))
+    return crawler
@@ -0,0 +1,108 @@
+import math
+import os
+
+import pytest
+
+from conftest import ROOT, UNIT_LIST_PATH, boards
+from make_pair_summaries import (KEY_UNITS_MIN_HITS, KEY_UNITS_N, compile_builds, identify_build,
+                                 identify_build_mask, load_json, min_required_hits)
+from unit_vocab import UnitVocab
+
+TEMPLATES = ["builds_set16_16.3_S.json", "builds_set16_16.3_SA.json", "builds_set16_16._all.json"]
+
+
+def reference_identify_build(board_units, builds):
+    """identify_build before the bitmask rewrite (name sets), the oracle for the tests."""
+    board = set(u.strip().lower() for u in board_units if u)
+    best = None
+    best_from_key_pool = False
+
+    for b in builds:
+        units = b.get("units", [])
+        if not units:
+            continue
+        clean = list(dict.fromkeys(units))
+        clean_norm = [u.strip().lower() for u in clean if u]
+        size = len(clean_norm)
+        if size == 0:
+            continue
+
+        key_n = min(KEY_UNITS_N, size)
+        key_hits = sum(1 for u in clean_norm[:key_n] if u in board)
+        key_ratio = key_hits / key_n if key_n > 0 else 0.0
+        is_key_ok = (key_hits >= KEY_UNITS_MIN_HITS)
+
+        matched_units = [clean[i] for i, u in enumerate(clean_norm) if u in board]
+        matched = len(matched_units)
+        if matched < min_required_hits(size):
+            continue
+
+        cand = {
+            "build_id": b.get("build_id", "UNKNOWN"),
+            "build_name": b.get("name", "UNKNOWN"),
+            "matched_units": matched_units,
+            "matched": matched,
+            "size": size,
+            "score": round((matched / size) / math.sqrt(size), 4),
+            "key_hits": key_hits,
+            "key_n": key_n,
+            "key_ratio": round(key_ratio, 4),
+        }
+
+        if best is None:
+            best, best_from_key_pool = cand, is_key_ok
+            continue
+        if best_from_key_pool and not is_key_ok:
+            continue
+        if (not best_from_key_pool) and is_key_ok:
+            best, best_from_key_pool = cand, True
+            continue
+        cand_tuple = (cand["key_hits"], cand["key_ratio"], cand["score"], cand["matched"], -cand["size"])
+        best_tuple = (best["key_hits"], best["key_ratio"], best["score"], best["matched"], -best["size"])
+        if cand_tuple > best_tuple:
+            best = cand
+    return best
+
+
+def strip_mask(res):
+    if res is None:
+        return None
+    return {k: v for k, v in res.items() if k != "matched_mask"}
+
+
+@pytest.mark.parametrize("template", TEMPLATES)
+def test_mask_matches_reference(synth, template):
+    builds = load_json(os.path.join(ROOT, "config", template))
+    vocab = UnitVocab.from_unit_list(UNIT_LIST_PATH)
+    compiled = compile_builds(builds, vocab)
+
+    hits = 0
+    for board in boards(builds, list(vocab.names), 3000, seed=1):
+        want = reference_identify_build(board, builds)
+        got = identify_build_mask(vocab.encode_board(board), compiled, with_names=True)
+        assert strip_mask(got) == want, board
+        hits += want is not None
+    assert hits > 1000  # the boards actually exercise the templates
+
+    # synthetic match boards
+    for i in range(200):
+        for p in synth.match(i)["info"]["participants"]:
+            board = [u["character_id"] for u in p["units"]]
+            want = reference_identify_build(board, builds)
+            assert strip_mask(identify_build_mask(vocab.encode_board(board), compiled, with_names=True)) == want
+
+
+def test_wrapper_and_names_flag():
+    builds = load_json(os.path.join(ROOT, "config", TEMPLATES[1]))
+    vocab = UnitVocab.from_unit_list(UNIT_LIST_PATH)
+    compiled = compile_builds(builds, vocab)
+    for board in boards(builds, list(vocab.names), 300, seed=2):
+        want = reference_identify_build(board, builds)
+        assert strip_mask(identify_build(board, builds)) == want
+        bare = identify_build_mask(vocab.encode_board(board), compiled, with_names=False)
+        if want is None:
+            assert bare is None
+        else:
+            assert "matched_units" not in bare
+            want.pop("matched_units")
+            assert strip_mask(bare) == want
@@ -0,0 +1,80 @@
+import itertools
+import os
+
+import numpy as np
+import pytest
+
+import classifier_sweep
+import make_pair_summaries as mps
+from classifier_sweep import (build_cache, classify, from_words, select_rows, sweep, template_arrays, to_words)
+from conftest import ROOT, UNIT_LIST_PATH, boards
+from make_pair_summaries import compile_builds, identify_build_mask, load_json
+from unit_vocab import UnitVocab
+
+BUILDS = os.path.join(ROOT, "config", "builds_set16_16.3_SA.json")
+
+SETTINGS = list(itertools.product((1, 2, 3, 4), (1, 2, 3), (0.4, 0.5, 0.6), (2, 3)))
+
+
+def test_words_roundtrip():
+    for mask in (0, 1, (1 << 64) - 1, 1 << 64, (1 << 130) | 12345):
+        assert from_words(to_words(mask, 3)) == mask
+
+
+@pytest.fixture(scope="module")
+def encoded(synth):
+    builds = load_json(BUILDS)
+    vocab = UnitVocab.from_unit_list(UNIT_LIST_PATH)
+    masks = [vocab.encode_board(b) for b in boards(builds, list(vocab.names), 1500, seed=4)]
+    for i in range(150):
+        masks += [vocab.encode_board(u["character_id"] for u in p["units"]) for p in synth.match(i)["info"]["participants"]]
+    masks = list(dict.fromkeys(masks))
+    compile_builds(builds, vocab)   # template-only units get their ids before the word count is fixed
+    n_words = max(1, (len(vocab) + 63) // 64)
+    arr = np.array([to_words(m, n_words) for m in masks], dtype=np.uint64).reshape(len(masks), n_words)
+    return builds, vocab, masks, arr, n_words
+
+
+def test_classify_matches_identify_build_mask(encoded, monkeypatch):
+    builds, vocab, masks, arr, n_words = encoded
+    monkeypatch.setattr(classifier_sweep, "CHUNK_BOARDS", 700)  # several chunks
+
+    tpl = template_arrays(compile_builds(builds, vocab), n_words, sorted({s[0] for s in SETTINGS}))
+    assign = classify(arr, tpl, SETTINGS)
+
+    for s, (k, h, r, f) in enumerate(SETTINGS):
+        # identify_build_mask reads the constants at compile / call time -> recompile per setting
+        monkeypatch.setattr(mps, "KEY_UNITS_N", k)
+        monkeypatch.setattr(mps, "KEY_UNITS_MIN_HITS", h)
+        monkeypatch.setattr(mps, "MIN_HITS_RATIO", r)
+        monkeypatch.setattr(mps, "MIN_HITS_FLOOR", f)
+        compiled = compile_builds(builds, vocab)
+        want = []
+        for m in masks:
+            best = identify_build_mask(m, compiled, with_names=False)
+            # templates are distinct objects, the first one with this result is what argmax picks
+            want.append(-1 if best is None else next(
+                t for t, b in enumerate(compiled)
+                if b["build_id"] == best["build_id"] and b["build_name"] == best["build_name"]
+                and b["mask"] & m == best["matched_mask"]))
+        got = assign[s].tolist()
+        assert got == want, (k, h, r, f)
+        if s == 0:
+            assert sum(x >= 0 for x in want) > len(want) // 3
+
+
+def test_sweep_from_cache(synth, tmp_path, monkeypatch):
+    raw = tmp_path / "raw"
+    synth.write_corpus(str(raw), 120)
+    path = str(tmp_path / "board_cache.npz")
+    cache = build_cache(str(raw), path, UNIT_LIST_PATH)
+    assert len(cache["board"]) == 8 * 120
+
+    # incremental: nothing new to read, same cache
+    again = build_cache(str(raw), path, UNIT_LIST_PATH)
+    assert np.array_equal(again["boards"], cache["boards"]) and np.array_equal(again["board"], cache["board"])
+
+    weights = select_rows(cache, "16.3", 1160)
+    df, df_counts = sweep(cache, load_json(BUILDS), weights, (2, 3), (2, 3), (0.5,), (2,), verify=10_000)
+    assert df.loc[df["is_baseline"], "churn"].item() == 0.0
+    assert (df_counts.drop(columns=["build_id", "build_name"]).sum() == weights.sum()).all()
@@ -0,0 +1,295 @@
+import random
+import threading
+import time
+
+import pytest
+
+import crawl_control
+from conftest import BUILDS_PATH, UNIT_LIST_PATH
+from crawl_control import (CLOSED, HALF_OPEN, OPEN, AIMDLimit, CircuitBreaker, CrawlControl, HostControl,
+                           RateWindows, parse_limits)
+from crawl_metrics import CrawlMetrics
+
+
+class Clock:
+    def __init__(self, t=1_000_000.0):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+
+class Blocked(Exception):
+    pass
+
+
+class FakeCondition:
+    """HostControl.cond for one thread: wait() moves the clock instead of blocking"""
+
+    def __init__(self, clock, budget=3600.0):
+        self.clock = clock
+        self.budget = budget
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def wait(self, timeout):
+        self.budget -= timeout
+        if self.budget < 0:
+            raise Blocked()
+        self.clock.t += timeout
+        return False
+
+    def notify_all(self):
+        pass
+
+
+@pytest.fixture()
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(crawl_control.time, "time", c)
+    return c
+
+
+def gate(clock, limit=None, breaker=None, rate=None):
+    hc = HostControl("h", limit or AIMDLimit(4, 1, 8), breaker or CircuitBreaker(10, 0.5, 10, 15.0, 300.0),
+                     CrawlMetrics(None), rate)
+    hc.cond = FakeCondition(clock)
+    return hc
+
+
+def request(hc, status, latency=0.05, retry_after=None):
+    probe = hc.acquire()
+    hc.release(probe, latency, status, retry_after)
+    return probe
+
+
+def blocks(hc, seconds):
+    """acquire() doesn't return within `seconds` of fake time"""
+    hc.cond.budget = seconds
+    try:
+        hc.acquire()
+    except Blocked:
+        return True
+    finally:
+        hc.cond.budget = 3600.0
+    return False
+
+
+# ---------------------------------------------------------
+# AIMD
+# ---------------------------------------------------------
+
+@pytest.mark.parametrize("status", [429, 500, 503, "ConnectionError"])
+def test_limit_halves_on_throttle_or_failure(status):
+    hc = HostControl("h", AIMDLimit(8, 1, 8), CircuitBreaker(20, 0.5, 10))
+    request(hc, status)
+    assert hc.limit.limit == 4.0
+    # the rest of the burst (already in flight) doesn't halve again
+    for _ in range(hc.limit.allowed - 1):
+        request(hc, status)
+    assert hc.limit.limit == 4.0
+    request(hc, status)
+    assert hc.limit.limit == 2.0
+
+
+def test_limit_halves_on_latency_spike():
+    lim = AIMDLimit(8, 1, 8, latency_tolerance=2.0, latency_floor=0.05)
+    for _ in range(20):
+        assert not lim.on_success(0.05)
+    assert lim.limit == 8.0
+    # one decrease, then the cooldown: the next `allowed` slow responses were already in flight
+    assert [lim.on_success(0.5) for _ in range(4)] == [True, False, False, False]
+    assert lim.limit == 4.0
+    # 2 ms -> 5 ms is noise, not load
+    lim = AIMDLimit(4, 1, 8, latency_tolerance=2.0, latency_floor=0.05)
+    for lat in [0.002] * 20 + [0.005] * 20:
+        assert not lim.on_success(lat)
+
+
+def test_limit_grows_by_one_per_clean_window():
+    lim = AIMDLimit(2, 1, 6)
+    while lim.limit < 6:
+        before = lim.limit
+        for _ in range(lim.allowed):
+            assert not lim.on_success(0.05)
+        # additive: about +1 per window of `allowed` completions, never more
+        assert 0.5 < lim.limit - before <= 1.0 or lim.limit == 6
+    assert lim.decreases == 0
+    for _ in range(20):
+        lim.on_success(0.05)
+    assert lim.limit == 6
+
+
+# ---------------------------------------------------------
+# circuit breaker
+# ---------------------------------------------------------
+
+def test_breaker_opens_at_the_failure_threshold(clock):
+    hc = gate(clock)
+    for status in [200] * 5 + [503] * 4:
+        request(hc, status)
+    assert hc.breaker.state == CLOSED  # 4 / 9: below min_requests and the ratio
+    request(hc, 503)
+    assert hc.breaker.state == OPEN  # 5 / 10
+    assert hc.breaker.open_until == clock.t + 15.0
+    assert hc.limit.limit == 1.0
+    assert hc.metrics.snapshot()["counters"]["breaker_open"] == 1
+
+
+def test_breaker_stays_closed_below_the_ratio(clock):
+    hc = gate(clock)
+    for status in ([200] * 6 + [503] * 4) * 5:
+        request(hc, status)
+    assert hc.breaker.state == CLOSED and hc.breaker.trips == 0
+
+
+def trip(hc):
+    for _ in range(10):
+        request(hc, 503)
+    assert hc.breaker.state == OPEN
+
+
+def test_half_open_after_open_seconds_with_a_single_probe(clock):
+    hc = gate(clock)
+    trip(hc)
+    opened = clock.t
+    assert blocks(hc, 14.0)
+    assert hc.breaker.state == OPEN
+    assert hc.acquire() is True  # the probe
+    assert clock.t == pytest.approx(opened + 15.0)
+    assert hc.breaker.state == HALF_OPEN and hc.breaker.probe_out
+    # nobody else gets through while the probe is out
+    assert blocks(hc, 60.0)
+    assert hc.in_flight == 1
+    assert hc.metrics.snapshot()["time"]["sleep_by_reason"]["breaker_open"] >= 15.0
+
+
+def test_failed_probe_doubles_the_open_time(clock):
+    hc = gate(clock)
+    trip(hc)
+    waits = []
+    for _ in range(6):
+        t0 = clock.t
+        assert request(hc, 503) is True
+        waits.append(clock.t - t0)
+        assert hc.breaker.state == OPEN
+    assert waits == [15.0, 30.0, 60.0, 120.0, 240.0, 300.0]  # capped at max_open_seconds
+    assert hc.breaker.open_until == clock.t + 300.0
+
+
+def test_probe_success_closes_the_breaker(clock):
+    hc = gate(clock)
+    trip(hc)
+    request(hc, 503)  # failed probe: 30 s
+    assert request(hc, 200) is True
+    b = hc.breaker
+    assert b.state == CLOSED and not b.probe_out and len(b.window) == 0
+    assert b.open_seconds == 15.0
+    assert hc.limit.limit == 1.0  # restarts from the minimum
+    assert request(hc, 200) is False
+    snap = hc.metrics.snapshot()["counters"]
+    assert (snap["breaker_open"], snap["breaker_half_open"], snap["breaker_close"]) == (2, 2, 1)
+
+
+def test_throttled_probe_lets_the_next_caller_probe(clock):
+    hc = gate(clock)
+    trip(hc)
+    assert request(hc, 429, retry_after=5.0) is True
+    assert hc.breaker.state == HALF_OPEN and not hc.breaker.probe_out
+    t0 = clock.t
+    assert hc.acquire() is True
+    assert clock.t - t0 == pytest.approx(5.0)  # Retry-After holds the host first
+
+
+# ---------------------------------------------------------
+# rate windows
+# ---------------------------------------------------------
+
+def starts_within(starts, sec):
+    """most request starts in any window (t - sec, t]; a start `sec` ago (to the float) has left it"""
+    j, best = 0, 0
+    for i, t in enumerate(starts):
+        while starts[j] <= t - sec + 1e-9:
+            j += 1
+        best = max(best, i - j + 1)
+    return best
+
+
+def test_rate_windows_never_exceed_a_window():
+    limits = parse_limits("20:1,100:120")
+    rw = RateWindows(limits, 0.9)
+    rng = random.Random(3)
+    now, starts = 0.0, []
+    while len(starts) < 600:
+        now += rng.expovariate(50.0)  # callers arrive far faster than the budget
+        wait = rw.wait(now)
+        if wait > 0:
+            now += wait
+            assert rw.wait(now) == 0.0
+        rw.take(now)
+        starts.append(now)
+    assert starts_within(starts, 1.0) <= 18
+    assert starts_within(starts, 120.0) <= 90
+    # and the budget is used: 90 per 120 s
+    assert starts[-1] < 7 * 120.0
+
+
+def test_gate_paces_to_the_rate_windows(clock):
+    hc = gate(clock, rate=RateWindows(parse_limits("5:1,12:10"), 1.0))
+    starts = []
+    for _ in range(40):
+        hc.acquire()
+        starts.append(clock.t)
+        hc.release(False, 0.01, 200)
+    assert starts_within(starts, 1.0) <= 5
+    assert starts_within(starts, 10.0) <= 12
+    assert hc.metrics.snapshot()["time"]["sleep_by_reason"]["pacing"] > 0
+
+
+# ---------------------------------------------------------
+# end to end: crawler against the stub's 5xx bursts
+# ---------------------------------------------------------
+
+def test_crawler_rides_out_stub_bursts(crawler, monkeypatch):
+    import config.crawl_config as cfg
+    from riot_stub_server import RiotStubServer, StubConfig, SyntheticSource
+
+    source = SyntheticSource(120, 5, BUILDS_PATH, UNIT_LIST_PATH)
+    server = RiotStubServer(source, StubConfig(latency_ms=2.0, burst_every_s=0.5, burst_length_s=0.2,
+                                               app_limits="10:0.1"), port=0)
+    monkeypatch.setattr(cfg, "API_BASE_URL", server.start())
+    settings = dict(crawler.control_settings(), breaker_window=8, breaker_min_requests=4,
+                    breaker_open_seconds=0.2, breaker_max_open_seconds=1.0, rate_limits=parse_limits("8:0.1"))
+    monkeypatch.setattr(crawler, "CONTROL", CrawlControl(settings, crawler.METRICS))
+    monkeypatch.setattr(crawler, "sleep", lambda seconds, reason: time.sleep(0.01))
+
+    mids = sorted(source.index_of)
+    got, errors = {}, []
+
+    def fetch(part):
+        try:
+            for mid in part:
+                got[mid] = crawler.match_detail_bytes(mid)
+        except Exception as e:  # a thread's exception would be lost otherwise
+            errors.append(e)
+
+    threads = [threading.Thread(target=fetch, args=(mids[i::3],)) for i in range(3)]
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(30)
+    finally:
+        server.stop()
+
+    assert not errors
+    assert all(got[mid] == source.get(mid) for mid in mids)
+    counters = crawler.METRICS.snapshot()["counters"]
+    assert server.stats["status_503"] > 0
+    assert counters.get("breaker_open", 0) >= 1 and counters.get("breaker_close", 0) >= 1
+    # paced below the stub's app limit: no 429 at all
+    assert server.stats["status_429"] == 0
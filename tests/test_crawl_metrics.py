@@ -0,0 +1,62 @@
+import pytest
+
+import crawl_metrics
+from crawl_metrics import CrawlMetrics
+
+
+class Clock:
+    def __init__(self, t=1_000_000.0):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+
+@pytest.fixture()
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(crawl_metrics.time, "time", c)
+    return c
+
+
+def test_network_time_is_wall_time_with_a_request_in_flight(clock):
+    m = CrawlMetrics(None)
+    t0 = clock.t
+
+    def at(dt):
+        clock.t = t0 + dt
+
+    # two overlapping requests: 0..3 and 1..4
+    m.request_started()
+    at(1)
+    m.request_started()
+    at(3)
+    m.observe_request("match_detail", 3.0, 200)
+    at(4)
+    m.observe_request("match_detail", 3.0, 503)
+    # idle, a sleep, then one request still in flight at the snapshot
+    at(6)
+    m.add_sleep(2.0, "throttle")
+    at(8)
+    m.request_started()
+    at(10)
+    t = m.snapshot()["time"]
+    assert t["request_seconds_sum"] == 6.0
+    assert t["network_busy_seconds"] == 6.0  # 0..4 and 8..10
+    assert t["sleep_seconds"] == 2.0
+    assert t["other_seconds"] == 2.0  # 10 - 6 - 2
+    at(11)
+    m.observe_request("match_ids", 3.0, "ConnectionError")
+    at(20)
+    t = m.snapshot()["time"]
+    assert (t["request_seconds_sum"], t["network_busy_seconds"], t["other_seconds"]) == (9.0, 7.0, 11.0)
+    assert "tft_crawler_network_busy_seconds_total 7.000000" in m.to_prometheus()
+
+
+def test_requests_observed_without_a_start_dont_count_as_busy(clock):
+    m = CrawlMetrics(None)
+    m.observe_request("match_detail", 0.5, 200)
+    clock.t += 5
+    t = m.snapshot()["time"]
+    assert t["request_seconds_sum"] == 0.5 and t["network_busy_seconds"] == 0.0
+    assert m.in_flight == 0
@@ -0,0 +1,92 @@
+import json
+import os
+import sys
+
+import pytest
+
+import duo_stats
+from conftest import pair_rows
+from duo_stats import DuoAggregator, DuoStats, duo_key
+
+
+@pytest.fixture(scope="module")
+def rows():
+    return pair_rows(1500, seed=9, n_players=30)
+
+
+def run(out_dir, rows, max_groups):
+    agg = DuoAggregator(str(out_dir), max_groups)
+    for r in rows:
+        agg.add(r)
+    return agg.finish()
+
+
+def duos(rows):
+    out = set()
+    for r in rows:
+        if r["queue_id"] != 1160:
+            continue
+        a, b = r["members"][0]["puuid"], r["members"][1]["puuid"]
+        if a != b:
+            out.add(tuple(sorted((a, b))))
+    return sorted(out)
+
+
+def assert_same_output(dir_a, dir_b, rows):
+    sa, sb = DuoStats(str(dir_a)), DuoStats(str(dir_b))
+    assert sa.leaderboards() == sb.leaderboards()
+    for k in ("teams", "players", "duos", "global_mean_points", "builds"):
+        assert sa.meta[k] == sb.meta[k], k
+    for a, b in duos(rows):
+        rec = sa.lookup(a, b)
+        assert rec is not None and rec == sb.lookup(a, b), (a, b)
+
+
+def test_spilled_run_matches_in_memory_run(tmp_path, rows):
+    meta_mem = run(tmp_path / "mem", rows, max_groups=10**9)
+    meta_spill = run(tmp_path / "spill", rows, max_groups=50)
+    assert meta_mem["spills"] == 0 and meta_spill["spills"] > 20
+    lb = DuoStats(str(tmp_path / "mem")).leaderboards()
+    assert len(lb["best_performing"]) > 50
+    assert not os.path.exists(tmp_path / "spill" / "_spill")
+    assert_same_output(tmp_path / "mem", tmp_path / "spill", rows)
+
+    # counts add up to the input
+    stats = DuoStats(str(tmp_path / "spill"))
+    want = sum(1 for r in rows if r["queue_id"] == 1160 and r["members"][0]["puuid"] != r["members"][1]["puuid"])
+    assert sum(stats.lookup(a, b)["games"] for a, b in duos(rows)) == want == meta_spill["teams"]
+
+
+def test_leftover_spills_of_an_interrupted_run_are_dropped(tmp_path, rows):
+    run(tmp_path / "mem", rows, max_groups=10**9)
+
+    # interrupted run: spilled, never finished
+    agg = DuoAggregator(str(tmp_path / "out"), 50)
+    for r in rows[:2000]:
+        agg.add(r)
+    assert agg.spills > 0 and os.listdir(tmp_path / "out" / "_spill")
+
+    run(tmp_path / "out", rows, max_groups=50)
+    assert_same_output(tmp_path / "mem", tmp_path / "out", rows)
+
+
+def test_main_pairs_with_top_aggregates_first(tmp_path, rows, monkeypatch, capsys):
+    path = tmp_path / "pairs.jsonl"
+    path.write_text("".join(json.dumps(r) + "\n" for r in rows), encoding="utf-8")
+    out = tmp_path / "duo_stats"
+    a, b = duos(rows)[0]
+    monkeypatch.setattr(sys, "argv", ["duo_stats.py", "--pairs", str(path), "--out-dir", str(out),
+                                      "--top", "3", "--lookup", a, b])
+    duo_stats.main()
+    printed = capsys.readouterr().out
+    assert "[DONE]" in printed and "[MOST_PLAYED]" in printed and '"games"' in printed
+
+    # --top alone reads the run above
+    monkeypatch.setattr(sys, "argv", ["duo_stats.py", "--out-dir", str(out), "--top", "3"])
+    duo_stats.main()
+    printed = capsys.readouterr().out
+    assert "[DONE]" not in printed and "[BEST_PERFORMING]" in printed
+
+
+def test_duo_key_is_unordered():
+    assert duo_key(3, 7) == duo_key(7, 3)
@@ -0,0 +1,104 @@
+import functools
+import json
+import random
+from collections import deque
+
+import pytest
+
+from crawl_writer import CrawlWriter
+from frontier import DiskFrontier, SEGMENT_RE, state_puuids
+
+
+def seg_ids(directory):
+    return sorted(int(m.group(1)) for p in directory.iterdir() if (m := SEGMENT_RE.match(p.name)))
+
+
+def test_matches_deque_with_checkpoints_and_crashes(tmp_path):
+    rng = random.Random(11)
+    size = 7
+    fr = DiskFrontier(str(tmp_path), segment_size=size)
+    ref = deque()
+    written = (None, [])   # manifest + queue of the state on disk
+    n = 0
+
+    for step in range(20_000):
+        op = rng.random()
+        if op < 0.45:
+            k = rng.randint(1, 12)
+            new = [f"p{n + i}" for i in range(k)]
+            n += k
+            fr.extend(new)
+            ref.extend(new)
+        elif op < 0.9:
+            for _ in range(rng.randint(1, 12)):
+                if not ref:
+                    break
+                assert fr.popleft() == ref.popleft()
+        elif op < 0.97:
+            manifest = fr.checkpoint()
+            assert json.loads(json.dumps(manifest)) == manifest and "puuids" not in json.dumps(manifest)
+            snap = list(ref)
+            assert list(state_puuids({"frontier": manifest})) == snap
+            r = rng.random()
+            if r < 0.8:
+                # state saved, then committed
+                written = (manifest, snap)
+                fr.committed(manifest)
+                assert seg_ids(tmp_path) == list(range(manifest["read_segment"], fr.next_seg))
+            elif r < 0.9:
+                # crash between the state write and committed()
+                written = (manifest, snap)
+                fr = DiskFrontier(str(tmp_path), segment_size=size, manifest=manifest)
+                ref = deque(snap)
+            else:
+                # crash before the state write: the older state must still load
+                fr = DiskFrontier(str(tmp_path), segment_size=size, manifest=written[0])
+                ref = deque(written[1])
+        else:
+            # crash without a checkpoint
+            fr = DiskFrontier(str(tmp_path), segment_size=size, manifest=written[0])
+            ref = deque(written[1])
+
+        assert len(fr) == len(ref)
+        assert fr.stats()["in_memory"] <= 2 * size
+        if step % 97 == 0:
+            assert list(fr) == list(ref)
+
+    while ref:
+        assert fr.popleft() == ref.popleft()
+    with pytest.raises(IndexError):
+        fr.popleft()
+
+
+def test_committed_via_writer_after_the_state_is_on_disk(tmp_path):
+    fr = DiskFrontier(str(tmp_path / "frontier"), segment_size=5)
+    state_path = tmp_path / "crawler_state.json"
+    seen = []
+
+    def on_written(manifest):
+        # the state holding this manifest, or a newer one it was coalesced into, is already on disk
+        # (the writer swallows callback errors -> record and assert afterwards)
+        on_disk = json.loads(state_path.read_text(encoding="utf-8"))["frontier"]
+        seen.append((on_disk["read_segment"] >= manifest["read_segment"]
+                      and on_disk["next_segment"] >= manifest["next_segment"], manifest["read_segment"]))
+        fr.committed(manifest)
+
+    with CrawlWriter(batch_size=8) as w:
+        for i in range(40):
+            fr.extend(f"p{i}_{j}" for j in range(3))
+            for _ in range(2):
+                fr.popleft()
+            manifest = fr.checkpoint()
+            w.save_state(state_path, {"frontier": manifest}, functools.partial(on_written, manifest))
+        w.flush()
+
+    state = json.loads(state_path.read_text(encoding="utf-8"))
+    assert seen and all(ok for ok, _ in seen)
+    assert seen[-1][1] == state["frontier"]["read_segment"]
+    back = DiskFrontier(str(tmp_path / "frontier"), segment_size=5, manifest=state["frontier"])
+    assert list(back) == list(fr) == list(state_puuids(state))
+    assert seg_ids(tmp_path / "frontier")[0] == state["frontier"]["read_segment"]
+
+
+def test_old_queue_puuids_state():
+    assert list(state_puuids({"queue_puuids": ["a", "b"]})) == ["a", "b"]
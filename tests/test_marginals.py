@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import param_sweep
+from conftest import pair_rows
+from synergy_MVP import aggregate_pairs, build_pair_dataframe, compute_build_marginals, score_pairs
+
+
+@pytest.fixture(scope="module")
+def df_pairs():
+    df = build_pair_dataframe(pair_rows(300, seed=11, n_builds=6))
+    assert (df["build_a"] == df["build_b"]).any()  # a == b pairs are in the sample
+    return df
+
+
+def per_row(df, keys):
+    """the metric definitions, one team at a time"""
+    out = {}
+    for k, rank, points in zip(zip(*(df[c] for c in keys)), df["team_rank"], df["team_points"]):
+        out.setdefault(k, []).append((rank, points))
+    rows = []
+    for k, v in out.items():
+        ranks = np.array([r for r, _ in v])
+        rows.append(dict(zip(keys, k), games=len(v), avg_team_rank=ranks.mean(),
+                         avg_team_points=np.mean([p for _, p in v]), top1=(ranks == 1).mean(),
+                         top2=(ranks <= 2).mean(), top3=(ranks <= 3).mean()))
+    return pd.DataFrame(rows).sort_values(keys).reset_index(drop=True)
+
+
+COLS = ["games", "avg_team_rank", "avg_team_points", "top1", "top2", "top3"]
+
+
+def test_build_marginals_count_a_team_for_both_builds(df_pairs):
+    long = pd.concat([df_pairs.rename(columns={"build_a": "build"}), df_pairs.rename(columns={"build_b": "build"})])
+    want = per_row(long, ["build"])
+    got = compute_build_marginals(df_pairs)
+    assert list(got["build"]) == list(want["build"])
+    for c in COLS:
+        np.testing.assert_allclose(got[c].astype(float), want[c].astype(float), rtol=0, atol=1e-12, err_msg=c)
+
+
+def test_pair_aggregates(df_pairs):
+    want = per_row(df_pairs, ["build_a", "build_b"])
+    got = aggregate_pairs(df_pairs)
+    assert list(zip(got["build_a"], got["build_b"])) == list(zip(want["build_a"], want["build_b"]))
+    for c in COLS:
+        np.testing.assert_allclose(got[c].astype(float), want[c].astype(float), rtol=0, atol=1e-12, err_msg=c)
+
+
+def test_param_sweep_scores_on_the_same_aggregates(df_pairs):
+    tr = param_sweep.train_arrays(df_pairs)
+    gm = float(df_pairs["team_points"].mean())
+    syn = score_pairs(aggregate_pairs(df_pairs), compute_build_marginals(df_pairs), gm)
+    np.testing.assert_allclose(tr["l2"], syn["log_lift_top2"], rtol=0, atol=1e-12)
+    np.testing.assert_allclose(tr["l1"], syn["log_lift_top1"], rtol=0, atol=1e-12)
+    s = param_sweep.score_grid(tr, [param_sweep.EB_M], [param_sweep.W_TOP2], [param_sweep.W_TOP1])
+    np.testing.assert_allclose(s.reshape(-1), syn["synergy_score"], rtol=0, atol=1e-9)
@@ -0,0 +1,142 @@
+import json
+
+import pytest
+
+import config.crawl_config as cfg
+from matchlist_cache import MatchlistCache
+
+
+@pytest.fixture()
+def cache(tmp_path):
+    c = MatchlistCache(str(tmp_path / "matchlist.sqlite"))
+    yield c
+    c.close()
+
+
+def test_advance_over_the_known_run(cache):
+    cache.record_poll("p", 3)
+    for mid, t in (("m1", 1000), ("m2", 2000), ("m3", 3000)):
+        cache.record_time(mid, t)
+    assert cache.advance("p", ["m3", "m2", "m1"]) == 3000
+    # never moves back
+    assert cache.advance("p", ["m1"]) == 3000
+    assert cache.start_time("p", slack_seconds=1) == 2
+
+
+def test_advance_stops_at_a_gap_until_it_is_filled(cache):
+    cache.record_poll("p", 3)
+    cache.record_time("m1", 1000)
+    cache.record_time("m3", 3000)
+    assert cache.advance("p", ["m3", "m2", "m1"]) == 1000
+    cache.record_time("m4", 4000)
+    assert cache.advance("p", ["m4", "m3", "m2", "m1"]) == 1000
+    # m2 loaded later (the crawler retries it) -> the whole run counts
+    cache.record_time("m2", 2000)
+    assert cache.advance("p", ["m4", "m3", "m2", "m1"]) == 4000
+
+
+def test_advance_unknown_oldest(cache):
+    cache.record_poll("p", 2)
+    cache.record_time("m2", 2000)
+    assert cache.advance("p", ["m2", "m1"]) is None
+    assert cache.start_time("p") is None
+
+
+# ---------------------------------------------------------
+# list_matches paging
+# ---------------------------------------------------------
+
+def fake_lister(history, calls):
+    """history: ids newest first; the endpoint's count / start / startTime semantics"""
+    def match_ids_by_puuid(puuid, count, start_time=None, start=0):
+        calls.append((start_time, start))
+        return history[start:start + count]
+    return match_ids_by_puuid
+
+
+@pytest.mark.parametrize("n,want_ids,want_reach,want_calls", [
+    (12, 12, True, 3),    # short third page
+    (10, 10, True, 3),    # two full pages, the empty third one ends it
+    (4, 4, True, 1),
+    (15, 15, False, 3),   # MATCHLIST_MAX_PAGES full pages: can't tell if more follow
+    (40, 15, False, 3),
+])
+def test_list_matches_pages_back_to_the_watermark(crawler, monkeypatch, n, want_ids, want_reach, want_calls):
+    monkeypatch.setattr(cfg, "MATCHLIST_COUNT_PER_PLAYER", 5)
+    monkeypatch.setattr(cfg, "MATCHLIST_MAX_PAGES", 3)
+    history = [f"m{i}" for i in range(n, 0, -1)]
+    calls = []
+    monkeypatch.setattr(crawler, "match_ids_by_puuid", fake_lister(history, calls))
+
+    mids, reaches = crawler.list_matches("p", start_time=123)
+    assert mids == history[:want_ids]
+    assert reaches is want_reach
+    assert calls == [(123, 5 * i) for i in range(want_calls)]
+
+
+def test_list_matches_without_watermark_is_one_page(crawler, monkeypatch):
+    monkeypatch.setattr(cfg, "MATCHLIST_COUNT_PER_PLAYER", 5)
+    calls = []
+    monkeypatch.setattr(crawler, "match_ids_by_puuid", fake_lister([f"m{i}" for i in range(20)], calls))
+    assert crawler.list_matches("p") == ([f"m{i}" for i in range(5)], True)
+    assert calls == [(None, 0)]
+
+
+# ---------------------------------------------------------
+# crawl: a failed detail fetch is retried, the watermark moves on
+# ---------------------------------------------------------
+
+def test_failed_fetch_is_retried_and_unfreezes_the_watermark(crawler, synth, monkeypatch, tmp_path):
+    monkeypatch.setattr(cfg, "MATCHLIST_CACHE_PATH", str(tmp_path / "matchlist.sqlite"))
+    monkeypatch.setattr(cfg, "MATCHLIST_TTL_SECONDS", 0)
+    monkeypatch.setattr(cfg, "MATCHLIST_WATERMARK_SLACK_SECONDS", 0)
+
+    times = {f"m{i}": 1_000_000 * i for i in range(1, 6)}
+    games = ["m1", "m2", "m3"]           # p0's history, newest last
+    fetched, failing, listed = [], {"m2"}, []
+
+    def match_ids_by_puuid(puuid, count, start_time=None, start=0):
+        if puuid != "p0":
+            return []
+        listed.append(start_time)
+        newer = [m for m in reversed(games) if start_time is None or times[m] // 1000 >= start_time]
+        return newer[start:start + count]
+
+    def match_detail_bytes(mid):
+        fetched.append(mid)
+        if mid in failing:
+            failing.discard(mid)
+            raise RuntimeError("HTTP 503")
+        m = synth.match(int(mid[1:]))
+        m["metadata"]["match_id"] = mid
+        m["info"]["game_datetime"] = times[mid]
+        return json.dumps(m).encode("utf-8")
+
+    monkeypatch.setattr(crawler, "account_by_riot_id", lambda rid: {"puuid": "p0"})
+    monkeypatch.setattr(crawler, "match_ids_by_puuid", match_ids_by_puuid)
+    monkeypatch.setattr(crawler, "match_detail_bytes", match_detail_bytes)
+
+    def watermark():
+        c = MatchlistCache(cfg.MATCHLIST_CACHE_PATH)
+        try:
+            return c.con.execute("SELECT watermark_ms FROM players WHERE puuid = 'p0'").fetchone()[0]
+        finally:
+            c.close()
+
+    crawler.crawl(["Seed#EUNE"])
+    assert fetched == ["m3", "m2", "m1"]
+    assert watermark() == times["m1"]          # m2 failed: gap
+    state = json.loads(open(cfg.STATE_PATH, encoding="utf-8").read())
+    assert "m2" not in state["seen_match_ids"]
+
+    # refresh: m2 is listed again, fetched, and the watermark passes it
+    crawler.crawl([], refresh=True)
+    assert fetched[3:] == ["m2"]
+    assert watermark() == times["m3"]
+
+    # a new game: only it is fetched, the list starts at the new watermark
+    games.append("m4")
+    crawler.crawl([], refresh=True)
+    assert fetched[4:] == ["m4"]
+    assert listed[-1] == times["m3"] // 1000
+    assert watermark() == times["m4"]
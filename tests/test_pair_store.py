@@ -0,0 +1,80 @@
+import json
+
+import numpy as np
+import pytest
+
+import pair_store
+from conftest import pair_rows
+from pair_store import PairStore
+from synergy_MVP import (aggregate_pairs, build_pair_dataframe, compute_build_marginals, compute_pair_synergies,
+                         score_pairs)
+
+TEMPLATE = "builds_test"
+AGG_COLS = ["games", "avg_team_rank", "avg_team_points", "top1", "top2", "top3"]
+SCORE_COLS = AGG_COLS + ["eb_points", "lift_top2", "lift_top1", "log_lift_top2", "log_lift_top1", "synergy_score"]
+
+
+def assert_frames_close(got, want, keys, cols):
+    got = got.sort_values(keys).reset_index(drop=True)
+    want = want.sort_values(keys).reset_index(drop=True)
+    assert list(got[keys].itertuples(index=False)) == list(want[keys].itertuples(index=False))
+    for c in cols:
+        np.testing.assert_allclose(got[c].astype(float), want[c].astype(float), rtol=0, atol=1e-12, err_msg=c)
+
+
+@pytest.fixture(scope="module")
+def rows():
+    return pair_rows(800, seed=5)
+
+
+@pytest.fixture()
+def store(tmp_path, rows, monkeypatch):
+    monkeypatch.setattr(pair_store, "BATCH_ROWS", 500)  # several flushes
+    s = PairStore(str(tmp_path / "pairs.sqlite"))
+    s.begin_template(TEMPLATE)
+    for r in rows:
+        s.add(r, TEMPLATE)
+    s.finish()
+    yield s
+    s.conn.close()
+
+
+@pytest.mark.parametrize("patch", [None, "16.3"])
+def test_aggregates_match_pandas(store, rows, patch):
+    df_pairs = build_pair_dataframe([r for r in rows if patch is None or r["patch"] == patch])
+    df_marg = compute_build_marginals(df_pairs)
+
+    g = store.pair_aggregates(TEMPLATE, patch)
+    assert_frames_close(g, aggregate_pairs(df_pairs), ["build_a", "build_b"], AGG_COLS)
+    marg = store.build_marginals(TEMPLATE, patch)
+    assert_frames_close(marg, df_marg, ["build"], AGG_COLS)
+    gm = store.global_mean_points(TEMPLATE, patch)
+    assert gm == pytest.approx(float(df_pairs["team_points"].mean()), abs=1e-12)
+
+    # synergy_MVP.main_store == main
+    assert_frames_close(score_pairs(g, marg, gm), compute_pair_synergies(df_pairs, df_marg),
+                        ["build_a", "build_b"], SCORE_COLS)
+
+
+def test_time_and_queue_filters(store, rows):
+    since, until = rows[400]["game_datetime"], rows[2400]["game_datetime"]
+    sel = [r for r in rows if r["queue_id"] == 1100 and since <= r["game_datetime"] < until]
+    df = build_pair_dataframe([dict(r, queue_id=1160) for r in sel])
+    g = store.pair_aggregates(TEMPLATE, queue_id=1100, since=since, until=until)
+    assert_frames_close(g, aggregate_pairs(df), ["build_a", "build_b"], AGG_COLS)
+
+
+def test_rerun_and_import_jsonl(store, rows, tmp_path):
+    before = store.pair_aggregates(TEMPLATE)
+    # a second run of the same template replaces it, no duplicates
+    store.begin_template(TEMPLATE)
+    for r in rows:
+        store.add(r, TEMPLATE)
+    store.finish()
+    assert_frames_close(store.pair_aggregates(TEMPLATE), before, ["build_a", "build_b"], AGG_COLS)
+
+    path = tmp_path / "pair_summaries.jsonl"
+    path.write_text("".join(json.dumps(r) + "\n" for r in rows), encoding="utf-8")
+    assert store.import_jsonl(str(path), "other") == len(rows)
+    assert_frames_close(store.pair_aggregates("other"), before, ["build_a", "build_b"], AGG_COLS)
+    assert dict(store.templates()) == {TEMPLATE: len(rows), "other": len(rows)}
@@ -0,0 +1,128 @@
+import math
+
+import numpy as np
+import pytest
+
+import partner_index
+from conftest import pair_rows
+from partner_index import LOWER_IS_BETTER, PartnerIndex, _sort_key
+from synergy_MVP import build_pair_dataframe, compute_build_marginals, compute_pair_synergies
+
+METRICS = ("synergy_score", "eb_points", "lift_top2", "top2", "avg_team_rank")
+LIFT_COLS = ["games", "avg_team_rank", "avg_team_points", "top1", "top2", "top3",
+             "lift_top2", "lift_top1", "log_lift_top2", "log_lift_top1"]
+MEAN_COLS = ["eb_points", "synergy_score"]
+
+
+def games(df_pairs):
+    return list(zip(df_pairs["build_a"], df_pairs["build_b"], df_pairs["team_rank"]))
+
+
+def same(x, y):
+    return (isinstance(x, float) and isinstance(y, float) and math.isnan(x) and math.isnan(y)) or x == y
+
+
+def assert_rows_equal(got, want):
+    assert [(r["build_a"], r["build_b"]) for r in got] == [(r["build_a"], r["build_b"]) for r in want]
+    for rg, rw in zip(got, want):
+        assert rg.keys() == rw.keys()
+        assert all(same(rg[k], rw[k]) for k in rw), (rg, rw)
+
+
+def assert_frames_close(got, want, keys, cols, atol=1e-12):
+    got = got.sort_values(keys).reset_index(drop=True)
+    want = want.sort_values(keys).reset_index(drop=True)
+    assert list(got[keys].itertuples(index=False)) == list(want[keys].itertuples(index=False))
+    for c in cols:
+        np.testing.assert_allclose(got[c].astype(float), want[c].astype(float), rtol=0, atol=atol, err_msg=c)
+
+
+def assert_sorted_consistent(idx):
+    """every per-build array and top_pairs is the sort of the current values"""
+    for build, per_metric in idx.sorted.items():
+        for m, arr in per_metric.items():
+            higher = m not in LOWER_IS_BETTER
+            want = sorted((_sort_key(idx.values[(build, p) if build <= p else (p, build)].get(m), p, higher), p)
+                          for p in idx.partners_of[build])
+            assert arr == want, (build, m)
+    for m in idx.metrics:
+        higher = m not in LOWER_IS_BETTER
+        want = [k for _, k in sorted((_sort_key(v.get(m), k, higher), k) for k, v in idx.values.items())]
+        assert [(r["build_a"], r["build_b"]) for r in idx.top_pairs(m, k=len(want))] == want
+
+
+@pytest.fixture(scope="module")
+def df_pairs():
+    return build_pair_dataframe(pair_rows(600, seed=3))
+
+
+def test_from_pairs_matches_pandas(df_pairs):
+    df_marg = compute_build_marginals(df_pairs)
+    df_syn = compute_pair_synergies(df_pairs, df_marg)
+
+    idx = PartnerIndex.from_pairs(df_pairs, METRICS)
+    got_syn, got_marg = idx.to_frames()
+    assert_frames_close(got_syn, df_syn, ["build_a", "build_b"], LIFT_COLS + MEAN_COLS)
+    assert_frames_close(got_marg, df_marg, ["build"], ["games", "avg_team_rank", "avg_team_points", "top1", "top2", "top3"])
+
+    # from the CSV frames (what synergy_query loads) -> same index
+    idx2 = PartnerIndex.from_synergy(df_syn, df_marg, METRICS)
+    assert idx2.values.keys() == idx.values.keys()
+    for key, v in idx.values.items():
+        for m, x in v.items():
+            assert idx2.values[key][m] == pytest.approx(x, abs=1e-12, nan_ok=True), (key, m)
+    assert_sorted_consistent(idx2)
+
+
+def test_incremental_matches_rebuild(df_pairs):
+    rows = games(df_pairs)
+    idx = PartnerIndex.from_pairs(df_pairs.iloc[:200], METRICS)
+    for i in range(200, len(rows), 37):
+        idx.add_games(rows[i:i + 37])
+        assert_sorted_consistent(idx)
+
+    full = PartnerIndex.from_pairs(df_pairs, METRICS)
+    assert idx.pairs == full.pairs
+    assert idx.builds == full.builds
+    assert idx.values.keys() == full.values.keys()
+    for key, v in full.values.items():
+        got = idx.values[key]
+        for m in LIFT_COLS:
+            assert got[m] == pytest.approx(v[m], abs=1e-12, nan_ok=True), (key, m)
+        # untouched pairs keep the eb term of a global mean at most GLOBAL_MEAN_TOLERANCE off
+        for m in MEAN_COLS:
+            assert abs(got[m] - v[m]) <= partner_index.GLOBAL_MEAN_TOLERANCE + 1e-12, (key, m)
+
+    idx.rescore_all()
+    for m in METRICS:
+        assert_rows_equal(idx.top_pairs(m, k=10_000), full.top_pairs(m, k=10_000))
+        for build in full.sorted:
+            assert_rows_equal(idx.top(build, m, k=100), full.top(build, m, k=100))
+
+
+def test_incremental_exact_without_tolerance(df_pairs, monkeypatch):
+    # tolerance 0: every batch that moves the global mean rescores all -> identical to a rebuild
+    monkeypatch.setattr(partner_index, "GLOBAL_MEAN_TOLERANCE", 0.0)
+    rows = games(df_pairs)
+    idx = PartnerIndex(METRICS)
+    for i in range(0, len(rows), 50):
+        idx.add_games(rows[i:i + 50])
+        full = PartnerIndex.from_pairs(df_pairs.iloc[:i + 50], METRICS)
+        for m in METRICS:
+            assert_rows_equal(idx.top_pairs(m, k=10_000), full.top_pairs(m, k=10_000))
+
+
+def test_save_load_roundtrip(df_pairs, tmp_path):
+    idx = PartnerIndex.from_pairs(df_pairs, METRICS)
+    path = str(tmp_path / partner_index.INDEX_FILE)
+    idx.save(path)
+    back = PartnerIndex.load(path)
+    assert back.sorted == idx.sorted
+    for m in METRICS:
+        assert_rows_equal(back.top_pairs(m, k=10_000), idx.top_pairs(m, k=10_000))
+    # a loaded index keeps updating like the original
+    more = [("Build 01", "Build 02", 1), ("UNKNOWN(UNKNOWN)", "Build 05", 4)]
+    back.add_games(more)
+    idx.add_games(more)
+    for m in METRICS:
+        assert_rows_equal(back.top_pairs(m, k=10_000), idx.top_pairs(m, k=10_000))
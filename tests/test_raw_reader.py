@@ -0,0 +1,56 @@
+import gzip
+import json
+
+from raw_reader import _slim_from_full, parse_match_bytes, read_crawl_fields, read_match
+
+# parse_match_bytes must give exactly what json.loads + _slim_from_full gives
+
+
+def test_parse_matches_json_loads(synth):
+    for i in range(300):
+        buf = synth.match_bytes(i)
+        assert parse_match_bytes(buf) == _slim_from_full(json.loads(buf)), i
+
+
+def test_parse_other_layouts(synth):
+    m = synth.match(3)
+    m["info"]["participants"][0]["riotIdGameName"] = 'Qu"ote\\ Ünï ☃'
+    m["info"]["participants"][1]["units"][0]["character_id"] = "TFT16_Café"
+    want = _slim_from_full(m)
+    for buf in (json.dumps(m).encode(),                          # \uXXXX escapes
+                json.dumps(m, ensure_ascii=False).encode("utf-8"),
+                json.dumps(m, indent=2).encode(),
+                json.dumps(m, separators=(",", ":")).encode()):
+        assert parse_match_bytes(buf) == want
+        assert parse_match_bytes(bytearray(buf)) == want
+
+
+def test_parse_participant_without_units(synth):
+    m = synth.match(5)
+    del m["info"]["participants"][2]["units"]
+    buf = json.dumps(m).encode()
+    assert parse_match_bytes(buf) == _slim_from_full(json.loads(buf))
+
+
+def test_read_match_plain_and_gz(synth, tmp_path):
+    buf = synth.match_bytes(11)
+    want = _slim_from_full(json.loads(buf))
+    (tmp_path / "m.json").write_bytes(buf)
+    (tmp_path / "m.json.gz").write_bytes(gzip.compress(buf))
+    assert read_match(str(tmp_path / "m.json")) == want
+    assert read_match(str(tmp_path / "m.json.gz")) == want
+
+
+def test_crawl_fields(synth):
+    for i in range(50):
+        buf = synth.match_bytes(i)
+        full = json.loads(buf)
+        got = read_crawl_fields(buf)["info"]
+        for k in ("game_version", "queue_id", "game_datetime"):
+            assert got[k] == full["info"][k]
+        assert [p["puuid"] for p in got["participants"]] == [p["puuid"] for p in full["info"]["participants"]]
+
+
+def test_crawl_fields_error_body():
+    body = b'{"status": {"message": "Data not found", "status_code": 404}}'
+    assert read_crawl_fields(body) == json.loads(body)
@@ -0,0 +1,162 @@
+import pytest
+
+import crawl_shard
+from crawl_control import parse_limits
+from crawl_shard import WorkQueue
+
+
+class Clock:
+    def __init__(self, t=1_000_000.0):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+
+@pytest.fixture()
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(crawl_shard.time, "time", c)
+    return c
+
+
+@pytest.fixture()
+def queues(tmp_path, clock):
+    # two connections to one db = two worker processes
+    path = str(tmp_path / "work.sqlite")
+    a, b = WorkQueue(path), WorkQueue(path)
+    yield a, b
+    a.close()
+    b.close()
+
+
+def state(wq, mid):
+    return wq.con.execute("SELECT state, owner, attempts FROM matches WHERE match_id = ?", (mid,)).fetchone()
+
+
+def test_leases_are_exclusive_until_they_expire(queues, clock):
+    a, b = queues
+    a.finish_puuid("seed", [f"m{i}" for i in range(10)])
+
+    got_a = a.lease_matches("A", 6, ttl=30)
+    got_b = b.lease_matches("B", 10, ttl=30)
+    assert len(got_a) == 6 and len(got_b) == 4
+    assert not set(got_a) & set(got_b)
+    assert b.lease_matches("B", 10, ttl=30) == []
+
+    # A keeps half of its lease alive, the rest expires
+    clock.t += 20
+    a.renew("A", got_a[:3], ttl=30)
+    b.renew("B", got_a[3:], ttl=1000)   # not B's lease: no effect
+    clock.t += 15
+    again = b.lease_matches("B", 10, ttl=30)
+    assert sorted(again) == sorted(got_a[3:] + got_b)
+    assert state(a, got_a[3]) == (crawl_shard.LEASED, "B", 2)
+    assert all(state(a, m)[1] == "A" for m in got_a[:3])
+
+
+def test_late_finish_is_recorded_once(queues, clock):
+    a, b = queues
+    a.add_puuids(["seed"])
+    a.finish_puuid("seed", ["m1"])
+    assert a.lease_matches("A", 1, ttl=10) == ["m1"]
+    clock.t += 11
+    assert b.lease_matches("B", 1, ttl=10) == ["m1"]
+
+    assert b.finish_match("m1", True, 1160, "16.3", ["p1", "p2"]) is True
+    # A's lease expired and B finished it first
+    assert a.finish_match("m1", True, 1160, "16.3", ["p1", "p3"]) is False
+    assert a.finish_match("m1", True, 1160, "16.3", ["p1", "p3"]) is False
+    assert a.kept() == 1
+    assert state(a, "m1")[0] == crawl_shard.DONE
+    # the late snowball isn't added either
+    assert {p for p, in a.con.execute("SELECT puuid FROM puuids")} == {"seed", "p1", "p2"}
+    # done matches are never leased again
+    clock.t += 100
+    assert a.lease_matches("A", 5, ttl=10) == []
+
+
+def test_release_and_max_attempts(queues, clock):
+    a, _ = queues
+    a.finish_puuid("seed", ["m1"])
+    for attempt in range(1, 4):
+        assert a.lease_matches("A", 1, ttl=10) == ["m1"]
+        a.release("matches", "match_id", "m1", max_attempts=3)
+        assert state(a, "m1")[2] == attempt
+    assert state(a, "m1")[0] == crawl_shard.FAILED
+    assert a.lease_matches("A", 1, ttl=10) == []
+    assert a.counts()["matches"] == {"failed": 1}
+
+
+def test_seen_sets(queues):
+    a, b = queues
+    assert a.add_puuids(["p1", "p2"]) == 2
+    assert b.add_puuids(["p2", "p3"]) == 1
+    assert a.finish_puuid("p1", ["m1", "m2"]) == 2
+    assert b.finish_puuid("p2", ["m2", "m3"]) == 1
+    a.add_done_matches(["m4"], kept=True)
+    assert b.finish_puuid("p3", ["m4", "m5"]) == 1
+    assert a.counts() == {"puuids": {"done": 3}, "matches": {"pending": 4, "done": 1}}
+
+
+@pytest.mark.parametrize("limits,safety", [("20:1,100:120", 0.9), ("5:1,30:10", 1.0), ("1:1", 1.0)])
+def test_shared_budget_never_exceeds_the_limits(queues, clock, limits, safety):
+    a, b = queues
+    parsed = parse_limits(limits)
+    a.set_limits(parsed, safety)
+
+    # two workers asking as fast as the budget lets them (plus odd delays)
+    grants = []
+    end = clock.t + 400
+    i = 0
+    while clock.t < end:
+        wq = (a, b)[i % 2]
+        wait = wq.take_token()
+        if wait <= 0.0:
+            grants.append(clock.t)
+            clock.t += (i % 7) * 0.013
+        else:
+            clock.t += wait + 1e-6
+        i += 1
+
+    assert grants and grants[0] > end - 400   # buckets start empty
+    for n, sec in parsed:
+        allowed = max(1, int(n * safety))
+        j = 0
+        for k, t in enumerate(grants):
+            while grants[j] <= t - sec:
+                j += 1
+            assert k - j + 1 <= allowed, (n, sec, t)
+    # ... and the budget is actually used (the tightest long window is close to full)
+    n, sec = max(parsed, key=lambda x: x[1])
+    assert len(grants) >= (400 / sec) * (max(2, n * safety) - 1) * 0.95
+
+
+def test_item_that_keeps_crashing_workers_fails(queues, clock):
+    a, b = queues
+    a.finish_puuid("seed", ["m1", "m2"])
+    a.add_puuids(["p1"])
+    # every lease of m1 / p1 dies with its worker (no release), m2 is finished
+    for attempt in range(1, 4):
+        wq = (a, b)[attempt % 2]
+        assert "m1" in wq.lease_matches("W", 5, ttl=10, max_attempts=3)
+        assert wq.lease_puuids("W", 1, ttl=10, max_attempts=3) == ["p1"]
+        if attempt == 1:
+            assert wq.finish_match("m2", False, 1100, "16.3", [])
+        clock.t += 11
+        assert state(a, "m1") == (crawl_shard.LEASED, "W", attempt)
+
+    assert a.lease_matches("W", 5, ttl=10, max_attempts=3) == []
+    assert b.lease_puuids("W", 1, ttl=10, max_attempts=3) == []
+    assert state(a, "m1")[0] == crawl_shard.FAILED
+    assert a.counts() == {"puuids": {"failed": 1}, "matches": {"done": 1, "failed": 1}}
+    # a lease at the limit that is still running is left alone
+    a.finish_puuid("seed", ["m3"])
+    for _ in range(3):
+        assert a.lease_matches("W", 1, ttl=10, max_attempts=3) == ["m3"]
+        clock.t += 5
+        assert b.lease_matches("W", 1, ttl=10, max_attempts=3) == []
+        assert state(a, "m3")[0] == crawl_shard.LEASED
+        clock.t += 6
+    assert a.lease_matches("W", 1, ttl=10, max_attempts=3) == []
+    assert state(a, "m3")[0] == crawl_shard.FAILED